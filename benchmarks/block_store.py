@@ -409,6 +409,20 @@ async def run_add_block_benchmark(version: int):
         print(f"{total_time:0.4f}s, get_random_not_compactified")
         all_test_time += total_time
 
+        total_time = 0.0
+        if verbose:
+            print("profiling get_random_uncompact_proofs")
+
+        start = monotonic()
+        for i in range(1, 5000):
+            proofs = await block_store.get_random_uncompact_proofs(100)
+            assert len(proofs) == 100
+        stop = monotonic()
+        total_time += stop - start
+
+        print(f"{total_time:0.4f}s, get_random_uncompact_proofs")
+        all_test_time += total_time
+
         print(f"all tests completed in {all_test_time:0.4f}s")
 
         db_size = os.path.getsize(Path("block-store-benchmark.db"))
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import sys
+from time import monotonic
+from typing import List
+
+from utils import rand_hash
+
+from chia.types.blockchain_format.coin import Coin
+from chia.util.ints import uint32, uint64, uint128
+from chia.wallet.coin_selection import CoinSelectionObjective, select_coins
+from chia.wallet.util.wallet_types import WalletType
+from chia.wallet.wallet_coin_record import WalletCoinRecord
+
+NUM_ITERS = 20
+MAX_COIN_AMOUNT = uint64((1 << 64) - 1)
+
+# we need seeded random, to have reproducible benchmark runs
+random.seed(123456789)
+
+
+def make_coin_records(num: int, max_amount: int) -> List[WalletCoinRecord]:
+    records: List[WalletCoinRecord] = [
+        WalletCoinRecord(
+            Coin(rand_hash(), rand_hash(), uint64(random.randint(1, max_amount))),
+            uint32(1),
+            uint32(0),
+            False,
+            False,
+            WalletType.STANDARD_WALLET,
+            1,
+        )
+        for _ in range(num)
+    ]
+    # the wallet hands the coins over sorted, largest first
+    records.sort(key=lambda record: record.coin.amount, reverse=True)
+    return records
+
+
+async def run_coin_selection_benchmark(num_coins: int, max_amount: int) -> None:
+    verbose: bool = "--verbose" in sys.argv
+    log = logging.getLogger("benchmark")
+    records = make_coin_records(num_coins, max_amount)
+    spendable_amount = uint128(sum(record.coin.amount for record in records))
+    largest = records[0].coin.amount
+
+    for objective in CoinSelectionObjective:
+        total_time = 0.0
+        selected_coins = 0
+        for _ in range(NUM_ITERS):
+            # targets that need a handful up to a few hundred coins, none of them matching a single coin
+            target = uint128(random.randint(largest + 1, largest * 300))
+            start = monotonic()
+            coins = await select_coins(spendable_amount, MAX_COIN_AMOUNT, records, {}, log, target, objective=objective)
+            total_time += monotonic() - start
+            assert sum(coin.amount for coin in coins) >= target
+            selected_coins += len(coins)
+            if verbose:
+                print(".", end="")
+                sys.stdout.flush()
+
+        if verbose:
+            print("")
+        print(
+            f"{total_time:0.4f}s, {objective.value} {NUM_ITERS} selections from {num_coins} coins "
+            f"of up to {max_amount} mojos, {selected_coins / NUM_ITERS:0.1f} coins per selection"
+        )
+
+
+if __name__ == "__main__":
+    for num_coins, max_amount in [(10000, 1000000), (500000, 1000000), (500000, 1000)]:
+        asyncio.run(run_coin_selection_benchmark(num_coins, max_amount))
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sys
+from pathlib import Path
+from time import monotonic
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from utils import rand_hash, setup_db
+
+from chia.types.blockchain_format.coin import Coin
+from chia.types.blockchain_format.program import Program
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.db_wrapper import DBWrapper2
+from chia.util.ints import uint32, uint64
+from chia.wallet.nft_wallet.nft_info import NFTCoinInfo
+from chia.wallet.nft_wallet.nft_puzzles import NFT_METADATA_UPDATER, create_full_puzzle, metadata_to_program
+from chia.wallet.wallet_nft_store import WalletNftStore
+
+NUM_ITERS = 200
+NUM_WALLETS = 10
+NUM_DIDS = 100
+NUM_METADATA_HASHES = 1000
+PAGE_SIZE = 50
+
+# we need seeded random, to have reproducible benchmark runs
+random.seed(123456789)
+
+
+def make_puzzle(metadata_hash: bytes32) -> Program:
+    metadata = metadata_to_program({b"u": ["https://www.chia.net/img/branding/chia-logo.svg"], b"mh": metadata_hash})
+    return create_full_puzzle(rand_hash(), metadata, NFT_METADATA_UPDATER.get_tree_hash(), Program.to(1))
+
+
+async def run_nft_store_benchmark(num_nfts: int) -> None:
+    verbose: bool = "--verbose" in sys.argv
+    db_wrapper: DBWrapper2 = await setup_db("nft-store-benchmark.db", 2)
+
+    # keep track of benchmark total time
+    all_test_time = 0.0
+
+    try:
+        nft_store = await WalletNftStore.create(db_wrapper)
+
+        dids: List[bytes32] = [rand_hash() for _ in range(NUM_DIDS)]
+        metadata_hashes: List[bytes32] = [rand_hash() for _ in range(NUM_METADATA_HASHES)]
+        # building the puzzles is not what's measured, they are shared by many NFTs
+        puzzles: List[Program] = [make_puzzle(metadata_hash) for metadata_hash in metadata_hashes]
+        nft_ids: List[bytes32] = []
+
+        print(f"Building database with {num_nfts} NFTs ", end="")
+        total_time = 0.0
+        for batch_start in range(0, num_nfts, 1000):
+            start = monotonic()
+            async with db_wrapper.writer():
+                for i in range(batch_start, min(num_nfts, batch_start + 1000)):
+                    nft_id = rand_hash()
+                    nft_ids.append(nft_id)
+                    nft = NFTCoinInfo(
+                        nft_id,
+                        Coin(nft_id, rand_hash(), uint64(1)),
+                        None,
+                        puzzles[i % NUM_METADATA_HASHES],
+                        uint32(i),
+                        random.choice(dids),
+                        uint32(i),
+                    )
+                    did_id: Optional[bytes32] = dids[i % NUM_DIDS] if i % 3 == 0 else None
+                    await nft_store.save_nft(uint32(i % NUM_WALLETS), did_id, nft)
+            total_time += monotonic() - start
+            if verbose:
+                print(".", end="")
+                sys.stdout.flush()
+        print("")
+        print(f"{total_time:0.4f}s, SAVE NFT {num_nfts} NFTs")
+        all_test_time += total_time
+
+        total_time = 0.0
+        start = monotonic()
+        for i in range(NUM_ITERS):
+            assert await nft_store.get_nft_by_id(random.choice(nft_ids)) is not None
+        total_time += monotonic() - start
+        print(f"{total_time:0.4f}s, GET NFT BY ID {NUM_ITERS} lookups")
+        all_test_time += total_time
+
+        queries: List[Tuple[str, Callable[[], Awaitable[List[NFTCoinInfo]]]]] = [
+            ("DID", lambda: nft_store.get_nft_list(did_id=random.choice(dids), limit=PAGE_SIZE)),
+            ("MINTER DID", lambda: nft_store.get_nft_list(minter_did=random.choice(dids), limit=PAGE_SIZE)),
+            (
+                "METADATA HASH",
+                lambda: nft_store.get_nft_list(metadata_hash=random.choice(metadata_hashes), limit=PAGE_SIZE),
+            ),
+        ]
+        for name, query in queries:
+            total_time = 0.0
+            found = 0
+            start = monotonic()
+            for i in range(NUM_ITERS):
+                found += len(await query())
+            total_time += monotonic() - start
+            print(f"{total_time:0.4f}s, GET NFTS BY {name} {NUM_ITERS} lookups, found {found} NFTs in total")
+            all_test_time += total_time
+
+        # the same pages of a wallet, read with start_after and with offset
+        wallet_nfts = num_nfts // NUM_WALLETS
+        num_pages = min(NUM_ITERS, wallet_nfts // PAGE_SIZE)
+
+        total_time = 0.0
+        start_after: Optional[bytes32] = None
+        start = monotonic()
+        for i in range(num_pages):
+            page = await nft_store.get_nft_list(wallet_id=uint32(1), start_after=start_after, limit=PAGE_SIZE)
+            start_after = page[-1].nft_id
+        total_time += monotonic() - start
+        print(f"{total_time:0.4f}s, GET NFT LIST {num_pages} pages by start_after")
+        all_test_time += total_time
+
+        total_time = 0.0
+        start = monotonic()
+        for i in range(num_pages):
+            await nft_store.get_nft_list(wallet_id=uint32(1), offset=i * PAGE_SIZE, limit=PAGE_SIZE)
+        total_time += monotonic() - start
+        print(f"{total_time:0.4f}s, GET NFT LIST {num_pages} pages by offset")
+        all_test_time += total_time
+
+        total_time = 0.0
+        start = monotonic()
+        for i in range(num_pages):
+            await nft_store.get_nft_list(wallet_id=uint32(1), offset=wallet_nfts - (i + 1) * PAGE_SIZE, limit=PAGE_SIZE)
+        total_time += monotonic() - start
+        print(f"{total_time:0.4f}s, GET NFT LIST {num_pages} deep pages by offset")
+        all_test_time += total_time
+
+        total_time = 0.0
+        start = monotonic()
+        for i in range(NUM_ITERS):
+            await nft_store.count(wallet_id=uint32(i % NUM_WALLETS))
+        total_time += monotonic() - start
+        print(f"{total_time:0.4f}s, COUNT {NUM_ITERS} wallets")
+        all_test_time += total_time
+
+        print(f"all tests completed in {all_test_time:0.4f}s")
+
+    finally:
+        await db_wrapper.close()
+
+    db_size = os.path.getsize(Path("nft-store-benchmark.db"))
+    print(f"database size: {db_size/1000000:.3f} MB")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    for size in sizes if len(sizes) > 0 else [10000, 100000, 1000000]:
+        asyncio.run(run_nft_store_benchmark(size))
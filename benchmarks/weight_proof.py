@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import tempfile
+from concurrent.futures.process import ProcessPoolExecutor
+from pathlib import Path
+from time import monotonic
+from typing import List, Optional, Tuple
+
+import aiosqlite
+import click
+
+from chia.consensus.blockchain import Blockchain
+from chia.consensus.default_constants import DEFAULT_CONSTANTS
+from chia.full_node.block_store import BlockStore
+from chia.full_node.coin_store import CoinStore
+from chia.full_node.weight_proof import WeightProofHandler, _validate_sub_epoch_summaries, validate_weight_proof_inner
+from chia.types.weight_proof import WeightProof
+from chia.util.db_version import lookup_db_version
+from chia.util.db_wrapper import DBWrapper2
+
+
+async def record_weight_proof(db_path: Path, wp_path: Path) -> None:
+    # writes the weight proof of the peak of a (mainnet) blockchain database
+    async with aiosqlite.connect(db_path) as connection:
+        await connection.execute("pragma query_only=ON")
+        db_version: int = await lookup_db_version(connection)
+
+        db_wrapper = DBWrapper2(connection, db_version=db_version)
+        await db_wrapper.add_connection(await aiosqlite.connect(db_path))
+
+        block_store = await BlockStore.create(db_wrapper)
+        coin_store = await CoinStore.create(db_wrapper)
+        blockchain = await Blockchain.create(coin_store, block_store, DEFAULT_CONSTANTS, db_path.parent, 2)
+        try:
+            peak = blockchain.get_peak()
+            assert peak is not None
+            start_time = monotonic()
+            wp_bytes = await WeightProofHandler(DEFAULT_CONSTANTS, blockchain).get_proof_of_weight_bytes(
+                peak.header_hash
+            )
+            assert wp_bytes is not None
+            print(f"created weight proof of height {peak.height} in {monotonic() - start_time:0.2f}s")
+            wp_path.write_bytes(wp_bytes)
+        finally:
+            blockchain.shut_down()
+
+
+async def validate(weight_proof: WeightProof, num_processes: int) -> Tuple[bool, float]:
+    start_time = monotonic()
+    summaries, sub_epoch_weight_list = _validate_sub_epoch_summaries(DEFAULT_CONSTANTS, weight_proof)
+    assert summaries is not None and sub_epoch_weight_list is not None
+    with ProcessPoolExecutor(max_workers=num_processes) as executor:
+        with tempfile.NamedTemporaryFile(prefix="chia_weight_proof_benchmark_shutdown_trigger") as shutdown_file:
+            valid, _ = await validate_weight_proof_inner(
+                DEFAULT_CONSTANTS,
+                executor,
+                shutdown_file.name,
+                weight_proof,
+                summaries,
+                sub_epoch_weight_list,
+                False,
+                0,
+            )
+    return valid, monotonic() - start_time
+
+
+async def main(wp_path: Path, db_path: Optional[Path], processes: List[int]) -> None:
+    if not wp_path.exists():
+        if db_path is None:
+            raise click.UsageError(f"{wp_path} doesn't exist, pass --db-path to record it from a blockchain database")
+        await record_weight_proof(db_path, wp_path)
+
+    weight_proof = WeightProof.from_bytes(wp_path.read_bytes())
+    print(
+        f"weight proof of height {weight_proof.recent_chain_data[-1].height}: "
+        f"{len(weight_proof.sub_epochs)} sub epochs, {len(weight_proof.sub_epoch_segments)} segments, "
+        f"{len(weight_proof.recent_chain_data)} recent blocks"
+    )
+    for num_processes in processes:
+        valid, duration = await validate(weight_proof, num_processes)
+        assert valid
+        print(f"validate_weight_proof_inner() with {num_processes:2d} processes: {duration:0.2f}s")
+
+
+@click.command()
+@click.argument("wp-path", type=click.Path())
+@click.option("--db-path", type=click.Path(), default=None, help="blockchain database to record the weight proof from")
+@click.option("--processes", "-p", type=int, multiple=True, default=[1, 2, 4, 8], help="sizes of the process pool")
+def entry_point(wp_path: str, db_path: Optional[str], processes: List[int]) -> None:
+    asyncio.run(main(Path(wp_path), None if db_path is None else Path(db_path), list(processes)))
+
+
+if __name__ == "__main__":
+    # pylint: disable = no-value-for-parameter
+    entry_point()
@@ -91,6 +91,28 @@ def create_rpc_port_option() -> Callable[[FC], FC]:
     )
 
 
+def create_page_size_option() -> Callable[[FC], FC]:
+    return click.option(
+        "-ps",
+        "--page_size",
+        help="Return the results in pages of at most this many entries",
+        type=int,
+        required=False,
+        default=None,
+    )
+
+
+def create_cursor_option() -> Callable[[FC], FC]:
+    return click.option(
+        "-c",
+        "--cursor",
+        help="The hexadecimal next_cursor returned by the previous page",
+        type=str,
+        required=False,
+        default=None,
+    )
+
+
 def create_fee_option() -> Callable[[FC], FC]:
     return click.option(
         "-m",
@@ -150,29 +172,37 @@ def update_data_store(
 @data_cmd.command("get_keys", short_help="Get all keys for a given store")
 @create_data_store_id_option()
 @click.option("-r", "--root_hash", help="The hexadecimal root hash", type=str, required=False)
+@create_page_size_option()
+@create_cursor_option()
 @create_rpc_port_option()
 def get_keys(
     id: str,
     root_hash: Optional[str],
+    page_size: Optional[int],
+    cursor: Optional[str],
     data_rpc_port: int,
 ) -> None:
     from chia.cmds.data_funcs import get_keys_cmd
 
-    run(get_keys_cmd(data_rpc_port, id, root_hash))
+    run(get_keys_cmd(data_rpc_port, id, root_hash, page_size, cursor))
 
 
 @data_cmd.command("get_keys_values", short_help="Get all keys and values for a given store")
 @create_data_store_id_option()
 @click.option("-r", "--root_hash", help="The hexadecimal root hash", type=str, required=False)
+@create_page_size_option()
+@create_cursor_option()
 @create_rpc_port_option()
 def get_keys_values(
     id: str,
     root_hash: Optional[str],
+    page_size: Optional[int],
+    cursor: Optional[str],
     data_rpc_port: int,
 ) -> None:
     from chia.cmds.data_funcs import get_keys_values_cmd
 
-    run(get_keys_values_cmd(data_rpc_port, id, root_hash))
+    run(get_keys_values_cmd(data_rpc_port, id, root_hash, page_size, cursor))
 
 
 @data_cmd.command("get_root", short_help="Get the published root hash value for a given store")
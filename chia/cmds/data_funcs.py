@@ -47,12 +47,17 @@ async def get_keys_cmd(
     rpc_port: Optional[int],
     store_id: str,
     root_hash: Optional[str],
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
 ) -> None:
     store_id_bytes = bytes32.from_hexstr(store_id)
     root_hash_bytes = None if root_hash is None else bytes32.from_hexstr(root_hash)
+    cursor_bytes = None if cursor is None else hexstr_to_bytes(cursor)
     async with get_any_service_client("data_layer", rpc_port) as (client, config, _):
         if client is not None:
-            res = await client.get_keys(store_id=store_id_bytes, root_hash=root_hash_bytes)
+            res = await client.get_keys(
+                store_id=store_id_bytes, root_hash=root_hash_bytes, page_size=page_size, cursor=cursor_bytes
+            )
             print(res)
 
 
@@ -60,12 +65,17 @@ async def get_keys_values_cmd(
     rpc_port: Optional[int],
     store_id: str,
     root_hash: Optional[str],
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None,
 ) -> None:
     store_id_bytes = bytes32.from_hexstr(store_id)
     root_hash_bytes = None if root_hash is None else bytes32.from_hexstr(root_hash)
+    cursor_bytes = None if cursor is None else hexstr_to_bytes(cursor)
     async with get_any_service_client("data_layer", rpc_port) as (client, config, _):
         if client is not None:
-            res = await client.get_keys_values(store_id=store_id_bytes, root_hash=root_hash_bytes)
+            res = await client.get_keys_values(
+                store_id=store_id_bytes, root_hash=root_hash_bytes, page_size=page_size, cursor=cursor_bytes
+            )
             print(res)
 
 
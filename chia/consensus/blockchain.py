@@ -4,13 +4,14 @@ import asyncio
 import dataclasses
 import logging
 import multiprocessing
+import time
 import traceback
 from concurrent.futures import Executor
 from concurrent.futures.process import ProcessPoolExecutor
 from enum import Enum
 from multiprocessing.context import BaseContext
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from chia.consensus.block_body_validation import validate_block_body
 from chia.consensus.block_header_validation import validate_unfinished_header_block
@@ -23,9 +24,11 @@ from chia.consensus.find_fork_point import find_fork_point_in_chain
 from chia.consensus.full_block_to_block_record import block_to_block_record
 from chia.consensus.multiprocess_validation import (
     PreValidationResult,
+    PreValidationTimes,
     _run_generator,
     pre_validate_blocks_multiprocessing,
 )
+from chia.consensus.pending_block_records import PendingBlockRecords
 from chia.full_node.block_height_map import BlockHeightMap
 from chia.full_node.block_store import BlockStore
 from chia.full_node.coin_store import CoinStore
@@ -95,12 +98,16 @@ class Blockchain(BlockchainInterface):
     block_store: BlockStore
     # Used to verify blocks in parallel
     pool: Executor
+    num_workers: int
     # Set holding seen compact proofs, in order to avoid duplicates.
     _seen_compact_proofs: Set[Tuple[VDFInfo, uint32]]
 
     # Whether blockchain is shut down or not
     _shut_down: bool
 
+    # Loads the block records close to the peak, when they're loaded lazily
+    _load_task: Optional[asyncio.Task[None]]
+
     # Lock to prevent simultaneous reads and writes
     lock: asyncio.Lock
     compact_proof_lock: asyncio.Lock
@@ -115,22 +122,27 @@ class Blockchain(BlockchainInterface):
         multiprocessing_context: Optional[BaseContext] = None,
         *,
         single_threaded: bool = False,
+        lazy: bool = False,
     ) -> "Blockchain":
         """
         Initializes a blockchain with the BlockRecords from disk, assuming they have all been
         validated. Uses the genesis block given in override_constants, or as a fallback,
         in the consensus constants config.
+        If lazy is set, only the peak is loaded, the other BlockRecords close to it are loaded in the
+        background. The blockchain lock is held until they are, see wait_until_loaded().
         """
         self = Blockchain()
         self.lock = asyncio.Lock()  # External lock handled by full node
         self.compact_proof_lock = asyncio.Lock()
         if single_threaded:
             self.pool = InlineExecutor()
+            self.num_workers = 1
         else:
             cpu_count = multiprocessing.cpu_count()
             if cpu_count > 61:
                 cpu_count = 61  # Windows Server 2016 has an issue https://bugs.python.org/issue26903
             num_workers = max(cpu_count - reserved_cores, 1)
+            self.num_workers = num_workers
             self.pool = ProcessPoolExecutor(
                 max_workers=num_workers,
                 mp_context=multiprocessing_context,
@@ -143,35 +155,74 @@ class Blockchain(BlockchainInterface):
         self.coin_store = coin_store
         self.block_store = block_store
         self._shut_down = False
-        await self._load_chain_from_store(blockchain_dir)
+        self._load_task = None
         self._seen_compact_proofs = set()
+        await self._load_peak_from_store(blockchain_dir)
+        if lazy:
+            # nothing can add blocks before the block records they build on are loaded
+            await self.lock.acquire()
+            self._load_task = asyncio.create_task(self._load_in_background())
+        else:
+            await self._load_block_records_from_store()
         return self
 
     def shut_down(self) -> None:
         self._shut_down = True
+        if self._load_task is not None:
+            self._load_task.cancel()
         self.pool.shutdown(wait=True)
 
-    async def _load_chain_from_store(self, blockchain_dir: Path) -> None:
+    async def close(self) -> None:
+        """
+        Closes the height-to-hash file. Called once no more blocks are being added.
+        """
+        await self.__height_map.close()
+
+    async def _load_peak_from_store(self, blockchain_dir: Path) -> None:
         """
-        Initializes the state of the Blockchain class from the database.
+        Initializes the state of the Blockchain class from the database, with the peak BlockRecord only.
         """
         self.__height_map = await BlockHeightMap.create(blockchain_dir, self.block_store.db_wrapper)
         self.__block_records = {}
         self.__heights_in_cache = {}
-        block_records, peak = await self.block_store.get_block_records_close_to_peak(self.constants.BLOCKS_CACHE_SIZE)
-        for block in block_records.values():
-            self.add_block_record(block)
-
-        if len(block_records) == 0:
-            assert peak is None
+        peak = await self.block_store.get_peak()
+        if peak is None:
             self._peak_height = None
             return
 
-        assert peak is not None
-        self._peak_height = self.block_record(peak).height
+        peak_block_record = await self.block_store.get_block_record(peak[0])
+        assert peak_block_record is not None
+        self.add_block_record(peak_block_record)
+        self._peak_height = peak_block_record.height
         assert self.__height_map.contains_height(self._peak_height)
         assert not self.__height_map.contains_height(uint32(self._peak_height + 1))
 
+    async def _load_block_records_from_store(self) -> None:
+        """
+        Loads the BlockRecords close to the peak, BLOCKS_CACHE_SIZE of them.
+        """
+        if self._peak_height is None:
+            return
+        block_records, _ = await self.block_store.get_block_records_close_to_peak(self.constants.BLOCKS_CACHE_SIZE)
+        for block in block_records.values():
+            self.add_block_record(block)
+
+    async def _load_in_background(self) -> None:
+        start_time = time.monotonic()
+        try:
+            await self._load_block_records_from_store()
+            log.info(f"Loaded the block records close to the peak in {time.monotonic() - start_time:0.2f}s")
+        finally:
+            self.lock.release()
+
+    async def wait_until_loaded(self) -> None:
+        """
+        Waits for the BlockRecords close to the peak, when the blockchain was created lazily. Anything which looks
+        up the block records of recent blocks without holding the blockchain lock needs to wait for them.
+        """
+        if self._load_task is not None:
+            await asyncio.shield(self._load_task)
+
     def get_peak(self) -> Optional[BlockRecord]:
         """
         Return the peak of the blockchain
@@ -270,6 +321,8 @@ class Blockchain(BlockchainInterface):
                 records, state_change_summary = await self._reconsider_peak(
                     block_record, genesis, fork_point_with_peak, npc_result
                 )
+                if state_change_summary is not None:
+                    await self.__height_map.prepare_rollback(state_change_summary.fork_height)
 
                 # Then update the memory cache. It is important that this is not cancelled and does not throw
                 # This is done after all async/DB operations, so there is a decreased chance of failure.
@@ -633,18 +686,29 @@ class Blockchain(BlockchainInterface):
         wp_summaries: Optional[List[SubEpochSummary]] = None,
         *,
         validate_signatures: bool,
+        pending: Optional[PendingBlockRecords] = None,
+        times: Optional[PreValidationTimes] = None,
     ) -> List[PreValidationResult]:
+        block_records: BlockchainInterface = self
+        get_block_generator: Callable[
+            [BlockInfo, Dict[bytes32, FullBlock]], Awaitable[Optional[BlockGenerator]]
+        ] = self.get_block_generator
+        if pending is not None:
+            # pre-validates on top of blocks which are not added to the blockchain yet
+            block_records = pending
+            get_block_generator = pending.get_block_generator
         return await pre_validate_blocks_multiprocessing(
             self.constants,
-            self,
+            block_records,
             blocks,
             self.pool,
             True,
             npc_results,
-            self.get_block_generator,
+            get_block_generator,
             batch_size,
             wp_summaries,
             validate_signatures=validate_signatures,
+            times=times,
         )
 
     async def run_generator(self, unfinished_block: bytes, generator: BlockGenerator, height: uint32) -> NPCResult:
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 import traceback
 from concurrent.futures import Executor
 from dataclasses import dataclass
@@ -47,6 +48,19 @@ class PreValidationResult(Streamable):
     validated_signature: bool
 
 
+@dataclass
+class PreValidationTimes:
+    # seconds spent in the worker processes, in total and running CLVM and checking signatures
+    workers: float = 0.0
+    clvm: float = 0.0
+    signatures: float = 0.0
+
+    def add(self, other: PreValidationTimes) -> None:
+        self.workers += other.workers
+        self.clvm += other.clvm
+        self.signatures += other.signatures
+
+
 def batch_pre_validate_blocks(
     constants: ConsensusConstants,
     blocks_pickled: Dict[bytes, bytes],
@@ -58,7 +72,9 @@ def batch_pre_validate_blocks(
     expected_difficulty: List[uint64],
     expected_sub_slot_iters: List[uint64],
     validate_signatures: bool,
-) -> List[bytes]:
+) -> Tuple[List[bytes], PreValidationTimes]:
+    start = time.monotonic()
+    times = PreValidationTimes()
     blocks: Dict[bytes32, BlockRecord] = {}
     for k, v in blocks_pickled.items():
         blocks[bytes32(k)] = BlockRecord.from_bytes(v)
@@ -88,6 +104,7 @@ def batch_pre_validate_blocks(
                     assert block.transactions_info is not None
                     block_generator: BlockGenerator = BlockGenerator.from_bytes(prev_generator_bytes)
                     assert block_generator.program == block.transactions_generator
+                    clvm_start = time.monotonic()
                     npc_result = get_name_puzzle_conditions(
                         block_generator,
                         min(constants.MAX_BLOCK_COST_CLVM, block.transactions_info.cost),
@@ -95,6 +112,7 @@ def batch_pre_validate_blocks(
                         mempool_mode=False,
                         height=block.height,
                     )
+                    times.clvm += time.monotonic() - clvm_start
                     removals, tx_additions = tx_removals_and_additions(npc_result.conds)
                 if npc_result is not None and npc_result.error is not None:
                     results.append(PreValidationResult(uint16(npc_result.error), None, npc_result, False))
@@ -123,6 +141,7 @@ def batch_pre_validate_blocks(
                     if validate_signatures:
                         if npc_result is not None and block.transactions_info is not None:
                             assert npc_result.conds
+                            signatures_start = time.monotonic()
                             pairs_pks, pairs_msgs = pkm_pairs(npc_result.conds, constants.AGG_SIG_ME_ADDITIONAL_DATA)
                             # Using AugSchemeMPL.aggregate_verify, so it's safe to use from_bytes_unchecked
                             pks_objects: List[G1Element] = [G1Element.from_bytes_unchecked(pk) for pk in pairs_pks]
@@ -132,6 +151,7 @@ def batch_pre_validate_blocks(
                                 error_int = uint16(Err.BAD_AGGREGATE_SIGNATURE.value)
                             else:
                                 successfully_validated_signatures = True
+                            times.signatures += time.monotonic() - signatures_start
 
                 results.append(
                     PreValidationResult(error_int, required_iters, npc_result, successfully_validated_signatures)
@@ -161,7 +181,8 @@ def batch_pre_validate_blocks(
                 error_stack = traceback.format_exc()
                 log.error(f"Exception: {error_stack}")
                 results.append(PreValidationResult(uint16(Err.UNKNOWN.value), None, None, False))
-    return [bytes(r) for r in results]
+    times.workers = time.monotonic() - start
+    return [bytes(r) for r in results], times
 
 
 async def pre_validate_blocks_multiprocessing(
@@ -176,6 +197,7 @@ async def pre_validate_blocks_multiprocessing(
     wp_summaries: Optional[List[SubEpochSummary]] = None,
     *,
     validate_signatures: bool = True,
+    times: Optional[PreValidationTimes] = None,
 ) -> List[PreValidationResult]:
     """
     This method must be called under the blockchain lock
@@ -191,6 +213,7 @@ async def pre_validate_blocks_multiprocessing(
         blocks: list of full blocks to validate (must be connected to current chain)
         npc_results
         get_block_generator
+        times: the time spent in the worker processes is added to it
     """
     prev_b: Optional[BlockRecord] = None
     # Collects all the recent blocks (up to the previous sub-epoch)
@@ -358,11 +381,11 @@ async def pre_validate_blocks_multiprocessing(
             )
         )
     # Collect all results into one flat list
-    return [
-        PreValidationResult.from_bytes(result)
-        for batch_result in (await asyncio.gather(*futures))
-        for result in batch_result
-    ]
+    batch_results = await asyncio.gather(*futures)
+    if times is not None:
+        for _, batch_times in batch_results:
+            times.add(batch_times)
+    return [PreValidationResult.from_bytes(result) for batch_result, _ in batch_results for result in batch_result]
 
 
 def _run_generator(
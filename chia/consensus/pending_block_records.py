@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from chia.consensus.block_record import BlockRecord
+from chia.consensus.blockchain_interface import BlockchainInterface
+from chia.consensus.constants import ConsensusConstants
+from chia.consensus.full_block_to_block_record import block_to_block_record
+from chia.consensus.multiprocess_validation import PreValidationResult
+from chia.types.block_protocol import BlockInfo
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
+from chia.types.full_block import FullBlock
+from chia.types.generator_types import BlockGenerator
+from chia.util.ints import uint32
+
+
+class PendingBlockRecords(BlockchainInterface):
+    """
+    The block records of the blockchain, together with those of pre-validated blocks which are still being added
+    to it. The next blocks can be pre-validated against it while the pending ones are added, their difficulty and
+    sub slot iters depend on the pending blocks. The pending blocks are also passed to get_block_generator, for
+    the generator references to them.
+    Heights are only looked up in the blockchain, the pending blocks may be on a fork of it.
+    """
+
+    def __init__(
+        self,
+        constants: ConsensusConstants,
+        blockchain: BlockchainInterface,
+        get_block_generator: Callable[[BlockInfo, Dict[bytes32, FullBlock]], Awaitable[Optional[BlockGenerator]]],
+    ) -> None:
+        self.constants = constants
+        self.blockchain = blockchain
+        self._get_block_generator = get_block_generator
+        self._block_records: Dict[bytes32, BlockRecord] = {}
+        self._blocks: Dict[bytes32, FullBlock] = {}
+
+    def add_blocks(self, blocks: Sequence[FullBlock], pre_validation_results: Sequence[PreValidationResult]) -> None:
+        """Adds blocks which passed pre-validation, in height order."""
+        for block, result in zip(blocks, pre_validation_results):
+            assert result.required_iters is not None
+            if self.contains_block(block.header_hash):
+                continue
+            self._block_records[block.header_hash] = block_to_block_record(
+                self.constants, self, result.required_iters, block, None
+            )
+            self._blocks[block.header_hash] = block
+
+    async def get_block_generator(
+        self, block: BlockInfo, additional_blocks: Dict[bytes32, FullBlock]
+    ) -> Optional[BlockGenerator]:
+        return await self._get_block_generator(block, {**self._blocks, **additional_blocks})
+
+    def get_peak(self) -> Optional[BlockRecord]:
+        return self.blockchain.get_peak()
+
+    def get_peak_height(self) -> Optional[uint32]:
+        return self.blockchain.get_peak_height()
+
+    def block_record(self, header_hash: bytes32) -> BlockRecord:
+        block_record = self._block_records.get(header_hash)
+        if block_record is not None:
+            return block_record
+        return self.blockchain.block_record(header_hash)
+
+    def height_to_block_record(self, height: uint32) -> BlockRecord:
+        return self.blockchain.height_to_block_record(height)
+
+    def get_ses_heights(self) -> List[uint32]:
+        return self.blockchain.get_ses_heights()
+
+    def get_ses(self, height: uint32) -> SubEpochSummary:
+        return self.blockchain.get_ses(height)
+
+    def height_to_hash(self, height: uint32) -> Optional[bytes32]:
+        return self.blockchain.height_to_hash(height)
+
+    def contains_block(self, header_hash: bytes32) -> bool:
+        return header_hash in self._block_records or self.blockchain.contains_block(header_hash)
+
+    def contains_height(self, height: uint32) -> bool:
+        return self.blockchain.contains_height(height)
+
+    def add_block_record(self, block_record: BlockRecord) -> None:
+        # the records added temporarily by the pre-validation stay out of the blockchain
+        self._block_records[block_record.header_hash] = block_record
+
+    def remove_block_record(self, header_hash: bytes32) -> None:
+        del self._block_records[header_hash]
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import random
 import time
 import traceback
 from pathlib import Path
@@ -14,6 +13,8 @@ from chia.data_layer.data_layer_errors import KeyNotFoundError
 from chia.data_layer.data_layer_util import (
     DiffData,
     InternalNode,
+    KeysPage,
+    KeysValuesPage,
     KeyValue,
     Layer,
     Offer,
@@ -32,7 +33,7 @@ from chia.data_layer.data_layer_util import (
 )
 from chia.data_layer.data_layer_wallet import DataLayerWallet, Mirror, SingletonRecord, verify_offer
 from chia.data_layer.data_store import DataStore
-from chia.data_layer.download_data import insert_from_delta_file, write_files_for_root
+from chia.data_layer.download_data import ServerScores, insert_from_delta_file, write_files_for_root
 from chia.rpc.rpc_server import default_get_connections
 from chia.rpc.wallet_rpc_client import WalletRpcClient
 from chia.server.outbound_message import NodeType
@@ -46,6 +47,22 @@ from chia.wallet.trading.offer import Offer as TradingOffer
 from chia.wallet.transaction_record import TransactionRecord
 
 
+def proof_from_proof_of_inclusion(key: bytes, value: bytes, proof_of_inclusion: ProofOfInclusion) -> Proof:
+    return Proof(
+        key=key,
+        value=value,
+        node_hash=proof_of_inclusion.node_hash,
+        layers=tuple(
+            Layer(
+                other_hash_side=layer.other_hash_side,
+                other_hash=layer.other_hash,
+                combined_hash=layer.combined_hash,
+            )
+            for layer in proof_of_inclusion.layers
+        ),
+    )
+
+
 class DataLayer:
     data_store: DataStore
     db_path: Path
@@ -58,6 +75,7 @@ class DataLayer:
     none_bytes: bytes32
     lock: asyncio.Lock
     _server: Optional[ChiaServer]
+    client_session: aiohttp.ClientSession
 
     @property
     def server(self) -> ChiaServer:
@@ -96,6 +114,9 @@ class DataLayer:
         self.none_bytes = bytes32([0] * 32)
         self.lock = asyncio.Lock()
         self._server = None
+        self.syncing_stores: Set[bytes32] = set()
+        self.last_synced: Dict[bytes32, int] = {}
+        self.server_scores = ServerScores()
 
     def _set_state_changed_callback(self, callback: Callable[..., object]) -> None:
         self.state_changed_callback = callback
@@ -113,6 +134,8 @@ class DataLayer:
         self.data_store = await DataStore.create(database=self.db_path)
         self.wallet_rpc = await self.wallet_rpc_init
         self.subscription_lock: asyncio.Lock = asyncio.Lock()
+        # One pooled session is shared by all the concurrent store downloads.
+        self.client_session = aiohttp.ClientSession()
 
         self.periodically_manage_data_task: asyncio.Task[Any] = asyncio.create_task(self.periodically_manage_data())
 
@@ -127,6 +150,7 @@ class DataLayer:
             self.periodically_manage_data_task.cancel()
         except asyncio.CancelledError:
             pass
+        await self.client_session.close()
         await self.data_store.close()
 
     async def create_store(
@@ -235,6 +259,32 @@ class DataLayer:
         res = await self.data_store.get_keys(store_id, root_hash)
         return res
 
+    async def get_keys_values_paginated(
+        self,
+        store_id: bytes32,
+        root_hash: Optional[bytes32],
+        page_size: int,
+        cursor: Optional[bytes],
+    ) -> KeysValuesPage:
+        async with self.lock:
+            await self._update_confirmation_status(tree_id=store_id)
+        return await self.data_store.get_keys_values_paginated(
+            tree_id=store_id, page_size=page_size, cursor=cursor, root_hash=root_hash
+        )
+
+    async def get_keys_paginated(
+        self,
+        store_id: bytes32,
+        root_hash: Optional[bytes32],
+        page_size: int,
+        cursor: Optional[bytes],
+    ) -> KeysPage:
+        async with self.lock:
+            await self._update_confirmation_status(tree_id=store_id)
+        return await self.data_store.get_keys_paginated(
+            tree_id=store_id, page_size=page_size, cursor=cursor, root_hash=root_hash
+        )
+
     async def get_ancestors(self, node_hash: bytes32, store_id: bytes32) -> List[InternalNode]:
         async with self.lock:
             await self._update_confirmation_status(tree_id=store_id)
@@ -346,10 +396,10 @@ class DataLayer:
 
         timestamp = int(time.time())
         servers_info = await self.data_store.get_available_servers_for_store(tree_id, timestamp)
-        # TODO: maybe append a random object to the whole DataLayer class?
-        random.shuffle(servers_info)
-        for server_info in servers_info:
-            url = server_info.url
+        # Every failed attempt bans at least one server, so bound the retries by the server count.
+        for _ in range(len(servers_info)):
+            if len(servers_info) == 0:
+                break
             root = await self.data_store.get_tree_root(tree_id=tree_id)
             if root.generation > singleton_record.generation:
                 self.log.info(
@@ -359,13 +409,14 @@ class DataLayer:
                 break
             if root.generation == singleton_record.generation:
                 self.log.info(f"Fetch data: wallet generation matching on-chain generation: {tree_id}.")
+                self.last_synced[tree_id] = int(time.time())
                 break
 
             self.log.info(
                 f"Downloading files {tree_id}. "
                 f"Current wallet generation: {root.generation}. "
                 f"Target wallet generation: {singleton_record.generation}. "
-                f"Server used: {url}."
+                f"Servers available: {len(servers_info)}."
             )
 
             to_download = await self.wallet_rpc.dl_history(
@@ -377,18 +428,23 @@ class DataLayer:
             try:
                 timeout = self.config.get("client_timeout", 15)
                 proxy_url = self.config.get("proxy_url", None)
+                prefetch = self.config.get("delta_file_prefetch", 4)
                 success = await insert_from_delta_file(
                     self.data_store,
                     tree_id,
                     root.generation,
                     [record.root for record in reversed(to_download)],
-                    server_info,
+                    servers_info,
                     self.server_files_location,
                     timeout,
                     self.log,
                     proxy_url,
+                    self.client_session,
+                    self.server_scores,
+                    prefetch,
                 )
                 if success:
+                    self.last_synced[tree_id] = int(time.time())
                     self.log.info(
                         f"Finished downloading and validating {tree_id}. "
                         f"Wallet generation saved: {singleton_record.generation}. "
@@ -397,11 +453,11 @@ class DataLayer:
                     break
             except asyncio.CancelledError:
                 raise
-            except aiohttp.client_exceptions.ClientConnectorError:
-                self.log.warning(f"Server {url} unavailable for {tree_id}.")
             except Exception as e:
                 self.log.warning(f"Exception while downloading files for {tree_id}: {e} {traceback.format_exc()}.")
 
+            servers_info = await self.data_store.get_available_servers_for_store(tree_id, int(time.time()))
+
     async def upload_files(self, tree_id: bytes32) -> None:
         singleton_record: Optional[SingletonRecord] = await self.wallet_rpc.dl_latest_singleton(tree_id, True)
         if singleton_record is None:
@@ -532,20 +588,62 @@ class DataLayer:
                         )
 
             async with self.subscription_lock:
-                for subscription in subscriptions:
-                    try:
-                        await self.update_subscriptions_from_wallet(subscription.tree_id)
-                        await self.fetch_and_validate(subscription.tree_id)
-                        await self.upload_files(subscription.tree_id)
-                    except asyncio.CancelledError:
-                        raise
-                    except Exception as e:
-                        self.log.error(f"Exception while fetching data: {type(e)} {e} {traceback.format_exc()}.")
+                await self.sync_subscriptions(subscriptions)
             try:
                 await asyncio.sleep(manage_data_interval)
             except asyncio.CancelledError:
                 raise
 
+    async def get_generations_behind(self, tree_id: bytes32) -> int:
+        singleton_record: Optional[SingletonRecord] = await self.wallet_rpc.dl_latest_singleton(tree_id, True)
+        if singleton_record is None:
+            return 0
+        if not await self.data_store.tree_id_exists(tree_id=tree_id):
+            return int(singleton_record.generation)
+        root = await self.data_store.get_tree_root(tree_id=tree_id)
+        return max(0, singleton_record.generation - root.generation)
+
+    async def sync_subscriptions(self, subscriptions: List[Subscription]) -> None:
+        """Sync several stores concurrently, starting with the ones furthest behind so
+        that a single slow mirror does not hold up every other store.
+        """
+        max_concurrent_syncs = max(1, self.config.get("max_concurrent_syncs", 4))
+        semaphore = asyncio.Semaphore(max_concurrent_syncs)
+
+        async def generations_behind(tree_id: bytes32) -> int:
+            async with semaphore:
+                try:
+                    return await self.get_generations_behind(tree_id=tree_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.log.warning(f"Unable to determine sync lag for {tree_id}: {type(e)} {e}")
+                    return 0
+
+        lags: List[int] = await asyncio.gather(
+            *(generations_behind(subscription.tree_id) for subscription in subscriptions)
+        )
+        ordered_subscriptions = [
+            subscription for _, subscription in sorted(zip(lags, subscriptions), key=lambda pair: pair[0], reverse=True)
+        ]
+
+        async def sync(tree_id: bytes32) -> None:
+            async with semaphore:
+                self.syncing_stores.add(tree_id)
+                try:
+                    await self.update_subscriptions_from_wallet(tree_id)
+                    await self.fetch_and_validate(tree_id)
+                    await self.upload_files(tree_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.log.error(f"Exception while fetching data: {type(e)} {e} {traceback.format_exc()}.")
+                finally:
+                    self.syncing_stores.discard(tree_id)
+
+        # Tasks acquire the semaphore in creation order, so the most lagging stores start first.
+        await asyncio.gather(*(sync(subscription.tree_id) for subscription in ordered_subscriptions))
+
     async def build_offer_changelist(
         self,
         store_id: bytes32,
@@ -608,36 +706,44 @@ class DataLayer:
                 if new_root_hash is None:
                     raise Exception("only inserts are supported so a None root hash should not be possible")
 
-                proofs: List[Proof] = []
-                for entry in offer_store.inclusions:
-                    node_hash = await self.get_key_value_hash(
-                        store_id=offer_store.store_id,
-                        key=entry.key,
-                        root_hash=new_root_hash,
-                    )
-                    proof_of_inclusion = await self.data_store.get_proof_of_inclusion_by_hash(
-                        node_hash=node_hash,
-                        tree_id=offer_store.store_id,
-                        root_hash=new_root_hash,
-                    )
-                    proof = Proof(
+                proofs_of_inclusion = await self.data_store.get_proofs_of_inclusion_by_keys(
+                    keys=[entry.key for entry in offer_store.inclusions],
+                    tree_id=offer_store.store_id,
+                    root_hash=new_root_hash,
+                )
+                proofs = tuple(
+                    proof_from_proof_of_inclusion(
                         key=entry.key,
                         value=entry.value,
-                        node_hash=proof_of_inclusion.node_hash,
-                        layers=tuple(
-                            Layer(
-                                other_hash_side=layer.other_hash_side,
-                                other_hash=layer.other_hash,
-                                combined_hash=layer.combined_hash,
-                            )
-                            for layer in proof_of_inclusion.layers
-                        ),
+                        proof_of_inclusion=proofs_of_inclusion[entry.key],
                     )
-                    proofs.append(proof)
-                store_proof = StoreProofs(store_id=offer_store.store_id, proofs=tuple(proofs))
+                    for entry in offer_store.inclusions
+                )
+                store_proof = StoreProofs(store_id=offer_store.store_id, proofs=proofs)
                 our_store_proofs[offer_store.store_id] = store_proof
             return our_store_proofs
 
+    async def get_proofs(
+        self, store_id: bytes32, keys: List[bytes], root_hash: Optional[bytes32] = None
+    ) -> Tuple[bytes32, StoreProofs]:
+        async with self.lock:
+            await self._update_confirmation_status(tree_id=store_id)
+
+        if root_hash is None:
+            root = await self.data_store.get_tree_root(tree_id=store_id)
+            if root.node_hash is None:
+                raise Exception(f"Store is empty: {store_id.hex()}")
+            root_hash = root.node_hash
+        nodes_and_proofs = await self.data_store.get_nodes_and_proofs_of_inclusion_by_keys(
+            keys=keys, tree_id=store_id, root_hash=root_hash
+        )
+
+        proofs = tuple(
+            proof_from_proof_of_inclusion(key=node.key, value=node.value, proof_of_inclusion=proof_of_inclusion)
+            for node, proof_of_inclusion in nodes_and_proofs.values()
+        )
+        return root_hash, StoreProofs(store_id=store_id, proofs=proofs)
+
     async def make_offer(
         self,
         maker: Tuple[OfferStore, ...],
@@ -799,4 +905,7 @@ class DataLayer:
             generation=root.generation,
             target_root_hash=singleton_record.root,
             target_generation=singleton_record.generation,
+            generations_behind=max(0, singleton_record.generation - root.generation),
+            syncing=store_id in self.syncing_stores,
+            last_synced=self.last_synced.get(store_id),
         )
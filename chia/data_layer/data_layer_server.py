@@ -96,17 +96,19 @@ class DataLayerServer:
             await self.webserver.await_closed()
             self.webserver = None
 
-    async def file_handler(self, request: web.Request) -> web.Response:
+    async def file_handler(self, request: web.Request) -> web.StreamResponse:
         filename = request.match_info["filename"]
         if not is_filename_valid(filename):
             raise Exception("Invalid file format requested.")
         file_path = self.server_dir.joinpath(filename)
-        with open(file_path, "rb") as reader:
-            content = reader.read()
-        response = web.Response(
-            content_type="application/octet-stream",
-            headers={"Content-Disposition": "attachment;filename={}".format(filename)},
-            body=content,
+        # FileResponse streams the file and honors range requests, which lets clients
+        # fetch only the nodes of a delta file they are missing.
+        response = web.FileResponse(
+            path=file_path,
+            headers={
+                "Content-Type": "application/octet-stream",
+                "Content-Disposition": "attachment;filename={}".format(filename),
+            },
         )
         return response
 
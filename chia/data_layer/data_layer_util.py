@@ -326,6 +326,28 @@ class DiffData:
     value: bytes
 
 
+@dataclass(frozen=True)
+class KeysValuesPage:
+    # `next_cursor` is the last key of this page, None when there are no more pages.
+    # The totals are only computed for the first page, they are None for the following ones.
+    keys_values: List[TerminalNode]
+    next_cursor: Optional[bytes]
+    root_hash: Optional[bytes32]
+    total_count: Optional[int]
+    total_bytes: Optional[int]
+
+
+@dataclass(frozen=True)
+class KeysPage:
+    # `next_cursor` is the last key of this page, None when there are no more pages.
+    # The totals are only computed for the first page, they are None for the following ones.
+    keys: List[bytes]
+    next_cursor: Optional[bytes]
+    root_hash: Optional[bytes32]
+    total_count: Optional[int]
+    total_bytes: Optional[int]
+
+
 @streamable
 @dataclass(frozen=True)
 class SerializedNode(Streamable):
@@ -623,3 +645,7 @@ class SyncStatus:
     generation: int
     target_root_hash: bytes32
     target_generation: int
+    generations_behind: int
+    syncing: bool
+    # unix timestamp of the last time the store was found in sync with the chain
+    last_synced: Optional[int]
@@ -13,6 +13,8 @@ from chia.data_layer.data_layer_errors import KeyNotFoundError, NodeHashError, T
 from chia.data_layer.data_layer_util import (
     DiffData,
     InternalNode,
+    KeysPage,
+    KeysValuesPage,
     Node,
     NodeType,
     OperationType,
@@ -31,7 +33,8 @@ from chia.data_layer.data_layer_util import (
 )
 from chia.types.blockchain_format.program import Program
 from chia.types.blockchain_format.sized_bytes import bytes32
-from chia.util.db_wrapper import DBWrapper2
+from chia.util.chunks import chunks
+from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2
 
 log = logging.getLogger(__name__)
 
@@ -131,6 +134,19 @@ class DataStore:
                 )
                 """
             )
+            # The keys of a tree in key order, for the keys to be paged through without walking and sorting the
+            # whole tree for each page. It's filled for a root when it's first paged, see _index_keys()
+            await writer.execute(
+                """
+                CREATE TABLE IF NOT EXISTS keys_by_root(
+                    root_hash BLOB NOT NULL CHECK(length(root_hash) == 32),
+                    key BLOB NOT NULL,
+                    hash BLOB NOT NULL CHECK(length(hash) == 32),
+                    PRIMARY KEY(root_hash, key),
+                    FOREIGN KEY(hash) REFERENCES node(hash)
+                )
+                """
+            )
             await writer.execute(
                 """
                 CREATE TABLE IF NOT EXISTS subscriptions(
@@ -759,6 +775,200 @@ class DataStore:
 
         return keys
 
+    async def _index_keys(self, root_hash: bytes32) -> None:
+        """Fill keys_by_root for the tree under `root_hash`, unless it already is.
+
+        Only the keys of the current roots are kept, the others are removed when a new root is indexed.
+        """
+        async with self.db_wrapper.writer() as writer:
+            cursor = await writer.execute(
+                "SELECT 1 FROM keys_by_root WHERE root_hash == :root_hash LIMIT 1", {"root_hash": root_hash}
+            )
+            if await cursor.fetchone() is not None:
+                return
+
+            await writer.execute(
+                """
+                DELETE FROM keys_by_root WHERE root_hash NOT IN (
+                    SELECT node_hash FROM root AS current
+                    WHERE status == :status AND node_hash IS NOT NULL AND generation == (
+                        SELECT MAX(generation) FROM root WHERE tree_id == current.tree_id AND status == :status
+                    )
+                )
+                """,
+                {"status": Status.COMMITTED.value},
+            )
+            await writer.execute(
+                """
+                INSERT INTO keys_by_root(root_hash, key, hash)
+                WITH RECURSIVE
+                    tree_from_root_hash(hash, node_type, left, right, key) AS (
+                        SELECT node.hash, node.node_type, node.left, node.right, node.key
+                        FROM node WHERE node.hash == :root_hash
+                        UNION ALL
+                        SELECT
+                            node.hash, node.node_type, node.left, node.right, node.key FROM node, tree_from_root_hash
+                        WHERE node.hash == tree_from_root_hash.left OR node.hash == tree_from_root_hash.right
+                    )
+                SELECT :root_hash, key, hash FROM tree_from_root_hash WHERE node_type == :node_type
+                """,
+                {"root_hash": root_hash, "node_type": NodeType.TERMINAL},
+            )
+
+    async def iter_keys_values(
+        self,
+        tree_id: bytes32,
+        root_hash: Optional[bytes32] = None,
+        after_key: Optional[bytes] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[TerminalNode]:
+        """Yield the terminal nodes of a tree ordered by key, starting after `after_key`.
+
+        The nodes are read in key order from keys_by_root, which is filled the first time the root is
+        iterated. The reader is held until the iterator is exhausted or closed.
+        """
+        if root_hash is None:
+            root = await self.get_tree_root(tree_id=tree_id)
+            root_hash = root.node_hash
+        if root_hash is None:
+            return
+        await self._index_keys(root_hash=root_hash)
+
+        after_condition = "" if after_key is None else "AND keys_by_root.key > :after_key"
+        async with self.db_wrapper.reader() as reader:
+            cursor = await reader.execute(
+                f"""
+                SELECT node.* FROM keys_by_root INNER JOIN node ON node.hash == keys_by_root.hash
+                WHERE keys_by_root.root_hash == :root_hash {after_condition}
+                ORDER BY keys_by_root.key ASC
+                LIMIT :limit
+                """,
+                {"root_hash": root_hash, "after_key": after_key, "limit": -1 if limit is None else limit},
+            )
+            async for row in cursor:
+                node = row_to_node(row=row)
+                if not isinstance(node, TerminalNode):
+                    raise Exception(f"Unexpected internal node found: {node.hash.hex()}")
+                yield node
+
+    async def get_keys_values_size(
+        self, tree_id: bytes32, root_hash: Optional[bytes32] = None, include_values: bool = True
+    ) -> Tuple[int, int]:
+        """Return the number of terminal nodes and the total byte size of their keys
+        (and values, if requested).
+        """
+        async with self.db_wrapper.reader() as reader:
+            if root_hash is None:
+                root = await self.get_tree_root(tree_id=tree_id)
+                root_hash = root.node_hash
+            if root_hash is None:
+                return 0, 0
+            value_size = "LENGTH(value)" if include_values else "0"
+            cursor = await reader.execute(
+                f"""
+                WITH RECURSIVE
+                    tree_from_root_hash(hash, node_type, left, right, key, value) AS (
+                        SELECT node.* FROM node WHERE node.hash == :root_hash
+                        UNION ALL
+                        SELECT node.* FROM node, tree_from_root_hash
+                        WHERE node.hash == tree_from_root_hash.left OR node.hash == tree_from_root_hash.right
+                    )
+                SELECT COUNT(*) AS count, COALESCE(SUM(LENGTH(key) + {value_size}), 0) AS size
+                FROM tree_from_root_hash WHERE node_type == :node_type
+                """,
+                {"root_hash": root_hash, "node_type": NodeType.TERMINAL},
+            )
+            row = await cursor.fetchone()
+
+        if row is None:
+            return 0, 0
+        return int(row["count"]), int(row["size"])
+
+    async def get_keys_values_paginated(
+        self,
+        tree_id: bytes32,
+        page_size: int,
+        cursor: Optional[bytes] = None,
+        root_hash: Optional[bytes32] = None,
+    ) -> KeysValuesPage:
+        if page_size < 1:
+            raise ValueError(f"Page size must be positive, got: {page_size}")
+        # Pin the root so that following pages can be requested against the same tree.
+        if root_hash is None:
+            root = await self.get_tree_root(tree_id=tree_id)
+            root_hash = root.node_hash
+        keys_values = [
+            node
+            async for node in self.iter_keys_values(
+                tree_id=tree_id, root_hash=root_hash, after_key=cursor, limit=page_size + 1
+            )
+        ]
+        # the totals take a scan of the whole tree, which the first page is enough for
+        total_count: Optional[int] = None
+        total_bytes: Optional[int] = None
+        if cursor is None:
+            total_count, total_bytes = await self.get_keys_values_size(tree_id=tree_id, root_hash=root_hash)
+
+        next_cursor: Optional[bytes] = None
+        if len(keys_values) > page_size:
+            keys_values = keys_values[:page_size]
+            next_cursor = keys_values[-1].key
+
+        return KeysValuesPage(
+            keys_values=keys_values,
+            next_cursor=next_cursor,
+            root_hash=root_hash,
+            total_count=total_count,
+            total_bytes=total_bytes,
+        )
+
+    async def get_keys_paginated(
+        self,
+        tree_id: bytes32,
+        page_size: int,
+        cursor: Optional[bytes] = None,
+        root_hash: Optional[bytes32] = None,
+    ) -> KeysPage:
+        if page_size < 1:
+            raise ValueError(f"Page size must be positive, got: {page_size}")
+        if root_hash is None:
+            root = await self.get_tree_root(tree_id=tree_id)
+            root_hash = root.node_hash
+        keys: List[bytes] = []
+        total_count: Optional[int] = None
+        total_bytes: Optional[int] = None
+        if root_hash is not None:
+            await self._index_keys(root_hash=root_hash)
+            after_condition = "" if cursor is None else "AND key > :after_key"
+            async with self.db_wrapper.reader() as reader:
+                db_cursor = await reader.execute(
+                    f"""
+                    SELECT key FROM keys_by_root
+                    WHERE root_hash == :root_hash {after_condition}
+                    ORDER BY key ASC
+                    LIMIT :limit
+                    """,
+                    {"root_hash": root_hash, "after_key": cursor, "limit": page_size + 1},
+                )
+                keys = [row["key"] async for row in db_cursor]
+        if cursor is None:
+            total_count, total_bytes = await self.get_keys_values_size(
+                tree_id=tree_id, root_hash=root_hash, include_values=False
+            )
+
+        next_cursor: Optional[bytes] = None
+        if len(keys) > page_size:
+            keys = keys[:page_size]
+            next_cursor = keys[-1]
+
+        return KeysPage(
+            keys=keys,
+            next_cursor=next_cursor,
+            root_hash=root_hash,
+            total_count=total_count,
+            total_bytes=total_bytes,
+        )
+
     async def insert(
         self,
         key: bytes,
@@ -1095,6 +1305,44 @@ class DataStore:
 
         raise KeyNotFoundError(key=key)
 
+    async def get_nodes_by_keys(
+        self,
+        keys: List[bytes],
+        tree_id: bytes32,
+        root_hash: Optional[bytes32] = None,
+    ) -> Dict[bytes, TerminalNode]:
+        async with self.db_wrapper.reader() as reader:
+            if root_hash is None:
+                root = await self.get_tree_root(tree_id=tree_id)
+                root_hash = root.node_hash
+
+            nodes: Dict[bytes, TerminalNode] = {}
+            for keys_chunk in chunks(list(set(keys)), SQLITE_MAX_VARIABLE_NUMBER - 2):
+                placeholders = ",".join("?" * len(keys_chunk))
+                cursor = await reader.execute(
+                    f"""
+                    WITH RECURSIVE
+                        tree_from_root_hash(hash, node_type, left, right, key, value) AS (
+                            SELECT node.* FROM node WHERE node.hash == ?
+                            UNION ALL
+                            SELECT node.* FROM node, tree_from_root_hash
+                            WHERE node.hash == tree_from_root_hash.left OR node.hash == tree_from_root_hash.right
+                        )
+                    SELECT * FROM tree_from_root_hash
+                    WHERE node_type == ? AND key IN ({placeholders})
+                    """,
+                    (root_hash, NodeType.TERMINAL, *keys_chunk),
+                )
+                async for row in cursor:
+                    node = TerminalNode.from_row(row=row)
+                    nodes[node.key] = node
+
+        for key in keys:
+            if key not in nodes:
+                raise KeyNotFoundError(key=key)
+
+        return {key: nodes[key] for key in keys}
+
     async def get_node(self, node_hash: bytes32) -> Node:
         async with self.db_wrapper.reader() as reader:
             cursor = await reader.execute("SELECT * FROM node WHERE hash == :hash", {"hash": node_hash})
@@ -1106,6 +1354,21 @@ class DataStore:
         node = row_to_node(row=row)
         return node
 
+    async def get_nodes(self, node_hashes: List[bytes32]) -> Dict[bytes32, Node]:
+        """Fetch the nodes that exist locally among `node_hashes`, the node table being
+        content addressed this can be used to skip fetching nodes that are already known.
+        """
+        nodes: Dict[bytes32, Node] = {}
+        async with self.db_wrapper.reader() as reader:
+            for hashes_chunk in chunks(list(set(node_hashes)), SQLITE_MAX_VARIABLE_NUMBER):
+                placeholders = ",".join("?" * len(hashes_chunk))
+                cursor = await reader.execute(f"SELECT * FROM node WHERE hash IN ({placeholders})", hashes_chunk)
+                async for row in cursor:
+                    node = row_to_node(row=row)
+                    nodes[node.hash] = node
+
+        return nodes
+
     async def get_tree_as_program(self, tree_id: bytes32) -> Program:
         async with self.db_wrapper.reader() as reader:
             root = await self.get_tree_root(tree_id=tree_id)
@@ -1174,6 +1437,73 @@ class DataStore:
 
         return proof_of_inclusion
 
+    async def get_proofs_of_inclusion_by_hashes(
+        self,
+        node_hashes: List[bytes32],
+        tree_id: bytes32,
+        root_hash: Optional[bytes32] = None,
+    ) -> Dict[bytes32, ProofOfInclusion]:
+        """Collect the information for proofs of inclusion of several hashes in the
+        Merkle tree.  The ancestors of all the hashes are fetched together so path
+        nodes shared between the proofs are only read once.
+        """
+        async with self.db_wrapper.reader() as reader:
+            if root_hash is None:
+                root = await self.get_tree_root(tree_id=tree_id)
+                root_hash = root.node_hash
+            if root_hash is None:
+                raise Exception(f"Root hash is unspecified for tree ID: {tree_id.hex()}")
+
+            # Each hash is bound twice, once for each side.
+            parents: Dict[bytes32, InternalNode] = {}
+            for hashes_chunk in chunks(list(set(node_hashes)), SQLITE_MAX_VARIABLE_NUMBER // 2 - 1):
+                placeholders = ",".join("?" * len(hashes_chunk))
+                cursor = await reader.execute(
+                    f"""
+                    WITH RECURSIVE
+                        tree_from_root_hash(hash, node_type, left, right, key, value) AS (
+                            SELECT node.* FROM node WHERE node.hash == ?
+                            UNION ALL
+                            SELECT node.* FROM node, tree_from_root_hash
+                            WHERE node.hash == tree_from_root_hash.left OR node.hash == tree_from_root_hash.right
+                        ),
+                        ancestors(hash, node_type, left, right, key, value) AS (
+                            SELECT node.* FROM node
+                            WHERE node.left IN ({placeholders}) OR node.right IN ({placeholders})
+                            UNION
+                            SELECT node.* FROM node, ancestors
+                            WHERE node.left == ancestors.hash OR node.right == ancestors.hash
+                        )
+                    SELECT tree_from_root_hash.* FROM tree_from_root_hash INNER JOIN ancestors
+                    WHERE tree_from_root_hash.hash == ancestors.hash
+                    """,
+                    (root_hash, *hashes_chunk, *hashes_chunk),
+                )
+                async for row in cursor:
+                    parent = InternalNode.from_row(row=row)
+                    parents[parent.left_hash] = parent
+                    parents[parent.right_hash] = parent
+
+        proofs: Dict[bytes32, ProofOfInclusion] = {}
+        for node_hash in node_hashes:
+            layers: List[ProofOfInclusionLayer] = []
+            child_hash = node_hash
+            while child_hash in parents:
+                parent = parents[child_hash]
+                layer = ProofOfInclusionLayer.from_internal_node(internal_node=parent, traversal_child_hash=child_hash)
+                layers.append(layer)
+                child_hash = parent.hash
+
+            proof_of_inclusion = ProofOfInclusion(node_hash=node_hash, layers=layers)
+            if proof_of_inclusion.root_hash != root_hash:
+                raise Exception(
+                    f"Incorrect root, expected: {root_hash.hex()}"
+                    f"\n                     has: {proof_of_inclusion.root_hash.hex()}"
+                )
+            proofs[node_hash] = proof_of_inclusion
+
+        return proofs
+
     async def get_proof_of_inclusion_by_key(
         self,
         key: bytes,
@@ -1182,9 +1512,44 @@ class DataStore:
         """Collect the information for a proof of inclusion of a key and its value in
         the Merkle tree.
         """
+        proofs = await self.get_proofs_of_inclusion_by_keys(keys=[key], tree_id=tree_id)
+        return proofs[key]
+
+    async def get_nodes_and_proofs_of_inclusion_by_keys(
+        self,
+        keys: List[bytes],
+        tree_id: bytes32,
+        root_hash: Optional[bytes32] = None,
+    ) -> Dict[bytes, Tuple[TerminalNode, ProofOfInclusion]]:
+        """Collect the terminal nodes of several keys along with the information for
+        proofs of inclusion of the keys and their values in the Merkle tree.
+        """
         async with self.db_wrapper.reader():
-            node = await self.get_node_by_key(key=key, tree_id=tree_id)
-            return await self.get_proof_of_inclusion_by_hash(node_hash=node.hash, tree_id=tree_id)
+            if root_hash is None:
+                root = await self.get_tree_root(tree_id=tree_id)
+                root_hash = root.node_hash
+            nodes = await self.get_nodes_by_keys(keys=keys, tree_id=tree_id, root_hash=root_hash)
+            proofs = await self.get_proofs_of_inclusion_by_hashes(
+                node_hashes=[node.hash for node in nodes.values()],
+                tree_id=tree_id,
+                root_hash=root_hash,
+            )
+
+        return {key: (node, proofs[node.hash]) for key, node in nodes.items()}
+
+    async def get_proofs_of_inclusion_by_keys(
+        self,
+        keys: List[bytes],
+        tree_id: bytes32,
+        root_hash: Optional[bytes32] = None,
+    ) -> Dict[bytes, ProofOfInclusion]:
+        """Collect the information for proofs of inclusion of several keys and their
+        values in the Merkle tree.
+        """
+        nodes_and_proofs = await self.get_nodes_and_proofs_of_inclusion_by_keys(
+            keys=keys, tree_id=tree_id, root_hash=root_hash
+        )
+        return {key: proof for key, (_, proof) in nodes_and_proofs.items()}
 
     async def get_first_generation(self, node_hash: bytes32, tree_id: bytes32) -> int:
         async with self.db_wrapper.reader() as reader:
@@ -1206,6 +1571,7 @@ class DataStore:
         tree_id: bytes32,
         deltas_only: bool,
         writer: BinaryIO,
+        manifest_writer: Optional[BinaryIO] = None,
     ) -> None:
         if node_hash == bytes32([0] * 32):
             return
@@ -1218,8 +1584,8 @@ class DataStore:
         node = await self.get_node(node_hash)
         to_write = b""
         if isinstance(node, InternalNode):
-            await self.write_tree_to_file(root, node.left_hash, tree_id, deltas_only, writer)
-            await self.write_tree_to_file(root, node.right_hash, tree_id, deltas_only, writer)
+            await self.write_tree_to_file(root, node.left_hash, tree_id, deltas_only, writer, manifest_writer)
+            await self.write_tree_to_file(root, node.right_hash, tree_id, deltas_only, writer, manifest_writer)
             to_write = bytes(SerializedNode(False, bytes(node.left_hash), bytes(node.right_hash)))
         elif isinstance(node, TerminalNode):
             to_write = bytes(SerializedNode(True, node.key, node.value))
@@ -1228,6 +1594,9 @@ class DataStore:
 
         writer.write(len(to_write).to_bytes(4, byteorder="big"))
         writer.write(to_write)
+        if manifest_writer is not None:
+            manifest_writer.write(node_hash)
+            manifest_writer.write(len(to_write).to_bytes(4, byteorder="big"))
 
     async def update_subscriptions_from_wallet(self, tree_id: bytes32, new_urls: List[str]) -> None:
         async with self.db_wrapper.writer() as writer:
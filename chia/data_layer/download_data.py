@@ -3,14 +3,26 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import random
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 import aiohttp
 from typing_extensions import Literal
 
-from chia.data_layer.data_layer_util import NodeType, Root, SerializedNode, ServerInfo, Status
+from chia.data_layer.data_layer_util import (
+    InternalNode,
+    Node,
+    NodeType,
+    Root,
+    SerializedNode,
+    ServerInfo,
+    Status,
+    internal_hash,
+    leaf_hash,
+)
 from chia.data_layer.data_store import DataStore
 from chia.types.blockchain_format.sized_bytes import bytes32
 
@@ -23,6 +35,26 @@ def get_delta_filename(tree_id: bytes32, node_hash: bytes32, generation: int) ->
     return f"{tree_id}-{node_hash}-delta-{generation}-v1.0.dat"
 
 
+def get_manifest_filename(tree_id: bytes32, node_hash: bytes32, generation: int) -> str:
+    return f"{tree_id}-{node_hash}-manifest-{generation}-v1.0.dat"
+
+
+filename_functions: Dict[str, Callable[[bytes32, bytes32, int], str]] = {
+    "delta": get_delta_filename,
+    "full": get_full_tree_filename,
+    "manifest": get_manifest_filename,
+}
+
+# A manifest entry is the node hash followed by the length of its serialized node in the delta file.
+MANIFEST_ENTRY_SIZE = 32 + 4
+# Fall back to downloading the whole delta file if more than this share of it is missing locally...
+MANIFEST_MAX_MISSING_FRACTION = 0.5
+# ...or if fetching the missing nodes would take more than this many range requests.
+MANIFEST_MAX_RANGE_REQUESTS = 64
+# Servers which had no manifest are not asked for one again for this long.
+MANIFEST_MISSING_RETRY_SECONDS = 60 * 60
+
+
 def is_filename_valid(filename: str) -> bool:
     split = filename.split("-")
 
@@ -41,11 +73,11 @@ def is_filename_valid(filename: str) -> bool:
     if raw_version != "v1.0.dat":
         return False
 
-    if file_type not in {"delta", "full"}:
+    generate_file_func = filename_functions.get(file_type)
+    if generate_file_func is None:
         return False
 
-    generate_file_func = get_delta_filename if file_type == "delta" else get_full_tree_filename
-    reformatted = generate_file_func(tree_id=tree_id, node_hash=node_hash, generation=generation)
+    reformatted = generate_file_func(tree_id, node_hash, generation)
 
     return reformatted == filename
 
@@ -100,6 +132,7 @@ async def write_files_for_root(
 
     filename_full_tree = foldername.joinpath(get_full_tree_filename(tree_id, node_hash, root.generation))
     filename_diff_tree = foldername.joinpath(get_delta_filename(tree_id, node_hash, root.generation))
+    filename_manifest = foldername.joinpath(get_manifest_filename(tree_id, node_hash, root.generation))
 
     written = False
     mode: Literal["wb", "xb"] = "wb" if overwrite else "xb"
@@ -116,10 +149,11 @@ async def write_files_for_root(
             tree_id, root.node_hash, max_generation=root.generation
         )
         if last_seen_generation is None:
-            with open(filename_diff_tree, mode) as writer:
-                await data_store.write_tree_to_file(root, node_hash, tree_id, True, writer)
+            with open(filename_diff_tree, mode) as writer, open(filename_manifest, "wb") as manifest_writer:
+                await data_store.write_tree_to_file(root, node_hash, tree_id, True, writer, manifest_writer)
         else:
             open(filename_diff_tree, mode).close()
+            open(filename_manifest, "wb").close()
         written = True
     except FileExistsError:
         pass
@@ -127,73 +161,403 @@ async def write_files_for_root(
     return written
 
 
-async def insert_from_delta_file(
+async def download_file(
+    session: aiohttp.ClientSession,
+    server_info: ServerInfo,
+    filename: str,
+    target_filename: Path,
+    timeout: int,
+    log: logging.Logger,
+    proxy_url: str,
+) -> None:
+    async with session.get(server_info.url + "/" + filename, timeout=timeout, proxy=proxy_url) as resp:
+        resp.raise_for_status()
+        size = int(resp.headers.get("content-length", 0))
+        log.debug(f"Downloading delta file {filename}. Size {size} bytes.")
+        progress_byte = 0
+        progress_percentage = "{:.0%}".format(0)
+        with target_filename.open(mode="wb") as f:
+            async for chunk, _ in resp.content.iter_chunks():
+                f.write(chunk)
+                progress_byte += len(chunk)
+                new_percentage = "{:.0%}".format(progress_byte / size)
+                if new_percentage != progress_percentage:
+                    progress_percentage = new_percentage
+                    log.info(f"Downloading delta file {filename}. {progress_percentage} of {size} bytes.")
+
+
+def parse_manifest(manifest: bytes) -> List[Tuple[bytes32, int]]:
+    if len(manifest) % MANIFEST_ENTRY_SIZE != 0:
+        raise Exception(f"Invalid manifest size: {len(manifest)}")
+
+    entries: List[Tuple[bytes32, int]] = []
+    for start in range(0, len(manifest), MANIFEST_ENTRY_SIZE):
+        node_hash = bytes32(manifest[start : start + 32])
+        size = int.from_bytes(manifest[start + 32 : start + MANIFEST_ENTRY_SIZE], byteorder="big")
+        entries.append((node_hash, size))
+
+    return entries
+
+
+def serialized_node_hash(serialized_node: SerializedNode) -> bytes32:
+    if serialized_node.is_terminal:
+        return leaf_hash(key=serialized_node.value1, value=serialized_node.value2)
+    return internal_hash(left_hash=bytes32(serialized_node.value1), right_hash=bytes32(serialized_node.value2))
+
+
+def node_to_serialized_node(node: Node) -> SerializedNode:
+    if isinstance(node, InternalNode):
+        return SerializedNode(False, bytes(node.left_hash), bytes(node.right_hash))
+    return SerializedNode(True, node.key, node.value)
+
+
+async def rebuild_delta_file_from_manifest(
     data_store: DataStore,
-    tree_id: bytes32,
-    existing_generation: int,
-    root_hashes: List[bytes32],
+    session: aiohttp.ClientSession,
     server_info: ServerInfo,
-    client_foldername: Path,
+    server_scores: ServerScores,
+    tree_id: bytes32,
+    root_hash: bytes32,
+    generation: int,
+    target_filename: Path,
     timeout: int,
     log: logging.Logger,
     proxy_url: str,
 ) -> bool:
-    for root_hash in root_hashes:
-        timestamp = int(time.time())
-        existing_generation += 1
-        filename = get_delta_filename(tree_id, root_hash, existing_generation)
+    """Rebuild a delta file using the nodes already in the local node table and fetch
+    only the missing node blobs with HTTP range requests.  Returns False when the whole
+    delta file should be downloaded instead, such as when the server has no manifest,
+    does not support range requests, or most of the nodes are missing anyway.
+    """
+    manifest_filename = get_manifest_filename(tree_id, root_hash, generation)
+    delta_url = server_info.url + "/" + get_delta_filename(tree_id, root_hash, generation)
+    try:
+        async with session.get(server_info.url + "/" + manifest_filename, timeout=timeout, proxy=proxy_url) as resp:
+            if resp.status != 200:
+                if resp.status == 404:
+                    server_scores.record_missing_manifest(server_info.url)
+                return False
+            manifest = await resp.read()
+        entries = parse_manifest(manifest)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        log.debug(f"Unable to use manifest {manifest_filename}, downloading the full delta file: {e}")
+        return False
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(server_info.url + "/" + filename, timeout=timeout, proxy=proxy_url) as resp:
-                    resp.raise_for_status()
-                    size = int(resp.headers.get("content-length", 0))
-                    log.debug(f"Downloading delta file {filename}. Size {size} bytes.")
-                    progress_byte = 0
-                    progress_percentage = "{:.0%}".format(0)
-                    target_filename = client_foldername.joinpath(filename)
-                    with target_filename.open(mode="wb") as f:
-                        async for chunk, _ in resp.content.iter_chunks():
-                            f.write(chunk)
-                            progress_byte += len(chunk)
-                            new_percentage = "{:.0%}".format(progress_byte / size)
-                            if new_percentage != progress_percentage:
-                                progress_percentage = new_percentage
-                                log.info(f"Downloading delta file {filename}. {progress_percentage} of {size} bytes.")
-        except Exception:
-            target_filename = client_foldername.joinpath(filename)
+    if len(entries) == 0:
+        return False
+
+    local_nodes = await data_store.get_nodes([node_hash for node_hash, _ in entries])
+
+    # Group the consecutive missing nodes into byte ranges of the delta file.
+    ranges: List[Tuple[int, int, List[int]]] = []
+    offset = 0
+    missing_size = 0
+    previous_missing = False
+    for index, (node_hash, size) in enumerate(entries):
+        entry_size = 4 + size
+        missing = node_hash not in local_nodes
+        if missing:
+            missing_size += entry_size
+            if previous_missing:
+                start, _, indexes = ranges[-1]
+                indexes.append(index)
+                ranges[-1] = (start, offset + entry_size - 1, indexes)
+            else:
+                ranges.append((offset, offset + entry_size - 1, [index]))
+        previous_missing = missing
+        offset += entry_size
+    total_size = offset
+
+    if missing_size > total_size * MANIFEST_MAX_MISSING_FRACTION or len(ranges) > MANIFEST_MAX_RANGE_REQUESTS:
+        return False
+
+    downloaded: Dict[int, bytes] = {}
+    for start, end, indexes in ranges:
+        headers = {"Range": f"bytes={start}-{end}"}
+        async with session.get(delta_url, headers=headers, timeout=timeout, proxy=proxy_url) as resp:
+            if resp.status != 206:
+                # The server ignored the range, fall back to the full download.
+                return False
+            data = await resp.read()
+        if len(data) != end - start + 1:
+            raise Exception(f"Incomplete range read from {delta_url}.")
+
+        position = 0
+        for index in indexes:
+            node_hash, size = entries[index]
+            if int.from_bytes(data[position : position + 4], byteorder="big") != size:
+                raise Exception(f"Node size mismatch in range read from {delta_url}.")
+            blob = data[position + 4 : position + 4 + size]
+            if serialized_node_hash(SerializedNode.from_bytes(blob)) != node_hash:
+                raise Exception(f"Node hash mismatch in range read from {delta_url}.")
+            downloaded[index] = blob
+            position += 4 + size
+
+    with target_filename.open(mode="wb") as writer:
+        for index, (node_hash, size) in enumerate(entries):
+            if index in downloaded:
+                blob = downloaded[index]
+            else:
+                blob = bytes(node_to_serialized_node(local_nodes[node_hash]))
+            writer.write(len(blob).to_bytes(4, byteorder="big"))
+            writer.write(blob)
+    # Keep the manifest next to the delta file so it can be served along with it.
+    target_filename.with_name(manifest_filename).write_bytes(manifest)
+
+    log.info(
+        f"Rebuilt delta file for {tree_id} generation {generation} from the local node cache. "
+        f"Downloaded {missing_size} of {total_size} bytes."
+    )
+    return True
+
+
+def remove_delta_file(foldername: Path, tree_id: bytes32, root_hash: bytes32, generation: int) -> None:
+    """Remove a downloaded delta file along with its manifest."""
+    for filename in (
+        get_delta_filename(tree_id, root_hash, generation),
+        get_manifest_filename(tree_id, root_hash, generation),
+    ):
+        target_filename = foldername.joinpath(filename)
+        if target_filename.exists():
             os.remove(target_filename)
-            await data_store.server_misses_file(tree_id, server_info, timestamp)
-            raise
 
-        log.info(f"Successfully downloaded delta file {filename}.")
+
+@dataclass
+class ServerStats:
+    # exponential moving averages of the download throughput (bytes per second)
+    # and of the share of failed downloads
+    throughput: float
+    error_rate: float = 0.0
+    in_flight: int = 0
+    # when the server last answered that it has no manifest
+    manifest_missing_at: Optional[float] = None
+
+
+@dataclass
+class ServerScores:
+    """Scores mirrors by measured throughput and error rate so downloads go to the
+    fastest reliable mirrors, spread according to the downloads already in flight.
+    """
+
+    stats: Dict[str, ServerStats] = field(default_factory=dict)
+    smoothing: float = 0.3
+    # Mirrors without measurements are assumed to be reasonably fast so they get tried.
+    unknown_throughput: float = 10 * 1024 * 1024
+
+    def get_stats(self, url: str) -> ServerStats:
+        stats = self.stats.get(url)
+        if stats is None:
+            stats = ServerStats(throughput=self.unknown_throughput)
+            self.stats[url] = stats
+        return stats
+
+    def record_success(self, url: str, num_bytes: int, seconds: float) -> None:
+        stats = self.get_stats(url)
+        throughput = num_bytes / max(seconds, 0.001)
+        stats.throughput += self.smoothing * (throughput - stats.throughput)
+        stats.error_rate -= self.smoothing * stats.error_rate
+
+    def record_failure(self, url: str) -> None:
+        stats = self.get_stats(url)
+        stats.error_rate += self.smoothing * (1 - stats.error_rate)
+
+    def record_missing_manifest(self, url: str) -> None:
+        self.get_stats(url).manifest_missing_at = time.monotonic()
+
+    def may_have_manifest(self, url: str) -> bool:
+        missing_at = self.get_stats(url).manifest_missing_at
+        return missing_at is None or time.monotonic() - missing_at > MANIFEST_MISSING_RETRY_SECONDS
+
+    def score(self, url: str) -> float:
+        stats = self.get_stats(url)
+        return stats.throughput * (1 - stats.error_rate) / (1 + stats.in_flight)
+
+    def select(self, servers_info: List[ServerInfo]) -> ServerInfo:
+        # shuffle first so that equally scored mirrors are picked at random
+        candidates = list(servers_info)
+        random.shuffle(candidates)
+        return max(candidates, key=lambda server_info: self.score(server_info.url))
+
+
+async def download_delta_file(
+    data_store: DataStore,
+    session: aiohttp.ClientSession,
+    servers_info: List[ServerInfo],
+    server_scores: ServerScores,
+    failed_urls: Set[str],
+    tree_id: bytes32,
+    root_hash: bytes32,
+    generation: int,
+    client_foldername: Path,
+    timeout: int,
+    log: logging.Logger,
+    proxy_url: str,
+) -> ServerInfo:
+    """Download a delta file from the best scored mirror, failing over to the next
+    mirror on errors.  Returns the mirror the file came from.
+    """
+    filename = get_delta_filename(tree_id, root_hash, generation)
+    target_filename = client_foldername.joinpath(filename)
+
+    while True:
+        candidates = [server_info for server_info in servers_info if server_info.url not in failed_urls]
+        if len(candidates) == 0:
+            raise Exception(f"No server available to download {filename}.")
+        server_info = server_scores.select(candidates)
+        stats = server_scores.get_stats(server_info.url)
+        timestamp = int(time.time())
+        start = time.monotonic()
+        stats.in_flight += 1
         try:
-            await insert_into_data_store_from_file(
+            rebuilt = False
+            if server_scores.may_have_manifest(server_info.url):
+                rebuilt = await rebuild_delta_file_from_manifest(
+                    data_store,
+                    session,
+                    server_info,
+                    server_scores,
+                    tree_id,
+                    root_hash,
+                    generation,
+                    target_filename,
+                    timeout,
+                    log,
+                    proxy_url,
+                )
+            if not rebuilt:
+                await download_file(session, server_info, filename, target_filename, timeout, log, proxy_url)
+        except asyncio.CancelledError:
+            remove_delta_file(client_foldername, tree_id, root_hash, generation)
+            raise
+        except Exception as e:
+            remove_delta_file(client_foldername, tree_id, root_hash, generation)
+            server_scores.record_failure(server_info.url)
+            # Don't retry a failing mirror during this sync, its ban is also recorded.
+            failed_urls.add(server_info.url)
+            await data_store.server_misses_file(tree_id, server_info, timestamp)
+            log.warning(f"Server {server_info.url} failed to provide {filename}: {type(e)} {e}")
+            continue
+        finally:
+            stats.in_flight -= 1
+
+        server_scores.record_success(server_info.url, target_filename.stat().st_size, time.monotonic() - start)
+        log.info(f"Successfully downloaded delta file {filename} from {server_info.url}.")
+        return server_info
+
+
+async def insert_from_delta_file(
+    data_store: DataStore,
+    tree_id: bytes32,
+    existing_generation: int,
+    root_hashes: List[bytes32],
+    servers_info: List[ServerInfo],
+    client_foldername: Path,
+    timeout: int,
+    log: logging.Logger,
+    proxy_url: str,
+    session: Optional[aiohttp.ClientSession] = None,
+    server_scores: Optional[ServerScores] = None,
+    prefetch: int = 4,
+) -> bool:
+    """Download the delta files for `root_hashes` and insert them in order.  The next
+    `prefetch` files are downloaded in parallel, across the available mirrors, while
+    the current one is being inserted.
+    """
+    if session is None:
+        async with aiohttp.ClientSession() as new_session:
+            return await insert_from_delta_file(
                 data_store,
                 tree_id,
-                None if root_hash == bytes32([0] * 32) else root_hash,
-                client_foldername.joinpath(filename),
-            )
-            log.info(
-                f"Successfully inserted hash {root_hash} from delta file. "
-                f"Generation: {existing_generation}. Tree id: {tree_id}."
+                existing_generation,
+                root_hashes,
+                servers_info,
+                client_foldername,
+                timeout,
+                log,
+                proxy_url,
+                new_session,
+                server_scores,
+                prefetch,
             )
 
-            filename_full_tree = client_foldername.joinpath(
-                get_full_tree_filename(tree_id, root_hash, existing_generation)
+    # bound to locals so their narrowed types carry into start_download
+    client_session: aiohttp.ClientSession = session
+    scores = ServerScores() if server_scores is None else server_scores
+    failed_urls: Set[str] = set()
+    window = max(1, prefetch)
+    generations = [existing_generation + offset for offset in range(1, len(root_hashes) + 1)]
+    download_tasks: List[asyncio.Task[ServerInfo]] = []
+
+    def start_download(index: int) -> None:
+        if index < len(root_hashes):
+            download_tasks.append(
+                asyncio.create_task(
+                    download_delta_file(
+                        data_store,
+                        client_session,
+                        servers_info,
+                        scores,
+                        failed_urls,
+                        tree_id,
+                        root_hashes[index],
+                        generations[index],
+                        client_foldername,
+                        timeout,
+                        log,
+                        proxy_url,
+                    )
+                )
             )
-            root = await data_store.get_tree_root(tree_id=tree_id)
-            with open(filename_full_tree, "wb") as writer:
-                await data_store.write_tree_to_file(root, root_hash, tree_id, False, writer)
-            log.info(f"Successfully written full tree filename {filename_full_tree}.")
-            await data_store.received_correct_file(tree_id, server_info)
-        except asyncio.CancelledError:
-            raise
-        except Exception:
-            target_filename = client_foldername.joinpath(filename)
-            os.remove(target_filename)
-            await data_store.received_incorrect_file(tree_id, server_info, timestamp)
-            await data_store.rollback_to_generation(tree_id, existing_generation - 1)
-            raise
+
+    # Sliding window, the download of a generation only starts once the one `prefetch`
+    # generations before it is inserted.
+    for index in range(window):
+        start_download(index)
+
+    inserted = 0
+    try:
+        for index, (root_hash, generation) in enumerate(zip(root_hashes, generations)):
+            timestamp = int(time.time())
+            filename = get_delta_filename(tree_id, root_hash, generation)
+            server_info = await download_tasks[index]
+
+            try:
+                await insert_into_data_store_from_file(
+                    data_store,
+                    tree_id,
+                    None if root_hash == bytes32([0] * 32) else root_hash,
+                    client_foldername.joinpath(filename),
+                )
+                log.info(
+                    f"Successfully inserted hash {root_hash} from delta file. "
+                    f"Generation: {generation}. Tree id: {tree_id}."
+                )
+
+                filename_full_tree = client_foldername.joinpath(get_full_tree_filename(tree_id, root_hash, generation))
+                root = await data_store.get_tree_root(tree_id=tree_id)
+                with open(filename_full_tree, "wb") as writer:
+                    await data_store.write_tree_to_file(root, root_hash, tree_id, False, writer)
+                log.info(f"Successfully written full tree filename {filename_full_tree}.")
+                await data_store.received_correct_file(tree_id, server_info)
+                inserted += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                remove_delta_file(client_foldername, tree_id, root_hash, generation)
+                scores.record_failure(server_info.url)
+                await data_store.received_incorrect_file(tree_id, server_info, timestamp)
+                await data_store.rollback_to_generation(tree_id, generation - 1)
+                raise
+            start_download(index + window)
+    finally:
+        pending_tasks = [task for task in download_tasks if not task.done()]
+        for task in pending_tasks:
+            task.cancel()
+        await asyncio.gather(*pending_tasks, return_exceptions=True)
+        # Drop the prefetched files that were never inserted.
+        for root_hash, generation in zip(root_hashes[inserted : len(download_tasks)], generations[inserted:]):
+            remove_delta_file(client_foldername, tree_id, root_hash, generation)
 
     return True
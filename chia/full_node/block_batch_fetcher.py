@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, List, Optional, Set, Tuple
+
+from chia.server.ws_connection import WSChiaConnection
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.full_block import FullBlock
+
+log = logging.getLogger(__name__)
+
+MAX_BATCHES_IN_FLIGHT = 8
+MAX_BATCHES_PER_PEER = 2
+# A request which takes STALL_FACTOR times longer than the peer is expected to take is issued to another peer
+STALL_FACTOR = 3.0
+MIN_STALL_TIMEOUT = 5.0
+# Weight of the latest measurement in the moving average of the throughput of a peer
+THROUGHPUT_ALPHA = 0.3
+
+
+@dataclass
+class PeerThroughput:
+    blocks_per_second: Optional[float] = None
+    in_flight: int = 0
+
+    def update(self, num_blocks: int, duration: float) -> None:
+        measured = num_blocks / max(duration, 0.001)
+        if self.blocks_per_second is None:
+            self.blocks_per_second = measured
+        else:
+            self.blocks_per_second = THROUGHPUT_ALPHA * measured + (1 - THROUGHPUT_ALPHA) * self.blocks_per_second
+
+    def stall_timeout(self, num_blocks: int) -> float:
+        if self.blocks_per_second is None:
+            return MIN_STALL_TIMEOUT
+        return max(MIN_STALL_TIMEOUT, STALL_FACTOR * num_blocks / self.blocks_per_second)
+
+    def score(self) -> float:
+        # peers that were not measured yet go first, so that all of them get measured
+        if self.blocks_per_second is None:
+            return float("inf")
+        return self.blocks_per_second / (1 + self.in_flight)
+
+
+@dataclass
+class BatchRequest:
+    start_height: int
+    peer: WSChiaConnection
+    start_time: float
+
+
+@dataclass
+class BatchState:
+    start_height: int
+    end_height: int
+    # peers which failed to return the batch
+    failed: Set[bytes32] = field(default_factory=set)
+    requests: List[asyncio.Task[Optional[List[FullBlock]]]] = field(default_factory=list)
+    result: Optional[Tuple[WSChiaConnection, List[FullBlock]]] = None
+
+
+class BlockBatchFetcher:
+    """
+    Downloads the blocks from start_height to end_height in batches, keeping up to max_in_flight batch requests
+    in flight across the peers, and returns the batches in height order.
+    Peers are picked by their measured throughput. A batch which takes much longer than its peer is expected
+    to take is requested from another peer as well, the first response wins. Only max_in_flight batches past
+    the next one to be returned are requested or kept in memory.
+    """
+
+    request_batch: Callable[[WSChiaConnection, int, int], Coroutine[Any, Any, Optional[List[FullBlock]]]]
+    get_peers: Callable[[], List[WSChiaConnection]]
+    start_height: int
+    end_height: int
+    batch_size: int
+    max_in_flight: int
+    throughput: Dict[bytes32, PeerThroughput]
+    _batches: Dict[int, BatchState]
+    _requests: Dict[asyncio.Task[Optional[List[FullBlock]]], BatchRequest]
+    _next_batch: int
+
+    def __init__(
+        self,
+        request_batch: Callable[[WSChiaConnection, int, int], Coroutine[Any, Any, Optional[List[FullBlock]]]],
+        get_peers: Callable[[], List[WSChiaConnection]],
+        start_height: int,
+        end_height: int,
+        batch_size: int,
+        max_in_flight: int = MAX_BATCHES_IN_FLIGHT,
+    ) -> None:
+        self.request_batch = request_batch
+        self.get_peers = get_peers
+        self.start_height = start_height
+        self.end_height = end_height
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.throughput = {}
+        self._batches = {}
+        self._requests = {}
+        self._next_batch = start_height
+
+    async def batches(self) -> AsyncIterator[Tuple[WSChiaConnection, List[FullBlock]]]:
+        """
+        Yields the peer and the blocks of each batch, in height order. Stops early, after logging an error,
+        if a batch can't be fetched from any peer.
+        """
+        next_yield = self.start_height
+        try:
+            while next_yield < self.end_height:
+                batch = self._batches.get(next_yield)
+                if batch is not None and batch.result is not None:
+                    del self._batches[next_yield]
+                    next_yield += self.batch_size
+                    yield batch.result
+                    continue
+
+                peers = [peer for peer in self.get_peers() if not peer.closed]
+                self._issue_requests(peers, next_yield)
+                failed_batch = self._failed_batch(peers)
+                if failed_batch is not None:
+                    log.error(f"failed fetching {failed_batch.start_height} to {failed_batch.end_height} from peers")
+                    return
+                if len(self._requests) == 0:
+                    log.error(f"no peers to fetch {next_yield} to {self.end_height} from")
+                    return
+
+                done, _ = await asyncio.wait(
+                    self._requests.keys(), timeout=self._next_stall_timeout(), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    self._request_done(task)
+                self._hedge_stalled_requests(peers)
+        finally:
+            self.close()
+
+    @property
+    def requests_in_flight(self) -> int:
+        return len(self._requests)
+
+    def close(self) -> None:
+        """Cancels the requests still in flight."""
+        for task in self._requests:
+            task.cancel()
+        self._requests.clear()
+
+    def _throughput(self, peer: WSChiaConnection) -> PeerThroughput:
+        throughput = self.throughput.get(peer.peer_node_id)
+        if throughput is None:
+            throughput = PeerThroughput()
+            self.throughput[peer.peer_node_id] = throughput
+        return throughput
+
+    def _next_stall_timeout(self) -> Optional[float]:
+        # time until the next request which could be hedged stalls, None if no request can stall anymore
+        now = time.monotonic()
+        timeouts = [
+            request.start_time + self._throughput(request.peer).stall_timeout(self.batch_size) - now
+            for batch in self._batches.values()
+            if batch.result is None and len(batch.requests) == 1
+            for request in [self._requests[batch.requests[0]]]
+        ]
+        timeouts = [timeout for timeout in timeouts if timeout > 0]
+        return min(timeouts) if len(timeouts) > 0 else None
+
+    def _pick_peer(self, peers: List[WSChiaConnection], batch: BatchState) -> Optional[WSChiaConnection]:
+        requested = {self._requests[task].peer.peer_node_id for task in batch.requests}
+        candidates = [
+            peer
+            for peer in peers
+            if peer.peer_node_id not in batch.failed
+            and peer.peer_node_id not in requested
+            and self._throughput(peer).in_flight < MAX_BATCHES_PER_PEER
+        ]
+        if len(candidates) == 0:
+            return None
+        return max(candidates, key=lambda peer: (self._throughput(peer).score(), -self._throughput(peer).in_flight))
+
+    def _request(self, peer: WSChiaConnection, batch: BatchState) -> None:
+        task: asyncio.Task[Optional[List[FullBlock]]] = asyncio.create_task(
+            self.request_batch(peer, batch.start_height, batch.end_height)
+        )
+        self._requests[task] = BatchRequest(batch.start_height, peer, time.monotonic())
+        self._throughput(peer).in_flight += 1
+        batch.requests.append(task)
+
+    def _issue_requests(self, peers: List[WSChiaConnection], next_yield: int) -> None:
+        window_end = next_yield + self.max_in_flight * self.batch_size
+        # batches which lost all their requests are retried first, lowest height first
+        for start_height in sorted(self._batches):
+            batch = self._batches[start_height]
+            if batch.result is None and len(batch.requests) == 0:
+                peer = self._pick_peer(peers, batch)
+                if peer is not None:
+                    self._request(peer, batch)
+        while self._next_batch < min(self.end_height, window_end):
+            batch = BatchState(self._next_batch, min(self.end_height, self._next_batch + self.batch_size))
+            peer = self._pick_peer(peers, batch)
+            if peer is None:
+                return
+            self._batches[batch.start_height] = batch
+            self._next_batch += self.batch_size
+            self._request(peer, batch)
+
+    def _failed_batch(self, peers: List[WSChiaConnection]) -> Optional[BatchState]:
+        # a batch without a request which every peer failed to return
+        for batch in self._batches.values():
+            if batch.result is None and len(batch.requests) == 0:
+                if all(peer.peer_node_id in batch.failed for peer in peers):
+                    return batch
+        return None
+
+    def _request_done(self, task: asyncio.Task[Optional[List[FullBlock]]]) -> None:
+        request = self._requests.pop(task)
+        throughput = self._throughput(request.peer)
+        throughput.in_flight -= 1
+        duration = time.monotonic() - request.start_time
+        try:
+            blocks = task.result()
+        except Exception as e:
+            log.warning(f"Exception fetching {request.start_height} from peer {request.peer.peer_host}: {e}")
+            blocks = None
+
+        batch = self._batches.get(request.start_height)
+        if batch is not None:
+            batch.requests.remove(task)
+        if blocks is None or len(blocks) == 0:
+            # count the failure as a very slow response
+            throughput.update(self.batch_size, max(duration, 30.0))
+            if batch is not None:
+                batch.failed.add(request.peer.peer_node_id)
+            return
+        throughput.update(len(blocks), duration)
+        if batch is not None and batch.result is None:
+            batch.result = (request.peer, blocks)
+        # the other requests of the batch are left to finish, cancelling them would leak their pending requests
+
+    def _hedge_stalled_requests(self, peers: List[WSChiaConnection]) -> None:
+        now = time.monotonic()
+        for batch in self._batches.values():
+            if batch.result is not None or len(batch.requests) != 1:
+                continue
+            request = self._requests[batch.requests[0]]
+            if now - request.start_time < self._throughput(request.peer).stall_timeout(self.batch_size):
+                continue
+            peer = self._pick_peer(peers, batch)
+            if peer is not None:
+                log.info(
+                    f"Batch {batch.start_height} to {batch.end_height} stalled on peer {request.peer.peer_host}, "
+                    f"requesting it from {peer.peer_host}"
+                )
+                self._request(peer, batch)
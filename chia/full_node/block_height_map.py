@@ -1,21 +1,30 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
 
 import aiofiles
 
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
 from chia.util.db_wrapper import DBWrapper2
-from chia.util.files import write_file_async
+from chia.util.files import move_file
 from chia.util.ints import uint32
 from chia.util.streamable import Streamable, streamable
 
 log = logging.getLogger(__name__)
 
+# the height-to-hash file is grown by this many entries at a time
+HEIGHT_TO_HASH_GROWTH = 65536
+
 
 @streamable
 @dataclass(frozen=True)
@@ -23,6 +32,79 @@ class SesCache(Streamable):
     content: List[Tuple[uint32, bytes]]
 
 
+@streamable
+@dataclass(frozen=True)
+class HeightToHashTail(Streamable):
+    # the number of entries of the height-to-hash file that were flushed to
+    # disk, and the last of them
+    entries: uint32
+    header_hash: bytes32
+
+
+def ses_index_to_bytes(sub_epoch_summaries: Dict[uint32, bytes]) -> bytes:
+    """
+    The sub epoch summary cache on disk: the number of summaries, then the height of each summary and the end
+    offset of its serialized summary, ordered by height, then the serialized summaries.
+    """
+    heights = sorted(sub_epoch_summaries.keys())
+    index = bytearray(struct.pack(">I", len(heights)))
+    data = bytearray()
+    for height in heights:
+        data += sub_epoch_summaries[height]
+        index += struct.pack(">II", height, len(data))
+    return bytes(index + data)
+
+
+def ses_index_from_bytes(buf: bytes) -> Dict[uint32, bytes]:
+    (count,) = struct.unpack_from(">I", buf, 0)
+    data_start = 4 + count * 8
+    if len(buf) < data_start:
+        raise ValueError("truncated sub epoch summary index")
+    sub_epoch_summaries: Dict[uint32, bytes] = {}
+    start = data_start
+    for height, end in struct.iter_unpack(">II", buf[4:data_start]):
+        end += data_start
+        if end < start or end > len(buf):
+            raise ValueError("invalid sub epoch summary index")
+        sub_epoch_summaries[uint32(height)] = buf[start:end]
+        start = end
+    return sub_epoch_summaries
+
+
+def _write_file(file_path: Path, data: bytes) -> None:
+    # like write_file_async, for the small files which are written together with the height-to-hash map
+    with tempfile.NamedTemporaryFile(dir=file_path.parent, delete=False) as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    move_file(Path(f.name), file_path)
+
+
+def _flush_height_to_hash(height_to_hash: mmap.mmap, fd: int) -> None:
+    # mmap.flush() holds the GIL while it waits for the disk. Elsewhere than
+    # on Windows, the pages of a shared mapping are the file's, and fsync()
+    # writes them out without holding it
+    if sys.platform == "win32":
+        height_to_hash.flush()
+    else:
+        os.fsync(fd)
+
+
+def _write_files(
+    ses_file: Optional[Tuple[Path, bytes]],
+    height_to_hash_file: Optional[Tuple[Path, bytes]],
+    height_to_hash_map: Optional[Tuple[mmap.mmap, int]],
+    tail_file: Tuple[Path, bytes],
+) -> None:
+    if ses_file is not None:
+        _write_file(*ses_file)
+    if height_to_hash_file is not None:
+        _write_file(*height_to_hash_file)
+    if height_to_hash_map is not None:
+        _flush_height_to_hash(*height_to_hash_map)
+    _write_file(*tail_file)
+
+
 class BlockHeightMap:
     db: DBWrapper2
 
@@ -30,10 +112,16 @@ class BlockHeightMap:
     # and back in time on startup.
 
     # Defines the path from genesis to the peak, no orphan blocks
-    # this buffer contains all block hashes that are part of the current peak
-    # ordered by height. i.e. __height_to_hash[0..32] is the genesis hash
-    # __height_to_hash[32..64] is the hash for height 1 and so on
-    __height_to_hash: bytearray
+    # the height-to-hash file, memory mapped. It contains all block hashes
+    # that are part of the current peak ordered by height. i.e.
+    # __height_to_hash[0..32] is the genesis hash __height_to_hash[32..64]
+    # is the hash for height 1 and so on. The file is grown
+    # HEIGHT_TO_HASH_GROWTH entries at a time, only the first
+    # __height_to_hash_size bytes are part of the chain. Until the file is
+    # written by the first flush, the entries are kept in a bytearray
+    __height_to_hash: Union[mmap.mmap, bytearray]
+    __height_to_hash_file: Optional[BinaryIO]
+    __height_to_hash_size: int
 
     # All sub-epoch summaries that have been included in the blockchain from the beginning until and including the peak
     # (height_included, SubEpochSummary). Note: ONLY for the blocks in the path to the peak
@@ -44,58 +132,115 @@ class BlockHeightMap:
     # disk
     __dirty: int
 
+    # whether the sub epoch summaries changed since they were last written to
+    # disk
+    __ses_dirty: bool
+
+    # the number of entries recorded in the tail file. Those entries are on
+    # disk, the ones past them may not be, after a crash
+    __tail_entries: int
+
     # the file we're saving the height-to-hash cache to
     __height_to_hash_filename: Path
 
+    # the file recording how many entries of the height-to-hash file are on
+    # disk
+    __tail_filename: Path
+
     # the file we're saving the sub epoch summary cache to
     __ses_filename: Path
 
+    # the file the sub epoch summary cache used to be saved to, as a SesCache
+    __legacy_ses_filename: Path
+
+    # the files are written to by the default executor, one write at a time.
+    # A write carries on if its caller is cancelled, the next one (or close)
+    # waits for it
+    __write_lock: asyncio.Lock
+    __write: Optional["asyncio.Future[None]"]
+
     @classmethod
     async def create(cls, blockchain_dir: Path, db: DBWrapper2) -> "BlockHeightMap":
         self = BlockHeightMap()
         self.db = db
 
         self.__dirty = 0
+        self.__ses_dirty = False
+        self.__tail_entries = 0
         self.__height_to_hash = bytearray()
+        self.__height_to_hash_file = None
+        self.__height_to_hash_size = 0
         self.__sub_epoch_summaries = {}
         self.__height_to_hash_filename = blockchain_dir / "height-to-hash"
-        self.__ses_filename = blockchain_dir / "sub-epoch-summaries"
+        self.__tail_filename = blockchain_dir / "height-to-hash-tail"
+        self.__ses_filename = blockchain_dir / "sub-epoch-summary-index"
+        self.__legacy_ses_filename = blockchain_dir / "sub-epoch-summaries"
+        self.__write_lock = asyncio.Lock()
+        self.__write = None
 
+        row: Optional[Any] = None
         async with self.db.reader_no_transaction() as conn:
             if db.db_version == 2:
                 async with conn.execute("SELECT hash FROM current_peak WHERE key = 0") as cursor:
                     peak_row = await cursor.fetchone()
-                    if peak_row is None:
-                        return self
 
-                async with conn.execute(
-                    "SELECT header_hash,prev_hash,height,sub_epoch_summary FROM full_blocks WHERE header_hash=?",
-                    (peak_row[0],),
-                ) as cursor:
-                    row = await cursor.fetchone()
-                    if row is None:
-                        return self
+                if peak_row is not None:
+                    async with conn.execute(
+                        "SELECT header_hash,prev_hash,height,sub_epoch_summary FROM full_blocks WHERE header_hash=?",
+                        (peak_row[0],),
+                    ) as cursor:
+                        row = await cursor.fetchone()
             else:
                 async with await conn.execute(
                     "SELECT header_hash,prev_hash,height,sub_epoch_summary from block_records WHERE is_peak=1"
                 ) as cursor:
                     row = await cursor.fetchone()
-                    if row is None:
-                        return self
+
+        if row is None:
+            # none of the entries of the height-to-hash file are part of the
+            # chain (yet). The file is replaced by the first flush
+            return self
 
         try:
-            async with aiofiles.open(self.__height_to_hash_filename, "rb") as f:
-                self.__height_to_hash = bytearray(await f.read())
+            self.__open_height_to_hash()
         except Exception:
             # it's OK if this file doesn't exist, we can rebuild it
             pass
+        file_size = len(self.__height_to_hash)
+
+        # a height-to-hash file without a tail file was written in one go, by
+        # an earlier version. Otherwise, only the entries covered by the tail
+        # are known to be on disk
+        valid_size = file_size
+        tail_entries: Optional[int] = None
+        if self.__height_to_hash_file is not None:
+            try:
+                async with aiofiles.open(self.__tail_filename, "rb") as f:
+                    tail = HeightToHashTail.from_bytes(await f.read())
+                tail_entries = tail.entries
+                valid_size = 0
+                if tail.entries * 32 <= file_size and self.__last_hash(tail.entries) == tail.header_hash:
+                    valid_size = tail.entries * 32
+                else:
+                    log.warning("the height-to-hash file doesn't match its tail, rebuilding it")
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                log.warning(f"failed to read {self.__tail_filename}, rebuilding the height-to-hash file: {e}")
+                valid_size = 0
 
         try:
             async with aiofiles.open(self.__ses_filename, "rb") as f:
-                self.__sub_epoch_summaries = {k: v for (k, v) in SesCache.from_bytes(await f.read()).content}
+                self.__sub_epoch_summaries = ses_index_from_bytes(await f.read())
         except Exception:
-            # it's OK if this file doesn't exist, we can rebuild it
-            pass
+            try:
+                async with aiofiles.open(self.__legacy_ses_filename, "rb") as f:
+                    content = SesCache.from_bytes(await f.read()).content
+                self.__sub_epoch_summaries = {k: v for (k, v) in content}
+                self.__ses_dirty = True
+            except Exception:
+                # it's OK if these files don't exist, we can rebuild them
+                pass
 
         peak: bytes32
         prev_hash: bytes32
@@ -107,14 +252,27 @@ class BlockHeightMap:
             prev_hash = bytes32.fromhex(row[1])
         height = row[2]
 
-        # allocate memory for height to hash map
-        # this may also truncate it, if thie file on disk had an invalid size
+        # the height to hash map ends at the peak, the rest of the file is
+        # ignored. The entries past the valid ones are cleared, they're loaded
+        # from the DB again, along with their sub epoch summaries
         new_size = (height + 1) * 32
-        size = len(self.__height_to_hash)
-        if size > new_size:
-            del self.__height_to_hash[new_size:]
-        else:
-            self.__height_to_hash += bytearray([0] * (new_size - size))
+
+        # the tail is written before the file is modified, for it to only ever
+        # cover entries that are on disk. A file that doesn't exist yet is
+        # written along with its tail by the first flush
+        if self.__height_to_hash_file is not None:
+            if tail_entries != min(valid_size, new_size) // 32:
+                await self.__write_tail(min(valid_size, new_size) // 32)
+            else:
+                self.__tail_entries = tail_entries
+
+        self.__map_height_to_hash(new_size)
+        if valid_size < new_size:
+            self.__height_to_hash[valid_size:new_size] = bytes(new_size - valid_size)
+        for ses_height in [h for h in self.__sub_epoch_summaries.keys() if h * 32 >= valid_size]:
+            del self.__sub_epoch_summaries[ses_height]
+            self.__ses_dirty = True
+        self.__height_to_hash_size = new_size
 
         # if the peak hash is already in the height-to-hash map, we don't need
         # to load anything more from the DB
@@ -123,6 +281,7 @@ class BlockHeightMap:
 
             if row[3] is not None:
                 self.__sub_epoch_summaries[height] = row[3]
+                self.__ses_dirty = True
 
             # prepopulate the height -> hash mapping
             await self._load_blocks_from(height, prev_hash)
@@ -131,27 +290,103 @@ class BlockHeightMap:
 
         return self
 
+    def __open_height_to_hash(self) -> None:
+        # maps the existing height-to-hash file into memory
+        f = open(self.__height_to_hash_filename, "r+b")
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if size > 0:
+                self.__height_to_hash = mmap.mmap(f.fileno(), size)
+                self.__height_to_hash_file = f
+        finally:
+            if self.__height_to_hash_file is None:
+                f.close()
+
+    def __map_height_to_hash(self, min_size: int) -> None:
+        # grows the height-to-hash map to at least min_size bytes
+        if len(self.__height_to_hash) >= min_size:
+            return
+        if isinstance(self.__height_to_hash, bytearray):
+            self.__height_to_hash.extend(bytes(min_size - len(self.__height_to_hash)))
+            return
+        assert self.__height_to_hash_file is not None
+        self.__height_to_hash.close()
+        growth = HEIGHT_TO_HASH_GROWTH * 32
+        size = (min_size + growth - 1) // growth * growth
+        self.__height_to_hash_file.truncate(size)
+        self.__height_to_hash = mmap.mmap(self.__height_to_hash_file.fileno(), size)
+
+    def __last_hash(self, entries: int) -> bytes32:
+        # the hash of the last of the first entries of the file
+        if entries == 0:
+            return bytes32([0] * 32)
+        idx = (entries - 1) * 32
+        return bytes32(self.__height_to_hash[idx : idx + 32])
+
+    def __tail_file(self, entries: int) -> Tuple[Path, bytes]:
+        return self.__tail_filename, bytes(HeightToHashTail(uint32(entries), self.__last_hash(entries)))
+
+    async def __run_write(self, write: Callable[..., None], *args: Any) -> None:
+        async with self.__write_lock:
+            if self.__write is not None:
+                await asyncio.wait([self.__write])
+            self.__write = asyncio.get_running_loop().run_in_executor(None, write, *args)
+            await asyncio.shield(self.__write)
+
+    async def __write_tail(self, entries: int) -> None:
+        self.__tail_entries = entries
+        await self.__run_write(_write_file, *self.__tail_file(entries))
+
+    async def close(self) -> None:
+        async with self.__write_lock:
+            if self.__write is not None:
+                await asyncio.wait([self.__write])
+            if isinstance(self.__height_to_hash, mmap.mmap):
+                self.__height_to_hash.close()
+                self.__height_to_hash = bytearray()
+            if self.__height_to_hash_file is not None:
+                self.__height_to_hash_file.close()
+                self.__height_to_hash_file = None
+
     def update_height(self, height: uint32, header_hash: bytes32, ses: Optional[SubEpochSummary]) -> None:
         # we're only updating the last hash. If we've reorged, we already rolled
         # back, making this the new peak
-        assert height * 32 <= len(self.__height_to_hash)
+        assert height * 32 <= self.__height_to_hash_size
         self.__set_hash(height, header_hash)
         if ses is not None:
             self.__sub_epoch_summaries[height] = bytes(ses)
+            self.__ses_dirty = True
 
     async def maybe_flush(self) -> None:
         if self.__dirty < 1000:
             return
 
-        assert (len(self.__height_to_hash) % 32) == 0
-        map_buf = self.__height_to_hash.copy()
-
-        ses_buf = bytes(SesCache([(k, v) for (k, v) in self.__sub_epoch_summaries.items()]))
-
+        assert (self.__height_to_hash_size % 32) == 0
         self.__dirty = 0
 
-        await write_file_async(self.__height_to_hash_filename, map_buf)
-        await write_file_async(self.__ses_filename, ses_buf)
+        # the files are small, or only the pages written since the last flush
+        # are written out. The tail is taken before the write, the entries it
+        # covers are only changed after a rollback, which moves it back first
+        ses_file: Optional[Tuple[Path, bytes]] = None
+        if self.__ses_dirty:
+            ses_file = (self.__ses_filename, ses_index_to_bytes(self.__sub_epoch_summaries))
+            self.__ses_dirty = False
+        entries = self.__height_to_hash_size // 32
+        tail_file = self.__tail_file(entries)
+        self.__tail_entries = entries
+        if isinstance(self.__height_to_hash, bytearray):
+            # the first flush replaces the file in one go, it's memory mapped
+            # from then on. The entries set meanwhile are copied over
+            height_to_hash_file = (self.__height_to_hash_filename, bytes(self.__height_to_hash))
+            await self.__run_write(_write_files, ses_file, height_to_hash_file, None, tail_file)
+            in_memory = self.__height_to_hash
+            self.__open_height_to_hash()
+            self.__map_height_to_hash(len(in_memory))
+            self.__height_to_hash[: len(in_memory)] = in_memory
+        else:
+            assert self.__height_to_hash_file is not None
+            height_to_hash_map = (self.__height_to_hash, self.__height_to_hash_file.fileno())
+            await self.__run_write(_write_files, ses_file, None, height_to_hash_map, tail_file)
 
     # load height-to-hash map entries from the DB starting at height back in
     # time until we hit a match in the existing map, at which point we can
@@ -203,37 +438,51 @@ class BlockHeightMap:
                     ):
                         return
                     self.__sub_epoch_summaries[height] = entry[2]
+                    self.__ses_dirty = True
                 elif height in self.__sub_epoch_summaries:
                     # if the database file was swapped out and the existing
                     # cache doesn't represent any of it at all, a missing sub
                     # epoch summary needs to be removed from the cache too
                     del self.__sub_epoch_summaries[height]
+                    self.__ses_dirty = True
                 self.__set_hash(height, prev_hash)
                 prev_hash = entry[1]
 
     def __set_hash(self, height: int, block_hash: bytes32) -> None:
         idx = height * 32
+        self.__map_height_to_hash(idx + 32)
         self.__height_to_hash[idx : idx + 32] = block_hash
+        self.__height_to_hash_size = max(self.__height_to_hash_size, idx + 32)
         self.__dirty += 1
 
     def get_hash(self, height: uint32) -> bytes32:
         idx = height * 32
-        assert idx + 32 <= len(self.__height_to_hash)
+        assert idx + 32 <= self.__height_to_hash_size
         return bytes32(self.__height_to_hash[idx : idx + 32])
 
     def contains_height(self, height: uint32) -> bool:
-        return height * 32 < len(self.__height_to_hash)
+        return height * 32 < self.__height_to_hash_size
+
+    async def prepare_rollback(self, fork_height: int) -> None:
+        # the file is truncated in place by rollback(), the entries past the
+        # fork point are overwritten by the new blocks. The tail can't vouch
+        # for them anymore, so it's moved back to the fork point first
+        if fork_height + 1 < self.__tail_entries:
+            await self.__write_tail(fork_height + 1)
 
     def rollback(self, fork_height: int) -> None:
         # fork height may be -1, in which case all blocks are different and we
-        # should clear all sub epoch summaries
+        # should clear all sub epoch summaries. The tail was moved back by
+        # prepare_rollback()
+        assert fork_height + 1 >= self.__tail_entries
         heights_to_delete = []
         for ses_included_height in self.__sub_epoch_summaries.keys():
             if ses_included_height > fork_height:
                 heights_to_delete.append(ses_included_height)
         for height in heights_to_delete:
             del self.__sub_epoch_summaries[height]
-        del self.__height_to_hash[(fork_height + 1) * 32 :]
+            self.__ses_dirty = True
+        self.__height_to_hash_size = min(self.__height_to_hash_size, (fork_height + 1) * 32)
 
     def get_ses(self, height: uint32) -> SubEpochSummary:
         return SubEpochSummary.from_bytes(self.__sub_epoch_summaries[height])
@@ -2,8 +2,9 @@ from __future__ import annotations
 
 import dataclasses
 import logging
+import random
 import sqlite3
-from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 import typing_extensions
 import zstd
@@ -11,11 +12,19 @@ import zstd
 from chia.consensus.block_record import BlockRecord
 from chia.types.blockchain_format.program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.blockchain_format.vdf import CompressibleVDFField, VDFInfo, VDFProof
 from chia.types.full_block import FullBlock
 from chia.types.weight_proof import SubEpochChallengeSegment, SubEpochSegments
 from chia.util.db_wrapper import DBWrapper2, execute_fetchone
 from chia.util.errors import Err
-from chia.util.full_block_utils import GeneratorBlockInfo, block_info_from_block, generator_from_block
+from chia.util.full_block_utils import (
+    GeneratorBlockInfo,
+    block_info_from_block,
+    compressible_proofs_from_block,
+    generator_from_block,
+    is_compact_proof,
+    replace_compressible_proofs,
+)
 from chia.util.ints import uint32
 from chia.util.lru_cache import LRUCache
 
@@ -117,6 +126,34 @@ class BlockStore:
                 log.info("DB: Creating index peak")
                 await conn.execute("CREATE INDEX IF NOT EXISTS peak on block_records(is_peak)")
 
+            async with conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='uncompact_proofs'"
+            ) as cursor:
+                backfill = await cursor.fetchone() is None
+
+            # The proofs of blocks which aren't compact yet, which bluebox timelords are asked to compactify. The
+            # deficit of the block tells whether it's a challenge block
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS uncompact_proofs("
+                f"header_hash {'blob' if self.db_wrapper.db_version == 2 else 'text'},"
+                "height bigint,"
+                "field_vdf tinyint,"
+                "vdf_info blob,"
+                "deficit tinyint,"
+                "UNIQUE(header_hash, field_vdf, vdf_info))"
+            )
+
+            # This is a single-row table containing the height below which the blocks stored before the
+            # uncompact_proofs table existed still need their proofs added, see backfill_uncompact_proofs()
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS uncompact_proofs_backfill(key int PRIMARY KEY, height bigint)"
+            )
+            if backfill:
+                async with conn.execute("SELECT MAX(height) FROM full_blocks") as cursor:
+                    row = await cursor.fetchone()
+                if row is not None and row[0] is not None:
+                    await conn.execute("INSERT OR REPLACE INTO uncompact_proofs_backfill VALUES(?, ?)", (0, row[0] + 1))
+
         return self
 
     def maybe_from_hex(self, field: Union[bytes, str]) -> bytes32:
@@ -167,31 +204,72 @@ class BlockStore:
                     if cursor.rowcount != len(header_hashes):
                         raise RuntimeError(f"The blockchain database is corrupt. All of {header_hashes} should exist")
 
-    async def replace_proof(self, header_hash: bytes32, block: FullBlock) -> None:
-
-        assert header_hash == block.header_hash
-
-        block_bytes: bytes
-        if self.db_wrapper.db_version == 2:
-            block_bytes = self.compress(block)
-        else:
-            block_bytes = bytes(block)
-
-        self.block_cache.put(header_hash, block)
+    def _uncompact_proof_rows(
+        self, header_hash: bytes32, height: int, deficit: int, block_bytes: bytes
+    ) -> List[Tuple[Any, int, int, bytes, int]]:
+        buf = memoryview(block_bytes)
+        return [
+            (self.maybe_to_hex(header_hash), height, int(proof.field_vdf), proof.vdf_info, deficit)
+            for proof in compressible_proofs_from_block(buf)
+            if not is_compact_proof(buf[proof.start : proof.end])
+        ]
+
+    async def replace_proofs(
+        self, proofs: Sequence[Tuple[bytes32, CompressibleVDFField, VDFInfo, VDFProof]]
+    ) -> List[bool]:
+        """
+        Replaces VDF proofs of blocks, patching the serialized blocks rather than parsing them. The proofs of a
+        block are replaced together, and all the blocks are written along with their is_fully_compactified flag
+        in one transaction. Returns whether each proof was replaced, it's not if its block or VDF wasn't found.
+        """
+        new_proofs: Dict[bytes32, Dict[Tuple[CompressibleVDFField, bytes], bytes]] = {}
+        for header_hash, field_vdf, vdf_info, vdf_proof in proofs:
+            new_proofs.setdefault(header_hash, {})[(field_vdf, bytes(vdf_info))] = bytes(vdf_proof)
 
+        replaced: Dict[bytes32, Set[Tuple[CompressibleVDFField, bytes]]] = {}
         async with self.db_wrapper.writer_maybe_transaction() as conn:
-            await conn.execute(
-                "UPDATE full_blocks SET block=?,is_fully_compactified=? WHERE header_hash=?",
-                (
-                    block_bytes,
-                    int(block.is_fully_compactified()),
-                    self.maybe_to_hex(header_hash),
-                ),
+            updates: List[Tuple[bytes, int, Any]] = []
+            compact_proofs: List[Tuple[Any, int, bytes]] = []
+            for header_hash, block_proofs in new_proofs.items():
+                async with conn.execute(
+                    "SELECT block from full_blocks WHERE header_hash=?", (self.maybe_to_hex(header_hash),)
+                ) as cursor:
+                    row = await cursor.fetchone()
+                if row is None:
+                    continue
+                block_bytes, replaced[header_hash], fully_compactified = replace_compressible_proofs(
+                    memoryview(self.maybe_decompress_blob(row[0])), block_proofs
+                )
+                if len(replaced[header_hash]) == 0:
+                    continue
+                if self.db_wrapper.db_version == 2:
+                    block_bytes = zstd.compress(block_bytes)
+                updates.append((block_bytes, int(fully_compactified), self.maybe_to_hex(header_hash)))
+                compact_proofs.extend(
+                    (self.maybe_to_hex(header_hash), int(field_vdf), vdf_info)
+                    for field_vdf, vdf_info in replaced[header_hash]
+                    if is_compact_proof(memoryview(block_proofs[(field_vdf, vdf_info)]))
+                )
+                # the cached block still has the old proofs
+                self.rollback_cache_block(header_hash)
+
+            await conn.executemany(
+                "UPDATE full_blocks SET block=?,is_fully_compactified=? WHERE header_hash=?", updates
+            )
+            await conn.executemany(
+                "DELETE FROM uncompact_proofs WHERE header_hash=? AND field_vdf=? AND vdf_info=?", compact_proofs
             )
 
+        return [
+            (field_vdf, bytes(vdf_info)) in replaced.get(header_hash, set())
+            for header_hash, field_vdf, vdf_info, _ in proofs
+        ]
+
     async def add_full_block(self, header_hash: bytes32, block: FullBlock, block_record: BlockRecord) -> None:
         self.block_cache.put(header_hash, block)
 
+        block_bytes = bytes(block)
+        inserted: bool
         if self.db_wrapper.db_version == 2:
 
             ses: Optional[bytes] = (
@@ -201,7 +279,7 @@ class BlockStore:
             )
 
             async with self.db_wrapper.writer_maybe_transaction() as conn:
-                await conn.execute(
+                async with conn.execute(
                     "INSERT OR IGNORE INTO full_blocks VALUES(?, ?, ?, ?, ?, ?, ?, ?)",
                     (
                         header_hash,
@@ -210,23 +288,25 @@ class BlockStore:
                         ses,
                         int(block.is_fully_compactified()),
                         False,  # in_main_chain
-                        self.compress(block),
+                        zstd.compress(block_bytes),
                         bytes(block_record),
                     ),
-                )
+                ) as cursor:
+                    inserted = cursor.rowcount > 0
 
         else:
             async with self.db_wrapper.writer_maybe_transaction() as conn:
-                await conn.execute(
+                async with conn.execute(
                     "INSERT OR IGNORE INTO full_blocks VALUES(?, ?, ?, ?, ?)",
                     (
                         header_hash.hex(),
                         block.height,
                         int(block.is_transaction_block()),
                         int(block.is_fully_compactified()),
-                        bytes(block),
+                        block_bytes,
                     ),
-                )
+                ) as cursor:
+                    inserted = cursor.rowcount > 0
 
                 await conn.execute(
                     "INSERT OR IGNORE INTO block_records VALUES(?, ?, ?, ?,?, ?, ?)",
@@ -243,6 +323,14 @@ class BlockStore:
                     ),
                 )
 
+        # a block which was stored already has its uncompact proofs too
+        if inserted:
+            async with self.db_wrapper.writer_maybe_transaction() as conn:
+                await conn.executemany(
+                    "INSERT OR IGNORE INTO uncompact_proofs VALUES(?, ?, ?, ?, ?)",
+                    self._uncompact_proof_rows(header_hash, block.height, block_record.deficit, block_bytes),
+                )
+
     async def persist_sub_epoch_challenge_segments(
         self, ses_block_hash: bytes32, segments: List[SubEpochChallengeSegment]
     ) -> None:
@@ -592,7 +680,7 @@ class BlockStore:
         assert self.db_wrapper.db_version == 2
         async with self.db_wrapper.reader_no_transaction() as conn:
             async with conn.execute(
-                "SELECT block FROM full_blocks WHERE height >= ? AND height <= ? and in_main_chain=1",
+                "SELECT block FROM full_blocks WHERE height >= ? AND height <= ? and in_main_chain=1 ORDER BY height",
                 (start, stop),
             ) as cursor:
                 rows: List[sqlite3.Row] = list(await cursor.fetchall())
@@ -706,6 +794,97 @@ class BlockStore:
 
         return heights
 
+    async def get_random_uncompact_proofs(
+        self, number: int, challenge_deficit: Optional[int] = None
+    ) -> List[Tuple[bytes32, uint32, CompressibleVDFField, VDFInfo]]:
+        """
+        Returns up to `number` proofs which aren't compact, as (header_hash, height, field_vdf, vdf_info), from a
+        random position in the uncompact_proofs table. Some may be of orphan blocks. If challenge_deficit is set,
+        the signage and infusion point proofs are only returned for challenge blocks, which have this deficit.
+        """
+        condition = ""
+        params: List[int] = []
+        if challenge_deficit is not None:
+            condition = " AND (field_vdf IN (?, ?) OR deficit=?)"
+            params = [CompressibleVDFField.CC_EOS_VDF, CompressibleVDFField.ICC_EOS_VDF, challenge_deficit]
+
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            row = await execute_fetchone(conn, "SELECT MAX(rowid) FROM uncompact_proofs")
+            if row is None or row[0] is None:
+                return []
+            # the rows from a random one on, wrapping around, are found through the rowid without a scan
+            start = random.randint(0, row[0])
+            rows = list(
+                await conn.execute_fetchall(
+                    f"SELECT header_hash, height, field_vdf, vdf_info FROM uncompact_proofs WHERE rowid>=?{condition} "
+                    "ORDER BY rowid LIMIT ?",
+                    (start, *params, number),
+                )
+            )
+            if len(rows) < number:
+                rows += await conn.execute_fetchall(
+                    f"SELECT header_hash, height, field_vdf, vdf_info FROM uncompact_proofs WHERE rowid<?{condition} "
+                    "ORDER BY rowid LIMIT ?",
+                    (start, *params, number - len(rows)),
+                )
+
+        return [
+            (self.maybe_from_hex(row[0]), uint32(row[1]), CompressibleVDFField(row[2]), VDFInfo.from_bytes(row[3]))
+            for row in rows
+        ]
+
+    async def remove_uncompact_proofs(self, header_hashes: List[bytes32]) -> None:
+        """
+        Removes the uncompact proofs of blocks which won't be compactified, the orphan ones.
+        """
+        async with self.db_wrapper.writer_maybe_transaction() as conn:
+            await conn.executemany(
+                "DELETE FROM uncompact_proofs WHERE header_hash=?",
+                [(self.maybe_to_hex(header_hash),) for header_hash in header_hashes],
+            )
+
+    async def backfill_uncompact_proofs(self, number: int) -> bool:
+        """
+        Adds the uncompact proofs of the blocks at up to `number` heights, of the ones stored before the
+        uncompact_proofs table existed, from the highest down. Returns whether there are more to add.
+        """
+        async with self.db_wrapper.writer_maybe_transaction() as conn:
+            row = await execute_fetchone(conn, "SELECT height FROM uncompact_proofs_backfill WHERE key=0")
+            if row is None:
+                return False
+            end_height: int = row[0]
+            start_height = max(0, end_height - number)
+
+            if self.db_wrapper.db_version == 2:
+                query = (
+                    "SELECT header_hash, height, block, block_record FROM full_blocks "
+                    "WHERE height>=? AND height<? AND is_fully_compactified=0"
+                )
+            else:
+                query = (
+                    "SELECT full_blocks.header_hash, full_blocks.height, full_blocks.block, block_records.block "
+                    "FROM full_blocks JOIN block_records ON full_blocks.header_hash=block_records.header_hash "
+                    "WHERE full_blocks.height>=? AND full_blocks.height<? AND is_fully_compactified=0"
+                )
+            proofs: List[Tuple[Any, int, int, bytes, int]] = []
+            for row in await conn.execute_fetchall(query, (start_height, end_height)):
+                proofs.extend(
+                    self._uncompact_proof_rows(
+                        self.maybe_from_hex(row[0]),
+                        row[1],
+                        BlockRecord.from_bytes(row[3]).deficit,
+                        self.maybe_decompress_blob(row[2]),
+                    )
+                )
+            # the blocks added since the backfill started have their proofs already
+            await conn.executemany("INSERT OR IGNORE INTO uncompact_proofs VALUES(?, ?, ?, ?, ?)", proofs)
+
+            if start_height == 0:
+                await conn.execute("DELETE FROM uncompact_proofs_backfill WHERE key=0")
+                return False
+            await conn.execute("UPDATE uncompact_proofs_backfill SET height=? WHERE key=0", (start_height,))
+            return True
+
     async def count_compactified_blocks(self) -> int:
         if self.db_wrapper.db_version == 2:
             # DB V2 has an index on is_fully_compactified only for blocks in the main chain
@@ -23,8 +23,10 @@ from chia.consensus.constants import ConsensusConstants
 from chia.consensus.cost_calculator import NPCResult
 from chia.consensus.difficulty_adjustment import get_next_sub_slot_iters_and_difficulty
 from chia.consensus.make_sub_epoch_summary import next_sub_epoch_summary
-from chia.consensus.multiprocess_validation import PreValidationResult
+from chia.consensus.multiprocess_validation import PreValidationResult, PreValidationTimes
+from chia.consensus.pending_block_records import PendingBlockRecords
 from chia.consensus.pot_iterations import calculate_sp_iters
+from chia.full_node.block_batch_fetcher import BlockBatchFetcher
 from chia.full_node.block_store import BlockStore
 from chia.full_node.bundle_tools import detect_potential_template_generator
 from chia.full_node.coin_store import CoinStore
@@ -36,6 +38,16 @@ from chia.full_node.lock_queue import LockClient, LockQueue
 from chia.full_node.mempool_manager import MempoolManager
 from chia.full_node.signage_point import SignagePoint
 from chia.full_node.subscriptions import PeerSubscriptions
+from chia.full_node.sync_metrics import (
+    ADD_BLOCKS,
+    CLVM,
+    HINTS,
+    PRE_VALIDATION,
+    PRE_VALIDATION_WORKERS,
+    SIGNATURES,
+    UPDATE_WALLETS,
+    SyncMetrics,
+)
 from chia.full_node.sync_store import SyncStore
 from chia.full_node.tx_processing_queue import TransactionQueue
 from chia.full_node.weight_proof import WeightProofHandler
@@ -77,6 +89,18 @@ from chia.util.path import path_from_root
 from chia.util.profiler import mem_profile_task, profile_task
 from chia.util.safe_cancel_task import cancel_task_safe
 
+# seconds between the sync metrics sent to the state_changed callback during a long sync
+SYNC_METRICS_INTERVAL = 5.0
+# the most compact proofs replaced in one transaction
+MAX_COMPACT_PROOFS_PER_BATCH = 100
+# the heights of blocks whose uncompact proofs are indexed in one transaction, for DBs created before the index
+UNCOMPACT_PROOFS_BACKFILL_BATCH = 100
+
+# peer, blocks, blocks to validate and pre-validation task of a batch of the long sync
+PreValidatingBatch = Tuple[
+    WSChiaConnection, List[FullBlock], List[FullBlock], "asyncio.Task[List[PreValidationResult]]"
+]
+
 
 # This is the result of calling peak_post_processing, which is then fed into peak_post_processing_2
 @dataclasses.dataclass
@@ -99,6 +123,7 @@ class FullNode:
     state_changed_callback: Optional[Callable[[str, Optional[Dict[str, Any]]], None]]
     full_node_peers: Optional[FullNodePeers]
     sync_store: Any
+    sync_metrics: SyncMetrics
     signage_point_times: List[float]
     full_node_store: FullNodeStore
     uncompact_task: Optional[asyncio.Task[None]]
@@ -111,6 +136,8 @@ class FullNode:
     _transaction_queue_task: Optional[asyncio.Task[None]]
     simulator_transaction_callback: Optional[Callable[[bytes32], Awaitable[None]]]
     _sync_task: Optional[asyncio.Task[None]]
+    _compact_proofs_to_replace: List[Tuple[bytes32, CompressibleVDFField, VDFInfo, VDFProof, asyncio.Future[bool]]]
+    _replace_proofs_task: Optional[asyncio.Task[None]]
     _transaction_queue: Optional[TransactionQueue]
     _compact_vdf_sem: Optional[LimitedSemaphore]
     _new_peak_sem: Optional[LimitedSemaphore]
@@ -122,6 +149,7 @@ class FullNode:
     _coin_store: Optional[CoinStore]
     _mempool_manager: Optional[MempoolManager]
     _init_weight_proof: Optional[asyncio.Task[None]]
+    _initialization_task: Optional[asyncio.Task[None]]
     _blockchain: Optional[Blockchain]
     _timelord_lock: Optional[asyncio.Lock]
     weight_proof_handler: Optional[WeightProofHandler]
@@ -156,6 +184,7 @@ class FullNode:
         self.state_changed_callback = None
         self.full_node_peers = None
         self.sync_store = None
+        self.sync_metrics = SyncMetrics()
         self.signage_point_times = [time.time() for _ in range(self.constants.NUM_SPS_SUB_SLOT)]
         self.full_node_store = FullNodeStore(self.constants)
         self.uncompact_task = None
@@ -176,6 +205,8 @@ class FullNode:
         self.simulator_transaction_callback = None
 
         self._sync_task = None
+        self._compact_proofs_to_replace = []
+        self._replace_proofs_task = None
         self._transaction_queue = None
         self._compact_vdf_sem = None
         self._new_peak_sem = None
@@ -187,6 +218,7 @@ class FullNode:
         self._coin_store = None
         self._mempool_manager = None
         self._init_weight_proof = None
+        self._initialization_task = None
         self._blockchain = None
         self._timelord_lock = None
         self.weight_proof_handler = None
@@ -366,6 +398,7 @@ class FullNode:
             reserved_cores=reserved_cores,
             multiprocessing_context=self.multiprocessing_context,
             single_threaded=single_threaded,
+            lazy=True,
         )
 
         self._mempool_manager = MempoolManager(
@@ -395,10 +428,8 @@ class FullNode:
         if self.config.get("enable_memory_profiler", False):
             asyncio.create_task(mem_profile_task(self.root_path, "node", self.log))
 
-        time_taken = time.time() - start_time
         peak: Optional[BlockRecord] = self.blockchain.get_peak()
         if peak is None:
-            self.log.info(f"Initialized with empty blockchain time taken: {int(time_taken)}s")
             num_unspent = await self.coin_store.num_unspent()
             if num_unspent > 0:
                 self.log.error(
@@ -406,6 +437,26 @@ class FullNode:
                     "This is a fatal error. The blockchain database may be corrupt"
                 )
                 raise RuntimeError("corrupt blockchain DB")
+
+        # The server and the RPC server start now, the rest of the state is loaded in the background. Peer
+        # messages are ignored until it is, see FullNodeAPI.api_ready
+        self._initialization_task = asyncio.create_task(self._initialize(start_time))
+
+    async def _initialize(self, start_time: float) -> None:
+        try:
+            await self._initialize_from_peak(start_time)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.log.error(f"Error initializing the full node: {traceback.format_exc()}")
+            raise
+
+    async def _initialize_from_peak(self, start_time: float) -> None:
+        await self.blockchain.wait_until_loaded()
+        time_taken = time.time() - start_time
+        peak: Optional[BlockRecord] = self.blockchain.get_peak()
+        if peak is None:
+            self.log.info(f"Initialized with empty blockchain time taken: {int(time_taken)}s")
         else:
             self.log.info(
                 f"Blockchain initialized to peak {peak.header_hash} height"
@@ -439,6 +490,13 @@ class FullNode:
         if self.full_node_peers is not None:
             asyncio.create_task(self.full_node_peers.start())
 
+    async def wait_until_initialized(self) -> None:
+        """
+        Waits for the state loaded in the background on startup. Raises if loading it failed.
+        """
+        assert self._initialization_task is not None
+        await asyncio.shield(self._initialization_task)
+
     async def _handle_one_transaction(self, entry: TransactionQueueEntry) -> None:
         peer = entry.peer
         try:
@@ -469,10 +527,12 @@ class FullNode:
             raise
 
     async def initialize_weight_proof(self) -> None:
+        await self.blockchain.wait_until_loaded()
         self.weight_proof_handler = WeightProofHandler(
             constants=self.constants,
             blockchain=self.blockchain,
             multiprocessing_context=self.multiprocessing_context,
+            num_processes=self.config.get("weight_proof_validation_processes", 4),
         )
         peak = self.blockchain.get_peak()
         if peak is not None:
@@ -884,8 +944,12 @@ class FullNode:
 
     def _close(self) -> None:
         self._shut_down = True
+        if self._initialization_task is not None:
+            self._initialization_task.cancel()
         if self._init_weight_proof is not None:
             self._init_weight_proof.cancel()
+        if self.weight_proof_handler is not None:
+            self.weight_proof_handler.cancel_weight_proof_tasks()
 
         # blockchain is created in _start and in certain cases it may not exist here during _close
         if self._blockchain is not None:
@@ -907,7 +971,11 @@ class FullNode:
     async def _await_closed(self) -> None:
         for task_id, task in list(self.full_node_store.tx_fetch_tasks.items()):
             cancel_task_safe(task, self.log)
+        if self._replace_proofs_task is not None:
+            await asyncio.wait([self._replace_proofs_task])
         await self.db_wrapper.close()
+        if self._initialization_task is not None:
+            await asyncio.wait([self._initialization_task])
         if self._init_weight_proof is not None:
             await asyncio.wait([self._init_weight_proof])
         if self._blockchain_lock_queue is not None:
@@ -915,6 +983,8 @@ class FullNode:
         if self._sync_task is not None:
             with contextlib.suppress(asyncio.CancelledError):
                 await self._sync_task
+        if self._blockchain is not None:
+            await self.blockchain.close()
 
     async def _sync(self) -> None:
         """
@@ -1069,77 +1139,182 @@ class FullNode:
             self.blockchain, fork_point_height, peers_with_peak, node_next_block_check
         )
         batch_size = self.constants.MAX_BLOCK_COUNT_PER_REQUESTS
+        metrics = self.sync_metrics
+        metrics.start(fork_point_height, target_peak_sb_height, self.blockchain.num_workers)
+        last_metrics_report = 0.0
+
+        def report_metrics(force: bool = False) -> None:
+            nonlocal last_metrics_report
+            now = time.monotonic()
+            if force or now - last_metrics_report >= SYNC_METRICS_INTERVAL:
+                last_metrics_report = now
+                self._state_changed("sync_metrics", metrics.to_json_dict())
+
+        async def request_batch(
+            peer: WSChiaConnection, start_height: int, end_height: int
+        ) -> Optional[List[FullBlock]]:
+            start = time.monotonic()
+            bytes_read_before = peer.bytes_read
+            blocks: Optional[List[FullBlock]] = None
+            try:
+                request = RequestBlocks(uint32(start_height), uint32(end_height), True)
+                response = await peer.call_api(FullNodeAPI.request_blocks, request, timeout=30)
+                if response is None:
+                    await peer.close()
+                    if peer in peers_with_peak:
+                        peers_with_peak.remove(peer)
+                elif isinstance(response, RespondBlocks):
+                    blocks = response.blocks
+                return blocks
+            finally:
+                metrics.add_download(
+                    peer.peer_node_id.hex(),
+                    peer.peer_host,
+                    bytes_read_before,
+                    peer.bytes_read,
+                    time.monotonic() - start,
+                    None if blocks is None else len(blocks),
+                )
+
+        new_peers_with_peak: List[WSChiaConnection] = peers_with_peak[:]
+
+        def get_peers() -> List[WSChiaConnection]:
+            nonlocal new_peers_with_peak
+            if self.sync_store.peers_changed.is_set():
+                new_peers_with_peak = self.get_peers_with_peak(peak_hash)
+                self.sync_store.peers_changed.clear()
+            return new_peers_with_peak
 
         async def fetch_block_batches(
             batch_queue: asyncio.Queue[Optional[Tuple[WSChiaConnection, List[FullBlock]]]]
         ) -> None:
-            start_height, end_height = 0, 0
-            new_peers_with_peak: List[WSChiaConnection] = peers_with_peak[:]
+            # Several batches are requested at once from different peers, and queued in height order
+            fetcher = BlockBatchFetcher(request_batch, get_peers, fork_point_height, target_peak_sb_height, batch_size)
             try:
-                for start_height in range(fork_point_height, target_peak_sb_height, batch_size):
-                    end_height = min(target_peak_sb_height, start_height + batch_size)
-                    request = RequestBlocks(uint32(start_height), uint32(end_height), True)
-                    fetched = False
-                    for peer in random.sample(new_peers_with_peak, len(new_peers_with_peak)):
-                        if peer.closed:
-                            peers_with_peak.remove(peer)
-                            continue
-                        response = await peer.call_api(FullNodeAPI.request_blocks, request, timeout=30)
-                        if response is None:
-                            await peer.close()
-                            peers_with_peak.remove(peer)
-                        elif isinstance(response, RespondBlocks):
-                            await batch_queue.put((peer, response.blocks))
-                            fetched = True
-                            break
-                    if fetched is False:
-                        self.log.error(f"failed fetching {start_height} to {end_height} from peers")
-                        await batch_queue.put(None)
-                        return
-                    if self.sync_store.peers_changed.is_set():
-                        new_peers_with_peak = self.get_peers_with_peak(peak_hash)
-                        self.sync_store.peers_changed.clear()
+                async for peer, blocks in fetcher.batches():
+                    await batch_queue.put((peer, blocks))
+                    metrics.set_queue_depth("batches", batch_queue.qsize())
+                    metrics.set_queue_depth("requests_in_flight", fetcher.requests_in_flight)
             except Exception as e:
-                self.log.error(f"Exception fetching {start_height} to {end_height} from peer {e}")
+                self.log.error(f"Exception fetching {fork_point_height} to {target_peak_sb_height} from peers {e}")
             finally:
+                fetcher.close()
                 # finished signal with None
                 await batch_queue.put(None)
 
+        async def pre_validate_batch(
+            blocks_to_validate: List[FullBlock], pending: Optional[PendingBlockRecords]
+        ) -> List[PreValidationResult]:
+            times = PreValidationTimes()
+            with metrics.measure(PRE_VALIDATION, len(blocks_to_validate)):
+                results = await self.pre_validate_block_batch(blocks_to_validate, summaries, pending, times)
+            metrics.add(PRE_VALIDATION_WORKERS, times.workers, len(blocks_to_validate))
+            metrics.add(CLVM, times.clvm)
+            metrics.add(SIGNATURES, times.signatures)
+            return results
+
+        async def add_batch(
+            peer: WSChiaConnection,
+            blocks: List[FullBlock],
+            blocks_to_validate: List[FullBlock],
+            pre_validation_results: List[PreValidationResult],
+            advanced_peak: bool,
+        ) -> bool:
+            # returns whether the peak was advanced
+            start_height = blocks[0].height
+            end_height = blocks[-1].height
+            with metrics.measure(ADD_BLOCKS, len(blocks_to_validate)):
+                success, state_change_summary = await self.add_block_batch(
+                    blocks_to_validate,
+                    pre_validation_results,
+                    peer,
+                    None if advanced_peak else uint32(fork_point_height),
+                )
+            if success is False:
+                if peer in peers_with_peak:
+                    peers_with_peak.remove(peer)
+                await peer.close(600)
+                raise ValueError(f"Failed to validate block batch {start_height} to {end_height}")
+            self.log.info(f"Added blocks {start_height} to {end_height}")
+            peak: Optional[BlockRecord] = self.blockchain.get_peak()
+            if state_change_summary is not None:
+                assert peak is not None
+                # Hints must be added to the DB. The other post-processing tasks are not required when syncing
+                hints_to_add, lookup_coin_ids = get_hints_and_subscription_coin_ids(
+                    state_change_summary,
+                    self.subscriptions.has_coin_subscription,
+                    self.subscriptions.has_ph_subscription,
+                )
+                with metrics.measure(HINTS, len(blocks_to_validate)):
+                    await self.hint_store.add_hints(hints_to_add)
+                with metrics.measure(UPDATE_WALLETS, len(blocks_to_validate)):
+                    await self.update_wallets(state_change_summary, hints_to_add, lookup_coin_ids)
+            await self.send_peak_to_wallets()
+            self.blockchain.clean_block_record(end_height - self.constants.BLOCKS_CACHE_SIZE)
+            metrics.blocks_added += len(blocks_to_validate)
+            report_metrics()
+            return state_change_summary is not None
+
         async def validate_block_batches(
             inner_batch_queue: asyncio.Queue[Optional[Tuple[WSChiaConnection, List[FullBlock]]]]
         ) -> None:
+            # The next batch is pre-validated in the pool while the current one is added to the blockchain.
+            # Its difficulty and sub slot iters depend on the current batch, so it's pre-validated on top of the
+            # block records of the current batch, computed from their pre-validation results.
             advanced_peak: bool = False
-            while True:
-                res: Optional[Tuple[WSChiaConnection, List[FullBlock]]] = await inner_batch_queue.get()
-                if res is None:
-                    self.log.debug("done fetching blocks")
-                    return None
-                peer, blocks = res
-                start_height = blocks[0].height
-                end_height = blocks[-1].height
-                success, state_change_summary = await self.receive_block_batch(
-                    blocks, peer, None if advanced_peak else uint32(fork_point_height), summaries
-                )
-                if success is False:
-                    if peer in peers_with_peak:
-                        peers_with_peak.remove(peer)
-                    await peer.close(600)
-                    raise ValueError(f"Failed to validate block batch {start_height} to {end_height}")
-                self.log.info(f"Added blocks {start_height} to {end_height}")
-                peak: Optional[BlockRecord] = self.blockchain.get_peak()
-                if state_change_summary is not None:
-                    advanced_peak = True
-                    assert peak is not None
-                    # Hints must be added to the DB. The other post-processing tasks are not required when syncing
-                    hints_to_add, lookup_coin_ids = get_hints_and_subscription_coin_ids(
-                        state_change_summary,
-                        self.subscriptions.has_coin_subscription,
-                        self.subscriptions.has_ph_subscription,
-                    )
-                    await self.hint_store.add_hints(hints_to_add)
-                    await self.update_wallets(state_change_summary, hints_to_add, lookup_coin_ids)
-                await self.send_peak_to_wallets()
-                self.blockchain.clean_block_record(end_height - self.constants.BLOCKS_CACHE_SIZE)
+            # the batch which is added next
+            current: Optional[PreValidatingBatch] = None
+            done_fetching = False
+            while not done_fetching or current is not None:
+                res: Optional[Tuple[WSChiaConnection, List[FullBlock]]] = None
+                # the current batch is added right away, unless the next one is already fetched
+                if not done_fetching and (current is None or not inner_batch_queue.empty()):
+                    res = await inner_batch_queue.get()
+                    metrics.set_queue_depth("batches", inner_batch_queue.qsize())
+                    if res is None:
+                        self.log.debug("done fetching blocks")
+                        done_fetching = True
+
+                pre_validation_results: List[PreValidationResult] = []
+                pending: Optional[PendingBlockRecords] = None
+                if current is not None:
+                    pre_validation_results = await current[3]
+                    if res is not None and all(result.error is None for result in pre_validation_results):
+                        pending = PendingBlockRecords(
+                            self.constants, self.blockchain, self.blockchain.get_block_generator
+                        )
+                        pending.add_blocks(current[2], pre_validation_results)
+
+                next_batch: Optional[PreValidatingBatch] = None
+                # an invalid current batch ends the sync, the next one is not pre-validated
+                if res is not None and (current is None or pending is not None):
+                    blocks_to_validate = blocks_not_in_chain(res[1], self.blockchain if pending is None else pending)
+                    if len(blocks_to_validate) > 0:
+                        next_batch = (
+                            res[0],
+                            res[1],
+                            blocks_to_validate,
+                            asyncio.create_task(pre_validate_batch(blocks_to_validate, pending)),
+                        )
+
+                if current is not None:
+                    try:
+                        if await add_batch(current[0], current[1], current[2], pre_validation_results, advanced_peak):
+                            advanced_peak = True
+                    except Exception:
+                        if next_batch is not None:
+                            next_batch[3].cancel()
+                        raise
+                current = next_batch
+
+            sync_time = metrics.elapsed()
+            pre_validation_time = metrics.stages[PRE_VALIDATION].seconds if PRE_VALIDATION in metrics.stages else 0.0
+            add_time = metrics.stages[ADD_BLOCKS].seconds if ADD_BLOCKS in metrics.stages else 0.0
+            self.log.info(
+                f"Pre-validated blocks for {pre_validation_time:0.2f}s and added them for {add_time:0.2f}s, "
+                f"in {sync_time:0.2f}s. The pre-validation pool was busy "
+                f"{100 * min(1.0, pre_validation_time / max(sync_time, 0.001)):0.1f}% of the time"
+            )
 
         batch_queue_input: asyncio.Queue[Optional[Tuple[WSChiaConnection, List[FullBlock]]]] = asyncio.Queue(
             maxsize=buffer_size
@@ -1152,6 +1327,9 @@ class FullNode:
             assert validate_task.done()
             fetch_task.cancel()  # no need to cancel validate_task, if we end up here validate_task is already done
             self.log.error(f"sync from fork point failed err: {e}")
+        finally:
+            metrics.finish()
+            report_metrics(force=True)
 
     async def send_peak_to_wallets(self) -> None:
         peak = self.blockchain.get_peak()
@@ -1228,19 +1406,24 @@ class FullNode:
         # Precondition: All blocks must be contiguous blocks, index i+1 must be the parent of index i
         # Returns a bool for success, as well as a StateChangeSummary if the peak was advanced
 
-        blocks_to_validate: List[FullBlock] = []
-        for i, block in enumerate(all_blocks):
-            if not self.blockchain.contains_block(block.header_hash):
-                blocks_to_validate = all_blocks[i:]
-                break
+        blocks_to_validate = blocks_not_in_chain(all_blocks, self.blockchain)
         if len(blocks_to_validate) == 0:
             return True, None
+        pre_validation_results = await self.pre_validate_block_batch(blocks_to_validate, wp_summaries)
+        return await self.add_block_batch(blocks_to_validate, pre_validation_results, peer, fork_point)
 
+    async def pre_validate_block_batch(
+        self,
+        blocks_to_validate: List[FullBlock],
+        wp_summaries: Optional[List[SubEpochSummary]] = None,
+        pending: Optional[PendingBlockRecords] = None,
+        times: Optional[PreValidationTimes] = None,
+    ) -> List[PreValidationResult]:
         # Validates signatures in multiprocessing since they take a while, and we don't have cached transactions
         # for these blocks (unlike during normal operation where we validate one at a time)
         pre_validate_start = time.monotonic()
         pre_validation_results: List[PreValidationResult] = await self.blockchain.pre_validate_blocks_multiprocessing(
-            blocks_to_validate, {}, wp_summaries=wp_summaries, validate_signatures=True
+            blocks_to_validate, {}, wp_summaries=wp_summaries, validate_signatures=True, pending=pending, times=times
         )
         pre_validate_end = time.monotonic()
         pre_validate_time = pre_validate_end - pre_validate_start
@@ -1250,6 +1433,16 @@ class FullNode:
             f"Block pre-validation time: {pre_validate_end - pre_validate_start:0.2f} seconds "
             f"({len(blocks_to_validate)} blocks, start height: {blocks_to_validate[0].height})",
         )
+        return pre_validation_results
+
+    async def add_block_batch(
+        self,
+        blocks_to_validate: List[FullBlock],
+        pre_validation_results: List[PreValidationResult],
+        peer: WSChiaConnection,
+        fork_point: Optional[uint32],
+    ) -> Tuple[bool, Optional[StateChangeSummary]]:
+        add_start = time.monotonic()
         for i, block in enumerate(blocks_to_validate):
             if pre_validation_results[i].error is not None:
                 self.log.error(
@@ -1293,7 +1486,7 @@ class FullNode:
         if agg_state_change_summary is not None:
             self._state_changed("new_peak")
             self.log.debug(
-                f"Total time for {len(blocks_to_validate)} blocks: {time.time() - pre_validate_start}, "
+                f"Total time for adding {len(blocks_to_validate)} blocks: {time.monotonic() - add_start}, "
                 f"advanced: True"
             )
         return True, agg_state_change_summary
@@ -1550,6 +1743,10 @@ class FullNode:
 
         # TODO: maybe add and broadcast new IPs as well
 
+        if self.weight_proof_handler is not None and not self.sync_store.get_sync_mode():
+            # have the weight proof ready for the peers which start syncing to the new peak
+            self.weight_proof_handler.new_peak(record)
+
         if record.height % 1000 == 0:
             # Occasionally clear data in full node store to keep memory usage small
             self.full_node_store.clear_seen_unfinished_blocks()
@@ -2362,53 +2559,34 @@ class FullNode:
         header_hash: bytes32,
         field_vdf: CompressibleVDFField,
     ) -> bool:
-
-        block = await self.block_store.get_full_block(header_hash)
-        if block is None:
-            return False
-
-        new_block = None
-
-        if field_vdf == CompressibleVDFField.CC_EOS_VDF:
-            for index, sub_slot in enumerate(block.finished_sub_slots):
-                if sub_slot.challenge_chain.challenge_chain_end_of_slot_vdf == vdf_info:
-                    new_proofs = dataclasses.replace(sub_slot.proofs, challenge_chain_slot_proof=vdf_proof)
-                    new_subslot = dataclasses.replace(sub_slot, proofs=new_proofs)
-                    new_finished_subslots = block.finished_sub_slots
-                    new_finished_subslots[index] = new_subslot
-                    new_block = dataclasses.replace(block, finished_sub_slots=new_finished_subslots)
-                    break
-        if field_vdf == CompressibleVDFField.ICC_EOS_VDF:
-            for index, sub_slot in enumerate(block.finished_sub_slots):
-                if (
-                    sub_slot.infused_challenge_chain is not None
-                    and sub_slot.infused_challenge_chain.infused_challenge_chain_end_of_slot_vdf == vdf_info
-                ):
-                    new_proofs = dataclasses.replace(sub_slot.proofs, infused_challenge_chain_slot_proof=vdf_proof)
-                    new_subslot = dataclasses.replace(sub_slot, proofs=new_proofs)
-                    new_finished_subslots = block.finished_sub_slots
-                    new_finished_subslots[index] = new_subslot
-                    new_block = dataclasses.replace(block, finished_sub_slots=new_finished_subslots)
-                    break
-        if field_vdf == CompressibleVDFField.CC_SP_VDF:
-            if block.reward_chain_block.challenge_chain_sp_vdf == vdf_info:
-                assert block.challenge_chain_sp_proof is not None
-                new_block = dataclasses.replace(block, challenge_chain_sp_proof=vdf_proof)
-        if field_vdf == CompressibleVDFField.CC_IP_VDF:
-            if block.reward_chain_block.challenge_chain_ip_vdf == vdf_info:
-                new_block = dataclasses.replace(block, challenge_chain_ip_proof=vdf_proof)
-        if new_block is None:
-            return False
-        async with self.db_wrapper.writer():
+        # The proofs are replaced in batches by a single task. The ones which arrive while a batch is written are
+        # written together, in the next one
+        future: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        self._compact_proofs_to_replace.append((header_hash, field_vdf, vdf_info, vdf_proof, future))
+        if self._replace_proofs_task is None or self._replace_proofs_task.done():
+            self._replace_proofs_task = asyncio.create_task(self._replace_proofs())
+        return await future
+
+    async def _replace_proofs(self) -> None:
+        while len(self._compact_proofs_to_replace) > 0:
+            batch = self._compact_proofs_to_replace[:MAX_COMPACT_PROOFS_PER_BATCH]
+            del self._compact_proofs_to_replace[: len(batch)]
             try:
-                await self.block_store.replace_proof(header_hash, new_block)
-                return True
-            except BaseException as e:
+                async with self.db_wrapper.writer():
+                    replaced = await self.block_store.replace_proofs([(h, f, i, p) for h, f, i, p, _ in batch])
+            except Exception as e:
                 self.log.error(
-                    f"_replace_proof error while adding block {block.header_hash} height {block.height},"
+                    f"_replace_proofs error while replacing {len(batch)} compact proofs,"
                     f" rolling back: {e} {traceback.format_exc()}"
                 )
-                raise
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.log.debug(f"Replaced {sum(replaced)} of {len(batch)} compact proofs")
+            for (*_, future), was_replaced in zip(batch, replaced):
+                if not future.done():
+                    future.set_result(was_replaced)
 
     async def respond_compact_proof_of_time(self, request: timelord_protocol.RespondCompactProofOfTime) -> None:
         field_vdf = CompressibleVDFField(int(request.field_vdf))
@@ -2416,8 +2594,7 @@ class FullNode:
             request.vdf_info, request.vdf_proof, request.height, request.header_hash, field_vdf
         ):
             return None
-        async with self.blockchain.compact_proof_lock:
-            replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
+        replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
         if not replaced:
             self.log.error(f"Could not replace compact proof: {request.height}")
             return None
@@ -2500,7 +2677,7 @@ class FullNode:
         async with self.blockchain.compact_proof_lock:
             if self.blockchain.seen_compact_proofs(request.vdf_info, request.height):
                 return None
-            replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
+        replaced = await self._replace_proof(request.vdf_info, request.vdf_proof, request.header_hash, field_vdf)
         if not replaced:
             self.log.error(f"Could not replace compact proof: {request.height}")
             return None
@@ -2515,6 +2692,7 @@ class FullNode:
         self, uncompact_interval_scan: int, target_uncompact_proofs: int, sanitize_weight_proof_only: bool
     ) -> None:
         try:
+            backfilling = True
             while not self._shut_down:
                 while self.sync_store.get_sync_mode() or self.sync_store.get_long_sync():
                     if self._shut_down:
@@ -2523,83 +2701,31 @@ class FullNode:
 
                 broadcast_list: List[timelord_protocol.RequestCompactProofOfTime] = []
 
-                self.log.info("Getting random heights for bluebox to compact")
-                heights = await self.block_store.get_random_not_compactified(target_uncompact_proofs)
-                self.log.info("Heights found for bluebox to compact: [%s]" % ", ".join(map(str, heights)))
-
-                for h in heights:
-
-                    headers = await self.blockchain.get_header_blocks_in_range(h, h, tx_filter=False)
-                    records: Dict[bytes32, BlockRecord] = {}
-                    if sanitize_weight_proof_only:
-                        records = await self.blockchain.get_block_records_in_range(h, h)
-                    for header in headers.values():
-                        expected_header_hash = self.blockchain.height_to_hash(header.height)
-                        if header.header_hash != expected_header_hash:
-                            continue
-                        if sanitize_weight_proof_only:
-                            assert header.header_hash in records
-                            record = records[header.header_hash]
-                        for sub_slot in header.finished_sub_slots:
-                            if (
-                                sub_slot.proofs.challenge_chain_slot_proof.witness_type > 0
-                                or not sub_slot.proofs.challenge_chain_slot_proof.normalized_to_identity
-                            ):
-                                broadcast_list.append(
-                                    timelord_protocol.RequestCompactProofOfTime(
-                                        sub_slot.challenge_chain.challenge_chain_end_of_slot_vdf,
-                                        header.header_hash,
-                                        header.height,
-                                        uint8(CompressibleVDFField.CC_EOS_VDF),
-                                    )
-                                )
-                            if sub_slot.proofs.infused_challenge_chain_slot_proof is not None and (
-                                sub_slot.proofs.infused_challenge_chain_slot_proof.witness_type > 0
-                                or not sub_slot.proofs.infused_challenge_chain_slot_proof.normalized_to_identity
-                            ):
-                                assert sub_slot.infused_challenge_chain is not None
-                                broadcast_list.append(
-                                    timelord_protocol.RequestCompactProofOfTime(
-                                        sub_slot.infused_challenge_chain.infused_challenge_chain_end_of_slot_vdf,
-                                        header.header_hash,
-                                        header.height,
-                                        uint8(CompressibleVDFField.ICC_EOS_VDF),
-                                    )
-                                )
-                        # Running in 'sanitize_weight_proof_only' ignores CC_SP_VDF and CC_IP_VDF
-                        # unless this is a challenge block.
-                        if sanitize_weight_proof_only:
-                            if not record.is_challenge_block(self.constants):
-                                continue
-                        if header.challenge_chain_sp_proof is not None and (
-                            header.challenge_chain_sp_proof.witness_type > 0
-                            or not header.challenge_chain_sp_proof.normalized_to_identity
-                        ):
-                            assert header.reward_chain_block.challenge_chain_sp_vdf is not None
-                            broadcast_list.append(
-                                timelord_protocol.RequestCompactProofOfTime(
-                                    header.reward_chain_block.challenge_chain_sp_vdf,
-                                    header.header_hash,
-                                    header.height,
-                                    uint8(CompressibleVDFField.CC_SP_VDF),
-                                )
-                            )
-
-                        if (
-                            header.challenge_chain_ip_proof.witness_type > 0
-                            or not header.challenge_chain_ip_proof.normalized_to_identity
-                        ):
-                            broadcast_list.append(
-                                timelord_protocol.RequestCompactProofOfTime(
-                                    header.reward_chain_block.challenge_chain_ip_vdf,
-                                    header.header_hash,
-                                    header.height,
-                                    uint8(CompressibleVDFField.CC_IP_VDF),
-                                )
-                            )
+                self.log.info("Getting random uncompact proofs for bluebox to compact")
+                # Running in 'sanitize_weight_proof_only' ignores CC_SP_VDF and CC_IP_VDF
+                # unless this is a challenge block.
+                proofs = await self.block_store.get_random_uncompact_proofs(
+                    target_uncompact_proofs,
+                    self.constants.MIN_BLOCKS_PER_CHALLENGE_BLOCK - 1 if sanitize_weight_proof_only else None,
+                )
+                orphans: List[bytes32] = []
+                for header_hash, height, field_vdf, vdf_info in proofs:
+                    # orphan blocks are not compactified, the ones below the peak won't be in the chain
+                    block_hash = self.blockchain.height_to_hash(height)
+                    if header_hash != block_hash:
+                        if block_hash is not None:
+                            orphans.append(header_hash)
+                        continue
+                    broadcast_list.append(
+                        timelord_protocol.RequestCompactProofOfTime(vdf_info, header_hash, height, uint8(field_vdf))
+                    )
+                if len(orphans) > 0:
+                    await self.block_store.remove_uncompact_proofs(orphans)
+                self.log.info(
+                    "Heights found for bluebox to compact: [%s]"
+                    % ", ".join(str(request.height) for request in broadcast_list)
+                )
 
-                if len(broadcast_list) > target_uncompact_proofs:
-                    broadcast_list = broadcast_list[:target_uncompact_proofs]
                 if self.sync_store.get_sync_mode() or self.sync_store.get_long_sync():
                     continue
                 if self._server is not None:
@@ -2609,7 +2735,13 @@ class FullNode:
                         msg = make_msg(ProtocolMessageTypes.request_compact_proof_of_time, new_pot)
                         msgs.append(msg)
                     await self.server.send_to_all(msgs, NodeType.TIMELORD)
-                await asyncio.sleep(uncompact_interval_scan)
+
+                # the blocks stored before their uncompact proofs were indexed are indexed in the meantime
+                deadline = time.monotonic() + uncompact_interval_scan
+                while backfilling and time.monotonic() < deadline and not self._shut_down:
+                    backfilling = await self.block_store.backfill_uncompact_proofs(UNCOMPACT_PROOFS_BACKFILL_BATCH)
+                    await asyncio.sleep(0.1)
+                await asyncio.sleep(max(0.0, deadline - time.monotonic()))
         except Exception as e:
             error_stack = traceback.format_exc()
             self.log.error(f"Exception in broadcast_uncompact_blocks: {e}")
@@ -2628,3 +2760,11 @@ async def node_next_block_check(
         if peak is not None and block_response.block.prev_header_hash == peak.header_hash:
             return True
     return False
+
+
+def blocks_not_in_chain(all_blocks: List[FullBlock], blockchain: BlockchainInterface) -> List[FullBlock]:
+    # the blocks from the first one which is not in the blockchain
+    for i, block in enumerate(all_blocks):
+        if not blockchain.contains_block(block.header_hash):
+            return all_blocks[i:]
+    return []
@@ -54,7 +54,7 @@ from chia.types.peer_info import PeerInfo
 from chia.types.transaction_queue_entry import TransactionQueueEntry
 from chia.types.unfinished_block import UnfinishedBlock
 from chia.util.api_decorators import api_request
-from chia.util.full_block_utils import header_block_from_block
+from chia.util.full_block_utils import block_without_generator, header_block_from_block
 from chia.util.generator_tools import get_block_header, tx_removals_and_additions
 from chia.util.hash import std_hash
 from chia.util.ints import uint8, uint32, uint64, uint128
@@ -272,11 +272,11 @@ class FullNodeAPI:
         if request.tip in self.full_node.pow_creation:
             event = self.full_node.pow_creation[request.tip]
             await event.wait()
-            wp = await self.full_node.weight_proof_handler.get_proof_of_weight(request.tip)
+            wp_bytes = await self.full_node.weight_proof_handler.get_proof_of_weight_bytes(request.tip)
         else:
             event = asyncio.Event()
             self.full_node.pow_creation[request.tip] = event
-            wp = await self.full_node.weight_proof_handler.get_proof_of_weight(request.tip)
+            wp_bytes = await self.full_node.weight_proof_handler.get_proof_of_weight_bytes(request.tip)
             event.set()
         tips = list(self.full_node.pow_creation.keys())
 
@@ -285,22 +285,13 @@ class FullNodeAPI:
             for i in range(0, 4):
                 self.full_node.pow_creation.pop(tips[i])
 
-        if wp is None:
+        if wp_bytes is None:
             self.log.error(f"failed creating weight proof for peak {request.tip}")
             return None
 
-        # Serialization of wp is slow
-        if (
-            self.full_node.full_node_store.serialized_wp_message_tip is not None
-            and self.full_node.full_node_store.serialized_wp_message_tip == request.tip
-        ):
-            return self.full_node.full_node_store.serialized_wp_message
-        message = make_msg(
-            ProtocolMessageTypes.respond_proof_of_weight, full_node_protocol.RespondProofOfWeight(wp, request.tip)
-        )
-        self.full_node.full_node_store.serialized_wp_message_tip = request.tip
-        self.full_node.full_node_store.serialized_wp_message = message
-        return message
+        # Serialization of wp is slow. RespondProofOfWeight is the proof followed by the tip, so the proof
+        # serialized by the weight proof handler is sent as it is
+        return make_msg(ProtocolMessageTypes.respond_proof_of_weight, wp_bytes + request.tip)
 
     @api_request()
     async def respond_proof_of_weight(self, request: full_node_protocol.RespondProofOfWeight) -> Optional[Message]:
@@ -326,62 +317,47 @@ class FullNodeAPI:
 
     @api_request(reply_types=[ProtocolMessageTypes.respond_blocks, ProtocolMessageTypes.reject_blocks])
     async def request_blocks(self, request: full_node_protocol.RequestBlocks) -> Optional[Message]:
+        reject = RejectBlocks(request.start_height, request.end_height)
         if (
             request.end_height < request.start_height
             or request.end_height - request.start_height > self.full_node.constants.MAX_BLOCK_COUNT_PER_REQUESTS
         ):
-            reject = RejectBlocks(request.start_height, request.end_height)
-            msg: Message = make_msg(ProtocolMessageTypes.reject_blocks, reject)
-            return msg
-        for i in range(request.start_height, request.end_height + 1):
-            if not self.full_node.blockchain.contains_height(uint32(i)):
-                reject = RejectBlocks(request.start_height, request.end_height)
-                msg = make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                return msg
-
-        if not request.include_transaction_block:
-            blocks: List[FullBlock] = []
-            for i in range(request.start_height, request.end_height + 1):
-                header_hash_i: Optional[bytes32] = self.full_node.blockchain.height_to_hash(uint32(i))
-                if header_hash_i is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    return make_msg(ProtocolMessageTypes.reject_blocks, reject)
-
-                block: Optional[FullBlock] = await self.full_node.block_store.get_full_block(header_hash_i)
-                if block is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    return make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                block = dataclasses.replace(block, transactions_generator=None)
-                blocks.append(block)
-            msg = make_msg(
-                ProtocolMessageTypes.respond_blocks,
-                full_node_protocol.RespondBlocks(request.start_height, request.end_height, blocks),
-            )
+            return make_msg(ProtocolMessageTypes.reject_blocks, reject)
+        if self.full_node.block_store.db_wrapper.db_version == 2:
+            # one range query, which fails unless all the blocks are in the main chain
+            try:
+                blocks_bytes: List[bytes] = await self.full_node.block_store.get_block_bytes_in_range(
+                    request.start_height, request.end_height
+                )
+            except ValueError:
+                return make_msg(ProtocolMessageTypes.reject_blocks, reject)
         else:
-            blocks_bytes: List[bytes] = []
+            header_hashes: List[bytes32] = []
             for i in range(request.start_height, request.end_height + 1):
-                header_hash_i = self.full_node.blockchain.height_to_hash(uint32(i))
+                header_hash_i: Optional[bytes32] = self.full_node.blockchain.height_to_hash(uint32(i))
                 if header_hash_i is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
                     return make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                block_bytes: Optional[bytes] = await self.full_node.block_store.get_full_block_bytes(header_hash_i)
-                if block_bytes is None:
-                    reject = RejectBlocks(request.start_height, request.end_height)
-                    msg = make_msg(ProtocolMessageTypes.reject_blocks, reject)
-                    return msg
-
-                blocks_bytes.append(block_bytes)
-
-            respond_blocks_manually_streamed: bytes = (
-                bytes(uint32(request.start_height))
-                + bytes(uint32(request.end_height))
-                + len(blocks_bytes).to_bytes(4, "big", signed=False)
-            )
-            for block_bytes in blocks_bytes:
-                respond_blocks_manually_streamed += block_bytes
-            msg = make_msg(ProtocolMessageTypes.respond_blocks, respond_blocks_manually_streamed)
+                header_hashes.append(header_hash_i)
+            try:
+                blocks_bytes = await self.full_node.block_store.get_block_bytes_by_hash(header_hashes)
+            except ValueError:
+                return make_msg(ProtocolMessageTypes.reject_blocks, reject)
+        if len(blocks_bytes) != (request.end_height - request.start_height + 1):  # +1 because interval is inclusive
+            return make_msg(ProtocolMessageTypes.reject_blocks, reject)
 
-        return msg
+        if not request.include_transaction_block:
+            blocks_bytes = [block_without_generator(block_bytes) for block_bytes in blocks_bytes]
+
+        # we're building the RespondBlocks manually to avoid the cost of parsing and serializing the blocks
+        respond_blocks_manually_streamed: bytes = b"".join(
+            [
+                bytes(uint32(request.start_height)),
+                bytes(uint32(request.end_height)),
+                len(blocks_bytes).to_bytes(4, "big", signed=False),
+                *blocks_bytes,
+            ]
+        )
+        return make_msg(ProtocolMessageTypes.respond_blocks, respond_blocks_manually_streamed)
 
     @api_request()
     async def reject_block(self, request: full_node_protocol.RejectBlock) -> None:
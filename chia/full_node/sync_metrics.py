@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# The stages of the long sync pipeline
+DOWNLOAD = "download"
+PRE_VALIDATION = "pre_validation"
+# measured in the pre-validation worker processes
+PRE_VALIDATION_WORKERS = "pre_validation_workers"
+CLVM = "clvm"
+SIGNATURES = "signatures"
+# Blockchain.receive_block of the pre-validated blocks, including the DB writes
+ADD_BLOCKS = "add_blocks"
+HINTS = "hints"
+UPDATE_WALLETS = "update_wallets"
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    blocks: int = 0
+    seconds: float = 0.0
+
+    def add(self, seconds: float, blocks: int) -> None:
+        self.calls += 1
+        self.blocks += blocks
+        self.seconds += seconds
+
+    def to_json_dict(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "blocks": self.blocks,
+            "seconds": round(self.seconds, 3),
+            # the stages overlap, so the shares add up to more than 1
+            "share_of_elapsed": round(self.seconds / elapsed, 4) if elapsed > 0 else 0.0,
+            "blocks_per_second": round(self.blocks / self.seconds, 2) if self.seconds > 0 else 0.0,
+        }
+
+
+@dataclass
+class PeerSyncStats:
+    peer_host: str
+    requests: int = 0
+    failures: int = 0
+    blocks: int = 0
+    seconds: float = 0.0
+    # the peer's counter of received bytes, before the first batch request was sent and after the last response
+    bytes_read_at_start: Optional[int] = None
+    bytes_read_at_end: int = 0
+
+    @property
+    def bytes_read(self) -> int:
+        return 0 if self.bytes_read_at_start is None else self.bytes_read_at_end - self.bytes_read_at_start
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        return {
+            "peer_host": self.peer_host,
+            "requests": self.requests,
+            "failures": self.failures,
+            "blocks": self.blocks,
+            "seconds": round(self.seconds, 3),
+            "bytes": self.bytes_read,
+            "blocks_per_second": round(self.blocks / self.seconds, 2) if self.seconds > 0 else 0.0,
+            "bytes_per_second": round(self.bytes_read / self.seconds, 2) if self.seconds > 0 else 0.0,
+        }
+
+
+@dataclass
+class SyncMetrics:
+    """
+    Timings and counters of the current (or last) long sync, per stage of the pipeline and per peer, for the
+    get_sync_metrics RPC and the metrics websocket.
+    """
+
+    start_time: Optional[float] = None
+    end_time: Optional[float] = None
+    start_height: int = 0
+    target_height: int = 0
+    blocks_added: int = 0
+    num_workers: int = 1
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    peers: Dict[str, PeerSyncStats] = field(default_factory=dict)
+    # current number of items waiting in each queue of the pipeline
+    queue_depths: Dict[str, int] = field(default_factory=dict)
+    clock: Callable[[], float] = time.monotonic
+
+    def start(self, start_height: int, target_height: int, num_workers: int) -> None:
+        self.start_time = self.clock()
+        self.end_time = None
+        self.start_height = start_height
+        self.target_height = target_height
+        self.blocks_added = 0
+        self.num_workers = max(1, num_workers)
+        self.stages = {}
+        self.peers = {}
+        self.queue_depths = {}
+
+    def finish(self) -> None:
+        self.end_time = self.clock()
+
+    def elapsed(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        return (self.clock() if self.end_time is None else self.end_time) - self.start_time
+
+    def add(self, stage: str, seconds: float, blocks: int = 0) -> None:
+        stage_stats = self.stages.get(stage)
+        if stage_stats is None:
+            stage_stats = StageStats()
+            self.stages[stage] = stage_stats
+        stage_stats.add(seconds, blocks)
+
+    @contextmanager
+    def measure(self, stage: str, blocks: int = 0) -> Iterator[None]:
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add(stage, self.clock() - start, blocks)
+
+    def add_download(
+        self,
+        peer_id: str,
+        peer_host: str,
+        bytes_read_before: int,
+        bytes_read_after: int,
+        seconds: float,
+        blocks: Optional[int],
+    ) -> None:
+        """
+        Records a batch request to a peer, blocks is None if it failed. The bytes read are the peer's counter
+        before the request was sent and after it completed.
+        """
+        peer_stats = self.peers.get(peer_id)
+        if peer_stats is None:
+            peer_stats = PeerSyncStats(peer_host)
+            self.peers[peer_id] = peer_stats
+        # the requests to a peer overlap, and may complete in any order
+        if peer_stats.bytes_read_at_start is None or bytes_read_before < peer_stats.bytes_read_at_start:
+            peer_stats.bytes_read_at_start = bytes_read_before
+        peer_stats.bytes_read_at_end = max(peer_stats.bytes_read_at_end, bytes_read_after)
+        peer_stats.requests += 1
+        peer_stats.seconds += seconds
+        if blocks is None:
+            peer_stats.failures += 1
+        else:
+            peer_stats.blocks += blocks
+            self.add(DOWNLOAD, seconds, blocks)
+
+    def set_queue_depth(self, queue: str, depth: int) -> None:
+        self.queue_depths[queue] = depth
+
+    def to_json_dict(self) -> Dict[str, Any]:
+        elapsed = self.elapsed()
+        workers = self.stages.get(PRE_VALIDATION_WORKERS)
+        worker_seconds = 0.0 if workers is None else workers.seconds
+        return {
+            "syncing": self.start_time is not None and self.end_time is None,
+            "elapsed": round(elapsed, 3),
+            "start_height": self.start_height,
+            "target_height": self.target_height,
+            "blocks_added": self.blocks_added,
+            "blocks_per_second": round(self.blocks_added / elapsed, 2) if elapsed > 0 else 0.0,
+            "worker_utilization": round(worker_seconds / (elapsed * self.num_workers), 4) if elapsed > 0 else 0.0,
+            "stages": {name: stage.to_json_dict(elapsed) for name, stage in self.stages.items()},
+            "peers": {peer_id: peer.to_json_dict() for peer_id, peer in self.peers.items()},
+            "queue_depths": dict(self.queue_depths),
+        }
@@ -9,7 +9,7 @@ import random
 import tempfile
 from concurrent.futures.process import ProcessPoolExecutor
 from multiprocessing.context import BaseContext
-from typing import IO, Awaitable, Dict, List, Optional, Tuple
+from typing import IO, Dict, List, Optional, Tuple
 
 from chia.consensus.block_header_validation import validate_finished_header_block
 from chia.consensus.block_record import BlockRecord
@@ -41,9 +41,9 @@ from chia.types.weight_proof import (
     WeightProof,
 )
 from chia.util.block_cache import BlockCache
-from chia.util.chunks import chunks
 from chia.util.hash import std_hash
 from chia.util.ints import uint8, uint32, uint64, uint128
+from chia.util.lru_cache import LRUCache
 from chia.util.setproctitle import getproctitle, setproctitle
 
 log = logging.getLogger(__name__)
@@ -58,20 +58,35 @@ class WeightProofHandler:
     LAMBDA_L = 100
     C = 0.5
     MAX_SAMPLES = 20
+    # proofs of the most recent tips, kept with their serialized bytes
+    MAX_CACHED_PROOFS = 4
+    # the proofs of nearby tips mostly sample the same sub epochs
+    MAX_CACHED_SEGMENTS = 2 * MAX_SAMPLES
 
     def __init__(
         self,
         constants: ConsensusConstants,
         blockchain: BlockchainInterface,
         multiprocessing_context: Optional[BaseContext] = None,
+        num_processes: int = 4,
     ):
-        self.tip: Optional[bytes32] = None
-        self.proof: Optional[WeightProof] = None
         self.constants = constants
         self.blockchain = blockchain
         self.lock = asyncio.Lock()
-        self._num_processes = 4
+        # size of the process pool validating weight proofs
+        self._num_processes = max(1, num_processes)
         self.multiprocessing_context = multiprocessing_context
+        self._proofs: LRUCache[bytes32, WeightProof] = LRUCache(self.MAX_CACHED_PROOFS)
+        self._proof_bytes: LRUCache[bytes32, bytes] = LRUCache(self.MAX_CACHED_PROOFS)
+        # sub epoch data by the height of its summary, with the header hash of the block at that height, so that
+        # the data of a block which was reorged out is never used. Shared by the proofs of all tips.
+        self._sub_epoch_data: Dict[uint32, Tuple[bytes32, SubEpochData]] = {}
+        # challenge segments by the header hash of the block including the summary of their sub epoch
+        self._segments: LRUCache[bytes32, List[SubEpochChallengeSegment]] = LRUCache(self.MAX_CACHED_SEGMENTS)
+        # the recent chain of the last proof, extended for the next tips
+        self._recent_chain: Optional[List[HeaderBlock]] = None
+        self._precompute_tip: Optional[bytes32] = None
+        self._precompute_task: Optional[asyncio.Task[None]] = None
 
     async def get_proof_of_weight(self, tip: bytes32) -> Optional[WeightProof]:
 
@@ -85,24 +100,71 @@ class WeightProofHandler:
             return None
 
         async with self.lock:
-            if self.proof is not None:
-                if self.proof.recent_chain_data[-1].header_hash == tip:
-                    return self.proof
+            wp = self._proofs.get(tip)
+            if wp is not None:
+                return wp
             wp = await self._create_proof_of_weight(tip)
             if wp is None:
                 return None
-            self.proof = wp
-            self.tip = tip
+            self._proofs.put(tip, wp)
             return wp
 
+    async def get_proof_of_weight_bytes(self, tip: bytes32) -> Optional[bytes]:
+        """
+        Returns the serialized weight proof for tip. It's cached, so that the proof is serialized once for all the
+        peers requesting it.
+        """
+        wp_bytes = self._proof_bytes.get(tip)
+        if wp_bytes is not None:
+            return wp_bytes
+        wp = await self.get_proof_of_weight(tip)
+        if wp is None:
+            return None
+        wp_bytes = bytes(wp)
+        self._proof_bytes.put(tip, wp_bytes)
+        return wp_bytes
+
+    def new_peak(self, peak: BlockRecord) -> None:
+        """
+        Builds the proof for the new peak in the background, so that it's ready when peers ask for it. Only the
+        latest peak is built if several arrive in the meantime.
+        """
+        if peak.height < self.constants.WEIGHT_PROOF_RECENT_BLOCKS:
+            return
+        self._precompute_tip = peak.header_hash
+        if self._precompute_task is None or self._precompute_task.done():
+            self._precompute_task = asyncio.create_task(self._precompute_proofs())
+
+    async def _precompute_proofs(self) -> None:
+        while self._precompute_tip is not None:
+            tip = self._precompute_tip
+            self._precompute_tip = None
+            try:
+                await self.get_proof_of_weight_bytes(tip)
+            except Exception as e:
+                log.error(f"failed creating weight proof for peak {tip}: {e}")
+
+    def cancel_weight_proof_tasks(self) -> None:
+        self._precompute_tip = None
+        if self._precompute_task is not None and not self._precompute_task.done():
+            self._precompute_task.cancel()
+
     def get_sub_epoch_data(self, tip_height: uint32, summary_heights: List[uint32]) -> List[SubEpochData]:
         sub_epoch_data: List[SubEpochData] = []
         for sub_epoch_n, ses_height in enumerate(summary_heights):
             if ses_height > tip_height:
                 break
+            header_hash = self.blockchain.height_to_hash(ses_height)
+            cached = self._sub_epoch_data.get(ses_height)
+            if cached is not None and cached[0] == header_hash:
+                sub_epoch_data.append(cached[1])
+                continue
             ses = self.blockchain.get_ses(ses_height)
             log.debug("handle sub epoch summary %s at height: %s ses %s", sub_epoch_n, ses_height, ses)
-            sub_epoch_data.append(_create_sub_epoch_data(ses))
+            data = _create_sub_epoch_data(ses)
+            if header_hash is not None:
+                self._sub_epoch_data[ses_height] = (header_hash, data)
+            sub_epoch_data.append(data)
         return sub_epoch_data
 
     async def _create_proof_of_weight(self, tip: bytes32) -> Optional[WeightProof]:
@@ -153,7 +215,9 @@ class WeightProofHandler:
 
             if _sample_sub_epoch(prev_ses_block.weight, ses_block.weight, weight_to_check):  # type: ignore
                 sample_n += 1
-                segments = await self.blockchain.get_sub_epoch_challenge_segments(ses_block.header_hash)
+                segments = self._segments.get(ses_block.header_hash)
+                if segments is None:
+                    segments = await self.blockchain.get_sub_epoch_challenge_segments(ses_block.header_hash)
                 if segments is None:
                     segments = await self.__create_sub_epoch_segments(ses_block, prev_ses_block, uint32(sub_epoch_n))
                     if segments is None:
@@ -162,6 +226,7 @@ class WeightProofHandler:
                         )
                         return None
                     await self.blockchain.persist_sub_epoch_challenge_segments(ses_block.header_hash, segments)
+                self._segments.put(ses_block.header_hash, segments)
                 sub_epoch_segments.extend(segments)
             prev_ses_block = ses_block
         log.debug(f"sub_epochs: {len(sub_epoch_data)}")
@@ -181,6 +246,33 @@ class WeightProofHandler:
         return seed
 
     async def _get_recent_chain(self, tip_height: uint32) -> Optional[List[HeaderBlock]]:
+        recent_chain = await self._extend_recent_chain(tip_height)
+        if recent_chain is None:
+            recent_chain = await self._create_recent_chain(tip_height)
+        self._recent_chain = recent_chain
+        return recent_chain
+
+    async def _extend_recent_chain(self, tip_height: uint32) -> Optional[List[HeaderBlock]]:
+        # The recent chain of the previous tip is reused if the new tip extends it without including a sub epoch
+        # summary, it starts at the same block then
+        if self._recent_chain is None:
+            return None
+        prev_tip = self._recent_chain[-1]
+        if prev_tip.height >= tip_height or self.blockchain.height_to_hash(prev_tip.height) != prev_tip.header_hash:
+            return None
+        headers = await self.blockchain.get_header_blocks_in_range(prev_tip.height + 1, tip_height, tx_filter=False)
+        blocks = await self.blockchain.get_block_records_in_range(prev_tip.height + 1, tip_height)
+        recent_chain = self._recent_chain[:]
+        for height in range(prev_tip.height + 1, tip_height + 1):
+            header_hash = self.blockchain.height_to_hash(uint32(height))
+            assert header_hash is not None
+            if blocks[header_hash].sub_epoch_summary_included is not None:
+                return None
+            recent_chain.append(headers[header_hash])
+        log.debug(f"extended recent chain from {prev_tip.height} to {tip_height}")
+        return recent_chain
+
+    async def _create_recent_chain(self, tip_height: uint32) -> Optional[List[HeaderBlock]]:
         recent_chain: List[HeaderBlock] = []
         ses_heights = self.blockchain.get_ses_heights()
         min_height = 0
@@ -631,7 +723,6 @@ class WeightProofHandler:
                         self.constants,
                         executor,
                         shutdown_file.name,
-                        self._num_processes,
                         weight_proof,
                         summaries,
                         sub_epoch_weight_list,
@@ -951,48 +1042,91 @@ def _validate_sub_epoch_segments(
 ):
     summaries = summaries_from_bytes(summaries_bytes)
     sub_epoch_segments: SubEpochSegments = SubEpochSegments.from_bytes(weight_proof_bytes)
-    rc_sub_slot_hash = constants.GENESIS_CHALLENGE
-    total_blocks, total_ip_iters = 0, 0
-    total_slot_iters, total_slots = 0, 0
-    total_ip_iters = 0
-    prev_ses: Optional[SubEpochSummary] = None
     segments_by_sub_epoch = map_segments_by_sub_epoch(sub_epoch_segments.challenge_segments)
-    curr_ssi = constants.SUB_SLOT_ITERS_STARTING
     vdfs_to_validate = []
     for sub_epoch_n, segments in segments_by_sub_epoch.items():
-        prev_ssi = curr_ssi
-        curr_difficulty, curr_ssi = _get_curr_diff_ssi(constants, sub_epoch_n, summaries)
         log.debug(f"validate sub epoch {sub_epoch_n}")
-        # recreate RewardChainSubSlot for next ses rc_hash
         sampled_seg_index = rng.choice(range(len(segments)))
-        if sub_epoch_n > 0:
-            rc_sub_slot = __get_rc_sub_slot(constants, segments[0], summaries, curr_ssi)
-            prev_ses = summaries[sub_epoch_n - 1]
-            rc_sub_slot_hash = rc_sub_slot.get_hash()
-        if not summaries[sub_epoch_n].reward_chain_hash == rc_sub_slot_hash:
-            log.error(f"failed reward_chain_hash validation sub_epoch {sub_epoch_n}")
-            return False
-
         # skip validation up to fork height
         if sub_epoch_n < validate_from:
+            if not _validate_sub_epoch_rc_hash(constants, sub_epoch_n, segments, summaries):
+                return False
             continue
+        valid, vdf_list = _validate_sub_epoch(constants, sub_epoch_n, segments, summaries, sampled_seg_index)
+        if not valid:
+            return False
+        vdfs_to_validate.extend(vdf_list)
+    return True, vdfs_to_validate
 
-        for idx, segment in enumerate(segments):
-            valid_segment, ip_iters, slot_iters, slots, vdf_list = _validate_segment(
-                constants, segment, curr_ssi, prev_ssi, curr_difficulty, prev_ses, idx == 0, sampled_seg_index == idx
-            )
-            vdfs_to_validate.extend(vdf_list)
-            if not valid_segment:
-                log.error(f"failed to validate sub_epoch {segment.sub_epoch_n} segment {idx} slots")
-                return False
-            prev_ses = None
-            total_blocks += 1
-            total_slot_iters += slot_iters
-            total_slots += slots
-            total_ip_iters += ip_iters
+
+def _validate_sub_epoch_rc_hash(
+    constants: ConsensusConstants,
+    sub_epoch_n: int,
+    segments: List[SubEpochChallengeSegment],
+    summaries: List[SubEpochSummary],
+) -> bool:
+    # recreate RewardChainSubSlot for next ses rc_hash
+    rc_sub_slot_hash = constants.GENESIS_CHALLENGE
+    if sub_epoch_n > 0:
+        _, curr_ssi = _get_curr_diff_ssi(constants, sub_epoch_n, summaries)
+        rc_sub_slot = __get_rc_sub_slot(constants, segments[0], summaries, curr_ssi)
+        rc_sub_slot_hash = rc_sub_slot.get_hash()
+    if not summaries[sub_epoch_n].reward_chain_hash == rc_sub_slot_hash:
+        log.error(f"failed reward_chain_hash validation sub_epoch {sub_epoch_n}")
+        return False
+    return True
+
+
+def _validate_sub_epoch(
+    constants: ConsensusConstants,
+    sub_epoch_n: int,
+    segments: List[SubEpochChallengeSegment],
+    summaries: List[SubEpochSummary],
+    sampled_seg_index: int,
+) -> Tuple[bool, List[Tuple[VDFProof, ClassgroupElement, VDFInfo]]]:
+    # validates the segments of one sub epoch, and returns the VDFs of its sampled segment
+    if not _validate_sub_epoch_rc_hash(constants, sub_epoch_n, segments, summaries):
+        return False, []
+    curr_difficulty, curr_ssi = _get_curr_diff_ssi(constants, sub_epoch_n, summaries)
+    prev_ssi = constants.SUB_SLOT_ITERS_STARTING
+    prev_ses: Optional[SubEpochSummary] = None
+    if sub_epoch_n > 0:
+        _, prev_ssi = _get_curr_diff_ssi(constants, sub_epoch_n - 1, summaries)
+        prev_ses = summaries[sub_epoch_n - 1]
+    vdfs_to_validate = []
+    for idx, segment in enumerate(segments):
+        valid_segment, _, _, _, vdf_list = _validate_segment(
+            constants, segment, curr_ssi, prev_ssi, curr_difficulty, prev_ses, idx == 0, sampled_seg_index == idx
+        )
+        vdfs_to_validate.extend(vdf_list)
+        if not valid_segment:
+            log.error(f"failed to validate sub_epoch {segment.sub_epoch_n} segment {idx} slots")
+            return False, []
+        prev_ses = None
     return True, vdfs_to_validate
 
 
+def _validate_sub_epoch_job(
+    constants: ConsensusConstants,
+    sub_epoch_n: int,
+    segments_bytes: bytes,
+    summaries_bytes: List[bytes],
+    sampled_seg_index: int,
+    shutdown_file_path: Optional[pathlib.Path] = None,
+) -> bool:
+    """
+    Validates the challenge segments of one sub epoch and the VDFs of its sampled segment, in a worker process,
+    independently of the other sub epochs. summaries_bytes are the summaries up to the one of this sub epoch.
+    Stops at the first failure.
+    """
+    summaries = summaries_from_bytes(summaries_bytes)
+    segments = SubEpochSegments.from_bytes(segments_bytes).challenge_segments
+    valid, vdfs_to_validate = _validate_sub_epoch(constants, sub_epoch_n, segments, summaries, sampled_seg_index)
+    if not valid:
+        return False
+    return _validate_vdfs(constants, vdfs_to_validate, shutdown_file_path)
+
+
 def _validate_segment(
     constants: ConsensusConstants,
     segment: SubEpochChallengeSegment,
@@ -1641,16 +1775,12 @@ def validate_total_iters(
     return total_iters == sub_slot_data.total_iters
 
 
-def _validate_vdf_batch(
+def _validate_vdfs(
     constants: ConsensusConstants,
-    vdf_list: List[Tuple[bytes, bytes, bytes]],
+    vdf_list: List[Tuple[VDFProof, ClassgroupElement, VDFInfo]],
     shutdown_file_path: Optional[pathlib.Path] = None,
-):
-
-    for vdf_proof_bytes, class_group_bytes, info in vdf_list:
-        vdf = VDFProof.from_bytes(vdf_proof_bytes)
-        class_group = ClassgroupElement.from_bytes(class_group_bytes)
-        vdf_info = VDFInfo.from_bytes(info)
+) -> bool:
+    for vdf, class_group, vdf_info in vdf_list:
         if not vdf.is_valid(constants, class_group, vdf_info):
             return False
 
@@ -1665,7 +1795,6 @@ async def validate_weight_proof_inner(
     constants,
     executor,
     shutdown_file_name,
-    num_processes,
     weight_proof: WeightProof,
     summaries: List[SubEpochSummary],
     sub_epoch_weight_list: List[uint128],
@@ -1685,45 +1814,49 @@ async def validate_weight_proof_inner(
         return False, []
 
     loop = asyncio.get_running_loop()
-    summary_bytes, wp_segment_bytes, wp_recent_chain_bytes = vars_to_bytes(summaries, weight_proof)
+    summary_bytes = [bytes(summary) for summary in summaries]
     recent_blocks_validation_task = loop.run_in_executor(
         executor,
         validate_recent_blocks,
         constants,
-        wp_recent_chain_bytes,
+        bytes(RecentChainData(weight_proof.recent_chain_data)),
         summary_bytes,
         pathlib.Path(shutdown_file_name),
     )
 
     if not skip_segment_validation:
-        segments_validated, vdfs_to_validate = _validate_sub_epoch_segments(
-            constants, rng, wp_segment_bytes, summary_bytes, validate_from
-        )
-        await asyncio.sleep(0)  # break up otherwise multi-second sync code
-
-        if not segments_validated:
-            return False, []
-
-        vdf_chunks = chunks(vdfs_to_validate, num_processes)
-        vdf_tasks: List[Awaitable] = []
-        for chunk in vdf_chunks:
-            byte_chunks = []
-            for vdf_proof, classgroup, vdf_info in chunk:
-                byte_chunks.append((bytes(vdf_proof), bytes(classgroup), bytes(vdf_info)))
-            vdf_task = asyncio.get_running_loop().run_in_executor(
-                executor,
-                _validate_vdf_batch,
-                constants,
-                byte_chunks,
-                pathlib.Path(shutdown_file_name),
+        # Each sub epoch is validated by a separate job in the pool, with its segments and the summaries up to its
+        # own. The sampled segments are drawn in sub epoch order, also for the sub epochs which are not validated.
+        sub_epoch_tasks: List[asyncio.Future[bool]] = []
+        for sub_epoch_n, segments in map_segments_by_sub_epoch(weight_proof.sub_epoch_segments).items():
+            sampled_seg_index = rng.choice(range(len(segments)))
+            if sub_epoch_n < validate_from:
+                if not _validate_sub_epoch_rc_hash(constants, sub_epoch_n, segments, summaries):
+                    return False, []
+                continue
+            sub_epoch_tasks.append(
+                loop.run_in_executor(
+                    executor,
+                    _validate_sub_epoch_job,
+                    constants,
+                    sub_epoch_n,
+                    bytes(SubEpochSegments(segments)),
+                    summary_bytes[: sub_epoch_n + 1],
+                    sampled_seg_index,
+                    pathlib.Path(shutdown_file_name),
+                )
             )
-            vdf_tasks.append(vdf_task)
             # give other stuff a turn
             await asyncio.sleep(0)
 
-        for vdf_task in asyncio.as_completed(fs=vdf_tasks):
-            validated = await vdf_task
+        for sub_epoch_task in asyncio.as_completed(fs=sub_epoch_tasks):
+            validated = await sub_epoch_task
             if not validated:
+                log.error("failed validating weight proof sub epoch segments")
+                # the jobs which didn't start yet are dropped
+                for task in sub_epoch_tasks:
+                    task.cancel()
+                recent_blocks_validation_task.cancel()
                 return False, []
 
     valid_recent_blocks, records_bytes = await recent_blocks_validation_task
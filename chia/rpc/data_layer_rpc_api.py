@@ -2,12 +2,14 @@ from __future__ import annotations
 
 import dataclasses
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
 
 from chia.data_layer.data_layer_errors import OfferIntegrityError
 from chia.data_layer.data_layer_util import (
     CancelOfferRequest,
     CancelOfferResponse,
+    KeysPage,
+    KeysValuesPage,
     MakeOfferRequest,
     MakeOfferResponse,
     Side,
@@ -64,6 +66,31 @@ def get_fee(config: Dict[str, Any], request: Dict[str, Any]) -> uint64:
     return uint64(fee)
 
 
+def get_page_size(config: Dict[str, Any], request: Dict[str, Any]) -> Optional[int]:
+    if request.get("page_size") is None:
+        return None
+    page_size = int(request["page_size"])
+    if page_size < 1:
+        raise Exception(f"page_size must be positive, got: {page_size}")
+    return min(page_size, int(config.get("max_page_size", 10000)))
+
+
+def get_cursor(request: Dict[str, Any]) -> Optional[bytes]:
+    cursor = request.get("cursor")
+    if cursor is None:
+        return None
+    return hexstr_to_bytes(cursor)
+
+
+def page_info(page: Union[KeysPage, KeysValuesPage]) -> Dict[str, Any]:
+    return {
+        "next_cursor": None if page.next_cursor is None else f"0x{page.next_cursor.hex()}",
+        "root_hash": None if page.root_hash is None else page.root_hash.hex(),
+        "total_count": page.total_count,
+        "total_bytes": page.total_bytes,
+    }
+
+
 class DataLayerRpcApi:
     # TODO: other RPC APIs do not accept a wallet and the service start does not expect to provide one
     def __init__(self, data_layer: DataLayer):  # , wallet: DataLayerWallet):
@@ -99,6 +126,7 @@ class DataLayerRpcApi:
             "/verify_offer": self.verify_offer,
             "/cancel_offer": self.cancel_offer,
             "/get_sync_status": self.get_sync_status,
+            "/get_proofs": self.get_proofs,
         }
 
     async def _state_changed(self, change: str, change_data: Optional[Dict[str, Any]]) -> List[WsRpcMessage]:
@@ -138,6 +166,16 @@ class DataLayerRpcApi:
             root_hash = bytes32.from_hexstr(root_hash)
         if self.service is None:
             raise Exception("Data layer not created")
+        page_size = get_page_size(self.service.config, request)
+        if page_size is not None:
+            cursor = get_cursor(request)
+            keys_page = await self.service.get_keys_paginated(store_id, root_hash, page_size, cursor)
+            if keys_page.keys == [] and cursor is None and root_hash is not None and root_hash != bytes32([0] * 32):
+                raise Exception(f"Can't find keys for {root_hash}")
+            return {
+                "keys": [f"0x{key.hex()}" for key in keys_page.keys],
+                **page_info(keys_page),
+            }
         keys = await self.service.get_keys(store_id, root_hash)
         if keys == [] and root_hash is not None and root_hash != bytes32([0] * 32):
             raise Exception(f"Can't find keys for {root_hash}")
@@ -150,6 +188,21 @@ class DataLayerRpcApi:
             root_hash = bytes32.from_hexstr(root_hash)
         if self.service is None:
             raise Exception("Data layer not created")
+        page_size = get_page_size(self.service.config, request)
+        if page_size is not None:
+            cursor = get_cursor(request)
+            keys_values_page = await self.service.get_keys_values_paginated(store_id, root_hash, page_size, cursor)
+            if (
+                keys_values_page.keys_values == []
+                and cursor is None
+                and root_hash is not None
+                and root_hash != bytes32([0] * 32)
+            ):
+                raise Exception(f"Can't find keys and values for {root_hash}")
+            return {
+                "keys_values": [recurse_jsonify(dataclasses.asdict(node)) for node in keys_values_page.keys_values],
+                **page_info(keys_values_page),
+            }
         res = await self.service.get_keys_values(store_id, root_hash)
         json_nodes = []
         for node in res:
@@ -426,5 +479,23 @@ class DataLayerRpcApi:
                 "generation": sync_status.generation,
                 "target_root_hash": sync_status.target_root_hash.hex(),
                 "target_generation": sync_status.target_generation,
+                "generations_behind": sync_status.generations_behind,
+                "syncing": sync_status.syncing,
+                "last_synced": sync_status.last_synced,
             }
         }
+
+    async def get_proofs(self, request: Dict[str, Any]) -> EndpointResult:
+        """
+        get proofs of inclusion for a list of keys, built together in one batch
+        """
+        store_id = bytes32.from_hexstr(request["id"])
+        keys = [hexstr_to_bytes(key) for key in request["keys"]]
+        root_hash = request.get("root_hash")
+        if root_hash is not None:
+            root_hash = bytes32.from_hexstr(root_hash)
+        if self.service is None:
+            raise Exception("Data layer not created")
+        root_hash, store_proofs = await self.service.get_proofs(store_id=store_id, keys=keys, root_hash=root_hash)
+
+        return {"root_hash": root_hash.hex(), "store_proofs": store_proofs.marshal()}
@@ -29,18 +29,38 @@ class DataLayerRpcClient(RpcClient):
         # TODO: better hinting for .fetch() (probably a TypedDict)
         return response  # type: ignore[no-any-return]
 
-    async def get_keys_values(self, store_id: bytes32, root_hash: Optional[bytes32]) -> Dict[str, Any]:
+    async def get_keys_values(
+        self,
+        store_id: bytes32,
+        root_hash: Optional[bytes32],
+        page_size: Optional[int] = None,
+        cursor: Optional[bytes] = None,
+    ) -> Dict[str, Any]:
         request: Dict[str, Any] = {"id": store_id.hex()}
         if root_hash is not None:
             request["root_hash"] = root_hash.hex()
+        if page_size is not None:
+            request["page_size"] = page_size
+        if cursor is not None:
+            request["cursor"] = cursor.hex()
         response = await self.fetch("get_keys_values", request)
         # TODO: better hinting for .fetch() (probably a TypedDict)
         return response  # type: ignore[no-any-return]
 
-    async def get_keys(self, store_id: bytes32, root_hash: Optional[bytes32]) -> Dict[str, Any]:
+    async def get_keys(
+        self,
+        store_id: bytes32,
+        root_hash: Optional[bytes32],
+        page_size: Optional[int] = None,
+        cursor: Optional[bytes] = None,
+    ) -> Dict[str, Any]:
         request: Dict[str, Any] = {"id": store_id.hex()}
         if root_hash is not None:
             request["root_hash"] = root_hash.hex()
+        if page_size is not None:
+            request["page_size"] = page_size
+        if cursor is not None:
+            request["cursor"] = cursor.hex()
         response = await self.fetch("get_keys", request)
         # TODO: better hinting for .fetch() (probably a TypedDict)
         return response  # type: ignore[no-any-return]
@@ -125,3 +145,11 @@ class DataLayerRpcClient(RpcClient):
     async def get_sync_status(self, store_id: bytes32) -> Dict[str, Any]:
         response = await self.fetch("get_sync_status", {"id": store_id.hex()})
         return response  # type: ignore[no-any-return]
+
+    async def get_proofs(self, store_id: bytes32, keys: List[bytes], root_hash: Optional[bytes32]) -> Dict[str, Any]:
+        request: Dict[str, Any] = {"id": store_id.hex(), "keys": [key.hex() for key in keys]}
+        if root_hash is not None:
+            request["root_hash"] = root_hash.hex()
+        response = await self.fetch("get_proofs", request)
+        # TODO: better hinting for .fetch() (probably a TypedDict)
+        return response  # type: ignore[no-any-return]
@@ -48,6 +48,7 @@ class FullNodeRpcApi:
             "/get_block": self.get_block,
             "/get_blocks": self.get_blocks,
             "/get_block_count_metrics": self.get_block_count_metrics,
+            "/get_sync_metrics": self.get_sync_metrics,
             "/get_block_record_by_height": self.get_block_record_by_height,
             "/get_block_record": self.get_block_record,
             "/get_block_records": self.get_block_records,
@@ -105,6 +106,9 @@ class FullNodeRpcApi:
         if change in ("block", "signage_point"):
             payloads.append(create_payload_dict(change, change_data, self.service_name, "metrics"))
 
+        if change == "sync_metrics":
+            payloads.append(create_payload_dict("get_sync_metrics", change_data, self.service_name, "metrics"))
+
         return payloads
 
     # this function is just here for backwards-compatibility. It will probably
@@ -238,6 +242,7 @@ class FullNodeRpcApi:
         return {"network_name": network_name, "network_prefix": address_prefix}
 
     async def get_recent_signage_point_or_eos(self, request: Dict) -> EndpointResult:
+        await self.service.wait_until_initialized()
         if "sp_hash" not in request:
             challenge_hash: bytes32 = bytes32.from_hexstr(request["challenge_hash"])
             # This is the case of getting an end of slot
@@ -389,6 +394,13 @@ class FullNodeRpcApi:
             }
         }
 
+    async def get_sync_metrics(self, _request: Dict) -> EndpointResult:
+        """
+        Returns the timings and counters of the current, or the last, long sync: blocks per second, time spent
+        in each stage, throughput per peer, queue depths and utilization of the pre-validation workers.
+        """
+        return {"sync_metrics": self.service.sync_metrics.to_json_dict()}
+
     async def get_block_records(self, request: Dict) -> EndpointResult:
         if "start" not in request:
             raise ValueError("No start in request")
@@ -479,7 +491,7 @@ class FullNodeRpcApi:
         return {"block_record": record}
 
     async def get_unfinished_block_headers(self, request: Dict) -> EndpointResult:
-
+        await self.service.wait_until_initialized()
         peak: Optional[BlockRecord] = self.service.blockchain.get_peak()
         if peak is None:
             return {"headers": []}
@@ -506,6 +518,7 @@ class FullNodeRpcApi:
         """
         if "newer_block_header_hash" not in request or "older_block_header_hash" not in request:
             raise ValueError("Invalid request. newer_block_header_hash and older_block_header_hash required")
+        await self.service.wait_until_initialized()
         newer_block_hex = request["newer_block_header_hash"]
         older_block_hex = request["older_block_header_hash"]
 
@@ -673,6 +686,7 @@ class FullNodeRpcApi:
 
         spend_bundle: SpendBundle = SpendBundle.from_json_dict(request["spend_bundle"])
         spend_name = spend_bundle.name()
+        await self.service.wait_until_initialized()
 
         if self.service.mempool_manager.get_spendbundle(spend_name) is not None:
             status = MempoolInclusionStatus.SUCCESS
@@ -768,6 +782,7 @@ class FullNodeRpcApi:
             raise ValueError("Request must contain 'target_times' array")
         if any(t < 0 for t in request["target_times"]):
             raise ValueError("'target_times' array members must be non-negative")
+        await self.service.wait_until_initialized()
 
         cost = 0
         if "spend_bundle" in request:
@@ -272,3 +272,7 @@ class FullNodeRpcClient(RpcClient):
     ) -> Dict[str, Any]:
         response = await self.fetch("get_fee_estimate", {"cost": cost, "target_times": target_times})
         return response
+
+    async def get_sync_metrics(self) -> Dict[str, Any]:
+        response = await self.fetch("get_sync_metrics", {})
+        return response["sync_metrics"]
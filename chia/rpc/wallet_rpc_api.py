@@ -847,7 +847,38 @@ class WalletRpcApi:
         if to_address is not None:
             to_puzzle_hash = decode_puzzle_hash(to_address)
 
-        transactions = await self.service.wallet_state_manager.tx_store.get_transactions_between(
+        tx_store = self.service.wallet_state_manager.tx_store
+        if "cursor" in request:
+            # Keyset pagination, pass the returned next_cursor to get the following page, None for the first one
+            limit = request.get("limit", 50)
+            page_args = (wallet_id, limit, request["cursor"], sort_key, reverse, to_puzzle_hash)
+            if request.get("summaries", False):
+                summaries, next_cursor = await tx_store.get_transaction_summaries_page(*page_args)
+                converted = [
+                    dataclasses.replace(
+                        summary,
+                        to_puzzle_hash=await self.service.wallet_state_manager.convert_puzzle_hash(
+                            summary.wallet_id, summary.to_puzzle_hash
+                        ),
+                    )
+                    for summary in summaries
+                ]
+                return {
+                    "transactions": [summary.to_json_dict_convenience(self.service.config) for summary in converted],
+                    "next_cursor": next_cursor,
+                    "wallet_id": wallet_id,
+                }
+            records, next_cursor = await tx_store.get_transactions_page(*page_args)
+            return {
+                "transactions": [
+                    (await self._convert_tx_puzzle_hash(tr)).to_json_dict_convenience(self.service.config)
+                    for tr in records
+                ],
+                "next_cursor": next_cursor,
+                "wallet_id": wallet_id,
+            }
+
+        transactions = await tx_store.get_transactions_between(
             wallet_id, start, end, sort_key=sort_key, reverse=reverse, to_puzzle_hash=to_puzzle_hash
         )
         return {
@@ -2155,28 +2186,25 @@ class WalletRpcApi:
 
     async def nft_get_nfts(self, request) -> EndpointResult:
         wallet_id = request.get("wallet_id", None)
-        nfts: List[NFTCoinInfo] = []
         if wallet_id is not None:
-            nft_wallet = self.service.wallet_state_manager.get_wallet(id=wallet_id, required_type=NFTWallet)
-            nfts = await nft_wallet.get_current_nfts()
-        else:
-            for wallet in self.service.wallet_state_manager.wallets.values():
-                if wallet.type() == WalletType.NFT.value:
-                    assert isinstance(wallet, NFTWallet)
-                    nfts.extend(await wallet.get_current_nfts())
-        start_index = request.get("start_index", 0)
-        num = request.get("num", len(nfts))
+            self.service.wallet_state_manager.get_wallet(id=wallet_id, required_type=NFTWallet)
+        # Only the NFTs of the requested page are loaded. With start_after, the pages are sorted by launcher id and
+        # the launcher id of the last NFT of a page gets the next one without skipping over the previous ones.
+        start_after = request.get("start_after", None)
+        nfts: List[NFTCoinInfo] = await self.service.wallet_state_manager.nft_store.get_nft_list(
+            wallet_id=None if wallet_id is None else uint32(wallet_id),
+            start_after=None if start_after is None else bytes32.from_hexstr(start_after),
+            offset=request.get("start_index", 0),
+            limit=request.get("num", None),
+        )
         nft_info_list = []
-        count = 0
         for nft in nfts:
-            if count >= start_index and count - start_index < num:
-                nft_info = await nft_puzzles.get_nft_info_from_puzzle(
-                    nft,
-                    self.service.wallet_state_manager.config,
-                    request.get("ignore_size_limit", False),
-                )
-                nft_info_list.append(nft_info)
-            count += 1
+            nft_info = await nft_puzzles.get_nft_info_from_puzzle(
+                nft,
+                self.service.wallet_state_manager.config,
+                request.get("ignore_size_limit", False),
+            )
+            nft_info_list.append(nft_info)
         return {"wallet_id": wallet_id, "success": True, "nft_list": nft_info_list}
 
     async def nft_set_nft_did(self, request):
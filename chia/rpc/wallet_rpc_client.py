@@ -13,7 +13,7 @@ from chia.util.ints import uint16, uint32, uint64
 from chia.wallet.notification_store import Notification
 from chia.wallet.trade_record import TradeRecord
 from chia.wallet.trading.offer import Offer
-from chia.wallet.transaction_record import TransactionRecord
+from chia.wallet.transaction_record import TransactionRecord, TransactionSummary
 from chia.wallet.transaction_sorting import SortKey
 from chia.wallet.util.wallet_types import WalletType
 
@@ -136,6 +136,60 @@ class WalletRpcClient(RpcClient):
         )
         return [TransactionRecord.from_json_dict_convenience(tx) for tx in res["transactions"]]
 
+    async def _get_transactions_page(
+        self,
+        wallet_id: int,
+        limit: int,
+        cursor: Optional[str],
+        sort_key: Optional[SortKey],
+        reverse: bool,
+        to_address: Optional[str],
+        summaries: bool,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        request: Dict[str, Any] = {
+            "wallet_id": wallet_id,
+            "limit": limit,
+            "cursor": cursor,
+            "reverse": reverse,
+            "summaries": summaries,
+        }
+        if sort_key is not None:
+            request["sort_key"] = sort_key.name
+        if to_address is not None:
+            request["to_address"] = to_address
+
+        res = await self.fetch("get_transactions", request)
+        return res["transactions"], res["next_cursor"]
+
+    async def get_transactions_page(
+        self,
+        wallet_id: int,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        sort_key: Optional[SortKey] = None,
+        reverse: bool = False,
+        to_address: Optional[str] = None,
+    ) -> Tuple[List[TransactionRecord], Optional[str]]:
+        """Returns a page of transactions, and the cursor of the next page, None after the last one."""
+        txs, next_cursor = await self._get_transactions_page(
+            wallet_id, limit, cursor, sort_key, reverse, to_address, summaries=False
+        )
+        return [TransactionRecord.from_json_dict_convenience(tx) for tx in txs], next_cursor
+
+    async def get_transaction_summaries_page(
+        self,
+        wallet_id: int,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        sort_key: Optional[SortKey] = None,
+        reverse: bool = False,
+        to_address: Optional[str] = None,
+    ) -> Tuple[List[TransactionSummary], Optional[str]]:
+        txs, next_cursor = await self._get_transactions_page(
+            wallet_id, limit, cursor, sort_key, reverse, to_address, summaries=True
+        )
+        return [TransactionSummary.from_json_dict(tx) for tx in txs], next_cursor
+
     async def get_transaction_count(
         self,
         wallet_id: int,
@@ -834,8 +888,14 @@ class WalletRpcClient(RpcClient):
         response = await self.fetch("nft_transfer_nft", request)
         return response
 
-    async def list_nfts(self, wallet_id):
+    async def list_nfts(self, wallet_id, start_index=None, num=None, start_after=None):
         request: Dict[str, Any] = {"wallet_id": wallet_id}
+        if start_index is not None:
+            request["start_index"] = start_index
+        if num is not None:
+            request["num"] = num
+        if start_after is not None:
+            request["start_after"] = start_after
         response = await self.fetch("nft_get_nfts", request)
         return response
 
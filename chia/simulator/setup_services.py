@@ -141,6 +141,7 @@ async def setup_full_node(
             override_capabilities=override_capabilities,
         )
     await service.start()
+    await service._node.wait_until_initialized()
 
     yield service
 
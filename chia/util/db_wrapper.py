@@ -173,6 +173,19 @@ class DBWrapper2:
             # just rolls back the state. We need to cancel it regardless
             await self._write_connection.execute(f"RELEASE {name}")
 
+    def current_task_is_writer(self) -> bool:
+        """
+        Returns True if the current task is inside a write transaction, whose
+        changes may still be rolled back.
+        """
+        return self._current_writer is not None and self._current_writer == asyncio.current_task()
+
+    def writer_is_active(self) -> bool:
+        """
+        Returns True while any task is inside a write transaction.
+        """
+        return self._lock.locked()
+
     @contextlib.asynccontextmanager
     async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
         """
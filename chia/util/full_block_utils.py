@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import io
 from dataclasses import dataclass
-from typing import Callable, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
 from blspy import G1Element, G2Element
 from chia_rs import serialized_length
@@ -12,6 +12,7 @@ from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.foliage import TransactionsInfo
 from chia.types.blockchain_format.program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.blockchain_format.vdf import CompressibleVDFField
 from chia.util.ints import uint32
 
 
@@ -67,6 +68,9 @@ def skip_bool(buf: memoryview) -> memoryview:
 #    return buf[100:]  # bytes100
 
 
+VDF_INFO_SIZE = 32 + 8 + 100
+
+
 def skip_vdf_info(buf: memoryview) -> memoryview:
     #    buf = skip_bytes32(buf)
     #    buf = skip_uint64(buf)
@@ -228,6 +232,35 @@ def generator_from_block(buf: memoryview) -> Optional[SerializedProgram]:
     return SerializedProgram.from_bytes(bytes(buf[:length]))
 
 
+def block_without_generator(block_bytes: bytes) -> bytes:
+    """
+    Returns the serialized full block with its transactions_generator removed, the same as
+    bytes(dataclasses.replace(block, transactions_generator=None)) without parsing the block.
+    """
+    buf = memoryview(block_bytes)
+    buf2 = buf[:]
+    buf2 = skip_list(buf2, skip_end_of_sub_slot_bundle)  # finished_sub_slots
+    buf2 = skip_reward_chain_block(buf2)  # reward_chain_block
+    buf2 = skip_optional(buf2, skip_vdf_proof)  # challenge_chain_sp_proof
+    buf2 = skip_vdf_proof(buf2)  # challenge_chain_ip_proof
+    buf2 = skip_optional(buf2, skip_vdf_proof)  # reward_chain_sp_proof
+    buf2 = skip_vdf_proof(buf2)  # reward_chain_ip_proof
+    buf2 = skip_optional(buf2, skip_vdf_proof)  # infused_challenge_chain_ip_proof
+    buf2 = skip_foliage(buf2)  # foliage
+    buf2 = skip_optional(buf2, skip_foliage_transaction_block)  # foliage_transaction_block
+    buf2 = skip_optional(buf2, skip_transactions_info)  # transactions_info
+
+    # this is the transactions_generator optional
+    if buf2[0] == 0:
+        return block_bytes
+    generator_start = len(buf) - len(buf2)
+    # serialized_length() only takes bytes, the generator (and the short ref list after it) is the only part
+    # copied for it
+    length = serialized_length(block_bytes[generator_start + 1 :])
+    # keeps the transactions_generator_ref_list that follows the generator
+    return b"".join([buf[:generator_start], b"\x00", buf2[1 + length :]])
+
+
 # this implements the BlockInfo protocol
 @dataclass(frozen=True)
 class GeneratorBlockInfo:
@@ -323,3 +356,102 @@ def header_block_from_block(
         header_block += bytes(transactions_info)
 
     return header_block
+
+
+@dataclass(frozen=True)
+class CompressibleProof:
+    """
+    A VDF proof of a serialized full block which bluebox timelords can compact, see CompressibleVDFField.
+    The proof is buf[start:end], vdf_info is the serialized VDFInfo it proves.
+    """
+
+    field_vdf: CompressibleVDFField
+    vdf_info: bytes
+    start: int
+    end: int
+
+
+def is_compact_proof(proof: memoryview) -> bool:
+    # witness_type is 0 and normalized_to_identity (the last byte) is set
+    return proof[0] == 0 and proof[len(proof) - 1] == 1
+
+
+def compressible_proofs_from_block(buf: memoryview) -> List[CompressibleProof]:
+    """
+    Returns the proofs of a serialized full block checked by FullBlock.is_fully_compactified(), in order.
+    """
+    proofs: List[CompressibleProof] = []
+    buf2 = buf[:]
+
+    # finished_sub_slots
+    n = int.from_bytes(buf2[:4], "big", signed=False)
+    buf2 = buf2[4:]
+    for _ in range(n):
+        cc_eos_vdf = bytes(buf2[:VDF_INFO_SIZE])
+        buf2 = skip_challenge_chain_sub_slot(buf2)
+        icc_eos_vdf = bytes(buf2[1 : 1 + VDF_INFO_SIZE]) if buf2[0] == 1 else b""
+        buf2 = skip_optional(buf2, skip_infused_challenge_chain)
+        buf2 = skip_reward_chain_sub_slot(buf2)
+
+        start = len(buf) - len(buf2)
+        buf2 = skip_vdf_proof(buf2)  # challenge_chain_slot_proof
+        proofs.append(CompressibleProof(CompressibleVDFField.CC_EOS_VDF, cc_eos_vdf, start, len(buf) - len(buf2)))
+        if buf2[0] == 1:
+            start = len(buf) - len(buf2) + 1
+            buf2 = skip_vdf_proof(buf2[1:])  # infused_challenge_chain_slot_proof
+            proofs.append(CompressibleProof(CompressibleVDFField.ICC_EOS_VDF, icc_eos_vdf, start, len(buf) - len(buf2)))
+        else:
+            buf2 = buf2[1:]
+        buf2 = skip_vdf_proof(buf2)  # reward_chain_slot_proof
+
+    # reward_chain_block
+    buf2 = buf2[16 + 4 + 16 + 1 + 32 :]  # weight, height, total_iters, signage_point_index, pos_ss_cc_challenge_hash
+    buf2 = skip_proof_of_space(buf2)  # proof_of_space
+    cc_sp_vdf = bytes(buf2[1 : 1 + VDF_INFO_SIZE]) if buf2[0] == 1 else b""
+    buf2 = skip_optional(buf2, skip_vdf_info)  # challenge_chain_sp_vdf
+    buf2 = skip_g2_element(buf2)  # challenge_chain_sp_signature
+    cc_ip_vdf = bytes(buf2[:VDF_INFO_SIZE])
+    buf2 = skip_vdf_info(buf2)  # challenge_chain_ip_vdf
+    buf2 = skip_optional(buf2, skip_vdf_info)  # reward_chain_sp_vdf
+    buf2 = skip_g2_element(buf2)  # reward_chain_sp_signature
+    buf2 = skip_vdf_info(buf2)  # reward_chain_ip_vdf
+    buf2 = skip_optional(buf2, skip_vdf_info)  # infused_challenge_chain_ip_vdf
+    buf2 = skip_bool(buf2)  # is_transaction_block
+
+    if buf2[0] == 1:
+        start = len(buf) - len(buf2) + 1
+        buf2 = skip_vdf_proof(buf2[1:])  # challenge_chain_sp_proof
+        proofs.append(CompressibleProof(CompressibleVDFField.CC_SP_VDF, cc_sp_vdf, start, len(buf) - len(buf2)))
+    else:
+        buf2 = buf2[1:]
+    start = len(buf) - len(buf2)
+    buf2 = skip_vdf_proof(buf2)  # challenge_chain_ip_proof
+    proofs.append(CompressibleProof(CompressibleVDFField.CC_IP_VDF, cc_ip_vdf, start, len(buf) - len(buf2)))
+    return proofs
+
+
+def replace_compressible_proofs(
+    buf: memoryview, new_proofs: Dict[Tuple[CompressibleVDFField, bytes], bytes]
+) -> Tuple[bytes, Set[Tuple[CompressibleVDFField, bytes]], bool]:
+    """
+    Replaces proofs of a serialized full block without parsing it. new_proofs maps the field and serialized
+    VDFInfo of a proof to the serialized VDFProof replacing it. Returns the new block, the keys of new_proofs
+    which were replaced, and whether the new block is fully compactified.
+    """
+    parts: List[memoryview] = []
+    replaced: Set[Tuple[CompressibleVDFField, bytes]] = set()
+    fully_compactified = True
+    pos = 0
+    for proof in compressible_proofs_from_block(buf):
+        key = (proof.field_vdf, proof.vdf_info)
+        new_proof = new_proofs.get(key)
+        if new_proof is None:
+            fully_compactified = fully_compactified and is_compact_proof(buf[proof.start : proof.end])
+            continue
+        parts.append(buf[pos : proof.start])
+        parts.append(memoryview(new_proof))
+        pos = proof.end
+        replaced.add(key)
+        fully_compactified = fully_compactified and is_compact_proof(memoryview(new_proof))
+    parts.append(buf[pos:])
+    return b"".join(parts), replaced, fully_compactified
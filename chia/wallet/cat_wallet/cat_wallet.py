@@ -34,7 +34,7 @@ from chia.wallet.cat_wallet.cat_utils import (
     unsigned_spend_bundle_for_spendable_cats,
 )
 from chia.wallet.cat_wallet.lineage_store import CATLineageStore
-from chia.wallet.coin_selection import select_coins
+from chia.wallet.coin_selection import max_num_coins_for_objective, select_coins
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.lineage_proof import LineageProof
 from chia.wallet.outer_puzzles import AssetType
@@ -312,6 +312,14 @@ class CATWallet:
 
         return uint128(total_amount)
 
+    async def get_cost_of_single_tx(self) -> Optional[int]:
+        """
+        Returns the cost of spending one coin of the wallet, None while the wallet has no spendable coin.
+        """
+        if self.cost_of_single_tx is None:
+            await self.get_max_send_amount()
+        return self.cost_of_single_tx
+
     def get_name(self) -> str:
         return self.wallet_info.name
 
@@ -469,6 +477,12 @@ class CATWallet:
         )
         if max_coin_amount is None:
             max_coin_amount = uint64(self.wallet_state_manager.constants.MAX_COIN_AMOUNT)
+        objective = self.wallet_state_manager.coin_selection_objective
+        max_num_coins = await max_num_coins_for_objective(
+            objective,
+            self.get_cost_of_single_tx,
+            self.wallet_state_manager.constants.MAX_BLOCK_COST_CLVM / 2,  # the same bound as the max send amount
+        )
         coins = await select_coins(
             spendable_amount,
             max_coin_amount,
@@ -479,6 +493,9 @@ class CATWallet:
             exclude,
             min_coin_amount,
             excluded_coin_amounts,
+            objective=objective,
+            time_budget=self.wallet_state_manager.coin_selection_time_budget,
+            max_num_coins=max_num_coins,
         )
         assert sum(c.amount for c in coins) >= amount
         return coins
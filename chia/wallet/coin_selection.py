@@ -2,13 +2,32 @@ from __future__ import annotations
 
 import logging
 import random
-from typing import Dict, List, Optional, Set
+import time
+from bisect import bisect_left
+from enum import Enum
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.ints import uint64, uint128
 from chia.wallet.wallet_coin_record import WalletCoinRecord
 
+# Upper bound on the number of coins spent by a single transaction, to keep its cost within a block.
+MAX_NUM_COINS = 500
+# Seconds the search based algorithms may spend on a single selection before settling for what they found.
+DEFAULT_TIME_BUDGET = 2.0
+# How often, in visited nodes, the exact match search checks the clock.
+EXACT_MATCH_CLOCK_INTERVAL = 1024
+
+
+class CoinSelectionObjective(Enum):
+    # The knapsack based selection.
+    DEFAULT = "default"
+    # Search for an exact match with as few coins as possible before falling back to the knapsack.
+    FEWEST_COINS = "fewest_coins"
+    # Spend the smallest coins first, which merges dust into the change coin.
+    CONSOLIDATE_DUST = "consolidate_dust"
+
 
 async def select_coins(
     spendable_amount: uint128,
@@ -20,16 +39,19 @@ async def select_coins(
     exclude: Optional[List[Coin]] = None,
     min_coin_amount: Optional[uint64] = None,
     excluded_coin_amounts: Optional[List[uint64]] = None,
+    objective: CoinSelectionObjective = CoinSelectionObjective.DEFAULT,
+    time_budget: float = DEFAULT_TIME_BUDGET,
+    max_num_coins: int = MAX_NUM_COINS,
 ) -> Set[Coin]:
     """
     Returns a set of coins that can be used for generating a new transaction.
+    Passing the spendable coins already sorted by descending amount saves the sort.
     """
-    if exclude is None:
-        exclude = []
+    deadline = time.monotonic() + time_budget
+    exclude_set: Set[Coin] = set() if exclude is None else set(exclude)
     if min_coin_amount is None:
         min_coin_amount = uint64(0)
-    if excluded_coin_amounts is None:
-        excluded_coin_amounts = []
+    excluded_amounts: Set[int] = set() if excluded_coin_amounts is None else set(excluded_coin_amounts)
 
     if amount > spendable_amount:
         error_msg = (
@@ -40,18 +62,18 @@ async def select_coins(
 
     log.debug(f"About to select coins for amount {amount}")
 
-    max_num_coins = 500
     sum_spendable_coins = 0
     valid_spendable_coins: List[Coin] = []
 
     for coin_record in spendable_coins:  # remove all the unconfirmed coins, excluded coins and dust.
-        if coin_record.coin.name() in unconfirmed_removals:
+        if coin_record.coin.amount < min_coin_amount or coin_record.coin.amount > max_coin_amount:
             continue
-        if coin_record.coin in exclude:
+        if coin_record.coin.amount in excluded_amounts:
             continue
-        if coin_record.coin.amount < min_coin_amount or coin_record.coin.amount > max_coin_amount:
+        if len(exclude_set) > 0 and coin_record.coin in exclude_set:
             continue
-        if coin_record.coin.amount in excluded_coin_amounts:
+        # hashing the coin is the expensive part of this loop, skip it when there is nothing to compare against
+        if len(unconfirmed_removals) > 0 and coin_record.coin.name() in unconfirmed_removals:
             continue
         valid_spendable_coins.append(coin_record.coin)
         sum_spendable_coins += coin_record.coin.amount
@@ -69,23 +91,22 @@ async def select_coins(
             " without already having coins."
         )
 
-    # Sort the coins by amount
+    # Sort the coins by amount, this is linear when they come in already sorted.
     valid_spendable_coins.sort(reverse=True, key=lambda r: r.amount)
+    # negated so the descending amounts can be bisected
+    negated_amounts: List[int] = [-coin.amount for coin in valid_spendable_coins]
 
     # check for exact 1 to 1 coin match.
-    exact_match_coin: Optional[Coin] = check_for_exact_match(valid_spendable_coins, uint64(amount))
-    if exact_match_coin:
+    first_not_larger = bisect_left(negated_amounts, -amount)
+    if first_not_larger < len(valid_spendable_coins) and valid_spendable_coins[first_not_larger].amount == amount:
+        exact_match_coin = valid_spendable_coins[first_not_larger]
         log.debug(f"selected coin with an exact match: {exact_match_coin}")
         return {exact_match_coin}
 
     # Check for an exact match with all of the coins smaller than the amount.
     # If we have more, smaller coins than the amount we run the next algorithm.
-    smaller_coin_sum = 0  # coins smaller than target.
-    smaller_coins: List[Coin] = []
-    for coin in valid_spendable_coins:
-        if coin.amount < amount:
-            smaller_coin_sum += coin.amount
-            smaller_coins.append(coin)
+    smaller_coins: List[Coin] = valid_spendable_coins[first_not_larger:]
+    smaller_coin_sum = sum(coin.amount for coin in smaller_coins)  # coins smaller than target.
     if smaller_coin_sum == amount and len(smaller_coins) < max_num_coins and amount != 0:
         log.debug(f"Selected all smaller coins because they equate to an exact match of the target.: {smaller_coins}")
         return set(smaller_coins)
@@ -95,7 +116,23 @@ async def select_coins(
         log.debug(f"Selected closest greater coin: {smallest_coin.name()}")
         return {smallest_coin}
     elif smaller_coin_sum > amount:
-        coin_set: Optional[Set[Coin]] = knapsack_coin_algorithm(smaller_coins, amount, max_coin_amount, max_num_coins)
+        coin_set: Optional[Set[Coin]] = None
+        if objective == CoinSelectionObjective.CONSOLIDATE_DUST:
+            coin_set = select_coins_consolidating_dust(amount, smaller_coins, max_num_coins)
+            if coin_set is not None:
+                log.debug(f"Selected {len(coin_set)} coins to consolidate dust")
+                return coin_set
+        elif objective == CoinSelectionObjective.FEWEST_COINS:
+            exact_coins: Optional[List[Coin]] = branch_and_bound_exact_match(
+                smaller_coins, amount, max_num_coins, deadline
+            )
+            if exact_coins is not None:
+                log.debug(f"Selected {len(exact_coins)} coins with an exact match of the target: {exact_coins}")
+                return set(exact_coins)
+        # the knapsack gets a short grace period even when the exact match search used up the budget
+        coin_set = knapsack_coin_algorithm(
+            smaller_coins, amount, max_coin_amount, max_num_coins, deadline=max(deadline, time.monotonic() + 0.1)
+        )
         log.debug(f"Selected coins from knapsack algorithm: {coin_set}")
         if coin_set is None:
             coin_set = sum_largest_coins(amount, smaller_coins)
@@ -141,14 +178,22 @@ def select_smallest_coin_over_target(target: uint128, sorted_coin_list: List[Coi
 
 # we use this to find the set of coins which have total value closest to the target, but at least the target.
 # IMPORTANT: The coins have to be sorted in descending order or else this function will not work.
+# The search stops early, returning the best set found so far, once the optional deadline (time.monotonic()) passes.
 def knapsack_coin_algorithm(
-    smaller_coins: List[Coin], target: uint128, max_coin_amount: int, max_num_coins: int, seed: bytes = b"knapsack seed"
+    smaller_coins: List[Coin],
+    target: uint128,
+    max_coin_amount: int,
+    max_num_coins: int,
+    seed: bytes = b"knapsack seed",
+    deadline: Optional[float] = None,
 ) -> Optional[Set[Coin]]:
     best_set_sum = max_coin_amount
     best_set_of_coins: Optional[Set[Coin]] = None
     ran: random.Random = random.Random()
     ran.seed(seed)
     for i in range(1000):
+        if deadline is not None and time.monotonic() > deadline:
+            break
         # reset these variables every loop.
         selected_coins: Set[Coin] = set()
         selected_coins_sum = 0
@@ -188,3 +233,124 @@ def sum_largest_coins(target: uint128, sorted_coins: List[Coin]) -> Optional[Set
         if total_value >= target:
             return selected_coins
     return None
+
+
+# The number of coins, up to MAX_NUM_COINS, whose spends fit in max_cost when each one costs about cost_per_coin.
+def max_num_coins_for_cost(cost_per_coin: int, max_cost: float) -> int:
+    return max(1, min(MAX_NUM_COINS, int(max_cost // max(1, cost_per_coin))))
+
+
+async def max_num_coins_for_objective(
+    objective: CoinSelectionObjective,
+    get_cost_per_coin: Callable[[], Awaitable[Optional[int]]],
+    max_cost: float,
+) -> int:
+    """
+    Returns the number of coins a selection with the objective may spend. Dust consolidation spends as many coins
+    as it may, so their cost is kept within max_cost, the cost per coin is only looked up for it.
+    """
+    if objective != CoinSelectionObjective.CONSOLIDATE_DUST:
+        return MAX_NUM_COINS
+    cost_per_coin = await get_cost_per_coin()
+    if cost_per_coin is None:
+        return MAX_NUM_COINS
+    return max_num_coins_for_cost(cost_per_coin, max_cost)
+
+
+# Searches for a set of at most max_num_coins coins that adds up to exactly the target, with as few coins as it
+# can find before the deadline (time.monotonic()). Coins of the same amount are interchangeable, so the search
+# branches on how many coins of each distinct amount to take rather than on individual coins, which keeps large
+# amounts of identical dust cheap to search. Coins must be sorted in descending amount order.
+def branch_and_bound_exact_match(
+    sorted_coins: List[Coin], target: uint128, max_num_coins: int, deadline: Optional[float] = None
+) -> Optional[List[Coin]]:
+    if target == 0:
+        return None
+    # the distinct amounts, with the index of their first coin in sorted_coins and the number of coins
+    amounts: List[int] = []
+    starts: List[int] = []
+    counts: List[int] = []
+    for i, coin in enumerate(sorted_coins):
+        if len(amounts) > 0 and amounts[-1] == coin.amount:
+            counts[-1] += 1
+        else:
+            amounts.append(coin.amount)
+            starts.append(i)
+            counts.append(1)
+    negated_amounts: List[int] = [-group_amount for group_amount in amounts]
+    # suffix_sums[i] is the value of all the coins of the amounts[i:]
+    suffix_sums: List[int] = [0] * (len(amounts) + 1)
+    for i in range(len(amounts) - 1, -1, -1):
+        suffix_sums[i] = suffix_sums[i + 1] + amounts[i] * counts[i]
+
+    best: Optional[List[Tuple[int, int]]] = None
+    max_coins = max_num_coins
+    # each frame is [group index, number of coins taken from it, remaining target before it, coins used before it]
+    stack: List[List[int]] = []
+    remaining, used, start = int(target), 0, 0
+    visited = 0
+    while True:
+        visited += 1
+        if visited % EXACT_MATCH_CLOCK_INTERVAL == 0 and deadline is not None and time.monotonic() > deadline:
+            break
+        descended = False
+        if remaining == 0:
+            best = [(frame[0], frame[1]) for frame in stack if frame[1] > 0]
+            max_coins = used - 1
+            # no set can use fewer coins than the largest amount needs
+            if used <= -(-int(target) // amounts[0]):
+                break
+        else:
+            # skip the amounts that are larger than what's left to reach
+            index = bisect_left(negated_amounts, -remaining, start)
+            coins_left = max_coins - used
+            if index < len(amounts) and suffix_sums[index] >= remaining and amounts[index] * coins_left >= remaining:
+                count = min(counts[index], remaining // amounts[index], coins_left)
+                stack.append([index, count, remaining, used])
+                remaining, used, start = remaining - count * amounts[index], used + count, index + 1
+                descended = True
+        if descended:
+            continue
+        # backtrack to the deepest group that can still take one coin fewer
+        while len(stack) > 0:
+            frame = stack[-1]
+            frame[1] = min(frame[1] - 1, max_coins - frame[3])
+            if frame[1] < 0:
+                stack.pop()
+                continue
+            index, count, remaining, used = frame
+            remaining, used, start = remaining - count * amounts[index], used + count, index + 1
+            break
+        else:
+            break
+    if best is None:
+        return None
+    return [coin for index, count in best for coin in sorted_coins[starts[index] : starts[index] + count]]
+
+
+# Spends as many of the smallest coins as fit next to the fewest largest coins that are needed to reach the
+# target, so that the dust gets merged into the change coin. The callers bound max_num_coins by the cost of
+# the spends. Coins must be sorted in descending amount order.
+def select_coins_consolidating_dust(
+    target: uint128, sorted_coins: List[Coin], max_num_coins: int
+) -> Optional[Set[Coin]]:
+    largest_coins = sum_largest_coins(target, sorted_coins)
+    if largest_coins is None or len(largest_coins) > max_num_coins:
+        return None
+    num_dust = min(max_num_coins - len(largest_coins), len(sorted_coins) - len(largest_coins))
+    selected_coins: Set[Coin] = set()
+    total_value = 0
+    for coin in reversed(sorted_coins[len(sorted_coins) - num_dust :]):
+        selected_coins.add(coin)
+        total_value += coin.amount
+        if total_value >= target:
+            return selected_coins
+    # top up the dust with the coins that weren't considered dust
+    others = sorted_coins[: len(sorted_coins) - num_dust]
+    top_up = select_smallest_coin_over_target(uint128(target - total_value), others)
+    if top_up is not None:
+        selected_coins.add(top_up)
+        return selected_coins
+    largest_others = sum_largest_coins(uint128(target - total_value), others)
+    assert largest_others is not None
+    return selected_coins | largest_others
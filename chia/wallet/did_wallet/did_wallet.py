@@ -22,7 +22,7 @@ from chia.types.coin_spend import CoinSpend
 from chia.types.spend_bundle import SpendBundle
 from chia.util.condition_tools import conditions_dict_for_solution, pkm_pairs_for_conditions_dict
 from chia.util.ints import uint8, uint32, uint64, uint128
-from chia.wallet.coin_selection import select_coins
+from chia.wallet.coin_selection import max_num_coins_for_objective, select_coins
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.derive_keys import master_sk_to_wallet_sk_unhardened
 from chia.wallet.did_wallet import did_wallet_puzzles
@@ -340,6 +340,13 @@ class DIDWallet:
         )
         if max_coin_amount is None:
             max_coin_amount = uint64(self.wallet_state_manager.constants.MAX_COIN_AMOUNT)
+        objective = self.wallet_state_manager.coin_selection_objective
+        # the cost of a DID spend is approximated by that of a standard coin spend
+        max_num_coins = await max_num_coins_for_objective(
+            objective,
+            self.standard_wallet.get_cost_of_single_tx,
+            self.wallet_state_manager.constants.MAX_BLOCK_COST_CLVM / 5,
+        )
         coins = await select_coins(
             spendable_amount,
             max_coin_amount,
@@ -350,6 +357,9 @@ class DIDWallet:
             exclude,
             min_coin_amount,
             excluded_coin_amounts,
+            objective=objective,
+            time_budget=self.wallet_state_manager.coin_selection_time_budget,
+            max_num_coins=max_num_coins,
         )
         assert sum(c.amount for c in coins) >= amount
         return coins
@@ -109,3 +109,30 @@ class TransactionRecord(Streamable):
             if memo is not None
         }
         return formatted
+
+
+@streamable
+@dataclass(frozen=True)
+class TransactionSummary(Streamable):
+    """
+    The fields of a TransactionRecord that have their own columns in the DB, read without unpacking the record.
+    """
+
+    confirmed_at_height: uint32
+    created_at_time: uint64
+    to_puzzle_hash: bytes32
+    amount: uint64
+    fee_amount: uint64
+    confirmed: bool
+    sent: uint32
+    wallet_id: uint32
+    trade_id: Optional[bytes32]
+    type: uint32  # TransactionType
+    name: bytes32
+
+    def to_json_dict_convenience(self, config: Dict) -> Dict:
+        selected = config["selected_network"]
+        prefix = config["network_overrides"]["config"][selected]["address_prefix"]
+        formatted = self.to_json_dict()
+        formatted["to_address"] = encode_puzzle_hash(self.to_puzzle_hash, prefix)
+        return formatted
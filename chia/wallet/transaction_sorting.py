@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+from typing import List, Tuple
 
 
 class SortKey(enum.Enum):
@@ -12,3 +13,9 @@ class SortKey(enum.Enum):
 
     def descending(self) -> str:
         return self.value.format(ASC="DESC", DESC="ASC")
+
+    def columns(self, reverse: bool = False) -> List[Tuple[str, bool]]:
+        """The sorted columns in order, each with whether it is sorted in descending order."""
+        order = self.descending() if reverse else self.ascending()
+        columns = [part.split(" ") for part in order[len("ORDER BY ") :].split(", ")]
+        return [(column, direction == "DESC") for column, direction in columns]
@@ -9,6 +9,7 @@ from chia.types.header_block import HeaderBlock
 from chia.util.hash import std_hash
 from chia.util.ints import uint32, uint64
 from chia.util.lru_cache import LRUCache
+from chia.wallet.wallet_validation_cache_store import WalletValidationCacheStore
 
 
 class PeerRequestCache:
@@ -19,8 +20,11 @@ class PeerRequestCache:
     _blocks_validated: LRUCache[bytes32, uint32]  # header_hash -> height
     _block_signatures_validated: LRUCache[bytes32, uint32]  # sig_hash -> height
     _additions_in_block: LRUCache[Tuple[bytes32, bytes32], uint32]  # header_hash, puzzle_hash -> height
+    # validation results shared with the other peers and persisted across restarts
+    _validation_cache: Optional[WalletValidationCacheStore]
 
-    def __init__(self) -> None:
+    def __init__(self, validation_cache: Optional[WalletValidationCacheStore] = None) -> None:
+        self._validation_cache = validation_cache
         self._blocks = LRUCache(100)
         self._block_requests = LRUCache(300)
         self._states_validated = LRUCache(1000)
@@ -61,13 +65,19 @@ class PeerRequestCache:
 
     def add_to_blocks_validated(self, reward_chain_hash: bytes32, height: uint32) -> None:
         self._blocks_validated.put(reward_chain_hash, height)
+        if self._validation_cache is not None:
+            self._validation_cache.add_to_blocks_validated(reward_chain_hash, height)
 
     def in_blocks_validated(self, reward_chain_hash: bytes32) -> bool:
-        return self._blocks_validated.get(reward_chain_hash) is not None
+        if self._blocks_validated.get(reward_chain_hash) is not None:
+            return True
+        return self._validation_cache is not None and self._validation_cache.in_blocks_validated(reward_chain_hash)
 
     def add_to_block_signatures_validated(self, block: HeaderBlock) -> None:
         sig_hash: bytes32 = self._calculate_sig_hash_from_block(block)
         self._block_signatures_validated.put(sig_hash, block.height)
+        if self._validation_cache is not None:
+            self._validation_cache.add_to_block_signatures_validated(sig_hash, block.height)
 
     @staticmethod
     def _calculate_sig_hash_from_block(block: HeaderBlock) -> bytes32:
@@ -79,15 +89,25 @@ class PeerRequestCache:
 
     def in_block_signatures_validated(self, block: HeaderBlock) -> bool:
         sig_hash: bytes32 = self._calculate_sig_hash_from_block(block)
-        return self._block_signatures_validated.get(sig_hash) is not None
+        if self._block_signatures_validated.get(sig_hash) is not None:
+            return True
+        return self._validation_cache is not None and self._validation_cache.in_block_signatures_validated(sig_hash)
 
     def add_to_additions_in_block(self, header_hash: bytes32, addition_ph: bytes32, height: uint32) -> None:
         self._additions_in_block.put((header_hash, addition_ph), height)
+        if self._validation_cache is not None:
+            self._validation_cache.add_to_additions_in_block(header_hash, addition_ph, height)
 
     def in_additions_in_block(self, header_hash: bytes32, addition_ph: bytes32) -> bool:
-        return self._additions_in_block.get((header_hash, addition_ph)) is not None
+        if self._additions_in_block.get((header_hash, addition_ph)) is not None:
+            return True
+        return self._validation_cache is not None and self._validation_cache.in_additions_in_block(
+            header_hash, addition_ph
+        )
 
     def clear_after_height(self, height: int) -> None:
+        # The shared validation results are only cleared on a rollback of the wallet's own chain, see
+        # WalletNode.perform_atomic_rollback, a single peer must not be able to drop them for everyone.
         # Remove any cached item which relates to an event that happened at a height above height.
         new_blocks = LRUCache[uint32, HeaderBlock](self._blocks.capacity)
         for k, v in self._blocks.cache.items():
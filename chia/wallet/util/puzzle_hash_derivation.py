@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from concurrent.futures.process import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.context import BaseContext
+from typing import AsyncIterator, List, Optional, Tuple
+
+from blspy import AugSchemeMPL, G1Element, PrivateKey
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.setproctitle import getproctitle, setproctitle
+from chia.wallet.derive_keys import master_sk_to_wallet_sk_intermediate, master_sk_to_wallet_sk_unhardened_intermediate
+from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import puzzle_hash_for_pk
+
+# Below this many indexes the derivation is done on the event loop, a round trip to
+# the worker processes isn't worth it.
+MIN_INDEXES_FOR_PROCESS_POOL = 500
+INDEXES_PER_BATCH = 250
+# Smaller batches on the event loop so each one only blocks it briefly.
+INDEXES_PER_INLINE_BATCH = 10
+
+
+@dataclass(frozen=True)
+class DerivedKeys:
+    index: int
+    pubkey: G1Element
+    puzzle_hash: bytes32
+    pubkey_unhardened: G1Element
+    puzzle_hash_unhardened: bytes32
+
+
+def _derive_keys_batch(
+    intermediate_sk_bytes: bytes, intermediate_pk_unhardened_bytes: bytes, start: int, end: int
+) -> List[Tuple[int, bytes, bytes32, bytes, bytes32]]:
+    # Runs in the worker processes, so it takes and returns plain bytes.
+    intermediate_sk = PrivateKey.from_bytes(intermediate_sk_bytes)
+    intermediate_pk_unhardened = G1Element.from_bytes(intermediate_pk_unhardened_bytes)
+    results: List[Tuple[int, bytes, bytes32, bytes, bytes32]] = []
+    for index in range(start, end):
+        pubkey = AugSchemeMPL.derive_child_sk(intermediate_sk, index).get_g1()
+        # Unhardened children can be derived from the public key alone, which skips a scalar multiplication.
+        pubkey_unhardened = AugSchemeMPL.derive_child_pk_unhardened(intermediate_pk_unhardened, index)
+        results.append(
+            (
+                index,
+                bytes(pubkey),
+                puzzle_hash_for_pk(pubkey),
+                bytes(pubkey_unhardened),
+                puzzle_hash_for_pk(pubkey_unhardened),
+            )
+        )
+    return results
+
+
+def _to_derived_keys(batch: List[Tuple[int, bytes, bytes32, bytes, bytes32]]) -> List[DerivedKeys]:
+    return [
+        DerivedKeys(index, G1Element.from_bytes(pubkey), puzzle_hash, G1Element.from_bytes(pubkey_un), puzzle_hash_un)
+        for index, pubkey, puzzle_hash, pubkey_un, puzzle_hash_un in batch
+    ]
+
+
+class PuzzleHashDerivationEngine:
+    """
+    Derives the hardened and unhardened wallet public keys, together with their standard
+    puzzle hashes, for ranges of derivation indexes. Large ranges are split in batches
+    that are computed in a process pool and yielded in index order as they complete.
+    """
+
+    def __init__(self, multiprocessing_context: BaseContext, num_processes: Optional[int] = None):
+        self._multiprocessing_context = multiprocessing_context
+        self._num_processes = num_processes if num_processes is not None else min(4, os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily, most wallets only ever derive a few keys at a time.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                self._num_processes,
+                mp_context=self._multiprocessing_context,
+                initializer=setproctitle,
+                initargs=(f"{getproctitle()}_derivation_worker",),
+            )
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def derive(self, master_sk: PrivateKey, start: int, end: int) -> AsyncIterator[List[DerivedKeys]]:
+        if start >= end:
+            return
+        intermediate_sk_bytes = bytes(master_sk_to_wallet_sk_intermediate(master_sk))
+        intermediate_pk_unhardened_bytes = bytes(master_sk_to_wallet_sk_unhardened_intermediate(master_sk).get_g1())
+
+        if end - start < MIN_INDEXES_FOR_PROCESS_POOL or self._num_processes < 2:
+            for batch_start in range(start, end, INDEXES_PER_INLINE_BATCH):
+                batch_end = min(batch_start + INDEXES_PER_INLINE_BATCH, end)
+                yield _to_derived_keys(
+                    _derive_keys_batch(intermediate_sk_bytes, intermediate_pk_unhardened_bytes, batch_start, batch_end)
+                )
+                # allow a context switch between batches so the networking layer stays responsive
+                await asyncio.sleep(0)
+            return
+
+        ranges = [(i, min(i + INDEXES_PER_BATCH, end)) for i in range(start, end, INDEXES_PER_BATCH)]
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        # Keep a bounded window of batches in flight so memory stays flat for very large ranges.
+        window = self._num_processes * 2
+        futures: List[asyncio.Future[List[Tuple[int, bytes, bytes32, bytes, bytes32]]]] = []
+        next_range = 0
+        try:
+            while next_range < len(ranges) or len(futures) > 0:
+                while next_range < len(ranges) and len(futures) < window:
+                    batch_start, batch_end = ranges[next_range]
+                    futures.append(
+                        loop.run_in_executor(
+                            executor,
+                            _derive_keys_batch,
+                            intermediate_sk_bytes,
+                            intermediate_pk_unhardened_bytes,
+                            batch_start,
+                            batch_end,
+                        )
+                    )
+                    next_range += 1
+                yield _to_derived_keys(await futures.pop(0))
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.ints import uint32
+from chia.wallet.util.wallet_types import WalletType
+
+DEFAULT_MAX_ENTRIES = 200000
+# ~1% false positives at capacity
+BLOOM_BITS_PER_ENTRY = 10
+BLOOM_NUM_HASHES = 7
+
+
+@dataclass(frozen=True)
+class PuzzleHashInfo:
+    derivation_index: uint32
+    wallet_id: uint32
+    wallet_type: WalletType
+    hardened: bool
+
+
+class PuzzleHashIndex:
+    """
+    In-memory lookup of the derived puzzle hashes of the wallet. Up to max_entries puzzle hashes are mapped
+    to slots of compact arrays holding their derivation index, wallet id, wallet type and hardened flag, and
+    the lookups are exact. Beyond that the map is dropped for a bloom filter, which only rules out the puzzle
+    hashes that are not ours, the others have to be looked up in the DB.
+    Puzzle hashes are sha256 outputs, so the bloom filter uses slices of them as its hash functions.
+    Puzzle hashes written by a transaction which may still be rolled back are pending, they are looked up in
+    the DB until they are added for good once the transaction is over.
+    """
+
+    max_entries: int
+    _slots: Dict[bytes32, int]
+    _derivation_indexes: array[int]
+    _wallet_ids: array[int]
+    _wallet_types: bytearray
+    _hardened: bytearray
+    # puzzle hashes derived for more than one wallet, the DB decides which record is returned for them
+    _ambiguous: Set[bytes32]
+    _bloom: Optional[bytearray]
+    _bloom_bits: int
+    _bloom_capacity: int
+    _bloom_entries: int
+    _pending: Set[bytes32]
+    # bumped by every add_pending, so that the DB lookup of the pending puzzle hashes can tell if it's outdated
+    pending_generation: int
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        self._pending = set()
+        self.pending_generation = 0
+        self.reset(0)
+
+    @property
+    def complete(self) -> bool:
+        """True while every puzzle hash is in the map and lookups don't need the DB."""
+        return self._bloom is None
+
+    def __len__(self) -> int:
+        return self._bloom_entries if self._bloom is not None else len(self._slots)
+
+    def reset(self, num_entries: int) -> None:
+        """Empties the index, ready to be loaded with num_entries puzzle hashes. The pending ones are kept."""
+        self._slots = {}
+        self._derivation_indexes = array("I")
+        self._wallet_ids = array("I")
+        self._wallet_types = bytearray()
+        self._hardened = bytearray()
+        self._ambiguous = set()
+        self._bloom = None
+        self._bloom_bits = 0
+        self._bloom_capacity = 0
+        self._bloom_entries = 0
+        if num_entries > self.max_entries:
+            self._new_bloom(2 * num_entries)
+
+    def needs_reload(self) -> bool:
+        """True once the bloom filter holds more entries than it was sized for and has to be rebuilt."""
+        return self._bloom is not None and self._bloom_entries > self._bloom_capacity
+
+    def add(
+        self, puzzle_hash: bytes32, derivation_index: int, wallet_id: int, wallet_type: int, hardened: bool
+    ) -> None:
+        if self._bloom is not None:
+            self._bloom_add(puzzle_hash)
+            return
+        slot = self._slots.get(puzzle_hash)
+        if slot is not None:
+            if self._wallet_ids[slot] != wallet_id:
+                self._ambiguous.add(puzzle_hash)
+            else:
+                self._derivation_indexes[slot] = derivation_index
+                self._wallet_types[slot] = wallet_type
+                self._hardened[slot] = hardened
+            return
+        if len(self._slots) >= self.max_entries:
+            self._switch_to_bloom()
+            self._bloom_add(puzzle_hash)
+            return
+        self._slots[puzzle_hash] = len(self._derivation_indexes)
+        self._derivation_indexes.append(derivation_index)
+        self._wallet_ids.append(wallet_id)
+        self._wallet_types.append(wallet_type)
+        self._hardened.append(hardened)
+
+    def add_pending(self, puzzle_hash: bytes32) -> None:
+        self._pending.add(puzzle_hash)
+        self.pending_generation += 1
+
+    def get_pending(self) -> List[bytes32]:
+        return list(self._pending)
+
+    def is_pending(self, puzzle_hash: bytes32) -> bool:
+        return puzzle_hash in self._pending
+
+    def remove_pending(self, puzzle_hashes: List[bytes32]) -> None:
+        self._pending.difference_update(puzzle_hashes)
+
+    def take_pending_from(self, other: PuzzleHashIndex) -> None:
+        """Takes over the pending puzzle hashes of the index this one replaces."""
+        self._pending = other._pending
+        self.pending_generation = other.pending_generation
+
+    def may_contain(self, puzzle_hash: bytes32) -> bool:
+        """
+        False if the puzzle hash is certainly not ours. True means it is, unless the index is not complete or
+        the puzzle hash is pending.
+        """
+        if puzzle_hash in self._pending:
+            return True
+        if self._bloom is None:
+            return puzzle_hash in self._slots
+        bloom = self._bloom
+        for position in self._bloom_positions(puzzle_hash):
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def get(self, puzzle_hash: bytes32) -> Optional[PuzzleHashInfo]:
+        """
+        Returns what is known about the puzzle hash. None means that it has to be looked up in the DB,
+        if it's not ruled out by may_contain.
+        """
+        slot = self._slots.get(puzzle_hash)
+        if slot is None or puzzle_hash in self._ambiguous or puzzle_hash in self._pending:
+            return None
+        return PuzzleHashInfo(
+            uint32(self._derivation_indexes[slot]),
+            uint32(self._wallet_ids[slot]),
+            WalletType(self._wallet_types[slot]),
+            bool(self._hardened[slot]),
+        )
+
+    def _new_bloom(self, capacity: int) -> None:
+        self._bloom_capacity = capacity
+        self._bloom_bits = max(8, capacity * BLOOM_BITS_PER_ENTRY)
+        self._bloom = bytearray((self._bloom_bits + 7) // 8)
+        self._bloom_entries = 0
+
+    def _switch_to_bloom(self) -> None:
+        puzzle_hashes = list(self._slots)
+        self._slots = {}
+        self._derivation_indexes = array("I")
+        self._wallet_ids = array("I")
+        self._wallet_types = bytearray()
+        self._hardened = bytearray()
+        self._ambiguous = set()
+        self._new_bloom(2 * len(puzzle_hashes))
+        for puzzle_hash in puzzle_hashes:
+            self._bloom_add(puzzle_hash)
+
+    def _bloom_positions(self, puzzle_hash: bytes32) -> List[int]:
+        return [
+            int.from_bytes(puzzle_hash[4 * i : 4 * i + 4], "little") % self._bloom_bits for i in range(BLOOM_NUM_HASHES)
+        ]
+
+    def _bloom_add(self, puzzle_hash: bytes32) -> None:
+        assert self._bloom is not None
+        for position in self._bloom_positions(puzzle_hash):
+            self._bloom[position >> 3] |= 1 << (position & 7)
+        self._bloom_entries += 1
@@ -3,7 +3,8 @@ from __future__ import annotations
 import asyncio
 import logging
 import random
-from typing import Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from chia_rs import compute_merkle_set_root
 
@@ -209,9 +210,10 @@ def validate_removals(
 
 
 async def request_and_validate_removals(
-    peer: WSChiaConnection, height: uint32, header_hash: bytes32, coin_name: bytes32, removals_root: bytes32
+    peer: WSChiaConnection, height: uint32, header_hash: bytes32, coin_names: List[bytes32], removals_root: bytes32
 ) -> bool:
-    removals_request = RequestRemovals(height, header_hash, [coin_name])
+    # All the removals of a block are requested at once, the proofs are checked against the root in a single pass.
+    removals_request = RequestRemovals(height, header_hash, coin_names)
 
     removals_res: Optional[Union[RespondRemovals, RejectRemovalsRequest]] = await peer.call_api(
         FullNodeAPI.request_removals, removals_request
@@ -227,12 +229,14 @@ async def request_and_validate_additions(
     peer_request_cache: PeerRequestCache,
     height: uint32,
     header_hash: bytes32,
-    puzzle_hash: bytes32,
+    puzzle_hashes: List[bytes32],
     additions_root: bytes32,
 ) -> bool:
-    if peer_request_cache.in_additions_in_block(header_hash, puzzle_hash):
+    # Only the puzzle hashes that weren't already proven for this block are requested, all in one request.
+    puzzle_hashes = [ph for ph in puzzle_hashes if not peer_request_cache.in_additions_in_block(header_hash, ph)]
+    if len(puzzle_hashes) == 0:
         return True
-    additions_request = RequestAdditions(height, header_hash, [puzzle_hash])
+    additions_request = RequestAdditions(height, header_hash, puzzle_hashes)
     additions_res: Optional[Union[RespondAdditions, RejectAdditionsRequest]] = await peer.call_api(
         FullNodeAPI.request_additions, additions_request
     )
@@ -243,7 +247,9 @@ async def request_and_validate_additions(
         additions_res.proofs,
         additions_root,
     )
-    peer_request_cache.add_to_additions_in_block(header_hash, puzzle_hash, height)
+    if result:
+        for puzzle_hash in puzzle_hashes:
+            peer_request_cache.add_to_additions_in_block(header_hash, puzzle_hash, height)
     return result
 
 
@@ -314,6 +320,62 @@ def last_change_height_cs(cs: CoinState) -> uint32:
     return uint32(0)
 
 
+def chunk_coin_states_by_height(coin_states: List[CoinState], chunk_size: int) -> Iterator[List[CoinState]]:
+    """
+    Splits coin states, sorted by last change height, in chunks of about chunk_size states without spreading
+    the states of a height over several chunks, so that each block only has to be fetched and proven once.
+    """
+    chunk: List[CoinState] = []
+    for coin_state in coin_states:
+        if len(chunk) >= chunk_size and last_change_height_cs(chunk[-1]) != last_change_height_cs(coin_state):
+            yield chunk
+            chunk = []
+        chunk.append(coin_state)
+    if len(chunk) > 0:
+        yield chunk
+
+
+class SubscriptionQueue:
+    """
+    Puzzle hashes or coin ids waiting to be subscribed to. Each one is only queued once, however many times
+    it is pushed.
+    """
+
+    _seen: Set[bytes32]
+    _pending: List[bytes32]
+
+    def __init__(self) -> None:
+        self._seen = set()
+        self._pending = []
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def num_seen(self) -> int:
+        return len(self._seen)
+
+    def push(self, items: Iterable[bytes32]) -> None:
+        for item in items:
+            if item not in self._seen:
+                self._seen.add(item)
+                self._pending.append(item)
+
+    def pop(self, max_items: int) -> List[bytes32]:
+        # from the end, the order doesn't matter and it keeps popping cheap
+        items = self._pending[-max_items:]
+        del self._pending[-max_items:]
+        return items
+
+
+@dataclass
+class LongSyncSubscriptions:
+    """The puzzle hashes and coin ids a long sync still has to subscribe to."""
+
+    puzzle_hashes: SubscriptionQueue = field(default_factory=SubscriptionQueue)
+    coin_ids: SubscriptionQueue = field(default_factory=SubscriptionQueue)
+
+
 def get_block_header(block):
     return HeaderBlock(
         block.finished_sub_slots,
@@ -18,7 +18,7 @@ from chia.types.generator_types import BlockGenerator
 from chia.types.spend_bundle import SpendBundle
 from chia.util.hash import std_hash
 from chia.util.ints import uint8, uint32, uint64, uint128
-from chia.wallet.coin_selection import select_coins
+from chia.wallet.coin_selection import max_num_coins_for_objective, select_coins
 from chia.wallet.derivation_record import DerivationRecord
 from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import (
     DEFAULT_HIDDEN_PUZZLE_HASH,
@@ -108,6 +108,14 @@ class Wallet:
 
         return uint128(total_amount)
 
+    async def get_cost_of_single_tx(self) -> Optional[int]:
+        """
+        Returns the cost of spending one coin of the wallet, None while the wallet has no spendable coin.
+        """
+        if self.cost_of_single_tx is None:
+            await self.get_max_send_amount()
+        return self.cost_of_single_tx
+
     @classmethod
     def type(cls) -> uint8:
         return uint8(WalletType.STANDARD_WALLET)
@@ -132,6 +140,9 @@ class Wallet:
             self.id()
         )
         addition_amount = 0
+        our_puzzle_hashes: Set[bytes32] = await self.wallet_state_manager.get_wallet_puzzle_hashes(
+            (coin for record in unconfirmed_tx for coin in record.additions + record.removals), self.id()
+        )
 
         for record in unconfirmed_tx:
             if not record.is_in_mempool():
@@ -140,7 +151,7 @@ class Wallet:
                 continue
             our_spend = False
             for coin in record.removals:
-                if await self.wallet_state_manager.does_coin_belong_to_wallet(coin, self.id()):
+                if coin.puzzle_hash in our_puzzle_hashes:
                     our_spend = True
                     break
 
@@ -148,7 +159,7 @@ class Wallet:
                 continue
 
             for coin in record.additions:
-                if await self.wallet_state_manager.does_coin_belong_to_wallet(coin, self.id()):
+                if coin.puzzle_hash in our_puzzle_hashes:
                     addition_amount += coin.amount
 
         return uint64(addition_amount)
@@ -275,8 +286,8 @@ class Wallet:
         Note: Must be called under wallet state manager lock
         """
         spendable_amount: uint128 = await self.get_spendable_balance()
-        spendable_coins: List[WalletCoinRecord] = list(
-            await self.wallet_state_manager.get_spendable_coins_for_wallet(self.id())
+        spendable_coins: List[WalletCoinRecord] = await self.wallet_state_manager.get_spendable_coins_by_amount(
+            self.id()
         )
 
         # Try to use coins from the store, if there isn't enough of "unused"
@@ -286,6 +297,12 @@ class Wallet:
         )
         if max_coin_amount is None:
             max_coin_amount = uint64(self.wallet_state_manager.constants.MAX_COIN_AMOUNT)
+        objective = self.wallet_state_manager.coin_selection_objective
+        max_num_coins = await max_num_coins_for_objective(
+            objective,
+            self.get_cost_of_single_tx,
+            self.wallet_state_manager.constants.MAX_BLOCK_COST_CLVM / 5,  # the same bound as the max send amount
+        )
         coins = await select_coins(
             spendable_amount,
             max_coin_amount,
@@ -296,6 +313,9 @@ class Wallet:
             exclude,
             min_coin_amount,
             excluded_coin_amounts,
+            objective=objective,
+            time_budget=self.wallet_state_manager.coin_selection_time_budget,
+            max_num_coins=max_num_coins,
         )
         assert sum(c.amount for c in coins) >= amount
         return coins
@@ -1,22 +1,90 @@
 from __future__ import annotations
 
+import asyncio
 import sqlite3
-from typing import Dict, List, Optional, Set
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import aiosqlite
+from sortedcontainers import SortedDict
 
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.sized_bytes import bytes32
-from chia.util.db_wrapper import DBWrapper2, execute_fetchone
-from chia.util.ints import uint32, uint64
+from chia.util.chunks import chunks
+from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2, execute_fetchone
+from chia.util.ints import uint32, uint64, uint128
 from chia.wallet.util.wallet_types import WalletType
 from chia.wallet.wallet_coin_record import WalletCoinRecord
 
 
+class UnspentCoinIndex:
+    """
+    The unspent coin records of one wallet, sorted by amount, together with their total amount.
+    """
+
+    # (amount, coin name) -> record
+    records_by_amount: SortedDict
+    amounts: Dict[bytes32, uint64]
+    balance: int
+
+    def __init__(self, records: Iterable[Tuple[bytes32, WalletCoinRecord]] = ()) -> None:
+        self.records_by_amount = SortedDict()
+        self.amounts = {}
+        self.balance = 0
+        for name, record in records:
+            self.add(name, record)
+
+    def __contains__(self, coin_name: bytes32) -> bool:
+        return coin_name in self.amounts
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def add(self, coin_name: bytes32, record: WalletCoinRecord) -> None:
+        self.remove(coin_name)
+        amount = uint64(record.coin.amount)
+        self.records_by_amount[(amount, coin_name)] = record
+        self.amounts[coin_name] = amount
+        self.balance += amount
+
+    def remove(self, coin_name: bytes32) -> None:
+        amount = self.amounts.pop(coin_name, None)
+        if amount is not None:
+            del self.records_by_amount[(amount, coin_name)]
+            self.balance -= amount
+
+    def get_amount(self, coin_name: bytes32) -> Optional[uint64]:
+        return self.amounts.get(coin_name)
+
+    def get_records(self) -> Set[WalletCoinRecord]:
+        return set(self.records_by_amount.values())
+
+    def get_records_by_amount(self, descending: bool = True) -> List[WalletCoinRecord]:
+        records: List[WalletCoinRecord] = list(self.records_by_amount.values())
+        if descending:
+            records.reverse()
+        return records
+
+
 class WalletCoinStore:
     """
     This object handles CoinRecords in DB used by wallet.
+
+    The unspent coins of each wallet are also indexed in memory, the index is loaded on first use.
+    Changes mark the coins as dirty, and the dirty coins are read back from the DB by a reader once no write
+    transaction is open, so the index never holds changes that are later rolled back.
     """
 
     db_wrapper: DBWrapper2
+    unspent_indexes: Dict[int, UnspentCoinIndex]
+    # the wallet whose index holds each indexed coin
+    indexed_coins: Dict[bytes32, int]
+    dirty_coins: Set[bytes32]
+    # serializes the reads of the dirty coins back into the indexes
+    refresh_lock: asyncio.Lock
+    # counts the reorgs which dropped the indexes
+    invalidations: int
+    # set by a reorg, the indexes are not loaded again until its write transaction is over
+    reload_pending: bool
 
     @classmethod
     async def create(cls, wrapper: DBWrapper2):
@@ -54,8 +122,81 @@ class WalletCoinStore:
 
             await conn.execute("CREATE INDEX IF NOT EXISTS coin_amount on coin_record(amount)")
 
+        self.unspent_indexes = {}
+        self.indexed_coins = {}
+        self.dirty_coins = set()
+        self.refresh_lock = asyncio.Lock()
+        self.invalidations = 0
+        self.reload_pending = False
         return self
 
+    async def get_unspent_index(self, wallet_id: int) -> Optional[UnspentCoinIndex]:
+        """
+        Returns the up to date index of the unspent coins of the wallet. Returns None while dirty coins may still
+        be part of an open write transaction, as those changes may still be rolled back.
+        """
+        if self.db_wrapper.current_task_is_writer():
+            return None
+        index = self.unspent_indexes.get(wallet_id)
+        if index is not None and len(self.dirty_coins) == 0 and not self.refresh_lock.locked():
+            return index
+
+        async with self.refresh_lock:
+            index = self.unspent_indexes.get(wallet_id)
+            if index is not None and len(self.dirty_coins) == 0:
+                return index
+            if (self.reload_pending or len(self.dirty_coins) > 0) and self.db_wrapper.writer_is_active():
+                return None
+            # No write transaction is open, so every change of the dirty coins, and of a reorg, is either committed
+            # or rolled back.
+            self.reload_pending = False
+            dirty_coins = list(self.dirty_coins)
+            self.dirty_coins.clear()
+            invalidations = self.invalidations
+
+            records: Dict[bytes32, WalletCoinRecord] = {}
+            rows: List[sqlite3.Row] = []
+            async with self.db_wrapper.reader() as conn:
+                for batch in chunks(dirty_coins, SQLITE_MAX_VARIABLE_NUMBER):
+                    batch_rows = await conn.execute_fetchall(
+                        f"SELECT * FROM coin_record WHERE coin_name IN ({','.join('?' * len(batch))})",
+                        [coin_name.hex() for coin_name in batch],
+                    )
+                    for row in batch_rows:
+                        records[bytes32.fromhex(row[0])] = self.coin_record_from_row(row)
+                if index is None:
+                    rows = list(
+                        await conn.execute_fetchall(
+                            "SELECT * FROM coin_record WHERE wallet_id=? AND spent_height=0", (wallet_id,)
+                        )
+                    )
+
+            if invalidations != self.invalidations:
+                # a reorg dropped the indexes while reading
+                return None
+            for coin_name in dirty_coins:
+                indexed_wallet_id = self.indexed_coins.pop(coin_name, None)
+                if indexed_wallet_id is not None:
+                    self.unspent_indexes[indexed_wallet_id].remove(coin_name)
+                record = records.get(coin_name)
+                if record is None or record.spent or record.wallet_id not in self.unspent_indexes:
+                    continue
+                self.unspent_indexes[record.wallet_id].add(coin_name, record)
+                self.indexed_coins[coin_name] = record.wallet_id
+            if index is None:
+                index = UnspentCoinIndex((bytes32.fromhex(row[0]), self.coin_record_from_row(row)) for row in rows)
+                self.unspent_indexes[wallet_id] = index
+                for coin_name in index.amounts:
+                    self.indexed_coins[coin_name] = wallet_id
+        return index
+
+    def _invalidate_unspent_indexes(self) -> None:
+        self.unspent_indexes.clear()
+        self.indexed_coins.clear()
+        self.dirty_coins.clear()
+        self.invalidations += 1
+        self.reload_pending = True
+
     async def count_small_unspent(self, cutoff: int) -> int:
         amount_bytes = bytes(uint64(cutoff))
         async with self.db_wrapper.reader_no_transaction() as conn:
@@ -83,6 +224,7 @@ class WalletCoinStore:
             name = record.name()
         assert record.spent == (record.spent_block_height != 0)
         async with self.db_wrapper.writer_maybe_transaction() as conn:
+            self.dirty_coins.add(name)
             await conn.execute_insert(
                 "INSERT OR REPLACE INTO coin_record VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (
@@ -102,12 +244,14 @@ class WalletCoinStore:
     # Sometimes we realize that a coin is actually not interesting to us so we need to delete it
     async def delete_coin_record(self, coin_name: bytes32) -> None:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
+            self.dirty_coins.add(coin_name)
             await (await conn.execute("DELETE FROM coin_record WHERE coin_name=?", (coin_name.hex(),))).close()
 
     # Update coin_record to be spent in DB
     async def set_spent(self, coin_name: bytes32, height: uint32) -> None:
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
+            self.dirty_coins.add(coin_name)
             await conn.execute_insert(
                 "UPDATE coin_record SET spent_height=?,spent=? WHERE coin_name=?",
                 (
@@ -170,12 +314,31 @@ class WalletCoinStore:
 
     async def get_unspent_coins_for_wallet(self, wallet_id: int) -> Set[WalletCoinRecord]:
         """Returns set of CoinRecords that have not been spent yet for a wallet."""
+        index = await self.get_unspent_index(wallet_id)
+        if index is not None:
+            return index.get_records()
         async with self.db_wrapper.reader_no_transaction() as conn:
             rows = await conn.execute_fetchall(
                 "SELECT * FROM coin_record WHERE wallet_id=? AND spent_height=0", (wallet_id,)
             )
         return set(self.coin_record_from_row(row) for row in rows)
 
+    async def get_unspent_coins_by_amount(self, wallet_id: int) -> List[WalletCoinRecord]:
+        """Returns the unspent CoinRecords of a wallet, largest amount first."""
+        index = await self.get_unspent_index(wallet_id)
+        if index is not None:
+            return index.get_records_by_amount()
+        records = list(await self.get_unspent_coins_for_wallet(wallet_id))
+        records.sort(key=lambda record: (record.coin.amount, record.name()), reverse=True)
+        return records
+
+    async def get_confirmed_balance(self, wallet_id: int) -> uint128:
+        """Returns the sum of the unspent coins of a wallet."""
+        index = await self.get_unspent_index(wallet_id)
+        if index is not None:
+            return uint128(index.balance)
+        return uint128(sum(record.coin.amount for record in await self.get_unspent_coins_for_wallet(wallet_id)))
+
     async def get_all_unspent_coins(self) -> Set[WalletCoinRecord]:
         """Returns set of CoinRecords that have not been spent yet for a wallet."""
         async with self.db_wrapper.reader_no_transaction() as conn:
@@ -220,6 +383,8 @@ class WalletCoinStore:
         """
 
         async with self.db_wrapper.writer_maybe_transaction() as conn:
+            # Reorgs are rare, the indexes are simply loaded again.
+            self._invalidate_unspent_indexes()
             await (await conn.execute("DELETE FROM coin_record WHERE confirmed_height>?", (height,))).close()
             await (
                 await conn.execute(
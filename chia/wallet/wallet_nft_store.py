@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 import logging
 from sqlite3 import Row
-from typing import List, Optional, Type, TypeVar, Union
+from typing import Any, List, Optional, Tuple, Type, TypeVar, Union
 
 from chia.types.blockchain_format.coin import Coin
 from chia.types.blockchain_format.program import Program
@@ -12,6 +12,7 @@ from chia.util.db_wrapper import DBWrapper2, execute_fetchone
 from chia.util.ints import uint32
 from chia.wallet.lineage_proof import LineageProof
 from chia.wallet.nft_wallet.nft_info import DEFAULT_STATUS, IN_TRANSACTION_STATUS, NFTCoinInfo
+from chia.wallet.nft_wallet.uncurry_nft import UncurriedNFT
 
 log = logging.getLogger(__name__)
 _T_WalletNftStore = TypeVar("_T_WalletNftStore", bound="WalletNftStore")
@@ -19,6 +20,17 @@ REMOVE_BUFF_BLOCKS = 1000
 NFT_COIN_INFO_COLUMNS = "nft_id, coin, lineage_proof, mint_height, status, full_puzzle, latest_height, minter_did"
 
 
+def _metadata_hash(full_puzzle: Program) -> Optional[str]:
+    # the "mh" entry of the NFT metadata, hex encoded
+    uncurried_nft: Optional[UncurriedNFT] = UncurriedNFT.uncurry(*full_puzzle.uncurry())
+    if uncurried_nft is None:
+        return None
+    meta_hash = uncurried_nft.meta_hash.as_python()
+    if not isinstance(meta_hash, bytes) or len(meta_hash) == 0:
+        return None
+    return meta_hash.hex()
+
+
 def _to_nft_coin_info(row: Row) -> NFTCoinInfo:
     # nft_id, coin, lineage_proof, mint_height, status, full_puzzle, latest_height, minter_did
     return NFTCoinInfo(
@@ -72,6 +84,28 @@ class WalletNftStore:
                 await conn.execute("CREATE INDEX IF NOT EXISTS latest_nft_height on users_nfts(latest_height)")
             except Exception:
                 pass
+            try:
+                await conn.execute("ALTER TABLE users_nfts ADD COLUMN metadata_hash text")
+            except Exception:
+                pass
+            else:
+                # The NFTs saved before the column existed
+                rows = await conn.execute_fetchall("SELECT nft_id, full_puzzle FROM users_nfts")
+                await conn.executemany(
+                    "UPDATE users_nfts SET metadata_hash=? WHERE nft_id=?",
+                    [(_metadata_hash(Program.from_bytes(row[1])), row[0]) for row in rows],
+                )
+            # The lookups and pages of the NFTs that are not removed, sorted by NFT ID
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS nft_wallet_id_nft_id on users_nfts(wallet_id, nft_id)"
+                " WHERE removed_height is NULL"
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS nft_did_id_nft_id on users_nfts(did_id, nft_id)"
+                " WHERE removed_height is NULL"
+            )
+            await conn.execute("CREATE INDEX IF NOT EXISTS nft_minter_did on users_nfts(minter_did)")
+            await conn.execute("CREATE INDEX IF NOT EXISTS nft_metadata_hash on users_nfts(metadata_hash)")
 
         return self
 
@@ -115,10 +149,10 @@ class WalletNftStore:
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             columns = (
                 "nft_id, nft_coin_id, wallet_id, did_id, coin, lineage_proof, mint_height, status, full_puzzle, "
-                "minter_did, removed_height, latest_height"
+                "minter_did, removed_height, latest_height, metadata_hash"
             )
             await conn.execute(
-                f"INSERT or REPLACE INTO users_nfts ({columns}) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                f"INSERT or REPLACE INTO users_nfts ({columns}) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (
                     nft_coin_info.nft_id.hex(),
                     nft_coin_info.coin.name().hex(),
@@ -134,6 +168,7 @@ class WalletNftStore:
                     None if nft_coin_info.minter_did is None else nft_coin_info.minter_did.hex(),
                     None,
                     int(nft_coin_info.latest_height),
+                    _metadata_hash(nft_coin_info.full_puzzle),
                 ),
             )
             # Rotate the old removed NFTs, they are not possible to be reorged
@@ -143,14 +178,14 @@ class WalletNftStore:
             )
 
     async def count(self, wallet_id: Optional[uint32] = None, did_id: Optional[bytes32] = None) -> int:
-        sql = "SELECT COUNT(nft_id) FROM users_nfts WHERE removed_height is NULL"
-        params: List[Union[uint32, bytes32]] = []
+        sql = "SELECT COUNT(*) FROM users_nfts WHERE removed_height is NULL"
+        params: List[Union[uint32, str]] = []
         if wallet_id is not None:
             sql += " AND wallet_id=?"
             params.append(wallet_id)
         if did_id is not None:
             sql += " AND did_id=?"
-            params.append(did_id)
+            params.append(did_id.hex())
         async with self.db_wrapper.reader_no_transaction() as conn:
             count_row = await execute_fetchone(conn, sql, params)
             if count_row:
@@ -170,35 +205,62 @@ class WalletNftStore:
                 return False
         return True
 
+    @staticmethod
+    def _list_query(
+        wallet_id: Optional[uint32],
+        did_id: Optional[bytes32],
+        minter_did: Optional[bytes32],
+        metadata_hash: Optional[bytes],
+        start_after: Optional[bytes32],
+        offset: int,
+        limit: Optional[int],
+    ) -> Tuple[str, List[Any]]:
+        sql = f"SELECT {NFT_COIN_INFO_COLUMNS} FROM users_nfts WHERE removed_height is NULL"
+        params: List[Any] = []
+        if wallet_id is not None:
+            sql += " AND wallet_id=?"
+            params.append(int(wallet_id))
+        if did_id is not None:
+            sql += " AND did_id=?"
+            params.append(did_id.hex())
+        if minter_did is not None:
+            sql += " AND minter_did=?"
+            params.append(minter_did.hex())
+        if metadata_hash is not None:
+            sql += " AND metadata_hash=?"
+            params.append(metadata_hash.hex())
+        if start_after is None:
+            sql += " ORDER BY rowid"
+        else:
+            # keyset pagination, seeks past the last NFT of the previous page in the index
+            sql += " AND nft_id>? ORDER BY nft_id"
+            params.append(start_after.hex())
+        if limit is not None or offset > 0:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+        return sql, params
+
     async def get_nft_list(
-        self, wallet_id: Optional[uint32] = None, did_id: Optional[bytes32] = None
+        self,
+        wallet_id: Optional[uint32] = None,
+        did_id: Optional[bytes32] = None,
+        *,
+        minter_did: Optional[bytes32] = None,
+        metadata_hash: Optional[bytes] = None,
+        start_after: Optional[bytes32] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
     ) -> List[NFTCoinInfo]:
-        sql: str = f"SELECT {NFT_COIN_INFO_COLUMNS}" " from users_nfts WHERE"
-        if wallet_id is not None and did_id is None:
-            sql += f" wallet_id={wallet_id}"
-        if wallet_id is None and did_id is not None:
-            sql += f" did_id='{did_id.hex()}'"
-        if wallet_id is not None and did_id is not None:
-            sql += f" did_id='{did_id.hex()}' and wallet_id={wallet_id}"
-        if wallet_id is not None or did_id is not None:
-            sql += " and"
-        sql += " removed_height is NULL"
+        """
+        Returns the NFTs matching all the given filters, in the order they were saved in. Pages can be read with
+        offset, or sorted by NFT ID by passing the NFT ID of the last NFT of the previous page as start_after,
+        which doesn't have to skip over the NFTs before the page.
+        """
+        sql, params = self._list_query(wallet_id, did_id, minter_did, metadata_hash, start_after, offset, limit)
         async with self.db_wrapper.reader_no_transaction() as conn:
-            rows = await conn.execute_fetchall(sql)
+            rows = await conn.execute_fetchall(sql, params)
 
-        return [
-            NFTCoinInfo(
-                bytes32.from_hexstr(row[0]),
-                Coin.from_json_dict(json.loads(row[1])),
-                None if row[2] is None else LineageProof.from_json_dict(json.loads(row[2])),
-                Program.from_bytes(row[5]),
-                uint32(row[3]),
-                None if row[7] is None else bytes32.from_hexstr(row[7]),
-                uint32(row[6]) if row[6] is not None else uint32(0),
-                row[4] == IN_TRANSACTION_STATUS,
-            )
-            for row in rows
-        ]
+        return [_to_nft_coin_info(row) for row in rows]
 
     async def exists(self, coin_id: bytes32) -> bool:
         async with self.db_wrapper.reader_no_transaction() as conn:
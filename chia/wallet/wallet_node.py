@@ -8,8 +8,9 @@ import random
 import sys
 import time
 import traceback
+from collections import deque
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Set, Tuple
 
 from blspy import AugSchemeMPL, G1Element, G2Element, PrivateKey
 from packaging.version import Version
@@ -39,6 +40,7 @@ from chia.types.peer_info import PeerInfo
 from chia.types.weight_proof import WeightProof
 from chia.util.chunks import chunks
 from chia.util.config import WALLET_PEERS_PATH_KEY_DEPRECATED, process_config_start_method
+from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER
 from chia.util.errors import KeychainIsEmpty, KeychainIsLocked, KeychainKeyNotFound, KeychainProxyConnectionFailure
 from chia.util.ints import uint32, uint64
 from chia.util.keychain import Keychain
@@ -48,7 +50,10 @@ from chia.wallet.transaction_record import TransactionRecord
 from chia.wallet.util.new_peak_queue import NewPeakItem, NewPeakQueue, NewPeakQueueTypes
 from chia.wallet.util.peer_request_cache import PeerRequestCache, can_use_peer_request_cache
 from chia.wallet.util.wallet_sync_utils import (
+    LongSyncSubscriptions,
     PeerRequestException,
+    SubscriptionQueue,
+    chunk_coin_states_by_height,
     fetch_header_blocks_in_range,
     fetch_last_tx_from_peer,
     last_change_height_cs,
@@ -58,6 +63,7 @@ from chia.wallet.util.wallet_sync_utils import (
     subscribe_to_coin_updates,
     subscribe_to_phs,
 )
+from chia.wallet.wallet_coin_record import WalletCoinRecord
 from chia.wallet.wallet_state_manager import WalletStateManager
 from chia.wallet.wallet_weight_proof_handler import WalletWeightProofHandler, get_wp_fork_point
 
@@ -116,6 +122,12 @@ class WalletNode:
     race_cache_hashes: List[Tuple[uint32, bytes32]] = dataclasses.field(default_factory=list)
     node_peaks: Dict[bytes32, Tuple[uint32, bytes32]] = dataclasses.field(default_factory=dict)
     validation_semaphore: Optional[asyncio.Semaphore] = None
+    # Concurrent header block and proof requests made while validating a batch of untrusted states
+    max_concurrent_validation_requests: int = 10
+    # Subscription requests a long sync keeps in flight with its peer
+    max_concurrent_subscription_requests: int = 4
+    # What the running long syncs still have to subscribe to, new puzzle hashes and coin ids are pushed to them
+    long_sync_subscriptions: List[LongSyncSubscriptions] = dataclasses.field(default_factory=list)
     local_node_synced: bool = False
     LONG_SYNC_THRESHOLD: int = 300
     last_wallet_tx_resend_time: int = 0
@@ -181,9 +193,24 @@ class WalletNode:
 
     def get_cache_for_peer(self, peer) -> PeerRequestCache:
         if peer.peer_node_id not in self.untrusted_caches:
-            self.untrusted_caches[peer.peer_node_id] = PeerRequestCache()
+            self.untrusted_caches[peer.peer_node_id] = PeerRequestCache(
+                None if self._wallet_state_manager is None else self._wallet_state_manager.validation_cache_store
+            )
         return self.untrusted_caches[peer.peer_node_id]
 
+    def push_long_sync_subscriptions(
+        self, *, puzzle_hashes: Optional[List[bytes32]] = None, coin_ids: Optional[List[bytes32]] = None
+    ) -> None:
+        """
+        Queues puzzle hashes and coin ids that were created while long syncs are running, so that the syncs
+        subscribe to them without reloading everything from the DB.
+        """
+        for subscriptions in self.long_sync_subscriptions:
+            if puzzle_hashes is not None:
+                subscriptions.puzzle_hashes.push(puzzle_hashes)
+            if coin_ids is not None:
+                subscriptions.coin_ids.push(coin_ids)
+
     def rollback_request_caches(self, reorg_height: int):
         # Everything after reorg_height should be removed from the cache
         for cache in self.untrusted_caches.values():
@@ -239,7 +266,11 @@ class WalletNode:
 
         multiprocessing_start_method = process_config_start_method(config=self.config, log=self.log)
         multiprocessing_context = multiprocessing.get_context(method=multiprocessing_start_method)
-        self._weight_proof_handler = WalletWeightProofHandler(self.constants, multiprocessing_context)
+        self._weight_proof_handler = WalletWeightProofHandler(
+            self.constants,
+            multiprocessing_context,
+            num_processes=self.config.get("weight_proof_validation_processes", 4),
+        )
         self.synced_peers = set()
         private_key = await self.get_private_key(fingerprint or self.get_last_used_fingerprint())
         if private_key is None:
@@ -592,6 +623,8 @@ class WalletNode:
                     self.rollback_request_caches(fork_height)
                 else:
                     cache.clear_after_height(fork_height)
+                self.wallet_state_manager.validation_cache_store.clear_after_height(fork_height)
+                await self.wallet_state_manager.validation_cache_store.flush()
             except Exception as e:
                 tb = traceback.format_exc()
                 self.log.error(f"Exception while perform_atomic_rollback: {e} {tb}")
@@ -619,8 +652,8 @@ class WalletNode:
         Sync algorithm:
         - Download and verify weight proof (if not trusted)
         - Roll back anything after the fork point (if rollback=True)
-        - Subscribe to all puzzle_hashes over and over until there are no more updates
-        - Subscribe to all coin_ids over and over until there are no more updates
+        - Subscribe to all puzzle_hashes, and to the new ones created meanwhile, until there are no more updates
+        - Subscribe to all coin_ids, and to the new ones created meanwhile, until there are no more updates
         - rollback=False means that we are just double-checking with this peer to make sure we don't have any
           missing transactions, so we don't need to rollback
         """
@@ -645,39 +678,37 @@ class WalletNode:
 
         # We only process new state updates to avoid slow reprocessing. We set the sync height after adding
         # Things, so we don't have to reprocess these later. There can be many things in ph_update_res.
-        already_checked_ph: Set[bytes32] = set()
-        while not self._shut_down:
+        # The puzzle hashes and coin ids are read from the DB once, the ones created by the states we receive are
+        # pushed to the subscriptions by the wallet state manager.
+        subscriptions = LongSyncSubscriptions()
+        self.long_sync_subscriptions.append(subscriptions)
+        try:
             await self.wallet_state_manager.create_more_puzzle_hashes()
-            all_puzzle_hashes = await self.get_puzzle_hashes_to_subscribe()
-            not_checked_puzzle_hashes = set(all_puzzle_hashes) - already_checked_ph
-            if not_checked_puzzle_hashes == set():
-                break
-            for chunk in chunks(list(not_checked_puzzle_hashes), 1000):
-                ph_update_res: List[CoinState] = await subscribe_to_phs(chunk, full_node, 0)
-                ph_update_res = list(filter(is_new_state_update, ph_update_res))
-                if not await self.receive_state_from_peer(ph_update_res, full_node, update_finished_height=True):
+            subscriptions.puzzle_hashes.push(await self.get_puzzle_hashes_to_subscribe())
+            while len(subscriptions.puzzle_hashes) > 0:
+                if not await self.subscribe_pipelined(
+                    subscriptions.puzzle_hashes,
+                    subscribe_to_phs,
+                    full_node,
+                    state_filter=is_new_state_update,
+                    update_finished_height=True,
+                ):
                     # If something goes wrong, abort sync
                     return
-            already_checked_ph.update(not_checked_puzzle_hashes)
+                # The states received may have used up puzzle hashes, derive the next ones
+                await self.wallet_state_manager.create_more_puzzle_hashes()
 
-        self.log.info(f"Successfully subscribed and updated {len(already_checked_ph)} puzzle hashes")
+            self.log.info(f"Successfully subscribed and updated {subscriptions.puzzle_hashes.num_seen} puzzle hashes")
 
-        # The number of coin id updates are usually going to be significantly less than ph updates, so we can
-        # sync from 0 every time.
-        already_checked_coin_ids: Set[bytes32] = set()
-        while not self._shut_down:
-            all_coin_ids = await self.get_coin_ids_to_subscribe(0)
-            not_checked_coin_ids = set(all_coin_ids) - already_checked_coin_ids
-            if not_checked_coin_ids == set():
-                break
-            for chunk in chunks(list(not_checked_coin_ids), 1000):
-                c_update_res: List[CoinState] = await subscribe_to_coin_updates(chunk, full_node, 0)
-
-                if not await self.receive_state_from_peer(c_update_res, full_node):
-                    # If something goes wrong, abort sync
-                    return
-            already_checked_coin_ids.update(not_checked_coin_ids)
-        self.log.info(f"Successfully subscribed and updated {len(already_checked_coin_ids)} coin ids")
+            # The number of coin id updates are usually going to be significantly less than ph updates, so we can
+            # sync from 0.
+            subscriptions.coin_ids.push(await self.get_coin_ids_to_subscribe(0))
+            if not await self.subscribe_pipelined(subscriptions.coin_ids, subscribe_to_coin_updates, full_node):
+                # If something goes wrong, abort sync
+                return
+            self.log.info(f"Successfully subscribed and updated {subscriptions.coin_ids.num_seen} coin ids")
+        finally:
+            self.long_sync_subscriptions.remove(subscriptions)
 
         # Only update this fully when the entire sync has completed
         await self.wallet_state_manager.blockchain.set_finished_sync_up_to(target_height)
@@ -692,6 +723,39 @@ class WalletNode:
 
         self.log.info(f"Sync (trusted: {trusted}) duration was: {time.time() - start_time}")
 
+    async def subscribe_pipelined(
+        self,
+        queue: SubscriptionQueue,
+        subscribe: Callable[[List[bytes32], WSChiaConnection, int], Coroutine[Any, Any, List[CoinState]]],
+        peer: WSChiaConnection,
+        *,
+        state_filter: Optional[Callable[[CoinState], bool]] = None,
+        update_finished_height: bool = False,
+    ) -> bool:
+        """
+        Subscribes to everything in the queue, including what gets pushed to it meanwhile, with several requests
+        in flight. The responses are applied one at a time, in the order of the requests. Returns False if the
+        sync has to be aborted.
+        """
+        pending: Deque[asyncio.Task[List[CoinState]]] = deque()
+        try:
+            while not self._shut_down:
+                while len(pending) < self.max_concurrent_subscription_requests and len(queue) > 0:
+                    pending.append(asyncio.create_task(subscribe(queue.pop(1000), peer, 0)))
+                if len(pending) == 0:
+                    return True
+                coin_states: List[CoinState] = await pending.popleft()
+                if state_filter is not None:
+                    coin_states = list(filter(state_filter, coin_states))
+                if not await self.receive_state_from_peer(
+                    coin_states, peer, update_finished_height=update_finished_height
+                ):
+                    return False
+            return False
+        finally:
+            for task in pending:
+                task.cancel()
+
     async def receive_state_from_peer(
         self,
         items_input: List[CoinState],
@@ -706,7 +770,6 @@ class WalletNode:
         assert self._wallet_state_manager is not None
         trusted = self.is_trusted(peer)
         # Validate states in parallel, apply serial
-        # TODO: optimize fetching
         if self.validation_semaphore is None:
             self.validation_semaphore = asyncio.Semaphore(10)
 
@@ -733,9 +796,7 @@ class WalletNode:
                 cache.clear_after_height(fork_height)
                 self.log.info(f"clear_after_height {fork_height} for peer {peer}")
 
-        all_tasks: List[asyncio.Task] = []
         target_concurrent_tasks: int = 30
-        concurrent_tasks_cs_heights: List[uint32] = []
 
         # Ensure the list is sorted
 
@@ -745,66 +806,12 @@ class WalletNode:
         if num_filtered > 0:
             self.log.info(f"Filtered {num_filtered} spam transactions")
 
-        async def receive_and_validate(inner_states: List[CoinState], inner_idx_start: int, cs_heights: List[uint32]):
-            try:
-                assert self.validation_semaphore is not None
-                async with self.validation_semaphore:
-                    if header_hash is not None:
-                        assert height is not None
-                        for inner_state in inner_states:
-                            self.add_state_to_race_cache(header_hash, height, inner_state)
-                            self.log.info(f"Added to race cache: {height}, {inner_state}")
-                    valid_states = [
-                        inner_state
-                        for inner_state in inner_states
-                        if await self.validate_received_state_from_peer(inner_state, peer, cache, fork_height)
-                    ]
-                    if len(valid_states) > 0:
-                        async with self.wallet_state_manager.db_wrapper.writer():
-                            self.log.info(
-                                f"new coin state received ({inner_idx_start}-"
-                                f"{inner_idx_start + len(inner_states) - 1}/ {len(items)})"
-                            )
-                            try:
-                                await self.wallet_state_manager.new_coin_state(valid_states, peer, fork_height)
-
-                                if update_finished_height:
-                                    if len(cs_heights) == 1:
-                                        # We have processed all past tasks, so we can increase the height safely
-                                        synced_up_to = last_change_height_cs(valid_states[-1]) - 1
-                                    else:
-                                        # We know we have processed everything before this min height
-                                        synced_up_to = min(cs_heights) - 1
-                                    await self.wallet_state_manager.blockchain.set_finished_sync_up_to(synced_up_to)
-                            except Exception as e:
-                                tb = traceback.format_exc()
-                                self.log.error(f"Exception while adding state: {e} {tb}")
-                            else:
-                                await self.wallet_state_manager.blockchain.clean_block_records()
-
-            except Exception as e:
-                tb = traceback.format_exc()
-                if self._shut_down:
-                    self.log.debug(f"Shutting down while adding state : {e} {tb}")
-                else:
-                    self.log.error(f"Exception while adding state: {e} {tb}")
-            finally:
-                cs_heights.remove(last_change_height_cs(inner_states[0]))
-
-        idx = 1
-        # Keep chunk size below 1000 just in case, windows has sqlite limits of 999 per query
-        # Untrusted has a smaller batch size since validation has to happen which takes a while
-        chunk_size: int = 900 if trusted else 10
-        for states in chunks(items, chunk_size):
-            if self._server is None:
-                self.log.error("No server")
-                await asyncio.gather(*all_tasks)
-                return False
-            if peer.peer_node_id not in self.server.all_connections:
-                self.log.error(f"Disconnected from peer {peer.peer_node_id} host {peer.peer_host}")
-                await asyncio.gather(*all_tasks)
-                return False
-            if trusted:
+        if trusted:
+            idx = 1
+            # Keep chunk size below 1000 just in case, windows has sqlite limits of 999 per query
+            for states in chunks(items, 900):
+                if not self.is_connected_to(peer):
+                    return False
                 async with self.wallet_state_manager.db_wrapper.writer():
                     try:
                         self.log.info(f"new coin state received ({idx}-" f"{idx + len(states) - 1}/ {len(items)})")
@@ -819,22 +826,108 @@ class WalletNode:
                         return False
                     else:
                         await self.wallet_state_manager.blockchain.clean_block_records()
+                idx += len(states)
+            await self.update_ui()
+            return self.is_connected_to(peer)
 
-            else:
-                while len(concurrent_tasks_cs_heights) >= target_concurrent_tasks:
-                    await asyncio.sleep(0.1)
+        # Untrusted states are validated in a pipeline. Chunks made of whole heights are validated concurrently,
+        # so that every block is fetched and proven once, and applied in order as their validation completes.
+        # The bounded queue of pending chunks makes the producer wait while validation is behind.
+        pending: asyncio.Queue[Optional[Tuple[int, List[CoinState], asyncio.Task[List[CoinState]]]]] = asyncio.Queue(
+            target_concurrent_tasks
+        )
+
+        async def validate_states(inner_states: List[CoinState]) -> List[CoinState]:
+            try:
+                assert self.validation_semaphore is not None
+                async with self.validation_semaphore:
+                    if header_hash is not None:
+                        assert height is not None
+                        for inner_state in inner_states:
+                            self.add_state_to_race_cache(header_hash, height, inner_state)
+                            self.log.info(f"Added to race cache: {height}, {inner_state}")
+                    return await self.validate_received_states_from_peer(inner_states, peer, cache, fork_height)
+            except Exception as e:
+                tb = traceback.format_exc()
+                if self._shut_down:
+                    self.log.debug(f"Shutting down while validating state : {e} {tb}")
+                else:
+                    self.log.error(f"Exception while validating state: {e} {tb}")
+                return []
+
+        failed = False
+
+        async def apply_validated_states() -> None:
+            nonlocal failed
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                inner_idx_start, inner_states, validation_task = item
+                valid_states = await validation_task
+                if len(valid_states) == 0:
+                    failed = True
+                    continue
+                try:
+                    async with self.wallet_state_manager.db_wrapper.writer():
+                        self.log.info(
+                            f"new coin state received ({inner_idx_start}-"
+                            f"{inner_idx_start + len(inner_states) - 1}/ {len(items)})"
+                        )
+                        try:
+                            await self.wallet_state_manager.new_coin_state(valid_states, peer, fork_height)
+
+                            if update_finished_height and not failed:
+                                # No earlier chunk has failed, and a height is never split between chunks,
+                                # so everything below the last height of this chunk is processed.
+                                synced_up_to = last_change_height_cs(inner_states[-1]) - 1
+                                await self.wallet_state_manager.blockchain.set_finished_sync_up_to(synced_up_to)
+                        except Exception as e:
+                            failed = True
+                            tb = traceback.format_exc()
+                            self.log.error(f"Exception while adding state: {e} {tb}")
+                        else:
+                            await self.wallet_state_manager.blockchain.clean_block_records()
+                except Exception as e:
+                    failed = True
+                    tb = traceback.format_exc()
                     if self._shut_down:
-                        self.log.info("Terminating receipt and validation due to shut down request")
-                        await asyncio.gather(*all_tasks)
-                        return False
-                concurrent_tasks_cs_heights.append(last_change_height_cs(states[0]))
-                all_tasks.append(asyncio.create_task(receive_and_validate(states, idx, concurrent_tasks_cs_heights)))
-            idx += len(states)
+                        self.log.debug(f"Shutting down while adding state : {e} {tb}")
+                    else:
+                        self.log.error(f"Exception while adding state: {e} {tb}")
+
+        apply_task = asyncio.create_task(apply_validated_states())
+        completed = True
+        idx = 1
+        try:
+            # Untrusted has a smaller batch size since validation has to happen which takes a while
+            for states in chunk_coin_states_by_height(items, 100):
+                if not self.is_connected_to(peer):
+                    completed = False
+                    break
+                if self._shut_down:
+                    self.log.info("Terminating receipt and validation due to shut down request")
+                    completed = False
+                    break
+                await pending.put((idx, states, asyncio.create_task(validate_states(states))))
+                idx += len(states)
+        finally:
+            await pending.put(None)
+            await apply_task
+            await self.wallet_state_manager.validation_cache_store.flush()
 
-        still_connected = self._server is not None and peer.peer_node_id in self.server.all_connections
-        await asyncio.gather(*all_tasks)
         await self.update_ui()
-        return still_connected and self._server is not None and peer.peer_node_id in self.server.all_connections
+        # A failed chunk leaves its heights unsynced, so the sync has to be retried
+        return completed and not failed and self.is_connected_to(peer)
+
+    def is_connected_to(self, peer: WSChiaConnection) -> bool:
+        if self._server is None:
+            self.log.error("No server")
+            return False
+        if peer.peer_node_id not in self.server.all_connections:
+            self.log.error(f"Disconnected from peer {peer.peer_node_id} host {peer.peer_host}")
+            return False
+        return True
 
     async def is_peer_synced(
         self, peer: WSChiaConnection, header_block: HeaderBlock, request_time: uint64
@@ -1276,150 +1369,196 @@ class WalletNode:
         all_coin_names.update(await self.wallet_state_manager.interested_store.get_interested_coin_ids())
         return list(all_coin_names)
 
-    async def validate_received_state_from_peer(
+    async def validate_received_states_from_peer(
         self,
-        coin_state: CoinState,
+        coin_states: List[CoinState],
         peer: WSChiaConnection,
         peer_request_cache: PeerRequestCache,
         fork_height: Optional[uint32],
-    ) -> bool:
+    ) -> List[CoinState]:
         """
-        Returns all state that is valid and included in the blockchain proved by the weight proof. If return_old_states
-        is False, only new states that are not in the coin_store are returned.
+        Returns the states that are valid and included in the blockchain proved by the weight proof, in their
+        original order. The header blocks, additions and removals proofs and inclusion checks the states depend
+        on are fetched and validated once per height, however many of the states share it.
         """
-        # Only use the cache if we are talking about states before the fork point. If we are evaluating something
-        # in a reorg, we cannot use the cache, since we don't know if it's actually in the new chain after the reorg.
-        if await can_use_peer_request_cache(coin_state, peer_request_cache, fork_height):
-            return True
-
-        spent_height: Optional[uint32] = None if coin_state.spent_height is None else uint32(coin_state.spent_height)
-        confirmed_height: Optional[uint32] = (
-            None if coin_state.created_height is None else uint32(coin_state.created_height)
-        )
-        current = await self.wallet_state_manager.coin_store.get_coin_record(coin_state.coin.name())
-        # if remote state is same as current local state we skip validation
-
-        # CoinRecord unspent = height 0, coin state = None. We adjust for comparison below
-        current_spent_height = None
-        if current is not None and current.spent_block_height != 0:
-            current_spent_height = current.spent_block_height
-
-        # Same as current state, nothing to do
-        if (
-            current is not None
-            and current_spent_height == spent_height
-            and current.confirmed_block_height == confirmed_height
-        ):
-            peer_request_cache.add_to_states_validated(coin_state)
-            return True
+        valid: List[bool] = [False] * len(coin_states)
+        to_validate: List[int] = []
+        for i, coin_state in enumerate(coin_states):
+            # Only use the cache if we are talking about states before the fork point. If we are evaluating something
+            # in a reorg, we cannot use the cache, since we don't know if it's actually in the new chain after the
+            # reorg.
+            if await can_use_peer_request_cache(coin_state, peer_request_cache, fork_height):
+                valid[i] = True
+            else:
+                to_validate.append(i)
+
+        current_records: List[Optional[WalletCoinRecord]] = []
+        coin_names: List[bytes32] = [coin_states[i].coin.name() for i in to_validate]
+        # get_coin_records adds two parameters of its own
+        for names_chunk in chunks(coin_names, SQLITE_MAX_VARIABLE_NUMBER - 2):
+            current_records.extend(await self.wallet_state_manager.coin_store.get_coin_records(names_chunk))
+
+        # What has to be proven at each height, and the heights each state depends on
+        block_heights: Set[uint32] = set()
+        # Heights whose block must be requested again, since the cached one might have been reorged
+        refetch_heights: Set[uint32] = set()
+        additions: Dict[uint32, Set[bytes32]] = {}
+        removals: Dict[uint32, Set[bytes32]] = {}
+        inclusion_heights: Set[uint32] = set()
+        state_heights: Dict[int, List[uint32]] = {}
+        for i, coin_name, current in zip(to_validate, coin_names, current_records):
+            coin_state = coin_states[i]
+            spent_height: Optional[uint32] = (
+                None if coin_state.spent_height is None else uint32(coin_state.spent_height)
+            )
+            confirmed_height: Optional[uint32] = (
+                None if coin_state.created_height is None else uint32(coin_state.created_height)
+            )
+            # if remote state is same as current local state we skip validation
+
+            # CoinRecord unspent = height 0, coin state = None. We adjust for comparison below
+            current_spent_height = None
+            if current is not None and current.spent_block_height != 0:
+                current_spent_height = current.spent_block_height
+
+            # Same as current state, nothing to do
+            if (
+                current is not None
+                and current_spent_height == spent_height
+                and current.confirmed_block_height == confirmed_height
+            ):
+                peer_request_cache.add_to_states_validated(coin_state)
+                valid[i] = True
+                continue
 
-        reorg_mode = False
+            # If coin was removed from the blockchain
+            if confirmed_height is None:
+                if current is None:
+                    # Coin does not exist in local DB, so no need to do anything
+                    continue
+                # This coin got reorged
+                confirmed_height = current.confirmed_block_height
+                refetch_heights.add(confirmed_height)
+
+            # proof of inclusion of the puzzle hash in the additions of the created height
+            heights = [confirmed_height]
+            additions.setdefault(confirmed_height, set()).add(coin_state.coin.puzzle_hash)
+            # If spent_height is None, we need to validate that the creation block is actually in the longest
+            # blockchain. Otherwise, we don't have to, since we will validate the spent block later.
+            if spent_height is None:
+                inclusion_heights.add(confirmed_height)
+
+            # TODO: make sure all cases are covered
+            if current is not None and spent_height is None and current.spent_block_height != 0:
+                # Peer is telling us that coin that was previously known to be spent is not spent anymore
+                # Check old state
+                old_spent_height = uint32(current.spent_block_height)
+                refetch_heights.add(old_spent_height)
+                removals.setdefault(old_spent_height, set()).add(coin_name)
+                inclusion_heights.add(old_spent_height)
+                heights.append(old_spent_height)
+
+            if spent_height is not None:
+                removals.setdefault(spent_height, set()).add(coin_name)
+                inclusion_heights.add(spent_height)
+                heights.append(spent_height)
+
+            block_heights.update(heights)
+            state_heights[i] = heights
+
+        proven_heights: Set[uint32] = set()
+        if len(block_heights) > 0:
+            blocks = await self.fetch_state_blocks(peer, peer_request_cache, block_heights, refetch_heights)
+            semaphore = asyncio.Semaphore(self.max_concurrent_validation_requests)
+
+            async def validate_height(height: uint32) -> Optional[bool]:
+                # Returns None if the peer sent an invalid proof, otherwise whether the height is proven
+                block = blocks.get(height)
+                if block is None or block.foliage_transaction_block is None:
+                    return False
+                async with semaphore:
+                    if height in additions:
+                        if not await request_and_validate_additions(
+                            peer,
+                            peer_request_cache,
+                            height,
+                            block.header_hash,
+                            list(additions[height]),
+                            block.foliage_transaction_block.additions_root,
+                        ):
+                            self.log.warning(f"Validate false, additions at height {height}")
+                            return None
+                    if height in removals:
+                        if not await request_and_validate_removals(
+                            peer,
+                            height,
+                            block.header_hash,
+                            list(removals[height]),
+                            block.foliage_transaction_block.removals_root,
+                        ):
+                            self.log.warning(f"Validate false, removals at height {height}")
+                            return None
+                    if height in inclusion_heights:
+                        return await self.validate_block_inclusion(block, peer, peer_request_cache)
+                    return True
 
-        # If coin was removed from the blockchain
-        if confirmed_height is None:
-            if current is None:
-                # Coin does not exist in local DB, so no need to do anything
-                return False
-            # This coin got reorged
-            reorg_mode = True
-            confirmed_height = current.confirmed_block_height
-
-        # request header block for created height
-        state_block: Optional[HeaderBlock] = peer_request_cache.get_block(confirmed_height)
-        if state_block is None or reorg_mode:
-            state_blocks = await request_header_blocks(peer, confirmed_height, confirmed_height)
-            if state_blocks is None:
-                return False
-            state_block = state_blocks[0]
-            assert state_block is not None
-            peer_request_cache.add_to_blocks(state_block)
-
-        # get proof of inclusion
-        assert state_block.foliage_transaction_block is not None
-        validate_additions_result = await request_and_validate_additions(
-            peer,
-            peer_request_cache,
-            state_block.height,
-            state_block.header_hash,
-            coin_state.coin.puzzle_hash,
-            state_block.foliage_transaction_block.additions_root,
-        )
+            sorted_heights = sorted(block_heights)
+            results = await asyncio.gather(*(validate_height(height) for height in sorted_heights))
+            if None in results:
+                await peer.close(9999)
+                return []
+            proven_heights = {height for height, proven in zip(sorted_heights, results) if proven}
 
-        if validate_additions_result is False:
-            self.log.warning("Validate false 1")
-            await peer.close(9999)
-            return False
+        for i, heights in state_heights.items():
+            if all(height in proven_heights for height in heights):
+                peer_request_cache.add_to_states_validated(coin_states[i])
+                valid[i] = True
 
-        # If spent_height is None, we need to validate that the creation block is actually in the longest blockchain.
-        # Otherwise, we don't have to, since we will validate the spent block later.
-        if coin_state.spent_height is None:
-            validated = await self.validate_block_inclusion(state_block, peer, peer_request_cache)
-            if not validated:
-                return False
+        return [coin_state for coin_state, is_valid in zip(coin_states, valid) if is_valid]
 
-        # TODO: make sure all cases are covered
-        if current is not None:
-            if spent_height is None and current.spent_block_height != 0:
-                # Peer is telling us that coin that was previously known to be spent is not spent anymore
-                # Check old state
+    async def fetch_state_blocks(
+        self,
+        peer: WSChiaConnection,
+        peer_request_cache: PeerRequestCache,
+        heights: Set[uint32],
+        refetch_heights: Set[uint32],
+    ) -> Dict[uint32, HeaderBlock]:
+        """
+        Returns the header blocks at the heights that could be obtained. Cached blocks are used unless the height is
+        in refetch_heights, the others are requested in ranges of consecutive heights.
+        """
+        blocks: Dict[uint32, HeaderBlock] = {}
+        to_request: List[uint32] = []
+        for height in sorted(heights):
+            cached_block: Optional[HeaderBlock] = None
+            if height not in refetch_heights:
+                cached_block = peer_request_cache.get_block(height)
+            if cached_block is not None:
+                blocks[height] = cached_block
+            else:
+                to_request.append(height)
 
-                spent_state_blocks: Optional[List[HeaderBlock]] = await request_header_blocks(
-                    peer, current.spent_block_height, current.spent_block_height
-                )
-                if spent_state_blocks is None:
-                    return False
-                spent_state_block = spent_state_blocks[0]
-                assert spent_state_block.height == current.spent_block_height
-                assert spent_state_block.foliage_transaction_block is not None
-                peer_request_cache.add_to_blocks(spent_state_block)
+        ranges: List[List[uint32]] = []
+        for height in to_request:
+            if len(ranges) > 0 and ranges[-1][-1] == height - 1 and len(ranges[-1]) < 32:
+                ranges[-1].append(height)
+            else:
+                ranges.append([height])
 
-                validate_removals_result: bool = await request_and_validate_removals(
-                    peer,
-                    current.spent_block_height,
-                    spent_state_block.header_hash,
-                    coin_state.coin.name(),
-                    spent_state_block.foliage_transaction_block.removals_root,
-                )
-                if validate_removals_result is False:
-                    self.log.warning("Validate false 2")
-                    await peer.close(9999)
-                    return False
-                validated = await self.validate_block_inclusion(spent_state_block, peer, peer_request_cache)
-                if not validated:
-                    return False
+        semaphore = asyncio.Semaphore(self.max_concurrent_validation_requests)
 
-        if spent_height is not None:
-            # request header block for created height
-            cached_spent_state_block = peer_request_cache.get_block(spent_height)
-            if cached_spent_state_block is None:
-                spent_state_blocks = await request_header_blocks(peer, spent_height, spent_height)
-                if spent_state_blocks is None:
-                    return False
-                spent_state_block = spent_state_blocks[0]
-                assert spent_state_block.height == spent_height
-                assert spent_state_block.foliage_transaction_block is not None
-                peer_request_cache.add_to_blocks(spent_state_block)
-            else:
-                spent_state_block = cached_spent_state_block
-            assert spent_state_block is not None
-            assert spent_state_block.foliage_transaction_block is not None
-            validate_removals_result = await request_and_validate_removals(
-                peer,
-                spent_state_block.height,
-                spent_state_block.header_hash,
-                coin_state.coin.name(),
-                spent_state_block.foliage_transaction_block.removals_root,
-            )
-            if validate_removals_result is False:
-                self.log.warning("Validate false 3")
-                await peer.close(9999)
-                return False
-            validated = await self.validate_block_inclusion(spent_state_block, peer, peer_request_cache)
-            if not validated:
-                return False
-        peer_request_cache.add_to_states_validated(coin_state)
+        async def request_range(start: uint32, end: uint32) -> None:
+            async with semaphore:
+                header_blocks = await request_header_blocks(peer, start, end)
+            if header_blocks is None:
+                return
+            for header_block in header_blocks:
+                if start <= header_block.height <= end:
+                    blocks[header_block.height] = header_block
+                    peer_request_cache.add_to_blocks(header_block)
 
-        return True
+        await asyncio.gather(*(request_range(heights_range[0], heights_range[-1]) for heights_range in ranges))
+        return blocks
 
     async def validate_block_inclusion(
         self, block: HeaderBlock, peer: WSChiaConnection, peer_request_cache: PeerRequestCache
@@ -1596,14 +1735,9 @@ class WalletNode:
             raise PeerRequestException(f"Was not able to get states for {coin_names}")
 
         if not self.is_trusted(peer):
-            valid_list = []
-            for coin in coin_state.coin_states:
-                valid = await self.validate_received_state_from_peer(
-                    coin, peer, self.get_cache_for_peer(peer), fork_height
-                )
-                if valid:
-                    valid_list.append(coin)
-            return valid_list
+            return await self.validate_received_states_from_peer(
+                coin_state.coin_states, peer, self.get_cache_for_peer(peer), fork_height
+            )
 
         return coin_state.coin_states
 
@@ -1618,13 +1752,9 @@ class WalletNode:
             raise PeerRequestException(f"Was not able to obtain children {response}")
 
         if not self.is_trusted(peer):
-            request_cache = self.get_cache_for_peer(peer)
-            validated = []
-            for state in response.coin_states:
-                valid = await self.validate_received_state_from_peer(state, peer, request_cache, fork_height)
-                if valid:
-                    validated.append(state)
-            return validated
+            return await self.validate_received_states_from_peer(
+                response.coin_states, peer, self.get_cache_for_peer(peer), fork_height
+            )
         return response.coin_states
 
     # For RPC only. You should use wallet_state_manager.add_pending_transaction for normal wallet business.
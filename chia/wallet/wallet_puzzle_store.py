@@ -4,13 +4,16 @@ import asyncio
 import logging
 from typing import Dict, List, Optional, Set, Tuple
 
+import aiosqlite
 from blspy import G1Element
 
 from chia.types.blockchain_format.sized_bytes import bytes32
-from chia.util.db_wrapper import DBWrapper2, execute_fetchone
+from chia.util.chunks import chunks
+from chia.util.db_wrapper import SQLITE_MAX_VARIABLE_NUMBER, DBWrapper2, execute_fetchone
 from chia.util.ints import uint32
 from chia.util.lru_cache import LRUCache
 from chia.wallet.derivation_record import DerivationRecord
+from chia.wallet.util.puzzle_hash_index import DEFAULT_MAX_ENTRIES, PuzzleHashIndex
 from chia.wallet.util.wallet_types import WalletType
 
 log = logging.getLogger(__name__)
@@ -21,6 +24,10 @@ class WalletPuzzleStore:
     WalletPuzzleStore keeps track of all generated puzzle_hashes and their derivation path / wallet.
     This is only used for HD wallets where each address is derived from a public key. Otherwise, use the
     WalletInterestedStore to keep track of puzzle hashes which we are interested in.
+
+    The puzzle hashes are also indexed in memory, so that checking whether a puzzle hash is ours doesn't
+    hit the DB. The paths only go into the index once their transaction is over and they are read back from
+    the DB, until then their puzzle hashes are pending and looked up in the DB, in case they are rolled back.
     """
 
     lock: asyncio.Lock
@@ -29,11 +36,13 @@ class WalletPuzzleStore:
     # maps wallet_id -> last_derivation_index
     last_wallet_derivation_index: Dict[uint32, uint32]
     last_derivation_index: Optional[uint32]
+    puzzle_hash_index: PuzzleHashIndex
 
     @classmethod
-    async def create(cls, db_wrapper: DBWrapper2):
+    async def create(cls, db_wrapper: DBWrapper2, index_max_entries: int = DEFAULT_MAX_ENTRIES):
         self = cls()
         self.db_wrapper = db_wrapper
+        self.puzzle_hash_index = PuzzleHashIndex(index_max_entries)
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await conn.execute(
                 (
@@ -67,8 +76,54 @@ class WalletPuzzleStore:
         self.wallet_info_for_ph_cache = LRUCache(100)
         self.last_derivation_index = None
         self.last_wallet_derivation_index = {}
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            await self._load_puzzle_hash_index(conn)
         return self
 
+    async def _load_puzzle_hash_index(self, conn: aiosqlite.Connection) -> None:
+        # the current index keeps serving the lookups until the new one is loaded
+        index = PuzzleHashIndex(self.puzzle_hash_index.max_entries)
+        row = await execute_fetchone(conn, "SELECT COUNT(*) FROM derivation_paths")
+        index.reset(0 if row is None else row[0])
+        async with conn.execute(
+            "SELECT puzzle_hash, derivation_index, wallet_id, wallet_type, hardened FROM derivation_paths"
+        ) as cursor:
+            async for row in cursor:
+                index.add(bytes32.fromhex(row[0]), row[1], row[2], row[3], bool(row[4]))
+        index.take_pending_from(self.puzzle_hash_index)
+        self.puzzle_hash_index = index
+
+    async def _add_pending_to_index(self) -> None:
+        """
+        Adds the pending puzzle hashes to the index, as they were committed. While a write transaction is running
+        they may still be rolled back, so they stay pending until it's over.
+        """
+        if self.db_wrapper.writer_is_active():
+            return
+        puzzle_hashes = self.puzzle_hash_index.get_pending()
+        if len(puzzle_hashes) == 0:
+            return
+        generation = self.puzzle_hash_index.pending_generation
+        rows: List[aiosqlite.Row] = []
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            for batch in chunks([puzzle_hash.hex() for puzzle_hash in puzzle_hashes], SQLITE_MAX_VARIABLE_NUMBER):
+                rows.extend(
+                    await conn.execute_fetchall(
+                        "SELECT puzzle_hash, derivation_index, wallet_id, wallet_type, hardened "
+                        f"FROM derivation_paths WHERE puzzle_hash IN ({','.join('?' * len(batch))})",
+                        batch,
+                    )
+                )
+        if generation != self.puzzle_hash_index.pending_generation:
+            # more paths were written meanwhile, the next call adds them all
+            return
+        for row in rows:
+            self.puzzle_hash_index.add(bytes32.fromhex(row[0]), row[1], row[2], row[3], bool(row[4]))
+        self.puzzle_hash_index.remove_pending(puzzle_hashes)
+        if self.puzzle_hash_index.needs_reload():
+            async with self.db_wrapper.reader_no_transaction() as conn:
+                await self._load_puzzle_hash_index(conn)
+
     async def add_derivation_paths(self, records: List[DerivationRecord]) -> None:
         """
         Insert many derivation paths into the database.
@@ -103,6 +158,8 @@ class WalletPuzzleStore:
                     self.last_wallet_derivation_index[record.wallet_id], record.index
                 )
 
+        for record in records:
+            self.puzzle_hash_index.add_pending(record.puzzle_hash)
         async with self.db_wrapper.writer_maybe_transaction() as conn:
             await (
                 await conn.executemany(
@@ -110,6 +167,7 @@ class WalletPuzzleStore:
                     sql_records,
                 )
             ).close()
+        await self._add_pending_to_index()
 
     async def get_derivation_record(
         self, index: uint32, wallet_id: uint32, hardened: bool
@@ -138,6 +196,9 @@ class WalletPuzzleStore:
         """
         Returns the derivation record by index and wallet id.
         """
+        await self._add_pending_to_index()
+        if not self.puzzle_hash_index.may_contain(puzzle_hash):
+            return None
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
                 conn,
@@ -151,6 +212,32 @@ class WalletPuzzleStore:
 
         return None
 
+    async def get_derivation_records_for_puzzle_hashes(
+        self, puzzle_hashes: List[bytes32]
+    ) -> Dict[bytes32, DerivationRecord]:
+        """
+        Returns the derivation records for the puzzle hashes we know, looked up in as few queries as possible.
+        """
+        await self._add_pending_to_index()
+        records: Dict[bytes32, DerivationRecord] = {}
+        hex_puzzle_hashes = list(
+            {puzzle_hash.hex() for puzzle_hash in puzzle_hashes if self.puzzle_hash_index.may_contain(puzzle_hash)}
+        )
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            for batch in chunks(hex_puzzle_hashes, SQLITE_MAX_VARIABLE_NUMBER):
+                rows = await conn.execute_fetchall(
+                    "SELECT derivation_index, pubkey, puzzle_hash, wallet_type, wallet_id, hardened "
+                    f"FROM derivation_paths WHERE puzzle_hash IN ({','.join('?' * len(batch))})",
+                    batch,
+                )
+                for row in rows:
+                    record = self.row_to_record(row)
+                    # a puzzle hash can be derived for several wallets, keep the same record as the single lookups
+                    existing = records.get(record.puzzle_hash)
+                    if existing is None or record.wallet_id < existing.wallet_id:
+                        records[record.puzzle_hash] = record
+        return records
+
     async def set_used_up_to(self, index: uint32) -> None:
         """
         Sets a derivation path to used so we don't use it again.
@@ -166,6 +253,11 @@ class WalletPuzzleStore:
         """
         Checks if passed puzzle_hash is present in the db.
         """
+        await self._add_pending_to_index()
+        if not self.puzzle_hash_index.may_contain(puzzle_hash):
+            return False
+        if self.puzzle_hash_index.complete and not self.puzzle_hash_index.is_pending(puzzle_hash):
+            return True
 
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
@@ -222,6 +314,12 @@ class WalletPuzzleStore:
         Returns the derivation path for the puzzle_hash.
         Returns None if not present.
         """
+        await self._add_pending_to_index()
+        info = self.puzzle_hash_index.get(puzzle_hash)
+        if info is not None:
+            return info.derivation_index
+        if not self.puzzle_hash_index.may_contain(puzzle_hash):
+            return None
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
                 conn, "SELECT derivation_index FROM derivation_paths WHERE puzzle_hash=?", (puzzle_hash.hex(),)
@@ -233,6 +331,9 @@ class WalletPuzzleStore:
         Returns the derivation path for the puzzle_hash.
         Returns None if not present.
         """
+        await self._add_pending_to_index()
+        if not self.puzzle_hash_index.may_contain(puzzle_hash):
+            return None
         async with self.db_wrapper.reader_no_transaction() as conn:
             row = await execute_fetchone(
                 conn,
@@ -272,6 +373,12 @@ class WalletPuzzleStore:
         Returns the derivation path for the puzzle_hash.
         Returns None if not present.
         """
+        await self._add_pending_to_index()
+        info = self.puzzle_hash_index.get(puzzle_hash)
+        if info is not None:
+            return info.wallet_id, info.wallet_type
+        if not self.puzzle_hash_index.may_contain(puzzle_hash):
+            return None
         cached = self.wallet_info_for_ph_cache.get(puzzle_hash)
         if cached is not None:
             return cached
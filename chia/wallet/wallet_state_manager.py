@@ -3,12 +3,13 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import multiprocessing
 import multiprocessing.context
 import time
 from collections import defaultdict
 from pathlib import Path
 from secrets import token_bytes
-from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type, TypeVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Type, TypeVar, Union
 
 import aiosqlite
 from blspy import G1Element, PrivateKey
@@ -33,25 +34,19 @@ from chia.types.coin_spend import CoinSpend
 from chia.types.full_block import FullBlock
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
 from chia.util.bech32m import encode_puzzle_hash
+from chia.util.config import process_config_start_method
 from chia.util.db_synchronous import db_synchronous_on
 from chia.util.db_wrapper import DBWrapper2
 from chia.util.errors import Err
 from chia.util.ints import uint8, uint32, uint64, uint128
-from chia.util.lru_cache import LRUCache
 from chia.util.path import path_from_root
 from chia.wallet.cat_wallet.cat_constants import DEFAULT_CATS
 from chia.wallet.cat_wallet.cat_utils import construct_cat_puzzle, match_cat_puzzle
 from chia.wallet.cat_wallet.cat_wallet import CATWallet
+from chia.wallet.coin_selection import DEFAULT_TIME_BUDGET, CoinSelectionObjective
 from chia.wallet.db_wallet.db_wallet_puzzles import MIRROR_PUZZLE_HASH
 from chia.wallet.derivation_record import DerivationRecord
-from chia.wallet.derive_keys import (
-    _derive_path,
-    _derive_path_unhardened,
-    master_sk_to_wallet_sk,
-    master_sk_to_wallet_sk_intermediate,
-    master_sk_to_wallet_sk_unhardened,
-    master_sk_to_wallet_sk_unhardened_intermediate,
-)
+from chia.wallet.derive_keys import master_sk_to_wallet_sk, master_sk_to_wallet_sk_unhardened
 from chia.wallet.did_wallet.did_info import DIDInfo
 from chia.wallet.did_wallet.did_wallet import DIDWallet
 from chia.wallet.did_wallet.did_wallet_puzzles import DID_INNERPUZ_MOD, create_fullpuz, match_did_puzzle
@@ -70,6 +65,8 @@ from chia.wallet.transaction_record import TransactionRecord
 from chia.wallet.uncurried_puzzle import uncurry_puzzle
 from chia.wallet.util.address_type import AddressType
 from chia.wallet.util.compute_hints import compute_coin_hints
+from chia.wallet.util.puzzle_hash_derivation import PuzzleHashDerivationEngine
+from chia.wallet.util.puzzle_hash_index import DEFAULT_MAX_ENTRIES as PUZZLE_HASH_INDEX_MAX_ENTRIES
 from chia.wallet.util.transaction_type import TransactionType
 from chia.wallet.util.wallet_sync_utils import PeerRequestException, last_change_height_cs
 from chia.wallet.util.wallet_types import WalletType
@@ -86,6 +83,7 @@ from chia.wallet.wallet_puzzle_store import WalletPuzzleStore
 from chia.wallet.wallet_retry_store import WalletRetryStore
 from chia.wallet.wallet_transaction_store import WalletTransactionStore
 from chia.wallet.wallet_user_store import WalletUserStore
+from chia.wallet.wallet_validation_cache_store import DEFAULT_MAX_ENTRIES, WalletValidationCacheStore
 
 TWalletType = TypeVar("TWalletType", bound=WalletProtocol)
 
@@ -129,7 +127,9 @@ class WalletStateManager:
     coin_store: WalletCoinStore
     interested_store: WalletInterestedStore
     retry_store: WalletRetryStore
+    validation_cache_store: WalletValidationCacheStore
     multiprocessing_context: multiprocessing.context.BaseContext
+    derivation_engine: PuzzleHashDerivationEngine
     server: ChiaServer
     root_path: Path
     wallet_node: Any
@@ -138,6 +138,11 @@ class WalletStateManager:
     default_cats: Dict[str, Any]
     asset_to_wallet_map: Dict[AssetType, Any]
     initial_num_public_keys: int
+    derivation_paths_batch_size: int
+    coin_state_batch_size: int
+    max_concurrent_peer_requests: int
+    coin_selection_objective: CoinSelectionObjective
+    coin_selection_time_budget: float
 
     @staticmethod
     async def create(
@@ -172,6 +177,19 @@ class WalletStateManager:
             synchronous=db_synchronous_on(self.config.get("db_sync", "auto")),
         )
 
+        multiprocessing_start_method = process_config_start_method(config=self.config, log=self.log)
+        self.multiprocessing_context = multiprocessing.get_context(method=multiprocessing_start_method)
+        self.derivation_engine = PuzzleHashDerivationEngine(
+            self.multiprocessing_context, self.config.get("puzzle_hash_derivation_processes")
+        )
+        self.derivation_paths_batch_size = 1000
+        self.coin_state_batch_size = 1000
+        self.max_concurrent_peer_requests = 10
+        self.coin_selection_objective = CoinSelectionObjective(
+            self.config.get("coin_selection_objective", CoinSelectionObjective.DEFAULT.value)
+        )
+        self.coin_selection_time_budget = float(self.config.get("coin_selection_time_budget", DEFAULT_TIME_BUDGET))
+
         self.initial_num_public_keys = config["initial_num_public_keys"]
         min_num_public_keys = 425
         if not config.get("testing", False) and self.initial_num_public_keys < min_num_public_keys:
@@ -179,7 +197,9 @@ class WalletStateManager:
 
         self.coin_store = await WalletCoinStore.create(self.db_wrapper)
         self.tx_store = await WalletTransactionStore.create(self.db_wrapper)
-        self.puzzle_store = await WalletPuzzleStore.create(self.db_wrapper)
+        self.puzzle_store = await WalletPuzzleStore.create(
+            self.db_wrapper, self.config.get("puzzle_hash_index_max_entries", PUZZLE_HASH_INDEX_MAX_ENTRIES)
+        )
         self.user_store = await WalletUserStore.create(self.db_wrapper)
         self.nft_store = await WalletNftStore.create(self.db_wrapper)
         self.basic_store = await KeyValStore.create(self.db_wrapper)
@@ -190,6 +210,9 @@ class WalletStateManager:
         self.dl_store = await DataLayerStore.create(self.db_wrapper)
         self.interested_store = await WalletInterestedStore.create(self.db_wrapper)
         self.retry_store = await WalletRetryStore.create(self.db_wrapper)
+        self.validation_cache_store = await WalletValidationCacheStore.create(
+            self.db_wrapper, self.config.get("validation_cache_max_entries", DEFAULT_MAX_ENTRIES)
+        )
         self.default_cats = DEFAULT_CATS
 
         self.wallet_node = wallet_node
@@ -307,19 +330,23 @@ class WalletStateManager:
         self.log.debug(f"Requested to generate puzzle hashes to at least index {unused}")
         start_t = time.time()
         to_generate = num_additional_phs if num_additional_phs is not None else self.initial_num_public_keys
+        last_index = unused + to_generate
         new_paths: bool = False
 
+        # The keys for an index are the same for every wallet, so derive them once for all target wallets.
+        start_indexes: Dict[uint32, int] = {}
         for wallet_id in targets:
             target_wallet = self.wallets[wallet_id]
             if not target_wallet.require_derivation_paths():
                 self.log.debug("Skipping wallet %s as no derivation paths required", wallet_id)
                 continue
+            if WalletType(target_wallet.type()) == WalletType.POOLING_WALLET:
+                continue
             last: Optional[uint32] = await self.puzzle_store.get_last_derivation_path_for_wallet(wallet_id)
             self.log.debug(
                 "Fetched last record for wallet %r:  %s (from_zero=%r, unused=%r)", wallet_id, last, from_zero, unused
             )
             start_index = 0
-            derivation_paths: List[DerivationRecord] = []
 
             if last is not None:
                 start_index = last + 1
@@ -327,67 +354,80 @@ class WalletStateManager:
             # If the key was replaced (from_zero=True), we should generate the puzzle hashes for the new key
             if from_zero:
                 start_index = 0
-            last_index = unused + to_generate
             if start_index >= last_index:
                 self.log.debug(f"Nothing to create for for wallet_id: {wallet_id}, index: {start_index}")
-            else:
-                creating_msg = (
-                    f"Creating puzzle hashes from {start_index} to {last_index - 1} for wallet_id: {wallet_id}"
-                )
-                self.log.info(f"Start: {creating_msg}")
-                intermediate_sk = master_sk_to_wallet_sk_intermediate(self.private_key)
-                intermediate_sk_un = master_sk_to_wallet_sk_unhardened_intermediate(self.private_key)
-                for index in range(start_index, last_index):
-                    if WalletType(target_wallet.type()) == WalletType.POOLING_WALLET:
-                        continue
+                continue
+            self.log.info(
+                f"Start: Creating puzzle hashes from {start_index} to {last_index - 1} for wallet_id: {wallet_id}"
+            )
+            start_indexes[wallet_id] = start_index
 
-                    # Hardened
-                    pubkey: G1Element = _derive_path(intermediate_sk, [index]).get_g1()
-                    puzzlehash: Optional[bytes32] = target_wallet.puzzle_hash_for_pk(pubkey)
-                    if puzzlehash is None:
-                        self.log.error(f"Unable to create puzzles with wallet {target_wallet}")
-                        break
-                    self.log.debug(f"Puzzle at index {index} wallet ID {wallet_id} puzzle hash {puzzlehash.hex()}")
-                    new_paths = True
-                    derivation_paths.append(
-                        DerivationRecord(
-                            uint32(index),
-                            puzzlehash,
-                            pubkey,
-                            WalletType(target_wallet.type()),
-                            uint32(target_wallet.id()),
-                            True,
-                        )
-                    )
-                    # Unhardened
-                    pubkey_unhardened: G1Element = _derive_path_unhardened(intermediate_sk_un, [index]).get_g1()
-                    puzzlehash_unhardened: Optional[bytes32] = target_wallet.puzzle_hash_for_pk(pubkey_unhardened)
-                    if puzzlehash_unhardened is None:
-                        self.log.error(f"Unable to create puzzles with wallet {target_wallet}")
-                        break
-                    self.log.debug(
-                        f"Puzzle at index {index} wallet ID {wallet_id} puzzle hash {puzzlehash_unhardened.hex()}"
-                    )
-                    # We await sleep here to allow an asyncio context switch (since the other parts of this loop do
-                    # not have await and therefore block). This can prevent networking layer from responding to ping.
-                    await asyncio.sleep(0)
-                    derivation_paths.append(
-                        DerivationRecord(
-                            uint32(index),
-                            puzzlehash_unhardened,
-                            pubkey_unhardened,
-                            WalletType(target_wallet.type()),
-                            uint32(target_wallet.id()),
-                            False,
-                        )
-                    )
-                self.log.info(f"Done: {creating_msg} Time: {time.time() - start_t} seconds")
+        derivation_paths: List[DerivationRecord] = []
+
+        async def add_derivation_paths() -> None:
             await self.puzzle_store.add_derivation_paths(derivation_paths)
             if len(derivation_paths) > 0:
-                await self.wallet_node.new_peak_queue.subscribe_to_puzzle_hashes(
-                    [record.puzzle_hash for record in derivation_paths]
-                )
+                puzzle_hashes = [record.puzzle_hash for record in derivation_paths]
+                self.wallet_node.push_long_sync_subscriptions(puzzle_hashes=puzzle_hashes)
+                await self.wallet_node.new_peak_queue.subscribe_to_puzzle_hashes(puzzle_hashes)
                 self.state_changed("new_derivation_index", data_object={"index": derivation_paths[-1].index})
+            derivation_paths.clear()
+
+        if len(start_indexes) > 0:
+            async for derived_keys in self.derivation_engine.derive(
+                self.private_key, min(start_indexes.values()), last_index
+            ):
+                for keys in derived_keys:
+                    for wallet_id, start_index in list(start_indexes.items()):
+                        if keys.index < start_index:
+                            continue
+                        target_wallet = self.wallets[wallet_id]
+                        wallet_type = WalletType(target_wallet.type())
+                        puzzlehash: Optional[bytes32]
+                        puzzlehash_unhardened: Optional[bytes32]
+                        if wallet_type == WalletType.STANDARD_WALLET:
+                            puzzlehash = keys.puzzle_hash
+                            puzzlehash_unhardened = keys.puzzle_hash_unhardened
+                        else:
+                            puzzlehash = target_wallet.puzzle_hash_for_pk(keys.pubkey)
+                            puzzlehash_unhardened = target_wallet.puzzle_hash_for_pk(keys.pubkey_unhardened)
+                        if puzzlehash is None or puzzlehash_unhardened is None:
+                            self.log.error(f"Unable to create puzzles with wallet {target_wallet}")
+                            del start_indexes[wallet_id]
+                            continue
+                        self.log.debug(
+                            f"Puzzle at index {keys.index} wallet ID {wallet_id} puzzle hashes {puzzlehash.hex()} "
+                            f"{puzzlehash_unhardened.hex()}"
+                        )
+                        new_paths = True
+                        derivation_paths.append(
+                            DerivationRecord(
+                                uint32(keys.index),
+                                puzzlehash,
+                                keys.pubkey,
+                                wallet_type,
+                                uint32(target_wallet.id()),
+                                True,
+                            )
+                        )
+                        derivation_paths.append(
+                            DerivationRecord(
+                                uint32(keys.index),
+                                puzzlehash_unhardened,
+                                keys.pubkey_unhardened,
+                                wallet_type,
+                                uint32(target_wallet.id()),
+                                False,
+                            )
+                        )
+                # Stream the records into the store as they are produced instead of holding the whole range.
+                if len(derivation_paths) >= self.derivation_paths_batch_size:
+                    await add_derivation_paths()
+            await add_derivation_paths()
+            self.log.info(
+                f"Done: Creating puzzle hashes up to {last_index - 1} for wallet_ids: {list(start_indexes.keys())} "
+                f"Time: {time.time() - start_t} seconds"
+            )
         # By default, we'll mark previously generated unused puzzle hashes as used if we have new paths
         if mark_existing_as_used and unused > 0 and new_paths:
             self.log.info(f"Updating last used derivation index: {unused - 1}")
@@ -548,6 +588,16 @@ class WalletStateManager:
 
         return spendable_amount
 
+    async def get_wallet_puzzle_hashes(self, coins: Iterable[Coin], wallet_id: int) -> Set[bytes32]:
+        """
+        Returns the puzzle hashes of the coins which we have the keys for in this wallet, looked up in one go.
+        """
+        puzzle_hashes = list({coin.puzzle_hash for coin in coins})
+        if len(puzzle_hashes) == 0:
+            return set()
+        records = await self.puzzle_store.get_derivation_records_for_puzzle_hashes(puzzle_hashes)
+        return {puzzle_hash for puzzle_hash, record in records.items() if record.wallet_id == wallet_id}
+
     async def does_coin_belong_to_wallet(self, coin: Coin, wallet_id: int) -> bool:
         """
         Returns true if we have the key for this coin.
@@ -571,9 +621,8 @@ class WalletStateManager:
         """
         Returns the confirmed balance, including coinbase rewards that are not spendable.
         """
-        # lock only if unspent_coin_records is None
         if unspent_coin_records is None:
-            unspent_coin_records = await self.coin_store.get_unspent_coins_for_wallet(wallet_id)
+            return await self.coin_store.get_confirmed_balance(wallet_id)
         return uint128(sum(cr.coin.amount for cr in unspent_coin_records))
 
     async def get_unconfirmed_balance(
@@ -583,25 +632,61 @@ class WalletStateManager:
         Returns the balance, including coinbase rewards that are not spendable, and unconfirmed
         transactions.
         """
-        # This API should change so that get_balance_from_coin_records is called for Set[WalletCoinRecord]
-        # and this method is called only for the unspent_coin_records==None case.
-        if unspent_coin_records is None:
-            unspent_coin_records = await self.coin_store.get_unspent_coins_for_wallet(wallet_id)
-
         unconfirmed_tx: List[TransactionRecord] = await self.tx_store.get_unconfirmed_for_wallet(wallet_id)
-        all_unspent_coins: Set[Coin] = {cr.coin for cr in unspent_coin_records}
+        wallet_puzzle_hashes = await self.get_wallet_puzzle_hashes(
+            (coin for record in unconfirmed_tx for coin in record.additions + record.removals), wallet_id
+        )
+
+        if unspent_coin_records is not None:
+            all_unspent_coins: Set[Coin] = {cr.coin for cr in unspent_coin_records}
+            for record in unconfirmed_tx:
+                for addition in record.additions:
+                    # This change or a self transaction
+                    if addition.puzzle_hash in wallet_puzzle_hashes:
+                        all_unspent_coins.add(addition)
 
+                for removal in record.removals:
+                    if removal.puzzle_hash in wallet_puzzle_hashes and removal in all_unspent_coins:
+                        all_unspent_coins.remove(removal)
+
+            return uint128(sum(coin.amount for coin in all_unspent_coins))
+
+        index = await self.coin_store.get_unspent_index(wallet_id)
+        if index is None:
+            return await self.get_unconfirmed_balance(
+                wallet_id, await self.coin_store.get_unspent_coins_for_wallet(wallet_id)
+            )
+        # Apply the unconfirmed transactions on top of the indexed balance, without copying the unspent coins.
+        balance = index.balance
+        added: Dict[bytes32, Coin] = {}
+        removed: Set[bytes32] = set()
         for record in unconfirmed_tx:
             for addition in record.additions:
-                # This change or a self transaction
-                if await self.does_coin_belong_to_wallet(addition, wallet_id):
-                    all_unspent_coins.add(addition)
+                if addition.puzzle_hash not in wallet_puzzle_hashes:
+                    continue
+                name = addition.name()
+                if name in index:
+                    if name in removed:
+                        removed.remove(name)
+                        balance += addition.amount
+                elif name not in added:
+                    added[name] = addition
+                    balance += addition.amount
 
             for removal in record.removals:
-                if await self.does_coin_belong_to_wallet(removal, wallet_id) and removal in all_unspent_coins:
-                    all_unspent_coins.remove(removal)
-
-        return uint128(sum(coin.amount for coin in all_unspent_coins))
+                if removal.puzzle_hash not in wallet_puzzle_hashes:
+                    continue
+                name = removal.name()
+                amount = index.get_amount(name)
+                if amount is not None:
+                    if name not in removed:
+                        removed.add(name)
+                        balance -= amount
+                elif name in added:
+                    del added[name]
+                    balance -= removal.amount
+
+        return uint128(balance)
 
     async def unconfirmed_removals_for_wallet(self, wallet_id: int) -> Dict[bytes32, Coin]:
         """
@@ -1002,15 +1087,232 @@ class WalletStateManager:
         trade_removals = await self.trade_manager.get_coins_of_interest()
         all_unconfirmed: List[TransactionRecord] = await self.tx_store.get_all_unconfirmed()
         trade_coin_removed: List[CoinState] = []
-        used_up_to = -1
-        ph_to_index_cache: LRUCache = LRUCache(100)
 
         local_records: List[Optional[WalletCoinRecord]] = await self.coin_store.get_coin_records(
             [st.coin.name() for st in coin_states]
         )
+        puzzle_hashes: List[bytes32] = [st.coin.puzzle_hash for st in coin_states]
+        derivation_records = await self.puzzle_store.get_derivation_records_for_puzzle_hashes(puzzle_hashes)
 
         assert len(local_records) == len(coin_states)
+        # Consecutive states of the same kind are grouped into runs, and the runs are applied one after the other so
+        # the height order is kept. Plain XCH coin states are applied in one transaction per run, with their children
+        # looked up concurrently, while the ones that may need peer lookups to find their wallet are processed one at
+        # a time.
+        runs: List[Tuple[bool, List[Tuple[CoinState, Optional[WalletCoinRecord]]]]] = []
         for coin_state, local_record in zip(coin_states, local_records):
+            derivation_record = derivation_records.get(coin_state.coin.puzzle_hash)
+            simple = self.is_simple_coin_state(coin_state, local_record, derivation_record)
+            if len(runs) == 0 or runs[-1][0] != simple or len(runs[-1][1]) >= self.coin_state_batch_size:
+                runs.append((simple, []))
+            runs[-1][1].append((coin_state, local_record))
+
+        for simple, run in runs:
+            if simple:
+                await self.apply_simple_coin_states(
+                    run, derivation_records, all_unconfirmed, trade_removals, trade_coin_removed, peer, fork_height
+                )
+            else:
+                await self.process_coin_states(
+                    run, derivation_records, all_unconfirmed, trade_removals, trade_coin_removed, peer, fork_height
+                )
+
+        for coin_state_removed in trade_coin_removed:
+            await self.trade_manager.coins_of_interest_farmed(coin_state_removed, fork_height, peer)
+
+    def is_simple_coin_state(
+        self,
+        coin_state: CoinState,
+        local_record: Optional[WalletCoinRecord],
+        derivation_record: Optional[DerivationRecord],
+    ) -> bool:
+        """
+        Standard wallet coins which are either newly added, or spent while we already have them, can be applied
+        without looking anything up from a peer apart from the children of the spent coins.
+        """
+        if derivation_record is None or derivation_record.wallet_type != WalletType.STANDARD_WALLET:
+            return False
+        if coin_state.created_height is None:
+            return False
+        if coin_state.spent_height is None:
+            return local_record is None
+        return local_record is not None and local_record.wallet_type == WalletType.STANDARD_WALLET
+
+    async def apply_simple_coin_states(
+        self,
+        coin_states: List[Tuple[CoinState, Optional[WalletCoinRecord]]],
+        derivation_records: Dict[bytes32, DerivationRecord],
+        all_unconfirmed: List[TransactionRecord],
+        trade_removals: Set[bytes32],
+        trade_coin_removed: List[CoinState],
+        peer: WSChiaConnection,
+        fork_height: Optional[uint32],
+    ) -> None:
+        """
+        Applies the coin states selected by `is_simple_coin_state` in order, in one transaction. The children of the
+        spent coins we don't have as spent yet are fetched concurrently up front. Spent coins which created a
+        singleton launcher are handed over to `process_coin_states`, between the transactions of the states before
+        and after them.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_peer_requests)
+
+        async def fetch_children(coin_state: CoinState) -> List[CoinState]:
+            async with semaphore:
+                return await self.wallet_node.fetch_children(coin_state.coin.name(), peer=peer, fork_height=fork_height)
+
+        spent_states = [
+            coin_state
+            for coin_state, local_record in coin_states
+            if coin_state.spent_height is not None and not self.coin_record_matches(local_record, coin_state)
+        ]
+        children_results = await asyncio.gather(
+            *(fetch_children(coin_state) for coin_state in spent_states), return_exceptions=True
+        )
+        children_for_state: Dict[bytes32, Union[List[CoinState], BaseException]] = {
+            coin_state.coin.name(): children for coin_state, children in zip(spent_states, children_results)
+        }
+
+        added_coins = False
+        batch: List[Tuple[CoinState, Optional[WalletCoinRecord]]] = []
+        for coin_state, local_record in coin_states:
+            children = children_for_state.get(coin_state.coin.name())
+            if isinstance(children, list) and any(
+                child.coin.puzzle_hash == SINGLETON_LAUNCHER_HASH for child in children
+            ):
+                if await self.apply_simple_coin_state_batch(
+                    batch,
+                    children_for_state,
+                    derivation_records,
+                    all_unconfirmed,
+                    trade_removals,
+                    trade_coin_removed,
+                    peer,
+                    fork_height,
+                ):
+                    added_coins = True
+                batch = []
+                await self.process_coin_states(
+                    [(coin_state, local_record)],
+                    derivation_records,
+                    all_unconfirmed,
+                    trade_removals,
+                    trade_coin_removed,
+                    peer,
+                    fork_height,
+                )
+            else:
+                batch.append((coin_state, local_record))
+        if await self.apply_simple_coin_state_batch(
+            batch,
+            children_for_state,
+            derivation_records,
+            all_unconfirmed,
+            trade_removals,
+            trade_coin_removed,
+            peer,
+            fork_height,
+        ):
+            added_coins = True
+
+        if added_coins:
+            await self.create_more_puzzle_hashes()
+
+    async def apply_simple_coin_state_batch(
+        self,
+        coin_states: List[Tuple[CoinState, Optional[WalletCoinRecord]]],
+        children_for_state: Dict[bytes32, Union[List[CoinState], BaseException]],
+        derivation_records: Dict[bytes32, DerivationRecord],
+        all_unconfirmed: List[TransactionRecord],
+        trade_removals: Set[bytes32],
+        trade_coin_removed: List[CoinState],
+        peer: WSChiaConnection,
+        fork_height: Optional[uint32],
+    ) -> bool:
+        """
+        Applies the coin states in one transaction, each in its own savepoint so a failing state is only rolled back
+        itself and retried later. Returns whether coins were added.
+        """
+        if len(coin_states) == 0:
+            return False
+
+        added_coins = False
+        used_up_to = -1
+        async with self.db_wrapper.writer():
+            for coin_state, local_record in coin_states:
+                coin_name: bytes32 = coin_state.coin.name()
+                try:
+                    async with self.db_wrapper.writer():
+                        children = children_for_state.get(coin_name)
+                        if isinstance(children, BaseException):
+                            raise children
+
+                        await self.retry_store.remove_state(coin_state)
+                        self.log.debug("%s: %s", coin_name, coin_state)
+                        assert coin_state.created_height is not None
+                        if self.coin_record_matches(local_record, coin_state):
+                            continue
+
+                        derivation_record = derivation_records[coin_state.coin.puzzle_hash]
+                        used_up_to = max(used_up_to, derivation_record.index)
+                        if coin_state.spent_height is None:
+                            await self.coin_added(
+                                coin_state.coin,
+                                uint32(coin_state.created_height),
+                                all_unconfirmed,
+                                derivation_record.wallet_id,
+                                derivation_record.wallet_type,
+                                peer,
+                                coin_name,
+                                create_puzzle_hashes=False,
+                            )
+                            added_coins = True
+                        else:
+                            self.log.debug("Coin Removed: %s", coin_state)
+                            if coin_name in trade_removals:
+                                trade_coin_removed.append(coin_state)
+                            await self.coin_store.set_spent(coin_name, uint32(coin_state.spent_height))
+                            for unconfirmed_record in all_unconfirmed:
+                                if coin_state.coin in unconfirmed_record.removals:
+                                    self.log.info(f"Setting tx_id: {unconfirmed_record.name} to confirmed")
+                                    await self.tx_store.set_confirmed(
+                                        unconfirmed_record.name, uint32(coin_state.spent_height)
+                                    )
+                except Exception as e:
+                    self.log.exception(f"Error adding state... {e}")
+                    if isinstance(e, PeerRequestException) or isinstance(e, aiosqlite.Error):
+                        await self.retry_store.add_state(coin_state, peer.peer_node_id, fork_height)
+                    else:
+                        await self.retry_store.remove_state(coin_state)
+
+            # Update the DB to signal that we used puzzle hashes up to this one
+            if used_up_to >= 0:
+                await self.puzzle_store.set_used_up_to(uint32(used_up_to))
+
+        return added_coins
+
+    @staticmethod
+    def coin_record_matches(local_record: Optional[WalletCoinRecord], coin_state: CoinState) -> bool:
+        """
+        Whether we already have the coin, spent and confirmed at the same heights as in the coin state.
+        """
+        return (
+            local_record is not None
+            and local_record.spent_block_height == (coin_state.spent_height or 0)
+            and local_record.confirmed_block_height == coin_state.created_height
+        )
+
+    async def process_coin_states(
+        self,
+        coin_states: List[Tuple[CoinState, Optional[WalletCoinRecord]]],
+        derivation_records: Dict[bytes32, DerivationRecord],
+        all_unconfirmed: List[TransactionRecord],
+        trade_removals: Set[bytes32],
+        trade_coin_removed: List[CoinState],
+        peer: WSChiaConnection,
+        fork_height: Optional[uint32],
+    ) -> None:
+        used_up_to = -1
+        for coin_state, local_record in coin_states:
             try:
                 async with self.db_wrapper.writer():
                     # This only succeeds if we don't raise out of the transaction
@@ -1018,9 +1320,12 @@ class WalletStateManager:
 
                     existing: Optional[WalletCoinRecord]
                     coin_name: bytes32 = coin_state.coin.name()
-                    wallet_info: Optional[Tuple[uint32, WalletType]] = await self.get_wallet_id_for_puzzle_hash(
-                        coin_state.coin.puzzle_hash
-                    )
+                    derivation_record: Optional[DerivationRecord] = derivation_records.get(coin_state.coin.puzzle_hash)
+                    wallet_info: Optional[Tuple[uint32, WalletType]]
+                    if derivation_record is not None:
+                        wallet_info = derivation_record.wallet_id, derivation_record.wallet_type
+                    else:
+                        wallet_info = await self.get_wallet_id_for_puzzle_hash(coin_state.coin.puzzle_hash)
                     self.log.debug("%s: %s", coin_name, coin_state)
 
                     # If we already have this coin, & it was spent & confirmed at the same heights, then return (done)
@@ -1057,11 +1362,12 @@ class WalletStateManager:
                         continue
 
                     # Update the DB to signal that we used puzzle hashes up to this one
-                    derivation_index = ph_to_index_cache.get(coin_state.coin.puzzle_hash)
-                    if derivation_index is None:
+                    derivation_index: Optional[uint32]
+                    if derivation_record is not None:
+                        derivation_index = derivation_record.index
+                    else:
                         derivation_index = await self.puzzle_store.index_for_puzzle_hash(coin_state.coin.puzzle_hash)
                     if derivation_index is not None:
-                        ph_to_index_cache.put(coin_state.coin.puzzle_hash, derivation_index)
                         if derivation_index > used_up_to:
                             await self.puzzle_store.set_used_up_to(derivation_index)
                             used_up_to = max(used_up_to, derivation_index)
@@ -1112,6 +1418,7 @@ class WalletStateManager:
                                 wallet_id,
                             )
                             await self.coin_store.add_coin_record(record)
+                            self.wallet_node.push_long_sync_subscriptions(coin_ids=[coin_name])
                             # Coin first received
                             parent_coin_record: Optional[WalletCoinRecord] = await self.coin_store.get_coin_record(
                                 coin_state.coin.parent_coin_info
@@ -1367,8 +1674,6 @@ class WalletStateManager:
                 else:
                     await self.retry_store.remove_state(coin_state)
                 continue
-        for coin_state_removed in trade_coin_removed:
-            await self.trade_manager.coins_of_interest_farmed(coin_state_removed, fork_height, peer)
 
     async def have_a_pool_wallet_with_launched_id(self, launcher_id: bytes32) -> bool:
         for wallet_id, wallet in self.wallets.items():
@@ -1432,6 +1737,7 @@ class WalletStateManager:
         wallet_type: WalletType,
         peer: WSChiaConnection,
         coin_name: bytes32,
+        create_puzzle_hashes: bool = True,
     ) -> None:
         """
         Adding coin to DB
@@ -1523,10 +1829,12 @@ class WalletStateManager:
             coin, height, uint32(0), False, farm_reward, wallet_type, wallet_id
         )
         await self.coin_store.add_coin_record(coin_record_1, coin_name)
+        self.wallet_node.push_long_sync_subscriptions(coin_ids=[coin_name])
 
         await self.wallets[wallet_id].coin_added(coin, height, peer)
 
-        await self.create_more_puzzle_hashes()
+        if create_puzzle_hashes:
+            await self.create_more_puzzle_hashes()
 
     async def add_pending_transaction(self, tx_record: TransactionRecord):
         """
@@ -1638,6 +1946,8 @@ class WalletStateManager:
         return remove_ids
 
     async def _await_closed(self) -> None:
+        self.derivation_engine.close()
+        await self.validation_cache_store.flush()
         await self.db_wrapper.close()
 
     def unlink_db(self) -> None:
@@ -1691,28 +2001,35 @@ class WalletStateManager:
     ) -> Set[WalletCoinRecord]:
         if records is None:
             records = await self.coin_store.get_unspent_coins_for_wallet(wallet_id)
-
+        locked_coin_names = await self.get_locked_coin_names(wallet_id)
+        return set(record for record in records if record.name() not in locked_coin_names)
+
+    async def get_spendable_coins_by_amount(self, wallet_id: int) -> List[WalletCoinRecord]:
+        """Same as get_spendable_coins_for_wallet, largest amount first."""
+        records = await self.coin_store.get_unspent_coins_by_amount(wallet_id)
+        locked_coin_names = await self.get_locked_coin_names(wallet_id)
+        if len(locked_coin_names) == 0:
+            return records
+        return [record for record in records if record.name() not in locked_coin_names]
+
+    async def get_locked_coin_names(self, wallet_id: int) -> Set[bytes32]:
+        """Returns the names of the unspent coins of the wallet that are already part of a transaction or trade."""
         # Coins that are currently part of a transaction
         unconfirmed_tx: List[TransactionRecord] = await self.tx_store.get_unconfirmed_for_wallet(wallet_id)
-        removal_dict: Dict[bytes32, Coin] = {}
+        wallet_puzzle_hashes = await self.get_wallet_puzzle_hashes(
+            (coin for tx in unconfirmed_tx for coin in tx.removals), wallet_id
+        )
+        locked_coin_names: Set[bytes32] = set()
         for tx in unconfirmed_tx:
             for coin in tx.removals:
                 # TODO, "if" might not be necessary once unconfirmed tx doesn't contain coins for other wallets
-                if await self.does_coin_belong_to_wallet(coin, wallet_id):
-                    removal_dict[coin.name()] = coin
+                if coin.puzzle_hash in wallet_puzzle_hashes:
+                    locked_coin_names.add(coin.name())
 
         # Coins that are part of the trade
         offer_locked_coins: Dict[bytes32, WalletCoinRecord] = await self.trade_manager.get_locked_coins()
-
-        filtered = set()
-        for record in records:
-            if record.coin.name() in offer_locked_coins:
-                continue
-            if record.coin.name() in removal_dict:
-                continue
-            filtered.add(record)
-
-        return filtered
+        locked_coin_names.update(offer_locked_coins.keys())
+        return locked_coin_names
 
     async def new_peak(self, peak: wallet_protocol.NewPeakWallet):
         for wallet_id, wallet in self.wallets.items():
@@ -1728,12 +2045,14 @@ class WalletStateManager:
         for puzzle_hash, wallet_id in zip(puzzle_hashes, wallet_ids):
             await self.interested_store.add_interested_puzzle_hash(puzzle_hash, wallet_id)
         if len(puzzle_hashes) > 0:
+            self.wallet_node.push_long_sync_subscriptions(puzzle_hashes=puzzle_hashes)
             await self.wallet_node.new_peak_queue.subscribe_to_puzzle_hashes(puzzle_hashes)
 
     async def add_interested_coin_ids(self, coin_ids: List[bytes32]) -> None:
         for coin_id in coin_ids:
             await self.interested_store.add_interested_coin_id(coin_id)
         if len(coin_ids) > 0:
+            self.wallet_node.push_long_sync_subscriptions(coin_ids=coin_ids)
             await self.wallet_node.new_peak_queue.subscribe_to_coin_ids(coin_ids)
 
     async def delete_trade_transactions(self, trade_id: bytes32):
@@ -2,14 +2,14 @@ from __future__ import annotations
 
 import dataclasses
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.mempool_inclusion_status import MempoolInclusionStatus
 from chia.util.db_wrapper import DBWrapper2
 from chia.util.errors import Err
-from chia.util.ints import uint8, uint32
-from chia.wallet.transaction_record import TransactionRecord
+from chia.util.ints import uint8, uint32, uint64
+from chia.wallet.transaction_record import TransactionRecord, TransactionSummary
 from chia.wallet.transaction_sorting import SortKey
 from chia.wallet.util.transaction_type import TransactionType
 
@@ -23,6 +23,51 @@ def filter_ok_mempool_status(sent_to: List[Tuple[str, uint8, Optional[str]]]) ->
     return new_sent_to
 
 
+# The columns of a TransactionSummary, in the order of its fields
+SUMMARY_COLUMNS = (
+    "confirmed_at_height, created_at_time, to_puzzle_hash, amount, fee_amount, confirmed, sent, wallet_id, trade_id,"
+    " type, bundle_id"
+)
+
+
+def summary_from_row(row: Sequence[Any]) -> TransactionSummary:
+    return TransactionSummary(
+        uint32(row[0]),
+        uint64(row[1]),
+        bytes32.fromhex(row[2]),
+        uint64.from_bytes(row[3]),
+        uint64.from_bytes(row[4]),
+        bool(row[5]),
+        uint32(row[6]),
+        uint32(row[7]),
+        None if row[8] is None else bytes32(row[8]),
+        uint32(row[9]),
+        bytes32(row[10]),
+    )
+
+
+def encode_cursor(values: Sequence[int]) -> str:
+    return ",".join(str(value) for value in values)
+
+
+def decode_cursor(cursor: str, num_values: int) -> List[int]:
+    try:
+        values = [int(value) for value in cursor.split(",")]
+    except ValueError:
+        raise ValueError(f"Invalid transaction cursor {cursor}")
+    if len(values) != num_values:
+        raise ValueError(f"Invalid transaction cursor {cursor}")
+    return values
+
+
+def get_sort_key(sort_key: Optional[str]) -> SortKey:
+    if sort_key is None:
+        sort_key = "CONFIRMED_AT_HEIGHT"
+    if sort_key not in SortKey.__members__:
+        raise ValueError(f"There is no known sort {sort_key}")
+    return SortKey[sort_key]
+
+
 class WalletTransactionStore:
     """
     WalletTransactionStore stores transaction history for the wallet.
@@ -77,6 +122,17 @@ class WalletTransactionStore:
                 "CREATE INDEX IF NOT EXISTS transaction_record_wallet_id on transaction_record(wallet_id)"
             )
 
+            # Serve the sorts of the transaction history of a wallet, and the cursors into it, from the index
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS tx_wallet_confirmed_height"
+                " on transaction_record(wallet_id, confirmed_at_height)"
+            )
+            # also finds the unconfirmed transactions of a wallet without scanning the confirmed ones
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS tx_wallet_relevance"
+                " on transaction_record(wallet_id, confirmed, confirmed_at_height DESC, created_at_time DESC)"
+            )
+
         self.tx_submitted = {}
         self.last_wallet_tx_resend_time = int(time.time())
         return self
@@ -266,34 +322,116 @@ class WalletTransactionStore:
     ) -> List[TransactionRecord]:
         """Return a list of transaction between start and end index. List is in reverse chronological order.
         start = 0 is most recent transaction
+        Paging deep into the history this way gets slow, get_transactions_page doesn't.
         """
         limit = end - start
 
+        params: List[Any] = [wallet_id]
         if to_puzzle_hash is None:
             puzz_hash_where = ""
         else:
-            puzz_hash_where = f' AND to_puzzle_hash="{to_puzzle_hash.hex()}"'
-
-        if sort_key is None:
-            sort_key = "CONFIRMED_AT_HEIGHT"
-        if sort_key not in SortKey.__members__:
-            raise ValueError(f"There is no known sort {sort_key}")
+            puzz_hash_where = " AND to_puzzle_hash=?"
+            params.append(to_puzzle_hash.hex())
 
+        sort = get_sort_key(sort_key)
         if reverse:
-            query_str = SortKey[sort_key].descending()
+            query_str = sort.descending()
         else:
-            query_str = SortKey[sort_key].ascending()
+            query_str = sort.ascending()
 
         async with self.db_wrapper.reader_no_transaction() as conn:
             rows = await conn.execute_fetchall(
                 f"SELECT transaction_record FROM transaction_record WHERE wallet_id=?{puzz_hash_where}"
                 f" {query_str}, rowid"
                 f" LIMIT {start}, {limit}",
-                (wallet_id,),
+                params,
             )
 
         return [TransactionRecord.from_bytes(row[0]) for row in rows]
 
+    async def _get_page(
+        self,
+        columns: str,
+        wallet_id: int,
+        limit: int,
+        cursor: Optional[str],
+        sort_key: Optional[str],
+        reverse: bool,
+        to_puzzle_hash: Optional[bytes32],
+    ) -> Tuple[List[Any], Optional[str]]:
+        # Keyset pagination: the cursor holds the sorted columns of the last row of the previous page, and the
+        # next page starts right after it in the index instead of counting rows from the start.
+        sort = get_sort_key(sort_key)
+        sort_columns = sort.columns(reverse) + [("rowid", False)]
+        where = "wallet_id=?"
+        params: List[Any] = [wallet_id]
+        if to_puzzle_hash is not None:
+            where += " AND to_puzzle_hash=?"
+            params.append(to_puzzle_hash.hex())
+        if cursor is not None:
+            values = decode_cursor(cursor, len(sort_columns))
+            first_column, first_descending = sort_columns[0]
+            # the bound on the first column lets the index seek to the cursor
+            where += f" AND {first_column}{'<=' if first_descending else '>='}?"
+            params.append(values[0])
+            after: List[str] = []
+            for i, (column, descending) in enumerate(sort_columns):
+                equal = [f"{equal_column}=?" for equal_column, _ in sort_columns[:i]]
+                after.append(" AND ".join(equal + [f"{column}{'<' if descending else '>'}?"]))
+                params.extend(values[: i + 1])
+            where += f" AND (({') OR ('.join(after)}))"
+        query_str = sort.descending() if reverse else sort.ascending()
+        params.append(limit)
+
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            rows = list(
+                await conn.execute_fetchall(
+                    f"SELECT {columns}, {', '.join(column for column, _ in sort_columns)} FROM transaction_record"
+                    f" WHERE {where} {query_str}, rowid LIMIT ?",
+                    params,
+                )
+            )
+
+        next_cursor = None
+        if len(rows) > 0 and len(rows) == limit:
+            next_cursor = encode_cursor(rows[-1][-len(sort_columns) :])
+        return rows, next_cursor
+
+    async def get_transactions_page(
+        self,
+        wallet_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort_key: Optional[str] = None,
+        reverse: bool = False,
+        to_puzzle_hash: Optional[bytes32] = None,
+    ) -> Tuple[List[TransactionRecord], Optional[str]]:
+        """
+        Returns up to limit transactions of the wallet, sorted like get_transactions_between, following the
+        transaction the cursor points to. Also returns the cursor of the next page, None after the last one.
+        """
+        rows, next_cursor = await self._get_page(
+            "transaction_record", wallet_id, limit, cursor, sort_key, reverse, to_puzzle_hash
+        )
+        return [TransactionRecord.from_bytes(row[0]) for row in rows], next_cursor
+
+    async def get_transaction_summaries_page(
+        self,
+        wallet_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort_key: Optional[str] = None,
+        reverse: bool = False,
+        to_puzzle_hash: Optional[bytes32] = None,
+    ) -> Tuple[List[TransactionSummary], Optional[str]]:
+        """
+        Like get_transactions_page, but only reads the summary of the transactions, not the full records.
+        """
+        rows, next_cursor = await self._get_page(
+            SUMMARY_COLUMNS, wallet_id, limit, cursor, sort_key, reverse, to_puzzle_hash
+        )
+        return [summary_from_row(row) for row in rows], next_cursor
+
     async def get_transaction_count_for_wallet(self, wallet_id) -> int:
         async with self.db_wrapper.reader_no_transaction() as conn:
             rows = list(
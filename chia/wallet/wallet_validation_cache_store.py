@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.db_wrapper import DBWrapper2
+from chia.util.ints import uint32
+from chia.util.lru_cache import LRUCache
+
+DEFAULT_MAX_ENTRIES = 20000
+
+
+class WalletValidationCacheStore:
+    """
+    Persistent results of the untrusted state validation, shared by all peers and kept across restarts.
+    Blocks proven to be in the chain are keyed by reward chain hash, checked block signatures by the hash of
+    the signed data and checked additions proofs by header hash and puzzle hash. Every entry records the
+    height it relates to, so that clear_after_height can invalidate it when the wallet's chain is rolled back.
+    The entries are mirrored in memory for the synchronous lookups of the validation, and written to the
+    DB in batches by flush(). Each kind of entry is bounded to max_entries, the oldest ones are dropped.
+    """
+
+    db_wrapper: DBWrapper2
+    max_entries: int
+    _blocks_validated: LRUCache[bytes32, uint32]  # reward_chain_hash -> height
+    _block_signatures_validated: LRUCache[bytes32, uint32]  # sig_hash -> height
+    _additions_in_block: LRUCache[Tuple[bytes32, bytes32], uint32]  # header_hash, puzzle_hash -> height
+    _pending_blocks: List[Tuple[bytes32, uint32]]
+    _pending_block_signatures: List[Tuple[bytes32, uint32]]
+    _pending_additions: List[Tuple[bytes32, bytes32, uint32]]
+    # lowest height above which the DB entries have to be removed on the next flush
+    _pending_clear_height: Optional[int]
+
+    @classmethod
+    async def create(
+        cls, db_wrapper: DBWrapper2, max_entries: int = DEFAULT_MAX_ENTRIES
+    ) -> "WalletValidationCacheStore":
+        self = cls()
+        self.db_wrapper = db_wrapper
+        self.max_entries = max_entries
+        self._blocks_validated = LRUCache(max_entries)
+        self._block_signatures_validated = LRUCache(max_entries)
+        self._additions_in_block = LRUCache(max_entries)
+        self._pending_blocks = []
+        self._pending_block_signatures = []
+        self._pending_additions = []
+        self._pending_clear_height = None
+
+        async with self.db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS validated_blocks(reward_chain_hash blob PRIMARY KEY, height int)"
+            )
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS validated_block_signatures(sig_hash blob PRIMARY KEY, height int)"
+            )
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS validated_additions("
+                " header_hash blob,"
+                " puzzle_hash blob,"
+                " height int,"
+                " PRIMARY KEY(header_hash, puzzle_hash))"
+            )
+            await conn.execute("CREATE INDEX IF NOT EXISTS validated_blocks_height on validated_blocks(height)")
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS validated_block_signatures_height on validated_block_signatures(height)"
+            )
+            await conn.execute("CREATE INDEX IF NOT EXISTS validated_additions_height on validated_additions(height)")
+
+        async with self.db_wrapper.reader_no_transaction() as conn:
+            # oldest first, so that the most recent entries are the last ones to be evicted from memory
+            for row in await conn.execute_fetchall(
+                "SELECT reward_chain_hash, height FROM validated_blocks ORDER BY rowid"
+            ):
+                self._blocks_validated.put(bytes32(row[0]), uint32(row[1]))
+            for row in await conn.execute_fetchall(
+                "SELECT sig_hash, height FROM validated_block_signatures ORDER BY rowid"
+            ):
+                self._block_signatures_validated.put(bytes32(row[0]), uint32(row[1]))
+            for row in await conn.execute_fetchall(
+                "SELECT header_hash, puzzle_hash, height FROM validated_additions ORDER BY rowid"
+            ):
+                self._additions_in_block.put((bytes32(row[0]), bytes32(row[1])), uint32(row[2]))
+
+        return self
+
+    def in_blocks_validated(self, reward_chain_hash: bytes32) -> bool:
+        return self._blocks_validated.get(reward_chain_hash) is not None
+
+    def add_to_blocks_validated(self, reward_chain_hash: bytes32, height: uint32) -> None:
+        if self._blocks_validated.get(reward_chain_hash) is None:
+            self._pending_blocks.append((reward_chain_hash, height))
+        self._blocks_validated.put(reward_chain_hash, height)
+
+    def in_block_signatures_validated(self, sig_hash: bytes32) -> bool:
+        return self._block_signatures_validated.get(sig_hash) is not None
+
+    def add_to_block_signatures_validated(self, sig_hash: bytes32, height: uint32) -> None:
+        if self._block_signatures_validated.get(sig_hash) is None:
+            self._pending_block_signatures.append((sig_hash, height))
+        self._block_signatures_validated.put(sig_hash, height)
+
+    def in_additions_in_block(self, header_hash: bytes32, puzzle_hash: bytes32) -> bool:
+        return self._additions_in_block.get((header_hash, puzzle_hash)) is not None
+
+    def add_to_additions_in_block(self, header_hash: bytes32, puzzle_hash: bytes32, height: uint32) -> None:
+        if self._additions_in_block.get((header_hash, puzzle_hash)) is None:
+            self._pending_additions.append((header_hash, puzzle_hash, height))
+        self._additions_in_block.put((header_hash, puzzle_hash), height)
+
+    def clear_after_height(self, height: int) -> None:
+        # Remove any entry which relates to an event that happened at a height above height.
+        for rc_hash in [key for key, h in self._blocks_validated.cache.items() if h > height]:
+            self._blocks_validated.remove(rc_hash)
+        for sig_hash in [key for key, h in self._block_signatures_validated.cache.items() if h > height]:
+            self._block_signatures_validated.remove(sig_hash)
+        for addition in [key for key, h in self._additions_in_block.cache.items() if h > height]:
+            self._additions_in_block.remove(addition)
+        self._pending_blocks = [entry for entry in self._pending_blocks if entry[1] <= height]
+        self._pending_block_signatures = [entry for entry in self._pending_block_signatures if entry[1] <= height]
+        self._pending_additions = [entry for entry in self._pending_additions if entry[2] <= height]
+        if self._pending_clear_height is None or height < self._pending_clear_height:
+            self._pending_clear_height = height
+
+    async def flush(self) -> None:
+        """Writes the changes since the last flush to the DB."""
+        if (
+            self._pending_clear_height is None
+            and len(self._pending_blocks) == 0
+            and len(self._pending_block_signatures) == 0
+            and len(self._pending_additions) == 0
+        ):
+            return
+        clear_height = self._pending_clear_height
+        blocks = self._pending_blocks
+        block_signatures = self._pending_block_signatures
+        additions = self._pending_additions
+        self._pending_clear_height = None
+        self._pending_blocks = []
+        self._pending_block_signatures = []
+        self._pending_additions = []
+
+        async with self.db_wrapper.writer_maybe_transaction() as conn:
+            if clear_height is not None:
+                for table in ("validated_blocks", "validated_block_signatures", "validated_additions"):
+                    await conn.execute(f"DELETE FROM {table} WHERE height>?", (clear_height,))
+            await conn.executemany("INSERT OR REPLACE INTO validated_blocks VALUES(?, ?)", blocks)
+            await conn.executemany("INSERT OR REPLACE INTO validated_block_signatures VALUES(?, ?)", block_signatures)
+            await conn.executemany("INSERT OR REPLACE INTO validated_additions VALUES(?, ?, ?)", additions)
+            for table in ("validated_blocks", "validated_block_signatures", "validated_additions"):
+                # drop the oldest entries beyond the bound
+                await conn.execute(
+                    f"DELETE FROM {table} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} ORDER BY rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
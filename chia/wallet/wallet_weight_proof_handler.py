@@ -27,9 +27,10 @@ class WalletWeightProofHandler:
         self,
         constants: ConsensusConstants,
         multiprocessing_context: BaseContext,
+        num_processes: int = 4,
     ):
         self._constants = constants
-        self._num_processes = 4
+        self._num_processes = max(1, num_processes)
         self._executor_shutdown_tempfile: IO = _create_shutdown_file()
         self._executor: ProcessPoolExecutor = ProcessPoolExecutor(
             self._num_processes,
@@ -61,7 +62,6 @@ class WalletWeightProofHandler:
                 self._constants,
                 self._executor,
                 self._executor_shutdown_tempfile.name,
-                self._num_processes,
                 weight_proof,
                 summaries,
                 sub_epoch_weight_list,
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import multiprocessing
+import shutil
 import time
 from dataclasses import replace
 from secrets import token_bytes
@@ -16,6 +18,7 @@ from chia.consensus.block_rewards import calculate_base_farmer_reward
 from chia.consensus.blockchain import ReceiveBlockResult
 from chia.consensus.coinbase import create_farmer_coin
 from chia.consensus.multiprocess_validation import PreValidationResult
+from chia.consensus.pending_block_records import PendingBlockRecords
 from chia.consensus.pot_iterations import is_overflow_block
 from chia.full_node.bundle_tools import detect_potential_template_generator
 from chia.full_node.mempool_check_conditions import get_name_puzzle_conditions
@@ -610,7 +613,8 @@ class TestBlockHeaderValidation:
 
         await db_wrapper.close()
         bc1.shut_down()
-        db_path.unlink()
+        await bc1.close()
+        shutil.rmtree(db_path.parent)
 
     @pytest.mark.asyncio
     async def test_invalid_icc_sub_slot_vdf(self, db_version):
@@ -1731,6 +1735,40 @@ class TestPreValidation:
         log.info(f"Average pv: {sum(times_pv)/(len(blocks)/n_at_a_time)}")
         log.info(f"Average rb: {sum(times_rb)/(len(blocks))}")
 
+    @pytest.mark.asyncio
+    async def test_pre_validation_on_pending_blocks(self, empty_blockchain, default_1000_blocks, bt):
+        blocks = default_1000_blocks[:200]
+        batch_size = 32
+        pending_blocks = blocks[:batch_size]
+        pending_res = await empty_blockchain.pre_validate_blocks_multiprocessing(
+            pending_blocks, {}, validate_signatures=True
+        )
+        for i in range(batch_size, len(blocks), batch_size):
+            blocks_to_validate = blocks[i : i + batch_size]
+            pending = PendingBlockRecords(bt.constants, empty_blockchain, empty_blockchain.get_block_generator)
+            pending.add_blocks(pending_blocks, pending_res)
+            # pre-validates the next batch while the pending one is added
+            pre_validation = asyncio.create_task(
+                empty_blockchain.pre_validate_blocks_multiprocessing(
+                    blocks_to_validate, {}, validate_signatures=True, pending=pending
+                )
+            )
+            for block, block_res in zip(pending_blocks, pending_res):
+                assert block_res.error is None
+                result, err, _ = await empty_blockchain.receive_block(block, block_res)
+                assert err is None
+                assert result == ReceiveBlockResult.NEW_PEAK
+            res = await pre_validation
+            # the same results as once the pending blocks are added
+            assert res == await empty_blockchain.pre_validate_blocks_multiprocessing(
+                blocks_to_validate, {}, validate_signatures=True
+            )
+            pending_blocks, pending_res = blocks_to_validate, res
+        for block, block_res in zip(pending_blocks, pending_res):
+            result, err, _ = await empty_blockchain.receive_block(block, block_res)
+            assert result == ReceiveBlockResult.NEW_PEAK
+        assert empty_blockchain.get_peak_height() == len(blocks) - 1
+
 
 class TestBodyValidation:
 
@@ -4,6 +4,7 @@ from __future__ import annotations
 import datetime
 import multiprocessing
 import os
+import shutil
 import sysconfig
 import tempfile
 from typing import Any, AsyncIterator, Dict, Iterator, List, Tuple, Union
@@ -119,7 +120,8 @@ async def empty_blockchain(request):
 
     await db_wrapper.close()
     bc1.shut_down()
-    db_path.unlink()
+    await bc1.close()
+    shutil.rmtree(db_path.parent)
 
 
 @pytest.fixture(scope="function")
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+from chia.data_layer.data_layer import DataLayer
+from chia.data_layer.data_layer_util import Subscription
+from chia.types.blockchain_format.sized_bytes import bytes32
+
+pytestmark = pytest.mark.data_layer
+
+
+@pytest.mark.parametrize(argnames="max_concurrent_syncs", argvalues=[1, 2])
+@pytest.mark.asyncio
+async def test_sync_subscriptions_limit_and_order(tmp_path: Path, max_concurrent_syncs: int) -> None:
+    config = {
+        "database_path": "db.sqlite",
+        "selected_network": "testnet",
+        "max_concurrent_syncs": max_concurrent_syncs,
+    }
+    data_layer = DataLayer(
+        config=config, root_path=tmp_path, wallet_rpc_init=asyncio.get_running_loop().create_future()
+    )
+
+    lags: Dict[bytes32, int] = {bytes32([i] * 32): lag for i, lag in enumerate([1, 7, 0, 3, 5])}
+    started: List[bytes32] = []
+    running = 0
+    max_running = 0
+
+    async def get_generations_behind(tree_id: bytes32) -> int:
+        return lags[tree_id]
+
+    async def update_subscriptions_from_wallet(tree_id: bytes32) -> None:
+        nonlocal running, max_running
+        started.append(tree_id)
+        running += 1
+        max_running = max(max_running, running)
+        assert tree_id in data_layer.syncing_stores
+
+    async def fetch_and_validate(tree_id: bytes32) -> None:
+        await asyncio.sleep(0.01)
+
+    async def upload_files(tree_id: bytes32) -> None:
+        nonlocal running
+        running -= 1
+
+    data_layer.get_generations_behind = get_generations_behind  # type: ignore[assignment]
+    data_layer.update_subscriptions_from_wallet = update_subscriptions_from_wallet  # type: ignore[assignment]
+    data_layer.fetch_and_validate = fetch_and_validate  # type: ignore[assignment]
+    data_layer.upload_files = upload_files  # type: ignore[assignment]
+
+    await data_layer.sync_subscriptions([Subscription(tree_id, []) for tree_id in lags])
+
+    # the stores furthest behind start first, and no more than max_concurrent_syncs sync at once
+    assert started == sorted(lags, key=lambda tree_id: lags[tree_id], reverse=True)
+    assert max_running == max_concurrent_syncs
+    assert data_layer.syncing_stores == set()
@@ -12,7 +12,7 @@ import pytest_asyncio
 
 from chia.consensus.block_rewards import calculate_base_farmer_reward, calculate_pool_reward
 from chia.data_layer.data_layer import DataLayer
-from chia.data_layer.data_layer_errors import OfferIntegrityError
+from chia.data_layer.data_layer_errors import KeyNotFoundError, OfferIntegrityError
 from chia.data_layer.data_layer_util import OfferStore, StoreProofs
 from chia.data_layer.data_layer_wallet import DataLayerWallet, verify_offer
 from chia.rpc.data_layer_rpc_api import DataLayerRpcApi
@@ -317,6 +317,38 @@ async def test_keys_values_ancestors(
         assert len(pairs_after["keys_values"]) == len(keys_after["keys"]) == 7
 
 
+@pytest.mark.asyncio
+async def test_get_proofs(
+    self_hostname: str, one_wallet_and_one_simulator_services: SimulatorsAndWalletsServices, tmp_path: Path
+) -> None:
+    wallet_rpc_api, full_node_api, wallet_rpc_port, ph, bt = await init_wallet_and_node(
+        self_hostname, one_wallet_and_one_simulator_services
+    )
+    async with init_data_layer(wallet_rpc_port=wallet_rpc_port, bt=bt, db_path=tmp_path) as data_layer:
+        data_rpc_api = DataLayerRpcApi(data_layer)
+        res = await data_rpc_api.create_data_store({})
+        assert res is not None
+        store_id = bytes32(hexstr_to_bytes(res["id"]))
+        await farm_block_check_singelton(data_layer, full_node_api, ph, store_id)
+        pairs = {bytes([i]): bytes([i, i + 1]) for i in range(10)}
+        changelist = [{"action": "insert", "key": key.hex(), "value": value.hex()} for key, value in pairs.items()]
+        res = await data_rpc_api.batch_update({"id": store_id.hex(), "changelist": changelist})
+        await farm_block_with_spend(full_node_api, ph, res["tx_id"], wallet_rpc_api)
+        root = await data_rpc_api.get_root({"id": store_id.hex()})
+
+        keys = [bytes([1]), bytes([4]), bytes([9])]
+        res = await data_rpc_api.get_proofs({"id": store_id.hex(), "keys": [key.hex() for key in keys]})
+        assert bytes32.from_hexstr(res["root_hash"]) == root["hash"]
+        store_proofs = StoreProofs.unmarshal(res["store_proofs"])
+        assert store_proofs.store_id == store_id
+        assert sorted((proof.key, proof.value) for proof in store_proofs.proofs) == [(key, pairs[key]) for key in keys]
+        for proof in store_proofs.proofs:
+            assert proof.root() == root["hash"]
+
+        with pytest.raises(KeyNotFoundError):
+            await data_rpc_api.get_proofs({"id": store_id.hex(), "keys": [b"\xff".hex()]})
+
+
 @pytest.mark.asyncio
 async def test_get_roots(
     self_hostname: str, one_wallet_and_one_simulator_services: SimulatorsAndWalletsServices, tmp_path: Path
@@ -1815,6 +1847,7 @@ async def test_get_sync_status(
         sync_status = sync_status_res["sync_status"]
         assert sync_status["root_hash"] == sync_status["target_root_hash"] == res_after["hash"].hex()
         assert sync_status["generation"] == sync_status["target_generation"] == 3
+        assert sync_status["generations_behind"] == 0
 
         await data_layer.data_store.rollback_to_generation(store_id, 2)
         sync_status_res = await data_rpc_api.get_sync_status({"id": store_id.hex()})
@@ -1825,3 +1858,4 @@ async def test_get_sync_status(
         assert sync_status["target_root_hash"] != sync_status["root_hash"]
         assert sync_status["generation"] == 2
         assert sync_status["target_generation"] == 3
+        assert sync_status["generations_behind"] == 1
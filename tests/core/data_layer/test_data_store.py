@@ -1,15 +1,17 @@
 from __future__ import annotations
 
+import contextlib
 import itertools
 import logging
 import statistics
 from pathlib import Path
 from random import Random
-from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Set, Tuple
 
 import pytest
+from aiohttp import web
 
-from chia.data_layer.data_layer_errors import NodeHashError, TreeGenerationIncrementingError
+from chia.data_layer.data_layer_errors import KeyNotFoundError, NodeHashError, TreeGenerationIncrementingError
 from chia.data_layer.data_layer_util import (
     DiffData,
     InternalNode,
@@ -18,6 +20,7 @@ from chia.data_layer.data_layer_util import (
     ProofOfInclusion,
     ProofOfInclusionLayer,
     Root,
+    SerializedNode,
     ServerInfo,
     Side,
     Status,
@@ -28,10 +31,16 @@ from chia.data_layer.data_layer_util import (
 )
 from chia.data_layer.data_store import DataStore
 from chia.data_layer.download_data import (
+    MANIFEST_MISSING_RETRY_SECONDS,
+    ServerScores,
     get_delta_filename,
     get_full_tree_filename,
+    get_manifest_filename,
+    insert_from_delta_file,
     insert_into_data_store_from_file,
     is_filename_valid,
+    parse_manifest,
+    serialized_node_hash,
     write_files_for_root,
 )
 from chia.types.blockchain_format.program import Program
@@ -471,6 +480,82 @@ async def test_get_pairs_when_empty(data_store: DataStore, tree_id: bytes32) ->
     assert pairs == []
 
 
+@pytest.mark.parametrize(argnames="page_size", argvalues=[1, 3, 100])
+@pytest.mark.asyncio
+async def test_get_keys_values_paginated(
+    data_store: DataStore,
+    tree_id: bytes32,
+    create_example: Callable[[DataStore, bytes32], Awaitable[Example]],
+    page_size: int,
+) -> None:
+    await create_example(data_store, tree_id)
+    all_pairs = await data_store.get_keys_values(tree_id=tree_id)
+
+    pages = []
+    cursor = None
+    while True:
+        page = await data_store.get_keys_values_paginated(tree_id=tree_id, page_size=page_size, cursor=cursor)
+        assert len(page.keys_values) <= page_size
+        if cursor is None:
+            assert page.total_count == len(all_pairs)
+            assert page.total_bytes == sum(len(node.key) + len(node.value) for node in all_pairs)
+        else:
+            assert page.total_count is None
+            assert page.total_bytes is None
+        pages.append(page)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    paged_pairs = [node for page in pages for node in page.keys_values]
+    assert paged_pairs == sorted(all_pairs, key=lambda node: node.key)
+
+    keys_page = await data_store.get_keys_paginated(tree_id=tree_id, page_size=page_size)
+    assert keys_page.keys == [node.key for node in paged_pairs[:page_size]]
+    assert keys_page.total_bytes == sum(len(node.key) for node in all_pairs)
+
+
+@pytest.mark.asyncio
+async def test_get_keys_paginated_indexes_current_root(
+    data_store: DataStore,
+    tree_id: bytes32,
+    create_example: Callable[[DataStore, bytes32], Awaitable[Example]],
+) -> None:
+    async def indexed_roots() -> Dict[bytes32, int]:
+        async with data_store.db_wrapper.reader() as reader:
+            cursor = await reader.execute("SELECT root_hash, COUNT(*) AS count FROM keys_by_root GROUP BY root_hash")
+            return {bytes32(row["root_hash"]): row["count"] async for row in cursor}
+
+    await create_example(data_store, tree_id)
+    old_root = await data_store.get_tree_root(tree_id=tree_id)
+    assert old_root.node_hash is not None
+    all_keys = sorted(await data_store.get_keys(tree_id=tree_id))
+
+    # the keys are indexed once, for all the pages of the root
+    page = await data_store.get_keys_paginated(tree_id=tree_id, page_size=2)
+    assert await indexed_roots() == {old_root.node_hash: len(all_keys)}
+    page = await data_store.get_keys_paginated(tree_id=tree_id, page_size=2, cursor=page.next_cursor)
+    assert page.keys == all_keys[2:4]
+
+    # the keys of a root which isn't the current one anymore are dropped when the new one is indexed
+    await data_store.autoinsert(key=b"\xff", value=b"\xff", tree_id=tree_id, status=Status.COMMITTED)
+    new_root = await data_store.get_tree_root(tree_id=tree_id)
+    assert new_root.node_hash is not None
+    page = await data_store.get_keys_paginated(tree_id=tree_id, page_size=len(all_keys) + 1)
+    assert page.keys == [*all_keys, b"\xff"]
+    assert await indexed_roots() == {new_root.node_hash: len(all_keys) + 1}
+
+
+@pytest.mark.asyncio
+async def test_get_keys_values_paginated_when_empty(data_store: DataStore, tree_id: bytes32) -> None:
+    page = await data_store.get_keys_values_paginated(tree_id=tree_id, page_size=10)
+
+    assert page.keys_values == []
+    assert page.next_cursor is None
+    assert page.total_count == 0
+    assert page.total_bytes == 0
+
+
 @pytest.mark.parametrize(
     argnames=["first_value", "second_value"],
     argvalues=[[b"\x06", b"\x06"], [b"\x06", b"\x07"]],
@@ -817,6 +902,32 @@ async def test_proof_of_inclusion_by_hash_equals_by_key(data_store: DataStore, t
     assert proof_by_hash == proof_by_key
 
 
+@pytest.mark.asyncio
+async def test_proofs_of_inclusion_batch_equals_single(
+    data_store: DataStore,
+    tree_id: bytes32,
+    create_example: Callable[[DataStore, bytes32], Awaitable[Example]],
+) -> None:
+    """Proofs built in one batch match the ones built one at a time."""
+    await create_example(data_store, tree_id)
+    pairs = await data_store.get_keys_values(tree_id=tree_id)
+
+    proofs_by_key = await data_store.get_proofs_of_inclusion_by_keys(keys=[node.key for node in pairs], tree_id=tree_id)
+
+    for node in pairs:
+        single_proof = await data_store.get_proof_of_inclusion_by_hash(node_hash=node.hash, tree_id=tree_id)
+        assert proofs_by_key[node.key] == single_proof
+        assert single_proof.valid()
+
+
+@pytest.mark.asyncio
+async def test_proofs_of_inclusion_by_keys_missing_key(data_store: DataStore, tree_id: bytes32) -> None:
+    await add_0123_example(data_store=data_store, tree_id=tree_id)
+
+    with pytest.raises(KeyNotFoundError):
+        await data_store.get_proofs_of_inclusion_by_keys(keys=[b"\x00", b"\x09"], tree_id=tree_id)
+
+
 @pytest.mark.asyncio
 async def test_proof_of_inclusion_by_hash_bytes(data_store: DataStore, tree_id: bytes32) -> None:
     """The proof of inclusion provided by the data store is able to be converted to a
@@ -1226,6 +1337,31 @@ async def test_data_server_files(data_store: DataStore, tree_id: bytes32, test_d
         generation += 1
 
 
+@pytest.mark.asyncio
+async def test_data_server_manifest_matches_delta_file(data_store: DataStore, tree_id: bytes32, tmp_path: Path) -> None:
+    await add_01234567_example(data_store=data_store, tree_id=tree_id)
+    root = await data_store.get_tree_root(tree_id=tree_id)
+    assert root.node_hash is not None
+    await write_files_for_root(data_store, tree_id, root, tmp_path)
+
+    manifest_filename = get_manifest_filename(tree_id, root.node_hash, root.generation)
+    assert is_filename_valid(manifest_filename)
+    entries = parse_manifest(tmp_path.joinpath(manifest_filename).read_bytes())
+
+    delta = tmp_path.joinpath(get_delta_filename(tree_id, root.node_hash, root.generation)).read_bytes()
+    offset = 0
+    for node_hash, size in entries:
+        assert int.from_bytes(delta[offset : offset + 4], byteorder="big") == size
+        serialized_node = SerializedNode.from_bytes(delta[offset + 4 : offset + 4 + size])
+        assert serialized_node_hash(serialized_node) == node_hash
+        offset += 4 + size
+    assert offset == len(delta)
+    assert entries[-1][0] == root.node_hash
+
+    local_nodes = await data_store.get_nodes([node_hash for node_hash, _ in entries])
+    assert set(local_nodes.keys()) == {node_hash for node_hash, _ in entries}
+
+
 @pytest.mark.asyncio
 async def test_pending_roots(data_store: DataStore, tree_id: bytes32) -> None:
     key = b"\x01\x02"
@@ -1256,3 +1392,187 @@ async def test_pending_roots(data_store: DataStore, tree_id: bytes32) -> None:
     await data_store.clear_pending_roots(tree_id=tree_id)
     pending_root = await data_store.get_pending_root(tree_id=tree_id)
     assert pending_root is None
+
+
+def test_server_scores_prefer_fast_reliable_servers() -> None:
+    fast = ServerInfo("http://fast", 0, 0)
+    slow = ServerInfo("http://slow", 0, 0)
+    flaky = ServerInfo("http://flaky", 0, 0)
+    scores = ServerScores()
+
+    scores.record_success(fast.url, 100 * 1024 * 1024, 1)
+    scores.record_success(slow.url, 1024, 1)
+    scores.record_success(flaky.url, 100 * 1024 * 1024, 1)
+    for _ in range(10):
+        scores.record_failure(flaky.url)
+
+    assert scores.score(fast.url) > scores.score(flaky.url)
+    assert scores.score(fast.url) > scores.score(slow.url)
+    assert scores.select([slow, flaky, fast]) == fast
+
+    # downloads in flight spread the load to the next best server
+    scores.get_stats(fast.url).in_flight = 1000
+    assert scores.select([slow, fast]) == slow
+
+
+def test_server_scores_remember_missing_manifest() -> None:
+    server_info = ServerInfo("http://no-manifest", 0, 0)
+    scores = ServerScores()
+    assert scores.may_have_manifest(server_info.url)
+
+    scores.record_missing_manifest(server_info.url)
+    assert not scores.may_have_manifest(server_info.url)
+
+    stats = scores.get_stats(server_info.url)
+    assert stats.manifest_missing_at is not None
+    stats.manifest_missing_at -= MANIFEST_MISSING_RETRY_SECONDS + 1
+    assert scores.may_have_manifest(server_info.url)
+
+
+async def write_delta_files(tree_id: bytes32, tmp_path: Path, num_generations: int) -> List[bytes32]:
+    server_files_location = tmp_path.joinpath("server")
+    server_files_location.mkdir()
+    root_hashes: List[bytes32] = []
+    data_store_server = await DataStore.create(database=tmp_path.joinpath("dl_server.sqlite"))
+    try:
+        await data_store_server.create_tree(tree_id, status=Status.COMMITTED)
+        for generation in range(num_generations):
+            key = generation.to_bytes(4, byteorder="big")
+            changelist: List[Dict[str, Any]] = [{"action": "insert", "key": key, "value": key}]
+            await data_store_server.insert_batch(tree_id, changelist, status=Status.COMMITTED)
+            root = await data_store_server.get_tree_root(tree_id)
+            assert root.node_hash is not None
+            await write_files_for_root(data_store_server, tree_id, root, server_files_location)
+            root_hashes.append(root.node_hash)
+    finally:
+        await data_store_server.close()
+    return root_hashes
+
+
+@contextlib.asynccontextmanager
+async def serve_files(handler: Callable[[web.Request], Awaitable[web.StreamResponse]]) -> AsyncIterator[ServerInfo]:
+    app = web.Application()
+    app.add_routes([web.get("/{filename}", handler)])
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    try:
+        port = runner.addresses[0][1]
+        yield ServerInfo(f"http://127.0.0.1:{port}", 0, 0)
+    finally:
+        await runner.cleanup()
+
+
+def file_handler(foldername: Path, requested: List[str]) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+    async def handler(request: web.Request) -> web.StreamResponse:
+        filename = request.match_info["filename"]
+        requested.append(filename)
+        path = foldername.joinpath(filename)
+        if not path.exists():
+            raise web.HTTPNotFound()
+        return web.FileResponse(path)
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_insert_from_delta_file_fails_over_to_next_mirror(
+    data_store: DataStore, tree_id: bytes32, tmp_path: Path
+) -> None:
+    root_hashes = await write_delta_files(tree_id, tmp_path, num_generations=5)
+    client_files_location = tmp_path.joinpath("client")
+    client_files_location.mkdir()
+
+    failing_requests: List[str] = []
+
+    async def failing_handler(request: web.Request) -> web.StreamResponse:
+        failing_requests.append(request.match_info["filename"])
+        raise web.HTTPInternalServerError()
+
+    working_requests: List[str] = []
+    async with serve_files(failing_handler) as failing, serve_files(
+        file_handler(tmp_path.joinpath("server"), working_requests)
+    ) as working:
+        scores = ServerScores()
+        # the failing mirror looks like the better one, so it is tried first
+        scores.record_success(failing.url, 100 * 1024 * 1024, 1)
+        scores.record_success(working.url, 1024, 1)
+
+        success = await insert_from_delta_file(
+            data_store,
+            tree_id,
+            0,
+            root_hashes,
+            [failing, working],
+            client_files_location,
+            15,
+            log,
+            "",
+            server_scores=scores,
+            prefetch=1,
+        )
+
+    assert success
+    root = await data_store.get_tree_root(tree_id)
+    assert root.generation == len(root_hashes)
+    assert root.node_hash == root_hashes[-1]
+    # the failing mirror is not retried during the sync
+    assert [filename for filename in failing_requests if "-delta-" in filename] == [
+        get_delta_filename(tree_id, root_hashes[0], 1)
+    ]
+    assert scores.get_stats(failing.url).error_rate > 0
+    delta_requests = [filename for filename in working_requests if "-delta-" in filename]
+    assert delta_requests == [
+        get_delta_filename(tree_id, root_hash, generation) for generation, root_hash in enumerate(root_hashes, start=1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_insert_from_delta_file_prefetch_window(tree_id: bytes32, tmp_path: Path) -> None:
+    num_generations = 8
+    prefetch = 2
+    root_hashes = await write_delta_files(tree_id, tmp_path, num_generations=num_generations)
+    client_files_location = tmp_path.joinpath("client")
+    client_files_location.mkdir()
+    # a file database, the prefetched downloads read the nodes while the insertions write them
+    data_store = await DataStore.create(database=tmp_path.joinpath("dl_client.sqlite"))
+    await data_store.create_tree(tree_id, status=Status.COMMITTED)
+
+    requested: List[str] = []
+    serve = file_handler(tmp_path.joinpath("server"), requested)
+    generations_ahead: List[int] = []
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        filename = request.match_info["filename"]
+        if "-delta-" in filename:
+            generation = int(filename.split("-")[3])
+            # the full tree file is written once a generation is inserted
+            inserted = len(list(client_files_location.glob("*-full-*")))
+            generations_ahead.append(generation - inserted)
+        return await serve(request)
+
+    try:
+        async with serve_files(handler) as server_info:
+            success = await insert_from_delta_file(
+                data_store,
+                tree_id,
+                0,
+                root_hashes,
+                [server_info],
+                client_files_location,
+                15,
+                log,
+                "",
+                prefetch=prefetch,
+            )
+        root = await data_store.get_tree_root(tree_id)
+    finally:
+        await data_store.close()
+
+    assert success
+    assert root.generation == num_generations
+    assert root.node_hash == root_hashes[-1]
+    assert len(generations_ahead) == num_generations
+    # a download only starts once the generation `prefetch` before it is inserted
+    assert max(generations_ahead) <= prefetch
@@ -9,6 +9,8 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from chia.consensus.blockchain import ReceiveBlockResult
+from chia.consensus.pending_block_records import PendingBlockRecords
 from chia.full_node.full_node_api import FullNodeAPI
 from chia.protocols import full_node_protocol
 from chia.protocols.shared_protocol import Capability
@@ -209,6 +211,50 @@ class TestFullSync:
         )
         await time_out_assert(60, node_height_exactly, True, full_node_2, num_blocks - 1)
 
+    @pytest.mark.asyncio
+    async def test_pre_validate_batch_across_epoch_boundary(self, two_nodes, default_1000_blocks):
+        full_node = two_nodes[0].full_node
+        blockchain = full_node.blockchain
+        # the difficulty and sub slot iters change with the first block of the second epoch
+        boundary = next(
+            block.height
+            for block in default_1000_blocks
+            if any(sub_slot.challenge_chain.new_difficulty is not None for sub_slot in block.finished_sub_slots)
+        )
+        assert test_constants.EPOCH_BLOCKS <= boundary < 2 * test_constants.EPOCH_BLOCKS
+        batch_size = 32
+        next_start = boundary - batch_size // 2
+        pending_start = next_start - batch_size
+
+        for i in range(0, pending_start, batch_size):
+            batch = default_1000_blocks[i : min(i + batch_size, pending_start)]
+            for block, result in zip(batch, await full_node.pre_validate_block_batch(batch)):
+                assert (await blockchain.receive_block(block, result))[0] == ReceiveBlockResult.NEW_PEAK
+
+        pending_blocks = default_1000_blocks[pending_start:next_start]
+        pending_results = await full_node.pre_validate_block_batch(pending_blocks)
+        assert all(result.error is None for result in pending_results)
+        pending = PendingBlockRecords(blockchain.constants, blockchain, blockchain.get_block_generator)
+        pending.add_blocks(pending_blocks, pending_results)
+
+        # the batch across the boundary is pre-validated while the previous one is added
+        next_blocks = default_1000_blocks[next_start : next_start + batch_size]
+        pre_validation = asyncio.create_task(full_node.pre_validate_block_batch(next_blocks, pending=pending))
+        for block, result in zip(pending_blocks, pending_results):
+            assert (await blockchain.receive_block(block, result))[0] == ReceiveBlockResult.NEW_PEAK
+        next_results = await pre_validation
+        assert all(result.error is None for result in next_results)
+        # the same results as once the previous batch is added
+        assert next_results == await full_node.pre_validate_block_batch(next_blocks)
+
+        for block, result in zip(next_blocks, next_results):
+            assert (await blockchain.receive_block(block, result))[0] == ReceiveBlockResult.NEW_PEAK
+        peak = blockchain.get_peak()
+        assert peak is not None and peak.height == next_blocks[-1].height
+        new_epoch = default_1000_blocks[boundary].finished_sub_slots[0].challenge_chain
+        assert peak.sub_slot_iters == new_epoch.new_sub_slot_iters
+        assert blockchain.get_next_difficulty(peak.header_hash, False) == new_epoch.new_difficulty
+
     @pytest.mark.asyncio
     async def test_backtrack_sync_1(self, two_nodes, self_hostname):
         full_node_1, full_node_2, server_1, server_2, bt = two_nodes
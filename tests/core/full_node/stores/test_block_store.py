@@ -5,6 +5,7 @@ import dataclasses
 import logging
 import random
 import sqlite3
+from typing import Set, Tuple
 
 import pytest
 from clvm.casts import int_to_bytes
@@ -17,7 +18,7 @@ from chia.full_node.coin_store import CoinStore
 from chia.simulator.block_tools import test_constants
 from chia.types.blockchain_format.program import SerializedProgram
 from chia.types.blockchain_format.sized_bytes import bytes32
-from chia.types.blockchain_format.vdf import VDFProof
+from chia.types.blockchain_format.vdf import CompressibleVDFField, VDFInfo, VDFProof
 from chia.types.full_block import FullBlock
 from chia.util.ints import uint8
 from tests.blockchain.blockchain_test_utils import _validate_and_add_block
@@ -112,6 +113,35 @@ async def test_deadlock(tmp_dir, db_version, bt):
         await asyncio.gather(*tasks)
 
 
+@pytest.mark.asyncio
+async def test_lazy_blockchain(tmp_dir, db_version, bt):
+    blocks = bt.get_consecutive_blocks(10)
+
+    async with DBConnection(db_version) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper)
+        bc = await Blockchain.create(coin_store, block_store, test_constants, tmp_dir, 2)
+        for block in blocks:
+            await _validate_and_add_block(bc, block)
+        bc.shut_down()
+
+        bc = await Blockchain.create(coin_store, block_store, test_constants, tmp_dir, 2, lazy=True)
+        try:
+            # only the peak is loaded, and nothing can add blocks until the rest is
+            peak = bc.get_peak()
+            assert peak is not None
+            assert peak.header_hash == blocks[-1].header_hash
+            assert not bc.contains_block(blocks[0].header_hash)
+            assert bc.lock.locked()
+
+            await bc.wait_until_loaded()
+            assert not bc.lock.locked()
+            for block in blocks:
+                assert bc.contains_block(block.header_hash)
+        finally:
+            bc.shut_down()
+
+
 @pytest.mark.asyncio
 async def test_rollback(bt, tmp_dir):
     blocks = bt.get_consecutive_blocks(10)
@@ -197,22 +227,9 @@ async def test_count_uncompactified_blocks(bt, tmp_dir, db_version):
 
 
 @pytest.mark.asyncio
-async def test_replace_proof(bt, tmp_dir, db_version):
+async def test_replace_proofs(bt, tmp_dir, db_version):
     blocks = bt.get_consecutive_blocks(10)
 
-    def rand_bytes(num) -> bytes:
-        ret = bytearray(num)
-        for i in range(num):
-            ret[i] = random.getrandbits(8)
-        return bytes(ret)
-
-    def rand_vdf_proof() -> VDFProof:
-        return VDFProof(
-            uint8(1),  # witness_type
-            rand_bytes(32),  # witness
-            bool(random.randint(0, 1)),  # normalized_to_identity
-        )
-
     async with DBConnection(db_version) as db_wrapper:
         coin_store = await CoinStore.create(db_wrapper)
         block_store = await BlockStore.create(db_wrapper)
@@ -220,24 +237,117 @@ async def test_replace_proof(bt, tmp_dir, db_version):
         for block in blocks:
             await _validate_and_add_block(bc, block)
 
-        replaced = []
+        compact_proofs = [VDFProof(uint8(0), bytes([i] * 100), True) for i in range(len(blocks))]
+        proofs = [
+            (block.header_hash, CompressibleVDFField.CC_IP_VDF, block.reward_chain_block.challenge_chain_ip_vdf, proof)
+            for block, proof in zip(blocks, compact_proofs)
+        ]
+        # a block we don't have, and a VDF that's not in the block
+        ip_vdf = blocks[1].reward_chain_block.challenge_chain_ip_vdf
+        proofs.append((bytes32([0] * 32), CompressibleVDFField.CC_IP_VDF, ip_vdf, compact_proofs[1]))
+        proofs.append((blocks[0].header_hash, CompressibleVDFField.CC_IP_VDF, ip_vdf, compact_proofs[1]))
+        assert await block_store.replace_proofs(proofs) == [True] * len(blocks) + [False, False]
+
+        for block, proof in zip(blocks, compact_proofs):
+            b = await block_store.get_full_block(block.header_hash)
+            assert b is not None
+            assert b == dataclasses.replace(block, challenge_chain_ip_proof=proof)
+            assert await block_store.is_fully_compactified(block.header_hash) == b.is_fully_compactified()
+
+
+def uncompact_proofs(block: FullBlock) -> Set[Tuple[bytes32, CompressibleVDFField, VDFInfo]]:
+    def is_compact(proof: VDFProof) -> bool:
+        return proof.witness_type == 0 and proof.normalized_to_identity
+
+    ret = set()
+    for sub_slot in block.finished_sub_slots:
+        if not is_compact(sub_slot.proofs.challenge_chain_slot_proof):
+            vdf = sub_slot.challenge_chain.challenge_chain_end_of_slot_vdf
+            ret.add((block.header_hash, CompressibleVDFField.CC_EOS_VDF, vdf))
+        icc_proof = sub_slot.proofs.infused_challenge_chain_slot_proof
+        if icc_proof is not None and not is_compact(icc_proof):
+            assert sub_slot.infused_challenge_chain is not None
+            vdf = sub_slot.infused_challenge_chain.infused_challenge_chain_end_of_slot_vdf
+            ret.add((block.header_hash, CompressibleVDFField.ICC_EOS_VDF, vdf))
+    if block.challenge_chain_sp_proof is not None and not is_compact(block.challenge_chain_sp_proof):
+        assert block.reward_chain_block.challenge_chain_sp_vdf is not None
+        ret.add((block.header_hash, CompressibleVDFField.CC_SP_VDF, block.reward_chain_block.challenge_chain_sp_vdf))
+    if not is_compact(block.challenge_chain_ip_proof):
+        ret.add((block.header_hash, CompressibleVDFField.CC_IP_VDF, block.reward_chain_block.challenge_chain_ip_vdf))
+    return ret
 
-        for block in blocks:
-            assert block.challenge_chain_ip_proof is not None
-            proof = rand_vdf_proof()
-            replaced.append(proof)
-            new_block = dataclasses.replace(block, challenge_chain_ip_proof=proof)
-            await block_store.replace_proof(block.header_hash, new_block)
 
-        for block, proof in zip(blocks, replaced):
-            b = await block_store.get_full_block(block.header_hash)
-            assert b.challenge_chain_ip_proof == proof
+@pytest.mark.asyncio
+async def test_uncompact_proofs(bt, tmp_dir, db_version):
+    blocks = bt.get_consecutive_blocks(10, skip_slots=2)
 
-            # make sure we get the same result when we hit the database
-            # itself (and not just the block cache)
-            block_store.rollback_cache_block(block.header_hash)
-            b = await block_store.get_full_block(block.header_hash)
-            assert b.challenge_chain_ip_proof == proof
+    async with DBConnection(db_version) as db_wrapper:
+        coin_store = await CoinStore.create(db_wrapper)
+        block_store = await BlockStore.create(db_wrapper)
+        bc = await Blockchain.create(coin_store, block_store, test_constants, tmp_dir, 2)
+        for block in blocks:
+            await _validate_and_add_block(bc, block)
+
+        async def found_proofs(
+            number: int, challenge_deficit=None
+        ) -> Set[Tuple[bytes32, CompressibleVDFField, VDFInfo]]:
+            found = await block_store.get_random_uncompact_proofs(number, challenge_deficit)
+            assert len(found) <= number
+            for header_hash, height, _, _ in found:
+                assert bc.height_to_hash(height) == header_hash
+            ret = {(header_hash, field_vdf, vdf_info) for header_hash, _, field_vdf, vdf_info in found}
+            assert len(ret) == len(found)
+            return ret
+
+        expected = set().union(*(uncompact_proofs(block) for block in blocks))
+        assert len(expected) > len(blocks)
+        assert await found_proofs(100) == expected
+        for _ in range(10):
+            assert len(await found_proofs(5)) == 5
+
+        # only the signage and infusion point proofs of challenge blocks
+        deficit = test_constants.MIN_BLOCKS_PER_CHALLENGE_BLOCK - 1
+        challenge_blocks = {
+            block.header_hash for block in blocks if bc.block_record(block.header_hash).deficit == deficit
+        }
+        assert await found_proofs(100, deficit) == {
+            (header_hash, field_vdf, vdf_info)
+            for header_hash, field_vdf, vdf_info in expected
+            if field_vdf in (CompressibleVDFField.CC_EOS_VDF, CompressibleVDFField.ICC_EOS_VDF)
+            or header_hash in challenge_blocks
+        }
+
+        # the proofs replaced by compact ones aren't returned anymore
+        compact_proof = VDFProof(uint8(0), bytes(100), True)
+        proofs = [
+            (block.header_hash, CompressibleVDFField.CC_IP_VDF, block.reward_chain_block.challenge_chain_ip_vdf)
+            for block in blocks
+        ]
+        assert await block_store.replace_proofs([(*proof, compact_proof) for proof in proofs]) == [True] * len(blocks)
+        expected -= set(proofs)
+        assert await found_proofs(100) == expected
+
+        # a DB created before the uncompact_proofs table has them added in the background
+        async with db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute("DROP TABLE uncompact_proofs")
+        block_store = await BlockStore.create(db_wrapper)
+        assert await found_proofs(100) == set()
+        while await block_store.backfill_uncompact_proofs(3):
+            pass
+        assert await found_proofs(100) == expected
+        assert not await block_store.backfill_uncompact_proofs(3)
+
+        # the blocks added while backfilling have their proofs already, they're not added twice
+        async with db_wrapper.writer_maybe_transaction() as conn:
+            await conn.execute("INSERT INTO uncompact_proofs_backfill VALUES(?, ?)", (0, len(blocks)))
+        while await block_store.backfill_uncompact_proofs(3):
+            pass
+        assert await found_proofs(100) == expected
+
+        # the proofs of orphan blocks are removed
+        orphan = blocks[-1].header_hash
+        await block_store.remove_uncompact_proofs([orphan])
+        assert await found_proofs(100) == {proof for proof in expected if proof[0] != orphan}
 
 
 @pytest.mark.asyncio
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import logging
+import shutil
 from secrets import token_bytes
 from typing import List, Optional
 
@@ -42,7 +43,8 @@ async def empty_blockchain(request):
     yield bc1
     await db_wrapper.close()
     bc1.shut_down()
-    db_path.unlink()
+    await bc1.close()
+    shutil.rmtree(db_path.parent)
 
 
 @pytest_asyncio.fixture(scope="function", params=[1, 2])
@@ -51,7 +53,8 @@ async def empty_blockchain_with_original_constants(request):
     yield bc1
     await db_wrapper.close()
     bc1.shut_down()
-    db_path.unlink()
+    await bc1.close()
+    shutil.rmtree(db_path.parent)
 
 
 class TestFullNodeStore:
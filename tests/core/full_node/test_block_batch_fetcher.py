@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, cast
+
+import pytest
+
+from chia.full_node import block_batch_fetcher
+from chia.full_node.block_batch_fetcher import BlockBatchFetcher
+from chia.server.ws_connection import WSChiaConnection
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.types.full_block import FullBlock
+
+
+@dataclass
+class FakePeer:
+    peer_node_id: bytes32
+    delay: float
+    fail: bool = False
+    closed: bool = False
+    peer_host: str = "127.0.0.1"
+    requests: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def make_peers(delays: List[float]) -> List[WSChiaConnection]:
+    return [cast(WSChiaConnection, FakePeer(bytes32([i] * 32), delay)) for i, delay in enumerate(delays)]
+
+
+def make_request_batch(
+    blocks: List[FullBlock],
+) -> Callable[[WSChiaConnection, int, int], Coroutine[Any, Any, Optional[List[FullBlock]]]]:
+    async def request_batch(peer: WSChiaConnection, start_height: int, end_height: int) -> Optional[List[FullBlock]]:
+        fake_peer = cast(FakePeer, peer)
+        fake_peer.requests.append((start_height, end_height))
+        await asyncio.sleep(fake_peer.delay)
+        if fake_peer.fail:
+            return None
+        return blocks[start_height : end_height + 1]
+
+    return request_batch
+
+
+async def fetch_all(fetcher: BlockBatchFetcher) -> List[Tuple[WSChiaConnection, List[FullBlock]]]:
+    return [batch async for batch in fetcher.batches()]
+
+
+@pytest.mark.asyncio
+async def test_batches_in_height_order(default_400_blocks: List[FullBlock]) -> None:
+    peers = make_peers([0.03, 0.01, 0.02, 0.0])
+    fetcher = BlockBatchFetcher(make_request_batch(default_400_blocks), lambda: peers, 10, 205, 32, max_in_flight=4)
+    batches = await fetch_all(fetcher)
+
+    assert [blocks[0].height for _, blocks in batches] == list(range(10, 205, 32))
+    assert batches[-1][1][-1].height == 205
+    # the requests were spread over the peers
+    assert all(len(cast(FakePeer, peer).requests) > 0 for peer in peers)
+    assert len(fetcher._requests) == 0
+
+
+@pytest.mark.asyncio
+async def test_stalled_batch_requested_from_another_peer(
+    monkeypatch: pytest.MonkeyPatch, default_400_blocks: List[FullBlock]
+) -> None:
+    monkeypatch.setattr(block_batch_fetcher, "MIN_STALL_TIMEOUT", 0.05)
+    peers = make_peers([10, 0.01])
+    fetcher = BlockBatchFetcher(make_request_batch(default_400_blocks), lambda: peers, 0, 64, 32)
+    batches = await asyncio.wait_for(fetch_all(fetcher), timeout=5)
+
+    assert [blocks[0].height for _, blocks in batches] == [0, 32]
+    assert all(peer is peers[1] for peer, _ in batches)
+    assert sorted(cast(FakePeer, peers[1]).requests) == [(0, 32), (32, 64)]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_retried_on_other_peers(default_400_blocks: List[FullBlock]) -> None:
+    peers = make_peers([0.0, 0.01])
+    cast(FakePeer, peers[0]).fail = True
+    fetcher = BlockBatchFetcher(make_request_batch(default_400_blocks), lambda: peers, 0, 100, 10)
+    batches = await fetch_all(fetcher)
+
+    assert [blocks[0].height for _, blocks in batches] == list(range(0, 100, 10))
+    assert all(peer is peers[1] for peer, _ in batches)
+    throughput: Dict[bytes32, block_batch_fetcher.PeerThroughput] = fetcher.throughput
+    assert throughput[peers[0].peer_node_id].blocks_per_second is not None
+    assert throughput[peers[1].peer_node_id].score() > throughput[peers[0].peer_node_id].score()
+
+
+@pytest.mark.asyncio
+async def test_stops_when_no_peer_has_the_batch(default_400_blocks: List[FullBlock]) -> None:
+    peers = make_peers([0.0, 0.0])
+    for peer in peers:
+        cast(FakePeer, peer).fail = True
+    fetcher = BlockBatchFetcher(make_request_batch(default_400_blocks), lambda: peers, 0, 100, 10)
+    assert await fetch_all(fetcher) == []
+
+    fetcher = BlockBatchFetcher(make_request_batch(default_400_blocks), lambda: [], 0, 100, 10)
+    assert await fetch_all(fetcher) == []
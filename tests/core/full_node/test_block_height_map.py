@@ -5,7 +5,7 @@ from typing import Optional
 
 import pytest
 
-from chia.full_node.block_height_map import BlockHeightMap, SesCache
+from chia.full_node.block_height_map import BlockHeightMap, HeightToHashTail, SesCache
 from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
 from chia.util.db_wrapper import DBWrapper2
@@ -132,6 +132,33 @@ class TestBlockHeightMap:
             for height in reversed(range(10)):
                 assert height_map.get_hash(height) == gen_block_hash(height)
 
+    @pytest.mark.asyncio
+    async def test_no_files_before_first_flush(self, tmp_dir, db_version):
+
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            for height in range(10):
+                height_map.update_height(height, gen_block_hash(height), None)
+            await height_map.maybe_flush()
+            # the entries are kept in memory until there are enough to flush
+            assert list(tmp_dir.iterdir()) == []
+
+            for height in range(10, 1000):
+                height_map.update_height(height, gen_block_hash(height), None)
+            await height_map.maybe_flush()
+            tail = HeightToHashTail.from_bytes((tmp_dir / "height-to-hash-tail").read_bytes())
+            assert tail == HeightToHashTail(1000, gen_block_hash(999))
+
+            # the file is memory mapped from then on
+            height_map.update_height(1000, gen_block_hash(1000), None)
+            for height in range(1001):
+                assert height_map.get_hash(height) == gen_block_hash(height)
+            await height_map.close()
+            assert (tmp_dir / "height-to-hash").read_bytes()[: 1000 * 32] == b"".join(
+                gen_block_hash(height) for height in range(1000)
+            )
+
     @pytest.mark.asyncio
     async def test_height_to_hash_long_chain(self, tmp_dir, db_version):
 
@@ -268,6 +295,101 @@ class TestBlockHeightMap:
                     with pytest.raises(KeyError) as _:
                         height_map.get_ses(height)
 
+    @pytest.mark.asyncio
+    async def test_restore_past_tail(self, tmp_dir, db_version):
+
+        # the entries past the tail may not have made it to disk before a
+        # crash, even if some of them did
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            await height_map.maybe_flush()
+            del height_map
+
+            await write_file_async(tmp_dir / "height-to-hash-tail", bytes(HeightToHashTail(1001, gen_block_hash(1000))))
+            with open(tmp_dir / "height-to-hash", "r+b") as f:
+                f.seek(1500 * 32)
+                f.write(bytes([0xFF] * 480 * 32))
+
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+
+            for height in reversed(range(2000)):
+                assert height_map.get_hash(height) == gen_block_hash(height)
+                if (height % 20) == 0:
+                    assert height_map.get_ses(height) == gen_ses(height)
+
+    @pytest.mark.asyncio
+    async def test_restore_tail_mismatch(self, tmp_dir, db_version):
+
+        # if the file doesn't match its tail, none of it can be trusted
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            await height_map.maybe_flush()
+            del height_map
+
+            await write_file_async(tmp_dir / "height-to-hash-tail", bytes(HeightToHashTail(2001, gen_block_hash(1234))))
+            with open(tmp_dir / "height-to-hash", "r+b") as f:
+                f.write(bytes([0xFF] * 1980 * 32))
+
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+
+            for height in reversed(range(2000)):
+                assert height_map.get_hash(height) == gen_block_hash(height)
+                if (height % 20) == 0:
+                    assert height_map.get_ses(height) == gen_ses(height)
+
+    @pytest.mark.asyncio
+    async def test_rollback_tail(self, tmp_dir, db_version):
+
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 2000, ses_every=20)
+
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            await height_map.maybe_flush()
+            tail = HeightToHashTail.from_bytes((tmp_dir / "height-to-hash-tail").read_bytes())
+            assert tail == HeightToHashTail(2001, gen_block_hash(2000))
+
+            # the entries past the fork point are about to be overwritten, the
+            # tail is moved back before they are
+            await height_map.prepare_rollback(1500)
+            height_map.rollback(1500)
+            tail = HeightToHashTail.from_bytes((tmp_dir / "height-to-hash-tail").read_bytes())
+            assert tail == HeightToHashTail(1501, gen_block_hash(1500))
+            assert not height_map.contains_height(1501)
+
+            # rolling back past the tail doesn't move it
+            height_map.update_height(1501, gen_block_hash(1501), None)
+            await height_map.prepare_rollback(1500)
+            height_map.rollback(1500)
+            tail = HeightToHashTail.from_bytes((tmp_dir / "height-to-hash-tail").read_bytes())
+            assert tail == HeightToHashTail(1501, gen_block_hash(1500))
+
+    @pytest.mark.asyncio
+    async def test_restore_legacy_file(self, tmp_dir, db_version):
+
+        # a height-to-hash file written by an earlier version has no tail. The
+        # tail is written when it's opened, before the file is modified
+        async with DBConnection(db_version) as db_wrapper:
+            await setup_db(db_wrapper)
+            await setup_chain(db_wrapper, 500, ses_every=20)
+
+            with open(tmp_dir / "height-to-hash", "wb") as f:
+                f.write(b"".join(gen_block_hash(height) for height in range(400)))
+
+            height_map = await BlockHeightMap.create(tmp_dir, db_wrapper)
+            tail = HeightToHashTail.from_bytes((tmp_dir / "height-to-hash-tail").read_bytes())
+            assert tail == HeightToHashTail(400, gen_block_hash(399))
+
+            for height in reversed(range(500)):
+                assert height_map.get_hash(height) == gen_block_hash(height)
+            await height_map.close()
+
     @pytest.mark.asyncio
     async def test_height_to_hash_with_orphans(self, tmp_dir, db_version):
 
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from chia.full_node.sync_metrics import ADD_BLOCKS, DOWNLOAD, PRE_VALIDATION_WORKERS, SyncMetrics
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_sync_metrics() -> None:
+    clock = FakeClock()
+    metrics = SyncMetrics(clock=clock.monotonic)
+    assert metrics.to_json_dict()["syncing"] is False
+
+    metrics.start(1000, 2000, num_workers=4)
+    metrics.add_download("aa", "127.0.0.1", bytes_read_before=3000, bytes_read_after=5000, seconds=2.0, blocks=32)
+    metrics.add_download("aa", "127.0.0.1", bytes_read_before=5000, bytes_read_after=9000, seconds=2.0, blocks=None)
+    # a request sent before the one which completed first
+    metrics.add_download("bb", "127.0.0.2", bytes_read_before=300, bytes_read_after=400, seconds=1.0, blocks=32)
+    metrics.add_download("bb", "127.0.0.2", bytes_read_before=100, bytes_read_after=350, seconds=1.0, blocks=32)
+    metrics.add(PRE_VALIDATION_WORKERS, 16.0, 64)
+    with metrics.measure(ADD_BLOCKS, 64):
+        clock.now += 10.0
+    metrics.blocks_added += 64
+    metrics.set_queue_depth("batches", 3)
+
+    data = metrics.to_json_dict()
+    assert data["syncing"] is True
+    assert data["elapsed"] == 10.0
+    assert data["blocks_per_second"] == 6.4
+    # 16 seconds of work for 4 workers in 10 seconds
+    assert data["worker_utilization"] == 0.4
+    assert data["stages"][ADD_BLOCKS] == {
+        "calls": 1,
+        "blocks": 64,
+        "seconds": 10.0,
+        "share_of_elapsed": 1.0,
+        "blocks_per_second": 6.4,
+    }
+    assert data["stages"][DOWNLOAD]["blocks"] == 96
+    # the bytes are counted from before the first request to the peer, including its response
+    assert data["peers"]["aa"]["bytes"] == 6000
+    assert data["peers"]["aa"]["requests"] == 2
+    assert data["peers"]["aa"]["failures"] == 1
+    assert data["peers"]["aa"]["bytes_per_second"] == 1500.0
+    assert data["peers"]["bb"]["bytes"] == 300
+    assert data["queue_depths"] == {"batches": 3}
+
+    metrics.finish()
+    clock.now += 10.0
+    data = metrics.to_json_dict()
+    assert data["syncing"] is False
+    assert data["elapsed"] == 10.0
+
+    metrics.start(2000, 2100, num_workers=4)
+    assert metrics.to_json_dict()["stages"] == {}
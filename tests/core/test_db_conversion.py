@@ -29,7 +29,7 @@ def rand_bytes(num) -> bytes:
 class TestDbUpgrade:
     @pytest.mark.asyncio
     @pytest.mark.parametrize("with_hints", [True, False])
-    async def test_blocks(self, default_1000_blocks, with_hints: bool):
+    async def test_blocks(self, default_1000_blocks, with_hints: bool, tmp_path: Path):
 
         blocks = default_1000_blocks
 
@@ -74,7 +74,7 @@ class TestDbUpgrade:
                 else:
                     hint_store1 = None
 
-                bc = await Blockchain.create(coin_store1, block_store1, test_constants, Path("."), reserved_cores=0)
+                bc = await Blockchain.create(coin_store1, block_store1, test_constants, tmp_path, reserved_cores=0)
 
                 for block in blocks:
                     # await _validate_and_add_block(bc, block)
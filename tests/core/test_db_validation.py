@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import random
 import sqlite3
+import tempfile
 from contextlib import closing
 from pathlib import Path
 from typing import List
@@ -139,12 +140,18 @@ async def make_db(db_file: Path, blocks: List[FullBlock]) -> None:
         block_store = await BlockStore.create(db_wrapper)
         coin_store = await CoinStore.create(db_wrapper)
 
-        bc = await Blockchain.create(coin_store, block_store, test_constants, Path("."), reserved_cores=0)
-
-        for block in blocks:
-            results = PreValidationResult(None, uint64(1), None, False)
-            result, err, _ = await bc.receive_block(block, results)
-            assert err is None
+        with tempfile.TemporaryDirectory() as blockchain_dir:
+            bc = await Blockchain.create(
+                coin_store, block_store, test_constants, Path(blockchain_dir), reserved_cores=0
+            )
+            try:
+                for block in blocks:
+                    results = PreValidationResult(None, uint64(1), None, False)
+                    result, err, _ = await bc.receive_block(block, results)
+                    assert err is None
+            finally:
+                bc.shut_down()
+                await bc.close()
     finally:
         await db_wrapper.close()
 
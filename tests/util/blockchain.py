@@ -17,15 +17,14 @@ from chia.util.default_root import DEFAULT_ROOT_PATH
 
 
 async def create_blockchain(constants: ConsensusConstants, db_version: int):
-    db_path = Path(tempfile.NamedTemporaryFile().name)
-
-    if db_path.exists():
-        db_path.unlink()
+    # the DB and the height-to-hash files are created in a new directory,
+    # which is removed along with them by the caller
+    db_path = Path(tempfile.mkdtemp()) / "blockchain.sqlite"
     wrapper = await DBWrapper2.create(database=db_path, reader_count=1, db_version=db_version)
 
     coin_store = await CoinStore.create(wrapper)
     store = await BlockStore.create(wrapper)
-    bc1 = await Blockchain.create(coin_store, store, constants, Path("."), 2)
+    bc1 = await Blockchain.create(coin_store, store, constants, db_path.parent, 2)
     assert bc1.get_peak() is None
     return bc1, wrapper, db_path
 
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import dataclasses
 import random
 from typing import Generator, Iterator, List, Optional
 
@@ -19,11 +20,18 @@ from chia.types.blockchain_format.slots import (
     RewardChainSubSlot,
     SubSlotProofs,
 )
-from chia.types.blockchain_format.vdf import VDFInfo, VDFProof
+from chia.types.blockchain_format.vdf import CompressibleVDFField, VDFInfo, VDFProof
 from chia.types.end_of_slot_bundle import EndOfSubSlotBundle
 from chia.types.full_block import FullBlock
 from chia.types.header_block import HeaderBlock
-from chia.util.full_block_utils import block_info_from_block, generator_from_block, header_block_from_block
+from chia.util.full_block_utils import (
+    block_info_from_block,
+    block_without_generator,
+    compressible_proofs_from_block,
+    generator_from_block,
+    header_block_from_block,
+    replace_compressible_proofs,
+)
 from chia.util.generator_tools import get_block_header
 from chia.util.ints import uint8, uint32, uint64, uint128
 
@@ -251,6 +259,7 @@ async def test_parser():
     # along with random values for the FullBlock fields. Ensure
     # generator_from_block() successfully parses out the generator object
     # correctly
+    compact_proof = VDFProof(uint8(0), rand_bytes(100), True)
     for block in get_full_blocks():
         block_bytes = bytes(block)
         gen = generator_from_block(block_bytes)
@@ -259,6 +268,23 @@ async def test_parser():
         assert block.transactions_generator == bi.transactions_generator
         assert block.prev_header_hash == bi.prev_header_hash
         assert block.transactions_generator_ref_list == bi.transactions_generator_ref_list
+        assert block_without_generator(block_bytes) == bytes(dataclasses.replace(block, transactions_generator=None))
+
+        proofs = compressible_proofs_from_block(memoryview(block_bytes))
+        key = (CompressibleVDFField.CC_IP_VDF, bytes(block.reward_chain_block.challenge_chain_ip_vdf))
+        assert (proofs[-1].field_vdf, proofs[-1].vdf_info) == key
+        new_block, replaced, fully_compactified = replace_compressible_proofs(
+            memoryview(block_bytes), {key: bytes(compact_proof)}
+        )
+        expected = dataclasses.replace(block, challenge_chain_ip_proof=compact_proof)
+        assert new_block == bytes(expected)
+        assert replaced == {key}
+        assert fully_compactified == expected.is_fully_compactified()
+        # replacing all of them compactifies the block
+        new_proofs = {(proof.field_vdf, proof.vdf_info): bytes(compact_proof) for proof in proofs}
+        _, replaced, fully_compactified = replace_compressible_proofs(memoryview(block_bytes), new_proofs)
+        assert replaced == set(new_proofs.keys())
+        assert fully_compactified
         # this doubles the run-time of this test, with questionable utility
         # assert gen == FullBlock.from_bytes(block_bytes).transactions_generator
 
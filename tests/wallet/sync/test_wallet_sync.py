@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 from typing import List, Optional, Set
 from unittest.mock import MagicMock
 
@@ -16,7 +17,13 @@ from chia.full_node.weight_proof import WeightProofHandler
 from chia.protocols import full_node_protocol, wallet_protocol
 from chia.protocols.protocol_message_types import ProtocolMessageTypes
 from chia.protocols.shared_protocol import Capability
-from chia.protocols.wallet_protocol import RequestAdditions, RespondAdditions, RespondBlockHeaders, SendTransaction
+from chia.protocols.wallet_protocol import (
+    CoinState,
+    RequestAdditions,
+    RespondAdditions,
+    RespondBlockHeaders,
+    SendTransaction,
+)
 from chia.server.outbound_message import Message, make_msg
 from chia.simulator.block_tools import test_constants
 from chia.simulator.simulator_protocol import FarmNewBlockProtocol
@@ -30,9 +37,14 @@ from chia.util.ints import uint16, uint32, uint64
 from chia.wallet.nft_wallet.nft_wallet import NFTWallet
 from chia.wallet.transaction_record import TransactionRecord
 from chia.wallet.util.compute_memos import compute_memos
-from chia.wallet.util.wallet_sync_utils import PeerRequestException
+from chia.wallet.util.wallet_sync_utils import (
+    PeerRequestException,
+    chunk_coin_states_by_height,
+    last_change_height_cs,
+)
 from chia.wallet.util.wallet_types import AmountWithPuzzlehash
 from chia.wallet.wallet_coin_record import WalletCoinRecord
+from chia.wallet.wallet_validation_cache_store import WalletValidationCacheStore
 from chia.wallet.wallet_weight_proof_handler import get_wp_fork_point
 from tests.connection_utils import disconnect_all, disconnect_all_and_reconnect
 from tests.util.wallet_is_synced import wallet_is_synced
@@ -1300,6 +1312,152 @@ class TestWalletSync:
             assert not wallet_node.db_flaky
             await time_out_assert(30, wallet.get_confirmed_balance, 1_000_000_000_000)
 
+    @pytest.mark.asyncio
+    async def test_new_coin_state_batches_simple_states(self, wallet_node_sim_and_wallet, self_hostname):
+        full_nodes, wallets, bt = wallet_node_sim_and_wallet
+        full_node_api = full_nodes[0]
+        wallet_node, wallet_server = wallets[0]
+        wsm = wallet_node.wallet_state_manager
+        wallet = wsm.main_wallet
+        await wallet_server.start_client(PeerInfo(self_hostname, uint16(full_node_api.full_node.server._port)), None)
+
+        ph = await wallet.get_new_puzzlehash()
+        for _ in range(3):
+            await full_node_api.farm_new_transaction_block(FarmNewBlockProtocol(ph))
+        await full_node_api.farm_new_transaction_block(FarmNewBlockProtocol(bytes32([0] * 32)))
+        await time_out_assert(20, wallet_is_synced, True, wallet_node, full_node_api)
+
+        # spend some of the coins, to ourselves
+        tx = await wallet.generate_signed_transaction(uint64(3_000_000_000_000), ph)
+        await wsm.add_pending_transaction(tx)
+        await time_out_assert(15, full_node_api.full_node.mempool_manager.get_spendbundle, tx.spend_bundle, tx.name)
+        await full_node_api.farm_new_transaction_block(FarmNewBlockProtocol(bytes32([0] * 32)))
+        await time_out_assert(20, wallet_is_synced, True, wallet_node, full_node_api)
+        balance = await wallet.get_confirmed_balance()
+        spent_height = full_node_api.full_node.blockchain.get_peak_height()
+
+        coin_states = await full_node_api.full_node.coin_store.get_coin_states_by_puzzle_hashes(
+            True, list(await wsm.puzzle_store.get_all_puzzle_hashes())
+        )
+        coin_states.sort(key=last_change_height_cs)
+        assert any(coin_state.spent_height == spent_height for coin_state in coin_states)
+        peer = wallet_node.get_full_node_peer()
+        assert peer is not None
+
+        fetch_children = wallet_node.fetch_children
+        fetched: List[bytes32] = []
+
+        async def counting_fetch_children(coin_name, *args, **kwargs):
+            fetched.append(coin_name)
+            return await fetch_children(coin_name, *args, **kwargs)
+
+        writer = wsm.db_wrapper.writer
+        transactions = 0
+
+        @contextlib.asynccontextmanager
+        async def counting_writer():
+            nonlocal transactions
+            if wsm.db_wrapper._current_writer != asyncio.current_task():
+                transactions += 1
+            async with writer() as conn:
+                yield conn
+
+        # the unspent coins we have already aren't plain XCH coin states, and don't need anything applied
+        processed: List[CoinState] = []
+
+        async def skip_process_coin_states(states, *args):
+            processed.extend(coin_state for coin_state, _ in states)
+
+        wallet_node.fetch_children = counting_fetch_children
+        wsm.db_wrapper.writer = counting_writer
+        wsm.process_coin_states = skip_process_coin_states
+
+        # the coin states we have already don't need their children
+        await wsm.new_coin_state(coin_states, peer, None)
+        assert fetched == []
+        assert await wallet.get_confirmed_balance() == balance
+
+        # the coins added and spent since are applied again in a single transaction
+        changed = [coin_state for coin_state in coin_states if last_change_height_cs(coin_state) == spent_height]
+
+        async def records_match() -> List[bool]:
+            records = await wsm.coin_store.get_coin_records([coin_state.coin.name() for coin_state in changed])
+            return [wsm.coin_record_matches(record, coin_state) for record, coin_state in zip(records, changed)]
+
+        await wsm.coin_store.rollback_to_block(spent_height - 1)
+        assert not any(await records_match())
+        transactions = 0
+        processed.clear()
+        await wsm.new_coin_state(coin_states, peer, None)
+        assert transactions == 1
+        assert set(fetched) == {
+            coin_state.coin.name() for coin_state in coin_states if coin_state.spent_height == spent_height
+        }
+        assert all(await records_match())
+        assert await wallet.get_confirmed_balance() == balance
+        assert all(last_change_height_cs(coin_state) < spent_height for coin_state in processed)
+
+    @pytest.mark.asyncio
+    async def test_untrusted_sync_stops_at_failed_chunk(self, wallet_node_sim_and_wallet, self_hostname, monkeypatch):
+        full_nodes, wallets, bt = wallet_node_sim_and_wallet
+        full_node_api = full_nodes[0]
+        wallet_node, wallet_server = wallets[0]
+        wsm = wallet_node.wallet_state_manager
+        await wallet_server.start_client(PeerInfo(self_hostname, uint16(full_node_api.full_node.server._port)), None)
+
+        ph = await wsm.main_wallet.get_new_puzzlehash()
+        for _ in range(4):
+            await full_node_api.farm_new_transaction_block(FarmNewBlockProtocol(ph))
+        await full_node_api.farm_new_transaction_block(FarmNewBlockProtocol(bytes32([0] * 32)))
+        await time_out_assert(20, wallet_is_synced, True, wallet_node, full_node_api)
+
+        coin_states = await full_node_api.full_node.coin_store.get_coin_states_by_puzzle_hashes(True, [ph])
+        coin_states.sort(key=last_change_height_cs)
+        heights = sorted({last_change_height_cs(coin_state) for coin_state in coin_states})
+        assert len(heights) > 2
+        peer = wallet_node.get_full_node_peer()
+        assert peer is not None
+
+        # one chunk per height, and the chunk of the second height fails validation
+        failing_height = heights[1]
+
+        async def validate_received_states_from_peer(states, *args):
+            if last_change_height_cs(states[0]) == failing_height:
+                return []
+            return states
+
+        monkeypatch.setattr(wallet_node, "is_trusted", lambda _: False)
+        monkeypatch.setattr(wallet_node, "validate_received_states_from_peer", validate_received_states_from_peer)
+        monkeypatch.setattr(
+            "chia.wallet.wallet_node.chunk_coin_states_by_height",
+            lambda states, _: chunk_coin_states_by_height(states, 1),
+        )
+
+        await wsm.blockchain.set_finished_sync_up_to(0, in_rollback=True)
+        assert not await wallet_node.receive_state_from_peer(coin_states, peer, update_finished_height=True)
+        # only the chunk before the failed one counts as synced, the chunks after it are applied but not counted
+        assert await wsm.blockchain.get_finished_sync_up_to() == heights[0] - 1
+
+        failing_height = -1
+        assert await wallet_node.receive_state_from_peer(coin_states, peer, update_finished_height=True)
+        assert await wsm.blockchain.get_finished_sync_up_to() == heights[-1] - 1
+
+    @pytest.mark.asyncio
+    async def test_rollback_clears_persisted_validation_cache(self, wallet_node_sim_and_wallet):
+        full_nodes, wallets, bt = wallet_node_sim_and_wallet
+        wallet_node, wallet_server = wallets[0]
+        wsm = wallet_node.wallet_state_manager
+        kept, removed = bytes32([1] * 32), bytes32([2] * 32)
+        wsm.validation_cache_store.add_to_blocks_validated(kept, uint32(5))
+        wsm.validation_cache_store.add_to_blocks_validated(removed, uint32(10))
+        await wsm.validation_cache_store.flush()
+
+        await wallet_node.perform_atomic_rollback(5)
+
+        reloaded = await WalletValidationCacheStore.create(wsm.db_wrapper)
+        assert reloaded.in_blocks_validated(kept)
+        assert not reloaded.in_blocks_validated(removed)
+
     @pytest.mark.asyncio
     async def test_bad_peak_mismatch(self, two_wallet_nodes, default_1000_blocks, self_hostname):
         full_nodes, wallets, bt = two_wallet_nodes
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import logging
+import random
 import time
 from random import randrange
-from typing import List, Set
+from typing import List, Optional, Set
 
 import pytest
 
@@ -13,9 +14,15 @@ from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.hash import std_hash
 from chia.util.ints import uint32, uint64, uint128
 from chia.wallet.coin_selection import (
+    MAX_NUM_COINS,
+    CoinSelectionObjective,
+    branch_and_bound_exact_match,
     check_for_exact_match,
     knapsack_coin_algorithm,
+    max_num_coins_for_cost,
+    max_num_coins_for_objective,
     select_coins,
+    select_coins_consolidating_dust,
     select_smallest_coin_over_target,
     sum_largest_coins,
 )
@@ -541,3 +548,192 @@ class TestCoinSelection:
                 logging.getLogger("test"),
                 target_amount,
             )
+
+    @pytest.mark.asyncio
+    async def test_branch_and_bound_exact_match(self, a_hash: bytes32) -> None:
+        coin_list: List[Coin] = [
+            Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(a))
+            for i, a in enumerate([320, 203, 202, 201, 160, 150, 80, 40, 20, 6, 3])
+        ]
+        match_2 = branch_and_bound_exact_match(coin_list, uint128(153), 500)
+        assert match_2 is not None
+        assert sorted(coin.amount for coin in match_2) == [3, 150]
+        # 320 + 40 + 3 is found first, but 203 + 160 uses fewer coins
+        match_363 = branch_and_bound_exact_match(coin_list, uint128(363), 500)
+        assert match_363 is not None
+        assert sorted(coin.amount for coin in match_363) == [160, 203]
+        assert branch_and_bound_exact_match(coin_list, uint128(2), 500) is None
+        assert branch_and_bound_exact_match(coin_list, uint128(sum(c.amount for c in coin_list)), 10) is None
+        assert len(branch_and_bound_exact_match(coin_list, uint128(sum(c.amount for c in coin_list)), 11) or []) == 11
+
+        # identical dust is searched by count, not coin by coin
+        dust_list: List[Coin] = [Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(2000)) for i in range(100)]
+        dust_list += [Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(1)) for i in range(100, 100100)]
+        start = time.monotonic()
+        assert branch_and_bound_exact_match(dust_list, uint128(3000), 500) is None
+        dust_match = branch_and_bound_exact_match(dust_list, uint128(2300), 500)
+        assert dust_match is not None
+        assert len(dust_match) == 301
+        assert time.monotonic() - start < 10
+
+    @pytest.mark.asyncio
+    async def test_coin_selection_consolidate_dust(self, a_hash: bytes32) -> None:
+        coin_list: List[WalletCoinRecord] = [
+            WalletCoinRecord(
+                Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(10000)),
+                uint32(1),
+                uint32(1),
+                False,
+                True,
+                WalletType(0),
+                1,
+            )
+            for i in range(10)
+        ]
+        coin_list += [
+            WalletCoinRecord(
+                Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(3)),
+                uint32(1),
+                uint32(1),
+                False,
+                True,
+                WalletType(0),
+                1,
+            )
+            for i in range(10, 1010)
+        ]
+        spendable_amount = uint128(sum(record.coin.amount for record in coin_list))
+        fewest: Set[Coin] = await select_coins(
+            spendable_amount,
+            uint64(DEFAULT_CONSTANTS.MAX_COIN_AMOUNT),
+            coin_list,
+            {},
+            logging.getLogger("test"),
+            uint128(20000),
+            objective=CoinSelectionObjective.FEWEST_COINS,
+        )
+        assert [coin.amount for coin in fewest] == [10000, 10000]
+
+        consolidated: Set[Coin] = await select_coins(
+            spendable_amount,
+            uint64(DEFAULT_CONSTANTS.MAX_COIN_AMOUNT),
+            coin_list,
+            {},
+            logging.getLogger("test"),
+            uint128(20000),
+            objective=CoinSelectionObjective.CONSOLIDATE_DUST,
+        )
+        assert sum(coin.amount for coin in consolidated) >= 20000
+        assert len(consolidated) == 500
+        assert len([coin for coin in consolidated if coin.amount == 3]) == 498
+
+        # the number of dust coins is bounded by the cost of their spends, which is only looked up for them
+        cost_lookups = 0
+
+        async def get_cost_per_coin() -> Optional[int]:
+            nonlocal cost_lookups
+            cost_lookups += 1
+            return 10000000
+
+        async def get_unknown_cost() -> Optional[int]:
+            return None
+
+        max_cost = DEFAULT_CONSTANTS.MAX_BLOCK_COST_CLVM / 5
+        for objective in (CoinSelectionObjective.DEFAULT, CoinSelectionObjective.FEWEST_COINS):
+            assert await max_num_coins_for_objective(objective, get_cost_per_coin, max_cost) == MAX_NUM_COINS
+        assert cost_lookups == 0
+        dust = CoinSelectionObjective.CONSOLIDATE_DUST
+        assert await max_num_coins_for_objective(dust, get_unknown_cost, max_cost) == MAX_NUM_COINS
+        max_num_coins = await max_num_coins_for_objective(dust, get_cost_per_coin, max_cost)
+        assert cost_lookups == 1
+        assert max_num_coins == 220
+        capped: Set[Coin] = await select_coins(
+            spendable_amount,
+            uint64(DEFAULT_CONSTANTS.MAX_COIN_AMOUNT),
+            coin_list,
+            {},
+            logging.getLogger("test"),
+            uint128(20000),
+            objective=CoinSelectionObjective.CONSOLIDATE_DUST,
+            max_num_coins=max_num_coins,
+        )
+        assert sum(coin.amount for coin in capped) >= 20000
+        assert len(capped) == max_num_coins
+        assert max_num_coins_for_cost(1, DEFAULT_CONSTANTS.MAX_BLOCK_COST_CLVM) == MAX_NUM_COINS
+
+        sorted_coins = [record.coin for record in coin_list]
+        small_target = select_coins_consolidating_dust(uint128(30), sorted_coins, 500)
+        assert small_target is not None
+        assert [coin.amount for coin in small_target] == [3] * 10
+        assert select_coins_consolidating_dust(uint128(200000), sorted_coins, 500) is None
+
+    @pytest.mark.asyncio
+    async def test_coin_selection_large_utxo_set(self, a_hash: bytes32) -> None:
+        rng = random.Random(1234)
+        coin_list: List[WalletCoinRecord] = [
+            WalletCoinRecord(
+                Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(rng.randint(1, 1000000))),
+                uint32(1),
+                uint32(1),
+                False,
+                True,
+                WalletType(0),
+                1,
+            )
+            for i in range(200000)
+        ]
+        coin_list.sort(key=lambda record: record.coin.amount, reverse=True)
+        spendable_amount = uint128(sum(record.coin.amount for record in coin_list))
+        for objective in CoinSelectionObjective:
+            for target_amount in [10000007, 123456789]:
+                start = time.monotonic()
+                result: Set[Coin] = await select_coins(
+                    spendable_amount,
+                    uint64(DEFAULT_CONSTANTS.MAX_COIN_AMOUNT),
+                    coin_list,
+                    {},
+                    logging.getLogger("test"),
+                    uint128(target_amount),
+                    objective=objective,
+                    time_budget=1.0,
+                )
+                assert sum(coin.amount for coin in result) >= target_amount
+                assert len(result) <= 500
+                # Just a sanity check on the time budget, it's actually much faster than this
+                assert time.monotonic() - start < 30
+
+    @pytest.mark.asyncio
+    async def test_coin_selection_default_objective_uses_knapsack(self, a_hash: bytes32) -> None:
+        coin_list: List[WalletCoinRecord] = [
+            WalletCoinRecord(
+                Coin(a_hash, std_hash(i.to_bytes(4, "big")), uint64(a)),
+                uint32(1),
+                uint32(1),
+                False,
+                True,
+                WalletType(0),
+                1,
+            )
+            for i, a in enumerate([320, 203, 202, 201, 160, 150, 80, 40, 20, 6, 3])
+        ]
+        spendable_amount = uint128(sum(record.coin.amount for record in coin_list))
+        smaller_coins = [record.coin for record in coin_list]
+        # the knapsack settles for 320 + 20 where the exact match search finds 203 + 80 + 40 + 6 + 3
+        for objective, expected in [
+            (
+                CoinSelectionObjective.DEFAULT,
+                knapsack_coin_algorithm(smaller_coins, uint128(332), DEFAULT_CONSTANTS.MAX_COIN_AMOUNT, 500),
+            ),
+            (CoinSelectionObjective.FEWEST_COINS, branch_and_bound_exact_match(smaller_coins, uint128(332), 500)),
+        ]:
+            assert expected is not None
+            result: Set[Coin] = await select_coins(
+                spendable_amount,
+                uint64(DEFAULT_CONSTANTS.MAX_COIN_AMOUNT),
+                coin_list,
+                {},
+                logging.getLogger("test"),
+                uint128(332),
+                objective=objective,
+            )
+            assert result == set(expected)
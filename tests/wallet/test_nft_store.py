@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import List, Optional
+
 import pytest
 
 from chia.types.blockchain_format.coin import Coin
@@ -8,6 +10,7 @@ from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.ints import uint32, uint64
 from chia.wallet.lineage_proof import LineageProof
 from chia.wallet.nft_wallet.nft_info import NFTCoinInfo
+from chia.wallet.nft_wallet.nft_puzzles import NFT_METADATA_UPDATER, create_full_puzzle, metadata_to_program
 from chia.wallet.wallet_nft_store import WalletNftStore
 from tests.util.db_connection import DBConnection
 
@@ -135,3 +138,87 @@ class TestNftStore:
             await db.rollback_to_block(-1)
             assert await db.count(wallet_id=uint32(1)) == 0
             assert await db.is_empty(wallet_id=uint32(1))
+
+    @pytest.mark.asyncio
+    async def test_nft_pages(self) -> None:
+        async with DBConnection(1) as wrapper:
+            db = await WalletNftStore.create(wrapper)
+            did_id = bytes32([1] * 32)
+            nfts: List[NFTCoinInfo] = []
+            for i in range(10):
+                nft_id = bytes32([i] * 32)
+                nft = NFTCoinInfo(
+                    nft_id,
+                    Coin(nft_id, nft_id, uint64(1)),
+                    None,
+                    Program.to(["A Test puzzle"]),
+                    uint32(1),
+                    None,
+                    uint32(10),
+                )
+                nfts.append(nft)
+                await db.save_nft(uint32(1 + i % 2), did_id if i < 3 else None, nft)
+            await db.delete_nft_by_nft_id(nfts[9].nft_id, uint32(11))
+            nfts = nfts[:9]
+
+            assert await db.get_nft_list() == nfts
+            assert await db.get_nft_list(offset=2, limit=3) == nfts[2:5]
+            assert await db.get_nft_list(limit=3, start_after=nfts[5].nft_id) == nfts[6:9]
+            assert await db.get_nft_list(start_after=nfts[8].nft_id) == []
+            assert await db.get_nft_list(wallet_id=uint32(2), limit=2, start_after=nfts[1].nft_id) == nfts[3:6:2]
+            assert await db.get_nft_list(did_id=did_id) == nfts[:3]
+
+            # walk through all the NFTs page by page
+            pages: List[NFTCoinInfo] = []
+            start_after: Optional[bytes32] = None
+            while True:
+                page = await db.get_nft_list(limit=4, start_after=start_after)
+                if len(page) == 0:
+                    break
+                pages.extend(page)
+                start_after = page[-1].nft_id
+            assert pages == nfts
+
+            assert await db.get_nft_list(wallet_id=uint32(1), limit=2) == nfts[0:3:2]
+            assert await db.get_nft_list(offset=7) == nfts[7:]
+            assert await db.count() == 9
+            assert await db.count(wallet_id=uint32(1)) == 5
+            assert await db.count(did_id=did_id) == 3
+
+            # saving an NFT again moves it to the end, apart from the pages by NFT ID
+            await db.save_nft(uint32(1), did_id, nfts[0])
+            assert await db.get_nft_list() == nfts[1:] + nfts[:1]
+            assert await db.get_nft_list(offset=7) == [nfts[8], nfts[0]]
+            assert await db.get_nft_list(start_after=nfts[0].nft_id, limit=3) == nfts[1:4]
+
+    @pytest.mark.asyncio
+    async def test_nft_filters(self) -> None:
+        async with DBConnection(1) as wrapper:
+            db = await WalletNftStore.create(wrapper)
+            minter_did = bytes32([2] * 32)
+            metadata_hash = bytes([3] * 32)
+            nfts: List[NFTCoinInfo] = []
+            for i in range(4):
+                nft_id = bytes32([i] * 32)
+                metadata = {b"u": ["https://www.chia.net/img/branding/chia-logo.svg"], b"h": bytes([i] * 32)}
+                if i % 2 == 0:
+                    metadata[b"mh"] = metadata_hash
+                full_puzzle = create_full_puzzle(
+                    nft_id, metadata_to_program(metadata), NFT_METADATA_UPDATER.get_tree_hash(), Program.to(1)
+                )
+                nft = NFTCoinInfo(
+                    nft_id,
+                    Coin(nft_id, full_puzzle.get_tree_hash(), uint64(1)),
+                    None,
+                    full_puzzle,
+                    uint32(1),
+                    minter_did if i < 2 else None,
+                    uint32(10),
+                )
+                nfts.append(nft)
+                await db.save_nft(uint32(1), None, nft)
+
+            assert await db.get_nft_list(minter_did=minter_did) == nfts[:2]
+            assert await db.get_nft_list(metadata_hash=metadata_hash) == nfts[0:4:2]
+            assert await db.get_nft_list(minter_did=minter_did, metadata_hash=metadata_hash) == nfts[:1]
+            assert await db.get_nft_list(metadata_hash=bytes([4] * 32)) == []
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import multiprocessing
+from typing import List
+
+import pytest
+from blspy import AugSchemeMPL
+
+from chia.util.ints import uint32
+from chia.wallet.derive_keys import master_sk_to_wallet_sk, master_sk_to_wallet_sk_unhardened
+from chia.wallet.puzzles.p2_delegated_puzzle_or_hidden_puzzle import puzzle_hash_for_pk
+from chia.wallet.util.puzzle_hash_derivation import DerivedKeys, PuzzleHashDerivationEngine
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("start, end", [(0, 25), (7, 1207)])
+async def test_derivation_engine_matches_single_derivation(start: int, end: int) -> None:
+    master_sk = AugSchemeMPL.key_gen(bytes([7] * 32))
+    engine = PuzzleHashDerivationEngine(multiprocessing.get_context(), num_processes=2)
+    try:
+        derived: List[DerivedKeys] = []
+        async for batch in engine.derive(master_sk, start, end):
+            derived.extend(batch)
+    finally:
+        engine.close()
+
+    assert [keys.index for keys in derived] == list(range(start, end))
+    for keys in derived[:: max(1, len(derived) // 20)]:
+        pubkey = master_sk_to_wallet_sk(master_sk, uint32(keys.index)).get_g1()
+        pubkey_unhardened = master_sk_to_wallet_sk_unhardened(master_sk, uint32(keys.index)).get_g1()
+        assert keys.pubkey == pubkey
+        assert keys.puzzle_hash == puzzle_hash_for_pk(pubkey)
+        assert keys.pubkey_unhardened == pubkey_unhardened
+        assert keys.puzzle_hash_unhardened == puzzle_hash_for_pk(pubkey_unhardened)
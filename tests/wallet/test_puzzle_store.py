@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 from secrets import token_bytes
+from typing import List
 
 import pytest
 from blspy import AugSchemeMPL
 
+from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.util.ints import uint32
 from chia.wallet.derivation_record import DerivationRecord
+from chia.wallet.util.puzzle_hash_index import PuzzleHashIndex
 from chia.wallet.util.wallet_types import WalletType
 from chia.wallet.wallet_puzzle_store import WalletPuzzleStore
 from tests.util.db_connection import DBConnection
@@ -68,7 +71,111 @@ class TestPuzzleStore:
             assert await db.get_unused_derivation_path() == 0
             assert await db.get_derivation_record(0, 2, False) == derivation_recs[1]
 
+            unknown_puzzle_hash = token_bytes(32)
+            records = await db.get_derivation_records_for_puzzle_hashes(
+                [rec.puzzle_hash for rec in derivation_recs[:10]] + [unknown_puzzle_hash]
+            )
+            assert len(records) == 10
+            assert unknown_puzzle_hash not in records
+            for rec in derivation_recs[:10]:
+                assert records[rec.puzzle_hash] == rec
+
             # Indeces up to 250
             await db.set_used_up_to(249)
 
             assert await db.get_unused_derivation_path() == 250
+
+
+def make_derivation_records(start: int, end: int, wallet_id: int) -> List[DerivationRecord]:
+    return [
+        DerivationRecord(
+            uint32(i),
+            bytes32(token_bytes(32)),
+            AugSchemeMPL.key_gen(token_bytes(32)).get_g1(),
+            WalletType.STANDARD_WALLET,
+            uint32(wallet_id),
+            i % 2 == 0,
+        )
+        for i in range(start, end)
+    ]
+
+
+class TestPuzzleHashIndex:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("index_max_entries", [1000, 150, 0])
+    async def test_lookups_match_db(self, index_max_entries: int) -> None:
+        async with DBConnection(1) as wrapper:
+            db = await WalletPuzzleStore.create(wrapper, index_max_entries)
+            records = make_derivation_records(0, 100, 1)
+            await db.add_derivation_paths(records)
+            # the index is loaded from the DB on startup
+            db = await WalletPuzzleStore.create(wrapper, index_max_entries)
+            assert db.puzzle_hash_index.complete == (index_max_entries >= 100)
+            # and kept up to date when paths are added, growing the bloom filter if needed
+            records += make_derivation_records(100, 300, 2)
+            await db.add_derivation_paths(records[100:])
+            assert db.puzzle_hash_index.complete == (index_max_entries >= 300)
+            assert not db.puzzle_hash_index.needs_reload()
+
+            for record in records:
+                assert await db.puzzle_hash_exists(record.puzzle_hash)
+                assert await db.index_for_puzzle_hash(record.puzzle_hash) == record.index
+                assert await db.wallet_info_for_puzzle_hash(record.puzzle_hash) == (
+                    record.wallet_id,
+                    record.wallet_type,
+                )
+            unknown_puzzle_hash = bytes32(token_bytes(32))
+            assert not await db.puzzle_hash_exists(unknown_puzzle_hash)
+            assert await db.index_for_puzzle_hash(unknown_puzzle_hash) is None
+            assert await db.wallet_info_for_puzzle_hash(unknown_puzzle_hash) is None
+            assert await db.get_derivation_record_for_puzzle_hash(unknown_puzzle_hash) is None
+            found = await db.get_derivation_records_for_puzzle_hashes(
+                [record.puzzle_hash for record in records] + [unknown_puzzle_hash]
+            )
+            assert found == {record.puzzle_hash: record for record in records}
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("index_max_entries", [1000, 0])
+    async def test_rolled_back_paths_not_indexed(self, index_max_entries: int) -> None:
+        async with DBConnection(1) as wrapper:
+            db = await WalletPuzzleStore.create(wrapper, index_max_entries)
+            records = make_derivation_records(0, 10, 1)
+            with pytest.raises(RuntimeError):
+                async with wrapper.writer():
+                    await db.add_derivation_paths(records)
+                    # the paths are pending and looked up in the DB while the transaction is open
+                    assert db.puzzle_hash_index.is_pending(records[0].puzzle_hash)
+                    assert await db.index_for_puzzle_hash(records[0].puzzle_hash) == records[0].index
+                    raise RuntimeError("roll back")
+            for record in records:
+                assert not await db.puzzle_hash_exists(record.puzzle_hash)
+                assert await db.index_for_puzzle_hash(record.puzzle_hash) is None
+                assert await db.wallet_info_for_puzzle_hash(record.puzzle_hash) is None
+            assert db.puzzle_hash_index.get_pending() == []
+
+            async with wrapper.writer():
+                await db.add_derivation_paths(records)
+            # added to the index once the transaction committed
+            assert await db.puzzle_hash_exists(records[0].puzzle_hash)
+            assert db.puzzle_hash_index.get_pending() == []
+            assert (db.puzzle_hash_index.get(records[0].puzzle_hash) is not None) == db.puzzle_hash_index.complete
+
+    def test_bloom_filter_false_positive_rate(self) -> None:
+        index = PuzzleHashIndex(max_entries=0)
+        index.reset(10000)
+        for i in range(10000):
+            index.add(bytes32(token_bytes(32)), i, 1, WalletType.STANDARD_WALLET, False)
+        assert not index.complete
+        false_positives = sum(index.may_contain(bytes32(token_bytes(32))) for _ in range(10000))
+        assert false_positives < 300
+
+    def test_puzzle_hash_in_several_wallets(self) -> None:
+        index = PuzzleHashIndex()
+        puzzle_hash = bytes32(token_bytes(32))
+        index.add(puzzle_hash, 3, 1, WalletType.STANDARD_WALLET, False)
+        info = index.get(puzzle_hash)
+        assert info is not None and info.derivation_index == 3 and info.wallet_id == 1
+        index.add(puzzle_hash, 3, 2, WalletType.CAT, False)
+        # the DB decides which wallet such puzzle hashes are reported for
+        assert index.get(puzzle_hash) is None
+        assert index.may_contain(puzzle_hash)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import dataclasses
 from secrets import token_bytes
-from typing import Any, List
+from typing import Any, List, Optional
 
 import pytest
 
@@ -652,3 +652,65 @@ async def test_get_not_sent() -> None:
         assert cmp(not_sent, [])
 
         # TODO: also cover include_accepted_txs=True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sort_key", ["CONFIRMED_AT_HEIGHT", "RELEVANCE"])
+@pytest.mark.parametrize("reverse", [False, True])
+async def test_get_transactions_page(sort_key: str, reverse: bool) -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletTransactionStore.create(db_wrapper)
+
+        # plenty of ties, so that the pages have to be split within them
+        for i in range(40):
+            await store.add_transaction_record(
+                dataclasses.replace(
+                    tr1,
+                    name=bytes32(token_bytes(32)),
+                    confirmed=i % 3 == 0,
+                    confirmed_at_height=uint32(i % 4),
+                    created_at_time=uint64(1000 + i % 2),
+                )
+            )
+        await store.add_transaction_record(dataclasses.replace(tr1, name=bytes32(token_bytes(32)), wallet_id=2))
+
+        expected = await store.get_transactions_between(1, 0, 100, sort_key=sort_key, reverse=reverse)
+        assert len(expected) == 40
+
+        transactions: List[TransactionRecord] = []
+        cursor: Optional[str] = None
+        while True:
+            page, cursor = await store.get_transactions_page(1, 7, cursor, sort_key=sort_key, reverse=reverse)
+            transactions.extend(page)
+            if cursor is None:
+                break
+        assert transactions == expected
+
+        summaries, cursor = await store.get_transaction_summaries_page(1, 40, sort_key=sort_key, reverse=reverse)
+        assert cursor is not None
+        assert [summary.name for summary in summaries] == [tx.name for tx in expected]
+        for summary, tx in zip(summaries, expected):
+            assert summary.confirmed_at_height == tx.confirmed_at_height
+            assert summary.created_at_time == tx.created_at_time
+            assert summary.to_puzzle_hash == tx.to_puzzle_hash
+            assert summary.amount == tx.amount
+            assert summary.fee_amount == tx.fee_amount
+            assert summary.confirmed == tx.confirmed
+            assert summary.trade_id == tx.trade_id
+            assert summary.type == tx.type
+        # the page after the last transaction is empty
+        assert await store.get_transaction_summaries_page(1, 40, cursor, sort_key=sort_key, reverse=reverse) == (
+            [],
+            None,
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_transactions_page_invalid_cursor() -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletTransactionStore.create(db_wrapper)
+
+        with pytest.raises(ValueError, match="Invalid transaction cursor"):
+            await store.get_transactions_page(1, 10, "1,2,3")
+        with pytest.raises(ValueError, match="Invalid transaction cursor"):
+            await store.get_transactions_page(1, 10, "a,b")
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from secrets import token_bytes
 
 import pytest
@@ -467,3 +468,102 @@ async def test_count_small_unspent() -> None:
         assert await store.count_small_unspent(3) == 1
         assert await store.count_small_unspent(2) == 1
         assert await store.count_small_unspent(1) == 0
+
+
+@pytest.mark.asyncio
+async def test_unspent_index() -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletCoinStore.create(db_wrapper)
+
+        await store.add_coin_record(record_1)
+        await store.add_coin_record(record_2)
+        await store.add_coin_record(record_3)  # spent
+        assert await store.get_confirmed_balance(0) == coin_1.amount + coin_2.amount
+        assert await store.get_unspent_coins_by_amount(0) == [record_1, record_2]
+
+        # changes rolled back with their transaction don't make it into the index
+        with pytest.raises(RuntimeError):
+            async with db_wrapper.writer():
+                await store.set_spent(coin_1.name(), uint32(12))
+                await store.add_coin_record(record_5)
+                raise RuntimeError("rollback")
+        assert await store.get_confirmed_balance(0) == coin_1.amount + coin_2.amount
+        assert await store.get_unspent_coins_for_wallet(1) == set()
+
+        await store.set_spent(coin_2.name(), uint32(12))
+        await store.add_coin_record(record_5)
+        assert await store.get_confirmed_balance(0) == coin_1.amount
+        assert await store.get_unspent_coins_for_wallet(0) == {record_1}
+        assert await store.get_confirmed_balance(1) == coin_5.amount
+
+        await store.delete_coin_record(coin_1.name())
+        assert await store.get_confirmed_balance(0) == 0
+
+        await store.rollback_to_block(11)
+        assert await store.get_unspent_coins_for_wallet(0) == {record_2}
+        assert await store.get_confirmed_balance(0) == coin_2.amount
+
+
+@pytest.mark.asyncio
+async def test_unspent_index_with_open_write_transaction() -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletCoinStore.create(db_wrapper)
+
+        await store.add_coin_record(record_1)
+        assert await store.get_confirmed_balance(0) == coin_1.amount
+
+        written = asyncio.Event()
+        release = asyncio.Event()
+
+        async def spend_and_roll_back() -> None:
+            async with db_wrapper.writer():
+                await store.set_spent(coin_1.name(), uint32(12))
+                written.set()
+                await release.wait()
+                raise RuntimeError("rollback")
+
+        task = asyncio.create_task(spend_and_roll_back())
+        await written.wait()
+        # the reads don't wait for the open transaction, and only see what is committed
+        assert await store.get_unspent_index(0) is None
+        assert await store.get_confirmed_balance(0) == coin_1.amount
+        assert await store.get_unspent_coins_for_wallet(0) == {record_1}
+
+        release.set()
+        with pytest.raises(RuntimeError):
+            await task
+        index = await store.get_unspent_index(0)
+        assert index is not None
+        assert index.balance == coin_1.amount
+
+
+@pytest.mark.asyncio
+async def test_unspent_index_with_open_rollback() -> None:
+    async with DBConnection(1) as db_wrapper:
+        store = await WalletCoinStore.create(db_wrapper)
+
+        await store.add_coin_record(record_1)
+        await store.add_coin_record(record_2)
+        assert await store.get_confirmed_balance(0) == coin_1.amount + coin_2.amount
+
+        rolled_back = asyncio.Event()
+        release = asyncio.Event()
+
+        async def roll_back() -> None:
+            async with db_wrapper.writer():
+                await store.rollback_to_block(4)
+                rolled_back.set()
+                await release.wait()
+
+        task = asyncio.create_task(roll_back())
+        await rolled_back.wait()
+        # the index isn't loaded again from the state before the reorg while it isn't committed
+        assert await store.get_unspent_index(0) is None
+        assert await store.get_confirmed_balance(0) == coin_1.amount + coin_2.amount
+
+        release.set()
+        await task
+        index = await store.get_unspent_index(0)
+        assert index is not None
+        assert index.balance == coin_1.amount
+        assert await store.get_unspent_coins_for_wallet(0) == {record_1}
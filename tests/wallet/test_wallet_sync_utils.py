@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from chia.protocols.wallet_protocol import CoinState
+from chia.types.blockchain_format.coin import Coin
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.ints import uint64
+from chia.wallet.util.wallet_sync_utils import SubscriptionQueue, chunk_coin_states_by_height, last_change_height_cs
+
+
+def make_coin_states(heights: List[Tuple[Optional[int], Optional[int]]]) -> List[CoinState]:
+    return [
+        CoinState(Coin(bytes32(i.to_bytes(32, "big")), bytes32(b"\x01" * 32), uint64(i)), spent, created)
+        for i, (created, spent) in enumerate(heights)
+    ]
+
+
+def test_chunk_coin_states_by_height() -> None:
+    coin_states = make_coin_states(
+        [(None, None), (1, None), (1, None), (1, 2), (2, None), (3, None), (2, 3), (3, None), (4, 5), (6, None)]
+    )
+    coin_states.sort(key=last_change_height_cs)
+
+    chunked = list(chunk_coin_states_by_height(coin_states, 2))
+    assert [coin_state for chunk in chunked for coin_state in chunk] == coin_states
+    assert [[last_change_height_cs(coin_state) for coin_state in chunk] for chunk in chunked] == [
+        [0, 1, 1],
+        [2, 2],
+        [3, 3, 3],
+        [5, 6],
+    ]
+    # a height is never split, however large the chunk gets
+    assert len(list(chunk_coin_states_by_height(coin_states[1:8], 1))) == 3
+    assert list(chunk_coin_states_by_height([], 10)) == []
+
+
+def test_subscription_queue() -> None:
+    items = [bytes32(i.to_bytes(32, "big")) for i in range(10)]
+    queue = SubscriptionQueue()
+    queue.push(items[:6])
+    assert len(queue) == 6
+    popped = queue.pop(4)
+    assert len(popped) == 4 and len(queue) == 2
+    # what was already pushed is not queued again, even once popped
+    queue.push(items)
+    assert len(queue) == 6
+    while len(queue) > 0:
+        popped += queue.pop(4)
+    assert sorted(popped) == items
+    assert queue.num_seen == 10
+    assert queue.pop(4) == []
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from secrets import token_bytes
+
+import pytest
+
+from chia.types.blockchain_format.sized_bytes import bytes32
+from chia.util.ints import uint32
+from chia.wallet.util.peer_request_cache import PeerRequestCache
+from chia.wallet.wallet_validation_cache_store import WalletValidationCacheStore
+from tests.util.db_connection import DBConnection
+
+
+class TestWalletValidationCacheStore:
+    @pytest.mark.asyncio
+    async def test_persisted_across_restarts(self) -> None:
+        async with DBConnection(1) as db_wrapper:
+            store = await WalletValidationCacheStore.create(db_wrapper)
+            reward_chain_hashes = [bytes32(token_bytes(32)) for _ in range(3)]
+            sig_hash = bytes32(token_bytes(32))
+            header_hash = bytes32(token_bytes(32))
+            puzzle_hash = bytes32(token_bytes(32))
+            for height, reward_chain_hash in enumerate(reward_chain_hashes):
+                store.add_to_blocks_validated(reward_chain_hash, uint32(height + 10))
+            store.add_to_block_signatures_validated(sig_hash, uint32(11))
+            store.add_to_additions_in_block(header_hash, puzzle_hash, uint32(12))
+            assert store.in_blocks_validated(reward_chain_hashes[0])
+            assert store.in_block_signatures_validated(sig_hash)
+            assert store.in_additions_in_block(header_hash, puzzle_hash)
+
+            # nothing is written before the flush
+            assert not (await WalletValidationCacheStore.create(db_wrapper)).in_blocks_validated(reward_chain_hashes[0])
+            await store.flush()
+            reloaded = await WalletValidationCacheStore.create(db_wrapper)
+            assert all(reloaded.in_blocks_validated(h) for h in reward_chain_hashes)
+            assert reloaded.in_block_signatures_validated(sig_hash)
+            assert reloaded.in_additions_in_block(header_hash, puzzle_hash)
+            assert not reloaded.in_additions_in_block(puzzle_hash, header_hash)
+
+            # a reorg drops everything above the fork height, in memory and in the DB
+            reloaded.clear_after_height(10)
+            assert reloaded.in_blocks_validated(reward_chain_hashes[0])
+            assert not reloaded.in_blocks_validated(reward_chain_hashes[1])
+            assert not reloaded.in_block_signatures_validated(sig_hash)
+            await reloaded.flush()
+            after_reorg = await WalletValidationCacheStore.create(db_wrapper)
+            assert after_reorg.in_blocks_validated(reward_chain_hashes[0])
+            assert not after_reorg.in_blocks_validated(reward_chain_hashes[2])
+            assert not after_reorg.in_additions_in_block(header_hash, puzzle_hash)
+
+    @pytest.mark.asyncio
+    async def test_size_bound(self) -> None:
+        async with DBConnection(1) as db_wrapper:
+            store = await WalletValidationCacheStore.create(db_wrapper, max_entries=5)
+            reward_chain_hashes = [bytes32(token_bytes(32)) for _ in range(8)]
+            for height, reward_chain_hash in enumerate(reward_chain_hashes):
+                store.add_to_blocks_validated(reward_chain_hash, uint32(height))
+            await store.flush()
+            reloaded = await WalletValidationCacheStore.create(db_wrapper, max_entries=5)
+            assert [reloaded.in_blocks_validated(h) for h in reward_chain_hashes] == [False] * 3 + [True] * 5
+
+    @pytest.mark.asyncio
+    async def test_shared_between_peers(self) -> None:
+        async with DBConnection(1) as db_wrapper:
+            store = await WalletValidationCacheStore.create(db_wrapper)
+            peer_1_cache = PeerRequestCache(store)
+            peer_2_cache = PeerRequestCache(store)
+            reward_chain_hash = bytes32(token_bytes(32))
+            peer_1_cache.add_to_blocks_validated(reward_chain_hash, uint32(100))
+            assert peer_2_cache.in_blocks_validated(reward_chain_hash)
+            assert not PeerRequestCache().in_blocks_validated(reward_chain_hash)
+
+            # a reorg reported by a single peer only clears the cache of that peer
+            peer_2_cache.clear_after_height(99)
+            assert PeerRequestCache(store).in_blocks_validated(reward_chain_hash)
+            store.clear_after_height(99)
+            assert not peer_2_cache.in_blocks_validated(reward_chain_hash)
+            assert not PeerRequestCache(store).in_blocks_validated(reward_chain_hash)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import dataclasses
 import sys
 from typing import Dict, List, Optional, Tuple
 
@@ -18,9 +19,10 @@ from chia.types.blockchain_format.sized_bytes import bytes32
 from chia.types.blockchain_format.sub_epoch_summary import SubEpochSummary
 from chia.types.full_block import FullBlock
 from chia.types.header_block import HeaderBlock
+from chia.types.weight_proof import WeightProof
 from chia.util.block_cache import BlockCache
 from chia.util.generator_tools import get_block_header
-from chia.util.ints import uint32, uint64
+from chia.util.ints import uint8, uint32, uint64
 
 
 def count_sub_epochs(blockchain, last_hash) -> int:
@@ -473,6 +475,50 @@ class TestWeightProof:
         assert valid
         assert fork_point != 0
 
+    @pytest.mark.asyncio
+    async def test_weight_proof_cached_across_tips(self, default_1000_blocks):
+        blocks = default_1000_blocks
+        header_cache, height_to_hash, sub_blocks, summaries = await load_blocks_dont_validate(blocks)
+        wpf = WeightProofHandler(test_constants, BlockCache(sub_blocks, header_cache, height_to_hash, summaries))
+        wp = await wpf.get_proof_of_weight(blocks[-10].header_hash)
+        assert wp is not None
+        # the proof of the new peak is built in the background, from the recent chain and segments of the last one
+        wpf.new_peak(sub_blocks[blocks[-1].header_hash])
+        assert wpf._precompute_task is not None
+        await wpf._precompute_task
+        wp_bytes = await wpf.get_proof_of_weight_bytes(blocks[-1].header_hash)
+        assert wp_bytes is not None
+        assert await wpf.get_proof_of_weight_bytes(blocks[-1].header_hash) is wp_bytes
+
+        wpf_new = WeightProofHandler(test_constants, BlockCache(sub_blocks, header_cache, height_to_hash, summaries))
+        new_wp = await wpf_new._create_proof_of_weight(blocks[-1].header_hash)
+        assert new_wp is not None
+        assert bytes(new_wp) == wp_bytes
+        wpf_verify = WeightProofHandler(test_constants, BlockCache(sub_blocks, header_cache, height_to_hash, {}))
+        valid, fork_point, _ = await wpf_verify.validate_weight_proof(WeightProof.from_bytes(wp_bytes))
+        assert valid
+        assert fork_point == 0
+
+    @pytest.mark.asyncio
+    async def test_sub_epoch_data_not_reused_after_reorg(self, default_1000_blocks):
+        blocks = default_1000_blocks
+        header_cache, height_to_hash, sub_blocks, summaries = await load_blocks_dont_validate(blocks)
+        wpf = WeightProofHandler(test_constants, BlockCache(sub_blocks, header_cache, height_to_hash, summaries))
+        summary_heights = sorted(summaries.keys())
+        tip_height = uint32(blocks[-1].height)
+        sub_epoch_data = wpf.get_sub_epoch_data(tip_height, summary_heights)
+        assert wpf.get_sub_epoch_data(tip_height, summary_heights) == sub_epoch_data
+
+        # the block including the last summary is reorged out, without a new peak for the handler
+        last_ses_height = summary_heights[-1]
+        height_to_hash[last_ses_height] = bytes32([1] * 32)
+        summaries[last_ses_height] = dataclasses.replace(
+            summaries[last_ses_height], num_blocks_overflow=uint8(summaries[last_ses_height].num_blocks_overflow + 1)
+        )
+        new_sub_epoch_data = wpf.get_sub_epoch_data(tip_height, summary_heights)
+        assert new_sub_epoch_data[:-1] == sub_epoch_data[:-1]
+        assert new_sub_epoch_data[-1].num_blocks_overflow == sub_epoch_data[-1].num_blocks_overflow + 1
+
     @pytest.mark.skip("used for debugging")
     @pytest.mark.asyncio
     async def test_weight_proof_from_database(self):
@@ -149,6 +149,7 @@ async def run_sync_test(
         try:
             full_node.set_server(FakeServer())  # type: ignore[arg-type]
             await full_node._start()
+            await full_node.wait_until_initialized()
 
             peak = full_node.blockchain.get_peak()
             if peak is not None:
@@ -353,6 +354,7 @@ async def run_sync_checkpoint(
     try:
         full_node.set_server(FakeServer())  # type: ignore[arg-type]
         await full_node._start()
+        await full_node.wait_until_initialized()
 
         peer: WSChiaConnection = FakePeer()  # type: ignore[assignment]
 